@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Compare the threaded ApiCaller with the asyncio AsyncApiCaller used by the FastAPI control plane.
+
+Local stub instances answer GET /ping and POST /ban (a single ban or a list of bans) and count the HTTP requests they receive.
+Two workloads are measured, both with --concurrency control-plane requests in flight at the same time:
+- ping: every control-plane request fans a GET /ping out to every instance
+- ban: every control-plane request bans --ips addresses, the threaded path sends one POST /ban per address
+  and per instance (the previous route) while the asyncio path sends the whole list once per instance
+
+Usage: python3 misc/benchmarks/api_async_fanout.py [--instances 20] [--requests 200] [--concurrency 16] [--ips 10]
+"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from asyncio import Semaphore, gather, run
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from os import environ
+from pathlib import Path
+from sys import path as sys_path
+from threading import Lock, Thread
+from time import perf_counter
+
+# Don't log every successful request
+environ.setdefault("LOG_LEVEL", "WARNING")
+
+COMMON_DIR = Path(__file__).resolve().parent.parent.parent / "src" / "common"
+
+for deps_path in (COMMON_DIR / "utils", COMMON_DIR / "api"):
+    if deps_path.as_posix() not in sys_path:
+        sys_path.append(deps_path.as_posix())
+
+from API import API  # type: ignore  # noqa: E402
+from ApiCaller import ApiCaller  # type: ignore  # noqa: E402
+from AsyncAPI import AsyncAPI  # type: ignore  # noqa: E402
+from AsyncApiCaller import AsyncApiCaller  # type: ignore  # noqa: E402
+
+REQUESTS = 0
+REQUESTS_LOCK = Lock()
+
+
+class StubInstanceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def reply(self, payload: dict):
+        global REQUESTS
+        with REQUESTS_LOCK:
+            REQUESTS += 1
+        body = dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.reply({"status": "success", "msg": "pong"})
+
+    def do_POST(self):
+        bans = loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if isinstance(bans, list):
+            self.reply({"status": "success", "msg": "success", "data": [{"ip": ban["ip"], "status": "success", "msg": "banned"} for ban in bans]})
+        else:
+            self.reply({"status": "success", "msg": f"ip {bans['ip']} banned"})
+
+    def log_message(self, *args):
+        pass
+
+
+def start_instances(count: int) -> list[ThreadingHTTPServer]:
+    servers = []
+    for _ in range(count):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubInstanceHandler)
+        server.daemon_threads = True
+        server.request_queue_size = 128
+        Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def bans_payload(request: int, count: int) -> list[dict]:
+    return [{"ip": f"10.{request // 250 % 250}.{request % 250}.{ip}", "exp": 3600, "reason": "benchmark", "ban_scope": "global"} for ip in range(1, count + 1)]
+
+
+def run_threaded(apis: list[API], workload: str, requests: int, concurrency: int, ips: int) -> float:
+    """The previous routes: sync endpoints run in the threadpool, one blocking fan-out per banned address."""
+
+    def handle(request: int):
+        api_caller = ApiCaller(apis)
+        if workload == "ping":
+            return api_caller.send_to_apis("GET", "/ping", response=True)[0]
+        return all(api_caller.send_to_apis("POST", "/ban", data=payload)[0] for payload in bans_payload(request, ips))
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        assert all(executor.map(handle, range(requests)))
+    return perf_counter() - start
+
+
+async def run_async(apis: list[AsyncAPI], workload: str, requests: int, concurrency: int, ips: int) -> float:
+    """The async routes: the fan-out runs on the event loop and the bans are sent once per instance."""
+    semaphore = Semaphore(concurrency)
+
+    async def handle(request: int):
+        async with semaphore:
+            api_caller = AsyncApiCaller(apis)
+            if workload == "ping":
+                return (await api_caller.send_to_apis("GET", "/ping", response=True))[0]
+            return (await api_caller.send_batch_to_apis("/ban", bans_payload(request, ips)))[0]
+
+    start = perf_counter()
+    assert all(await gather(*(handle(request) for request in range(requests))))
+    return perf_counter() - start
+
+
+def main():
+    global REQUESTS
+
+    parser = ArgumentParser(description="Async API fan-out benchmark against local stub instances")
+    parser.add_argument("--instances", type=int, default=20, help="number of stub instances")
+    parser.add_argument("--requests", type=int, default=200, help="control-plane requests per workload")
+    parser.add_argument("--concurrency", type=int, default=16, help="control-plane requests in flight")
+    parser.add_argument("--ips", type=int, default=10, help="addresses banned by each ban request")
+    args = parser.parse_args()
+
+    servers = start_instances(args.instances)
+    apis = [API(f"http://127.0.0.1:{server.server_address[1]}") for server in servers]
+    async_apis = [AsyncAPI.from_api(api) for api in apis]
+
+    for workload in ("ping", "ban"):
+        for label, runner in (
+            ("threaded", lambda: run_threaded(apis, workload, args.requests, args.concurrency, args.ips)),
+            ("asyncio ", lambda: run(run_async(async_apis, workload, args.requests, args.concurrency, args.ips))),
+        ):
+            REQUESTS = 0
+            elapsed = runner()
+            print(
+                f"{workload:<4} {label}: {elapsed:.3f}s, {args.requests / elapsed:.1f} control-plane req/s, "
+                f"{REQUESTS} instance requests ({REQUESTS / elapsed:.0f}/s)"
+            )
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
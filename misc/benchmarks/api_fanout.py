@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Compare one connection per request (plain requests.request) with the pooled keep-alive API client.
+
+Local stub instances answer every request with a small JSON body and count the TCP connections they accept.
+Each round fans a GET /health out to every instance, like the scheduler and the UI do.
+
+Usage: python3 misc/benchmarks/api_fanout.py [--instances 40] [--rounds 50]
+"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from sys import path as sys_path
+from threading import Lock, Thread
+from time import perf_counter
+
+COMMON_DIR = Path(__file__).resolve().parent.parent.parent / "src" / "common"
+
+for deps_path in (COMMON_DIR / "utils", COMMON_DIR / "api"):
+    if deps_path.as_posix() not in sys_path:
+        sys_path.append(deps_path.as_posix())
+
+from requests import request  # noqa: E402
+
+from API import API  # type: ignore  # noqa: E402
+from ApiCaller import ApiCaller  # type: ignore  # noqa: E402
+
+CONNECTIONS = 0
+CONNECTIONS_LOCK = Lock()
+
+
+class StubInstanceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    body = b'{"status": "success", "msg": "ok"}'
+
+    def setup(self):
+        global CONNECTIONS
+        super().setup()
+        with CONNECTIONS_LOCK:
+            CONNECTIONS += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_instances(count: int) -> list[ThreadingHTTPServer]:
+    servers = []
+    for _ in range(count):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubInstanceHandler)
+        server.daemon_threads = True
+        Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def run_per_call(endpoints: list[str], rounds: int) -> float:
+    """The previous behavior: a new executor per fan-out and a new connection per request."""
+
+    def send(endpoint: str):
+        return request("GET", f"{endpoint}health", timeout=(5, 10), headers={"User-Agent": "bwapi", "Host": "bwapi"}, verify=False).json()
+
+    start = perf_counter()
+    for _ in range(rounds):
+        with ThreadPoolExecutor() as executor:
+            list(executor.map(send, endpoints))
+    return perf_counter() - start
+
+
+def run_pooled(apis: list[API], rounds: int) -> float:
+    api_caller = ApiCaller(apis)
+    start = perf_counter()
+    for _ in range(rounds):
+        api_caller.send_to_apis("GET", "/health")
+    return perf_counter() - start
+
+
+def main():
+    global CONNECTIONS
+
+    parser = ArgumentParser(description="API fan-out benchmark against local stub instances")
+    parser.add_argument("--instances", type=int, default=40, help="number of stub instances")
+    parser.add_argument("--rounds", type=int, default=50, help="fan-outs to every instance")
+    args = parser.parse_args()
+
+    servers = start_instances(args.instances)
+    apis = [API(f"http://127.0.0.1:{server.server_address[1]}") for server in servers]
+    endpoints = [api.endpoint for api in apis]
+    total = args.instances * args.rounds
+
+    elapsed = run_per_call(endpoints, args.rounds)
+    print(f"per-call : {elapsed:.3f}s, {total / elapsed:.0f} req/s, {CONNECTIONS} connections for {total} requests")
+
+    CONNECTIONS = 0
+    elapsed = run_pooled(apis, args.rounds)
+    metrics = API.metrics().values()
+    reused = sum(endpoint["reused_connections"] for endpoint in metrics)
+    avg_latency = sum(endpoint["avg_latency_ms"] for endpoint in metrics) / len(metrics)
+    print(
+        f"pooled   : {elapsed:.3f}s, {total / elapsed:.0f} req/s, {CONNECTIONS} connections for {total} requests "
+        f"({reused} reused, {avg_latency:.2f}ms average latency)"
+    )
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Check the CIDR aggregation and range table of the IP list jobs against the raw list, and print size statistics.
+
+Without --file, a synthetic list mixing overlapping networks, adjacent networks, duplicates and single IPv4/IPv6
+addresses is generated. The check fails (exit code 1) if one address is matched differently by the raw list and by
+the aggregated networks or the range table.
+
+Usage: python3 misc/benchmarks/ip_aggregation.py [--file list.txt] [--entries 300000] [--samples 2000]
+"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from gzip import compress
+from ipaddress import IPv4Network, IPv6Network, ip_address, ip_network
+from pathlib import Path
+from random import Random
+from sys import exit as sys_exit, path as sys_path
+from time import perf_counter
+
+COMMON_DIR = Path(__file__).resolve().parent.parent.parent / "src" / "common"
+
+for deps_path in (COMMON_DIR / "utils",):
+    if deps_path.as_posix() not in sys_path:
+        sys_path.append(deps_path.as_posix())
+
+from ip_ranges import build_range_table, collapse_ip_entries, format_ip_ranges, load_range_table, range_table_contains  # type: ignore  # noqa: E402
+
+
+def synthetic_list(entries: int, seed: int = 42) -> list[bytes]:
+    rng = Random(seed)
+    lines = []
+    for _ in range(entries):
+        choice = rng.random()
+        if choice < 0.8:
+            lines.append(str(ip_address(rng.randrange(0x0B000000, 0x0C000000))).encode())
+        elif choice < 0.9:
+            prefix = rng.randrange(22, 31)
+            network = IPv4Network((rng.randrange(0x0B000000, 0x0C000000), prefix), strict=False)
+            lines.append(network.with_prefixlen.encode())
+        elif choice < 0.97:
+            lines.append(str(ip_address((0x20010DB8 << 96) | rng.randrange(0, 1 << 24))).encode())
+        else:
+            prefix = rng.randrange(112, 127)
+            network = IPv6Network(((0x20010DB8 << 96) | rng.randrange(0, 1 << 24), prefix), strict=False)
+            lines.append(network.with_prefixlen.encode())
+    return lines
+
+
+def union_size(networks) -> dict[int, int]:
+    """Number of distinct addresses covered by the raw networks, computed with a plain interval sweep."""
+    sizes = {4: 0, 6: 0}
+    for version in (4, 6):
+        intervals = sorted((int(n.network_address), int(n.broadcast_address)) for n in networks if n.version == version)
+        current_start = current_end = None
+        for start, end in intervals:
+            if current_end is None or start > current_end + 1:
+                if current_end is not None:
+                    sizes[version] += current_end - current_start + 1
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            sizes[version] += current_end - current_start + 1
+    return sizes
+
+
+def main():
+    parser = ArgumentParser(description="IP list aggregation check and statistics")
+    parser.add_argument("--file", type=Path, help="IP list to check, one address or network per line")
+    parser.add_argument("--entries", type=int, default=300_000, help="size of the synthetic list")
+    parser.add_argument("--samples", type=int, default=2_000, help="random addresses checked against the raw list")
+    args = parser.parse_args()
+
+    if args.file:
+        raw = [line.strip().split(b" ")[0] for line in args.file.read_bytes().splitlines() if line.strip() and not line.startswith((b"#", b";"))]
+    else:
+        raw = synthetic_list(args.entries)
+    unique = set(raw)
+    raw_text = b"\n".join(sorted(unique)) + b"\n"
+
+    start = perf_counter()
+    ranges, stats = collapse_ip_entries(unique)
+    text = format_ip_ranges(ranges)
+    table = build_range_table(ranges)
+    elapsed = perf_counter() - start
+
+    ranges = load_range_table(table)
+    print(f"entries           : {len(raw)} ({len(unique)} unique), collapsed and packed in {elapsed:.2f}s")
+    print(f"networks          : {len(text.splitlines())}")
+    print(f"ranges            : {len(ranges[4])} IPv4, {len(ranges[6])} IPv6")
+    print(f"text list         : {len(raw_text)} -> {len(text)} bytes ({len(compress(raw_text))} -> {len(compress(text))} gzipped)")
+    print(f"range table       : {len(table)} bytes")
+
+    errors = 0
+    raw_networks = [ip_network(entry.decode(), strict=False) for entry in unique]
+    collapsed = [ip_network(line.decode()) for line in text.splitlines()]
+
+    # Same coverage: every raw network is inside one range, and the collapsed list covers exactly as many addresses
+    expected = union_size(raw_networks)
+    covered = {4: sum(n.num_addresses for n in collapsed if n.version == 4), 6: sum(n.num_addresses for n in collapsed if n.version == 6)}
+    if expected != covered:
+        errors += 1
+        print(f"coverage mismatch : raw {expected}, collapsed {covered}")
+    for network in raw_networks:
+        if not range_table_contains(ranges, str(network.network_address)) or not range_table_contains(ranges, str(network.broadcast_address)):
+            errors += 1
+            print(f"missing network   : {network}")
+
+    # Random addresses, half of them next to the boundaries of the collapsed networks
+    rng = Random(7)
+    for i in range(args.samples):
+        if i % 2 and collapsed:
+            network = rng.choice(collapsed)
+            value = int(network.broadcast_address if rng.random() < 0.5 else network.network_address) + rng.choice((-1, 0, 1))
+            value = min(max(value, 0), (1 << network.max_prefixlen) - 1)
+            address = ip_address(value) if network.version == 6 or value < 1 << 32 else ip_address(0)
+        elif rng.random() < 0.8:
+            address = ip_address(rng.randrange(0x0AF00000, 0x0C100000))
+        else:
+            address = ip_address((0x20010DB8 << 96) | rng.randrange(0, 1 << 25))
+        in_raw = any(address in network for network in raw_networks if network.version == address.version)
+        in_collapsed = any(address in network for network in collapsed if network.version == address.version)
+        if in_raw != range_table_contains(ranges, str(address)) or in_raw != in_collapsed:
+            errors += 1
+            print(f"mismatch          : {address} (raw list: {in_raw})")
+
+    print(f"checked           : {len(raw_networks)} networks and {args.samples} addresses, {errors} error(s)")
+    sys_exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
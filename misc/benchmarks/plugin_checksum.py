@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Compare the archive checksum of plugin directories with the memoized Merkle tree of plugin_tree.
+
+The core plugins (or the directories given with --plugins) are copied to a temporary directory, then:
+- archive: sha256 of create_plugin_tar_gz(), like the scheduler and the jobs computed it at every start
+- memo (cold): plugin_checksum() with an empty memo file, hashing every file and building the archive once
+- memo (warm): plugin_checksum() with the memo left by the cold run, only stat() calls for unchanged plugins
+
+Usage: python3 misc/benchmarks/plugin_checksum.py [--plugins DIR ...] [--rounds 3]
+"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from pathlib import Path
+from shutil import copytree
+from sys import path as sys_path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+COMMON_DIR = Path(__file__).resolve().parent.parent.parent / "src" / "common"
+
+if (COMMON_DIR / "utils").as_posix() not in sys_path:
+    sys_path.append((COMMON_DIR / "utils").as_posix())
+
+from common_utils import bytes_hash, create_plugin_tar_gz  # type: ignore  # noqa: E402
+from plugin_tree import PluginHashMemo, plugin_checksum  # type: ignore  # noqa: E402
+
+
+def main():
+    parser = ArgumentParser(description="Plugin checksum benchmark")
+    parser.add_argument("--plugins", nargs="*", type=Path, help="plugin directories (defaults to the core plugins)")
+    parser.add_argument("--rounds", type=int, default=3, help="checksums of all the plugins per approach")
+    args = parser.parse_args()
+
+    sources = args.plugins or sorted(path for path in COMMON_DIR.joinpath("core").iterdir() if path.is_dir())
+
+    with TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        plugins = [Path(copytree(source, tmp_dir.joinpath("plugins", source.name))) for source in sources]
+        memo_file = tmp_dir.joinpath("plugin_hashes.json")
+        files = sum(1 for plugin in plugins for path in plugin.rglob("*") if path.is_file())
+        size = sum(path.stat().st_size for plugin in plugins for path in plugin.rglob("*") if path.is_file())
+        print(f"{len(plugins)} plugins, {files} files, {size:,} bytes")
+
+        def memoized():
+            memo = PluginHashMemo(memo_file)
+            checksums = [plugin_checksum(plugin, arc_root=plugin.name, memo=memo) for plugin in plugins]
+            memo.save()
+            return checksums
+
+        results = {}
+        for label, compute, rounds in (
+            ("archive    ", lambda: [bytes_hash(create_plugin_tar_gz(plugin, arc_root=plugin.name), algorithm="sha256") for plugin in plugins], args.rounds),
+            ("memo (cold)", memoized, 1),
+            ("memo (warm)", memoized, args.rounds),
+        ):
+            start = perf_counter()
+            for _ in range(rounds):
+                results[label] = compute()
+            print(f"{label}: {(perf_counter() - start) / rounds * 1000:.1f}ms for all the plugins")
+
+        assert results["archive    "] == results["memo (cold)"] == results["memo (warm)"]
+
+
+if __name__ == "__main__":
+    main()
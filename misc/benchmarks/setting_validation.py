@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Compare the previous per-variable setting checks of the Configurator with the precompiled SettingValidator.
+
+A multisite config is generated from settings.json and the core plugins: every service gets every multisite setting
+with its default value (plus a suffixed key for the multiple settings). Both approaches validate the whole config:
+- legacy: for every key, probe every service prefix, look the setting up in each settings dict (including a regex per
+  multiple setting) and re.search the raw pattern, as Configurator.__check_var did
+- validator: SettingValidator.validate, built once with the compiled regexes and probing the prefixes in a set
+
+Usage: python3 misc/benchmarks/setting_validation.py [--services 200] [--rounds 3]
+"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from json import loads
+from pathlib import Path
+from re import DOTALL, error as RegexError, search as re_search
+from sys import path as sys_path
+from time import perf_counter
+
+COMMON_DIR = Path(__file__).resolve().parent.parent.parent / "src" / "common"
+
+if (COMMON_DIR / "utils").as_posix() not in sys_path:
+    sys_path.append((COMMON_DIR / "utils").as_posix())
+
+from setting_validator import SettingValidator  # type: ignore  # noqa: E402
+
+
+def load_settings() -> list[dict]:
+    targets = [loads(COMMON_DIR.joinpath("settings.json").read_text())]
+    core = {}
+    for plugin_file in sorted(COMMON_DIR.joinpath("core").glob("*/plugin.json")):
+        core.update(loads(plugin_file.read_text()).get("settings", {}))
+    targets.append(core)
+    return targets
+
+
+def build_config(targets: list[dict], services: int) -> tuple[dict[str, str], list[str]]:
+    servers = [f"app{i}.example.com" for i in range(services)]
+    config = {"MULTISITE": "yes", "SERVER_NAME": " ".join(servers)}
+    for target in targets:
+        for setting, data in target.items():
+            config[setting] = data["default"]
+            for server in servers:
+                if data["context"] != "multisite":
+                    continue
+                config[f"{server}_{setting}"] = data["default"]
+                if "multiple" in data:
+                    config[f"{server}_{setting}_1"] = data["default"]
+    return config, servers
+
+
+def legacy_validate(targets: list[dict], servers: list[str], config: dict[str, str]) -> dict[str, str]:
+    def find_var(variable: str):
+        for target in targets:
+            if variable in target:
+                return target, variable
+            for real_var, settings in target.items():
+                if "multiple" in settings and re_search(f"^{real_var}_[0-9]+$", variable):
+                    return target, real_var
+        return None, variable
+
+    errors = {}
+    for variable, value in config.items():
+        prefixed, real_var = False, variable
+        for server in servers:
+            if variable.startswith(f"{server}_"):
+                prefixed, real_var = True, variable.replace(f"{server}_", "", 1)
+                break
+        where, real_var = find_var(real_var)
+        if not where:
+            errors[variable] = "missing"
+            continue
+        if prefixed and where[real_var]["context"] != "multisite":
+            errors[variable] = "not multisite"
+            continue
+        try:
+            if re_search(where[real_var]["regex"], value, DOTALL if where[real_var].get("type") == "file" else 0) is None:
+                errors[variable] = "regex"
+        except RegexError:
+            pass
+    return errors
+
+
+def main():
+    parser = ArgumentParser(description="Setting validation benchmark")
+    parser.add_argument("--services", type=int, default=200, help="number of services of the generated config")
+    parser.add_argument("--rounds", type=int, default=3, help="validations of the whole config per approach")
+    args = parser.parse_args()
+
+    targets = load_settings()
+    config, servers = build_config(targets, args.services)
+    print(f"{len(config)} keys, {sum(len(target) for target in targets)} settings, {len(servers)} services")
+
+    start = perf_counter()
+    validator = SettingValidator.from_plugins(*targets)
+    print(f"validator built in {(perf_counter() - start) * 1000:.1f}ms")
+
+    results = {}
+    for label, validate in (
+        ("legacy   ", lambda: legacy_validate(targets, servers, config)),
+        ("validator", lambda: validator.validate(config, set(servers))),
+    ):
+        start = perf_counter()
+        for _ in range(args.rounds):
+            results[label] = validate()
+        elapsed = (perf_counter() - start) / args.rounds
+        print(f"{label}: {elapsed * 1000:.1f}ms per config, {len(config) / elapsed:,.0f} keys/s, {len(results[label])} errors")
+
+    assert results["legacy   "].keys() == results["validator"].keys()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,87 @@
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+from typing import Dict, Optional, Tuple
+
 from API import API  # type: ignore
 from ApiCaller import ApiCaller  # type: ignore
+from AsyncAPI import AsyncAPI  # type: ignore
+from AsyncApiCaller import AsyncApiCaller  # type: ignore
 from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
 
 from .config import api_config
 from .utils import get_db
 
+# Seconds between two checks of the instances change date, and maximum age of the registry whatever that date says
+INSTANCES_CHECK_INTERVAL = 2.0
+INSTANCES_MAX_AGE = 60.0
+
+
+class InstancesRegistry:
+    """Process-wide cache of the API clients of the known instances.
+
+    It is reloaded when bw_metadata.last_instances_change moves (checked at most every
+    INSTANCES_CHECK_INTERVAL seconds), when the API changes an instance itself, or after INSTANCES_MAX_AGE seconds.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._apis: Dict[str, Tuple[API, AsyncAPI]] = {}
+        self._last_change: Optional[datetime] = None
+        self._loaded_at: Optional[float] = None
+        self._checked_at = 0.0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def is_fresh(self) -> bool:
+        """Whether the registry can be used without querying the database."""
+        now = monotonic()
+        return self._loaded_at is not None and now - self._checked_at < INSTANCES_CHECK_INTERVAL and now - self._loaded_at < INSTANCES_MAX_AGE
+
+    def refresh(self) -> Dict[str, Tuple[API, AsyncAPI]]:
+        """Return the API clients by hostname, reloading them from the database when the instances changed (blocking)."""
+        with self._lock:
+            if self.is_fresh():
+                return self._apis
+
+            db = get_db(log=False)
+            now = monotonic()
+            last_change = db.get_last_instances_change()
+            if self._loaded_at is not None and now - self._loaded_at < INSTANCES_MAX_AGE and last_change == self._last_change:
+                self._checked_at = now
+                return self._apis
+
+            try:
+                instances = db.get_instances()
+            except Exception:
+                # Fallback to internal API only if DB access fails, the registry is loaded again on the next call
+                api = API(api_config.internal_endpoint, api_config.internal_api_host_header)
+                return {"": (api, AsyncAPI.from_api(api))}
+
+            apis = {}
+            for inst in instances:
+                try:
+                    api = API.from_instance(inst)
+                except Exception:
+                    continue
+                apis[inst["hostname"]] = (api, AsyncAPI.from_api(api))
+
+            self._apis = apis
+            self._last_change = last_change
+            self._loaded_at = self._checked_at = now
+            return apis
+
+    async def arefresh(self) -> Dict[str, Tuple[API, AsyncAPI]]:
+        if self.is_fresh():
+            return self._apis
+        return await run_in_threadpool(self.refresh)
+
+
+INSTANCES_REGISTRY = InstancesRegistry()
+
 
 def get_internal_api() -> API:
     """Dependency that returns the internal NGINX API client."""
@@ -12,19 +89,13 @@ def get_internal_api() -> API:
 
 
 def get_instances_api_caller() -> ApiCaller:
-    """Build an ApiCaller targeting all known instances from the database."""
-    db = get_db(log=False)
-    apis = []
-    try:
-        for inst in db.get_instances():
-            try:
-                apis.append(API.from_instance(inst))
-            except Exception:
-                continue
-    except Exception:
-        # Fallback to internal API only if DB access fails
-        apis.append(API(api_config.internal_endpoint, api_config.internal_api_host_header))
-    return ApiCaller(apis)
+    """Build an ApiCaller targeting all known instances from the instances registry."""
+    return ApiCaller([api for api, _ in INSTANCES_REGISTRY.refresh().values()])
+
+
+async def get_async_instances_api_caller() -> AsyncApiCaller:
+    """Build an AsyncApiCaller targeting all known instances, the database is only queried when the registry is stale."""
+    return AsyncApiCaller([async_api for _, async_api in (await INSTANCES_REGISTRY.arefresh()).values()])
 
 
 def get_api_for_hostname(hostname: str) -> API:
@@ -33,3 +104,12 @@ def get_api_for_hostname(hostname: str) -> API:
     if not inst:
         raise HTTPException(status_code=404, detail=f"Instance {hostname} not found")
     return API.from_instance(inst)
+
+
+async def get_async_api_for_hostname(hostname: str) -> AsyncAPI:
+    """Dependency returning a single AsyncAPI client targeting the given hostname."""
+    apis = await INSTANCES_REGISTRY.arefresh()
+    if hostname in apis:
+        return apis[hostname][1]
+    # The instance may have been added since the last refresh
+    return AsyncAPI.from_api(await run_in_threadpool(get_api_for_hostname, hostname))
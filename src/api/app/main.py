@@ -31,8 +31,11 @@ BUNKERWEB_VERSION = get_version()
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     yield
+    from AsyncAPI import AsyncAPI  # type: ignore
     from .utils import _DB_INSTANCE, _API_DB_INSTANCE
 
+    AsyncAPI.close_connections()
+
     for db in (_DB_INSTANCE, _API_DB_INSTANCE):
         if db is not None:
             with suppress(Exception):
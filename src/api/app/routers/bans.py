@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from fastapi.responses import JSONResponse
-from typing import List, Union
+from starlette.concurrency import run_in_threadpool
+from typing import List, Literal, Optional, Union
 import json
 
+from ban_index import ensure_ban_index, get_ban_keys, get_bans  # type: ignore
+from common_utils import batch_results  # type: ignore
+
 from ..auth.guard import guard
-from ..deps import get_instances_api_caller
+from ..deps import get_async_instances_api_caller
 from ..schemas import BanRequest, UnbanRequest
+from ..utils import LOGGER, get_redis_client
 
 router = APIRouter(prefix="/bans", tags=["bans"])
 
 RESERVED_SERVICE_NAMES = frozenset({"unknown", "Web UI", "bwcli", "default server", ""})
+DEFAULT_BANS_PAGE_SIZE = 100
 
 
 def _derive_scope(payload: dict) -> None:
@@ -22,18 +28,62 @@ def _derive_scope(payload: dict) -> None:
         payload.pop("service", None)
 
 
+def _read_indexed_bans(start: int, stop: int, **kwargs) -> tuple:
+    redis_client = get_redis_client()
+    if not redis_client:
+        return None, 0
+    ensure_ban_index(redis_client)
+    keys, total = get_ban_keys(redis_client, start, stop, **kwargs)
+    return get_bans(redis_client, keys, LOGGER), total
+
+
 @router.get("", dependencies=[Depends(guard)])
-def list_bans(api_caller=Depends(get_instances_api_caller)) -> JSONResponse:
-    """List all active bans across all BunkerWeb instances."""
-    ok, responses = api_caller.send_to_apis("GET", "/bans", response=True)
+async def list_bans(
+    offset: Optional[int] = Query(None, ge=0, description="Index of the first ban to return"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of bans to return"),
+    service: Optional[str] = Query(None, description='Only return the bans of this service ("_" for global bans)'),
+    reason: Optional[str] = Query(None, description="Only return the bans with this reason"),
+    order_by: Literal["date", "expiration"] = Query("date", description="Order the bans by ban date or expiration"),
+    order_dir: Literal["asc", "desc"] = Query("desc", description="Order direction"),
+    api_caller=Depends(get_async_instances_api_caller),
+) -> JSONResponse:
+    """List all active bans across all BunkerWeb instances.
+
+    When offset, limit, service or reason is given, the bans are read page by page
+    from the Redis ban index (requires USE_REDIS=yes) instead of every instance.
+
+    Args:
+        offset: Index of the first ban to return
+        limit: Maximum number of bans to return (defaults to 100)
+        service: Filter by service ("_" for global bans)
+        reason: Filter by ban reason
+        order_by: Order by ban date or expiration
+        order_dir: Order direction
+    """
+    if any(value is not None for value in (offset, limit, service, reason)):
+        start = offset or 0
+        stop = start + (limit or DEFAULT_BANS_PAGE_SIZE) - 1
+        try:
+            bans, total = await run_in_threadpool(_read_indexed_bans, start, stop, by=order_by, desc=order_dir == "desc", service=service, reason=reason)
+        except Exception as e:
+            LOGGER.error(f"Couldn't read bans from the redis ban index: {e}")
+            return JSONResponse(status_code=502, content={"status": "error", "message": "Failed to read bans from Redis"})
+        if bans is None:
+            return JSONResponse(status_code=400, content={"status": "error", "message": "Paginated and filtered ban listings require Redis"})
+        return JSONResponse(status_code=200, content={"status": "success", "bans": bans, "total": total, "offset": start, "limit": stop - start + 1})
+
+    ok, responses = await api_caller.send_to_apis("GET", "/bans", response=True)
     return JSONResponse(status_code=200 if ok else 502, content=responses or {"status": "error", "msg": "internal error"})
 
 
 @router.post("/ban", dependencies=[Depends(guard)])
 @router.post("", dependencies=[Depends(guard)])
-def ban(req: Union[List[BanRequest], BanRequest, str], api_caller=Depends(get_instances_api_caller)) -> JSONResponse:
+async def ban(req: Union[List[BanRequest], BanRequest, str], api_caller=Depends(get_async_instances_api_caller)) -> JSONResponse:
     """Ban one or multiple IP addresses across all BunkerWeb instances.
 
+    The bans are sent to each instance in a single request and the response has one result per ban,
+    with the instances that failed to apply it.
+
     Args:
         req: Ban request(s) containing IP, expiration, reason, and optional service
     """
@@ -52,20 +102,23 @@ def ban(req: Union[List[BanRequest], BanRequest, str], api_caller=Depends(get_in
     else:
         items = req if isinstance(req, list) else [req]
 
-    all_ok = True
+    payloads = []
     for it in items:
         payload = it.model_dump()
         _derive_scope(payload)
-        ok, _ = api_caller.send_to_apis("POST", "/ban", data=payload)
-        all_ok = all_ok and ok
-    return JSONResponse(status_code=200 if all_ok else 502, content={"status": "success" if all_ok else "error"})
+        payloads.append(payload)
+    all_ok, responses = await api_caller.send_batch_to_apis("/ban", payloads, response=True)
+    return JSONResponse(status_code=200 if all_ok else 502, content={"status": "success" if all_ok else "error", "results": batch_results(payloads, responses)})
 
 
 @router.post("/unban", dependencies=[Depends(guard)])
 @router.delete("", dependencies=[Depends(guard)])
-def unban(req: Union[List[UnbanRequest], UnbanRequest, str], api_caller=Depends(get_instances_api_caller)) -> JSONResponse:
+async def unban(req: Union[List[UnbanRequest], UnbanRequest, str], api_caller=Depends(get_async_instances_api_caller)) -> JSONResponse:
     """Remove one or multiple bans across all BunkerWeb instances.
 
+    The unbans are sent to each instance in a single request and the response has one result per unban,
+    with the instances that failed to apply it.
+
     Args:
         req: Unban request(s) containing IP and optional service
     """
@@ -83,10 +136,10 @@ def unban(req: Union[List[UnbanRequest], UnbanRequest, str], api_caller=Depends(
     else:
         items = req if isinstance(req, list) else [req]
 
-    all_ok = True
+    payloads = []
     for it in items:
         payload = it.model_dump()
         _derive_scope(payload)
-        ok, _ = api_caller.send_to_apis("POST", "/unban", data=payload)
-        all_ok = all_ok and ok
-    return JSONResponse(status_code=200 if all_ok else 502, content={"status": "success" if all_ok else "error"})
+        payloads.append(payload)
+    all_ok, responses = await api_caller.send_batch_to_apis("/unban", payloads, response=True)
+    return JSONResponse(status_code=200 if all_ok else 502, content={"status": "success" if all_ok else "error", "results": batch_results(payloads, responses)})
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
+from logger import get_log_queue_stats  # type: ignore
+
 from ..utils import get_api_db
 
 router = APIRouter(tags=["core"])  # Utils-only (ping, health)
@@ -26,9 +28,14 @@ def health() -> JSONResponse:
     """Lightweight liveness probe for the API service itself.
 
     Returns 200 when the FastAPI service is up and routing requests.
-    Does not call internal BunkerWeb instances.
+    Does not call internal BunkerWeb instances. When the log queue is enabled,
+    its counters for the serving process are included under ``log_queue``.
     """
-    return JSONResponse(status_code=200, content={"status": "ok"})
+    content = {"status": "ok"}
+    log_queue = get_log_queue_stats()
+    if log_queue["enabled"]:
+        content["log_queue"] = log_queue
+    return JSONResponse(status_code=200, content=content)
 
 
 # Mount category routers under core
@@ -4,7 +4,7 @@ from typing import Optional, List
 
 from common_utils import parse_host  # type: ignore
 from ..auth.guard import guard
-from ..deps import get_instances_api_caller, get_api_for_hostname
+from ..deps import INSTANCES_REGISTRY, get_async_api_for_hostname, get_async_instances_api_caller
 from ..schemas import InstanceCreateRequest, InstancesDeleteRequest, InstanceUpdateRequest
 from ..config import api_config
 from ..utils import get_db, LOGGER
@@ -18,47 +18,47 @@ UI_API_METHODS = {"ui", "api"}
 
 # ---------- Instance actions broadcasted to all instances ----------
 @router.get("/ping", dependencies=[Depends(guard)])
-def ping(api_caller=Depends(get_instances_api_caller)) -> JSONResponse:
+async def ping(api_caller=Depends(get_async_instances_api_caller)) -> JSONResponse:
     """Ping all registered BunkerWeb instances to check their availability."""
-    ok, responses = api_caller.send_to_apis("GET", "/ping", response=True)
+    ok, responses = await api_caller.send_to_apis("GET", "/ping", response=True)
     return JSONResponse(status_code=200 if ok else 502, content=responses or {"status": "error", "msg": "internal error"})
 
 
 @router.post("/reload", dependencies=[Depends(guard)])
-def reload_config(test: bool = True, api_caller=Depends(get_instances_api_caller)) -> JSONResponse:
+async def reload_config(test: bool = True, api_caller=Depends(get_async_instances_api_caller)) -> JSONResponse:
     """Reload configuration on all registered BunkerWeb instances.
 
     Args:
         test: If True, validate configuration without applying it (default: True)
     """
     test_arg = "yes" if test else "no"
-    ok, _ = api_caller.send_to_apis("POST", f"/reload?test={test_arg}")
+    ok, _ = await api_caller.send_to_apis("POST", f"/reload?test={test_arg}")
     return JSONResponse(status_code=200 if ok else 502, content={"status": "success" if ok else "error"})
 
 
 @router.post("/stop", dependencies=[Depends(guard)])
-def stop(api_caller=Depends(get_instances_api_caller)) -> JSONResponse:
+async def stop(api_caller=Depends(get_async_instances_api_caller)) -> JSONResponse:
     """Stop all registered BunkerWeb instances."""
-    ok, _ = api_caller.send_to_apis("POST", "/stop")
+    ok, _ = await api_caller.send_to_apis("POST", "/stop")
     return JSONResponse(status_code=200 if ok else 502, content={"status": "success" if ok else "error"})
 
 
 # ---------- Instance actions for a single instance ----------
 @router.get("/{hostname}/ping", dependencies=[Depends(guard)])
-def ping_one(hostname: str, api=Depends(get_api_for_hostname)) -> JSONResponse:
+async def ping_one(hostname: str, api=Depends(get_async_api_for_hostname)) -> JSONResponse:
     """Ping a specific BunkerWeb instance to check its availability.
 
     Args:
         hostname: The hostname of the instance to ping
     """
-    sent, err, status, resp = api.request("GET", "/ping")
+    sent, err, status, resp = await api.request("GET", "/ping")
     if not sent or status != 200:
         return JSONResponse(status_code=502, content={"status": "error", "msg": (err or getattr(resp, "get", lambda _k: None)("msg")) or "internal error"})
     return JSONResponse(status_code=200, content=resp if isinstance(resp, dict) else {"status": "ok"})
 
 
 @router.post("/{hostname}/reload", dependencies=[Depends(guard)])
-def reload_one(hostname: str, test: bool = True, api=Depends(get_api_for_hostname)) -> JSONResponse:
+async def reload_one(hostname: str, test: bool = True, api=Depends(get_async_api_for_hostname)) -> JSONResponse:
     """Reload configuration on a specific BunkerWeb instance.
 
     Args:
@@ -66,19 +66,19 @@ def reload_one(hostname: str, test: bool = True, api=Depends(get_api_for_hostnam
         test: If True, validate configuration without applying it (default: True)
     """
     test_arg = "yes" if test else "no"
-    sent, _err, status, _resp = api.request("POST", f"/reload?test={test_arg}")
+    sent, _err, status, _resp = await api.request("POST", f"/reload?test={test_arg}")
     ok = bool(sent and status == 200)
     return JSONResponse(status_code=200 if ok else 502, content={"status": "success" if ok else "error"})
 
 
 @router.post("/{hostname}/stop", dependencies=[Depends(guard)])
-def stop_one(hostname: str, api=Depends(get_api_for_hostname)) -> JSONResponse:
+async def stop_one(hostname: str, api=Depends(get_async_api_for_hostname)) -> JSONResponse:
     """Stop a specific BunkerWeb instance.
 
     Args:
         hostname: The hostname of the instance to stop
     """
-    sent, _err, status, _resp = api.request("POST", "/stop")
+    sent, _err, status, _resp = await api.request("POST", "/stop")
     ok = bool(sent and status == 200)
     return JSONResponse(status_code=200 if ok else 502, content={"status": "success" if ok else "error"})
 
@@ -171,6 +171,7 @@ def create_instance(req: InstanceCreateRequest) -> JSONResponse:
         code = 400 if "already exists" in err or "read-only" in err else 500
         return JSONResponse(status_code=code, content={"status": "error", "message": err})
 
+    INSTANCES_REGISTRY.invalidate()
     return JSONResponse(
         status_code=201,
         content={
@@ -234,6 +235,7 @@ def update_instance(hostname: str, req: InstanceUpdateRequest) -> JSONResponse:
         code = 400 if ("does not exist" in err or "read-only" in err) else 500
         return JSONResponse(status_code=code, content={"status": "error", "message": err})
 
+    INSTANCES_REGISTRY.invalidate()
     instance = db.get_instance(hostname)
     return JSONResponse(status_code=200, content={"status": "success", "instance": instance})
 
@@ -258,6 +260,7 @@ def delete_instance(hostname: str) -> JSONResponse:
         LOGGER.exception(f"DELETE /instances/{hostname} failed: {err}")
         return JSONResponse(status_code=500, content={"status": "error", "message": err})
 
+    INSTANCES_REGISTRY.invalidate()
     return JSONResponse(status_code=200, content={"status": "success", "deleted": hostname})
 
 
@@ -299,4 +302,5 @@ def delete_instances(req: InstancesDeleteRequest) -> JSONResponse:
     if err:
         return JSONResponse(status_code=500, content={"status": "error", "message": err, "skipped": skipped})
 
+    INSTANCES_REGISTRY.invalidate()
     return JSONResponse(status_code=200, content={"status": "success", "deleted": to_delete, "skipped": skipped})
@@ -69,6 +69,17 @@ def _persist_config(config: Dict[str, Any]) -> JSONResponse:
     return JSONResponse(status_code=200, content={"status": "success", "changed_plugins": sorted(list(ret))})
 
 
+def _persist_patch(service: str, variables: Dict[str, Any]) -> JSONResponse:
+    """Write only the given service variables (unprefixed keys) to the database."""
+    db = get_db()
+    ret = db.save_config_patch({(service, *db.split_setting_key(k)[1:]): "" if v is None else v for k, v in variables.items()}, "api", changed=True)
+
+    if isinstance(ret, str):
+        code = 400 if ("read-only" in ret or "doesn't exist" in ret or "can't be" in ret) else 500
+        return JSONResponse(status_code=code, content={"status": "error", "message": ret})
+    return JSONResponse(status_code=200, content={"status": "success", "changed_plugins": sorted(list(ret))})
+
+
 def _service_method(service: str) -> Optional[str]:
     for item in get_db().get_services(with_drafts=True):
         if item.get("id") == service:
@@ -118,6 +129,17 @@ def update_service(service: str, req: ServiceUpdateRequest) -> JSONResponse:
         service: Current service identifier
         req: Update request with new server_name, variables, and draft status
     """
+    variables = {k: v for k, v in (req.variables or {}).items() if k != "SERVER_NAME"}  # Ignore direct edits to SERVER_NAME via variables
+    for k, v in variables.items():
+        if isinstance(v, (dict, list)):
+            return JSONResponse(status_code=422, content={"status": "error", "message": f"Invalid value for {k}: must be scalar"})
+
+    # Neither renamed nor (un)drafted: only the sent variables are written
+    if not req.server_name and req.is_draft is None:
+        if not any(s.get("id") == service for s in get_db().get_services(with_drafts=True)):
+            return JSONResponse(status_code=404, content={"status": "error", "message": f"Service {service} not found"})
+        return _persist_patch(service, variables)
+
     conf = _full_config_snapshot()
     services_list = (conf.get("SERVER_NAME", "") or "").split()
     if service not in services_list:
@@ -150,12 +172,7 @@ def update_service(service: str, req: ServiceUpdateRequest) -> JSONResponse:
         conf[f"{target}_IS_DRAFT"] = "yes" if bool(req.is_draft) else "no"
 
     # Update provided variables (unprefixed)
-    for k, v in (req.variables or {}).items():
-        if k == "SERVER_NAME":
-            # Ignore direct edits to SERVER_NAME via variables
-            continue
-        if isinstance(v, (dict, list)):
-            return JSONResponse(status_code=422, content={"status": "error", "message": f"Invalid value for {k}: must be scalar"})
+    for k, v in variables.items():
         conf[f"{target}_{k}"] = "" if v is None else v
 
     return _persist_config(conf)
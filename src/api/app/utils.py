@@ -8,6 +8,7 @@ from bcrypt import checkpw, gensalt, hashpw
 from regex import compile as re_compile
 
 from app.models.api_database import APIDatabase
+from common_utils import get_redis_client as get_common_redis_client  # type: ignore
 from logger import getLogger  # type: ignore
 
 from Database import Database  # type: ignore
@@ -20,6 +21,7 @@ LOGGER = getLogger("API")
 # Cached singletons for pooled DB engines
 _DB_INSTANCE: Optional[Database] = None  # type: ignore
 _API_DB_INSTANCE = None  # Late-bound type to avoid import cycles
+_REDIS_CLIENT = None
 
 
 def get_db(*, log: bool = True) -> Database:
@@ -45,6 +47,48 @@ def get_api_db(*, log: bool = True) -> APIDatabase:
     return _API_DB_INSTANCE
 
 
+def get_redis_client():
+    """Return a shared Redis client built from the global Redis settings, or None when Redis is disabled or unreachable."""
+    global _REDIS_CLIENT
+    if _REDIS_CLIENT is None:
+        config = get_db(log=False).get_config(
+            global_only=True,
+            methods=False,
+            filtered_settings=(
+                "USE_REDIS",
+                "REDIS_HOST",
+                "REDIS_PORT",
+                "REDIS_DATABASE",
+                "REDIS_TIMEOUT",
+                "REDIS_KEEPALIVE_POOL",
+                "REDIS_SSL",
+                "REDIS_USERNAME",
+                "REDIS_PASSWORD",
+                "REDIS_SENTINEL_HOSTS",
+                "REDIS_SENTINEL_USERNAME",
+                "REDIS_SENTINEL_PASSWORD",
+                "REDIS_SENTINEL_MASTER",
+            ),
+        )
+        _REDIS_CLIENT = get_common_redis_client(
+            use_redis=config.get("USE_REDIS", "no") == "yes",
+            redis_host=config.get("REDIS_HOST"),
+            redis_port=config.get("REDIS_PORT", "6379"),
+            redis_db=config.get("REDIS_DATABASE", "0"),
+            redis_timeout=config.get("REDIS_TIMEOUT", "1000.0"),
+            redis_keepalive_pool=config.get("REDIS_KEEPALIVE_POOL", "10"),
+            redis_ssl=config.get("REDIS_SSL", "no") == "yes",
+            redis_username=config.get("REDIS_USERNAME") or None,
+            redis_password=config.get("REDIS_PASSWORD") or None,
+            redis_sentinel_hosts=config.get("REDIS_SENTINEL_HOSTS", []),
+            redis_sentinel_username=config.get("REDIS_SENTINEL_USERNAME") or None,
+            redis_sentinel_password=config.get("REDIS_SENTINEL_PASSWORD") or None,
+            redis_sentinel_master=config.get("REDIS_SENTINEL_MASTER", ""),
+            logger=LOGGER,
+        )
+    return _REDIS_CLIENT
+
+
 USER_PASSWORD_RX = re_compile(r"^(?=.*\p{Ll})(?=.*\p{Lu})(?=.*\d)(?=.*\P{Alnum}).{8,}$")
 BCRYPT_HASH_RX = re_compile(r"^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}\Z")
 RECOMMENDED_BCRYPT_COST = 12  # below this, a supplied pre-hashed credential triggers a warning
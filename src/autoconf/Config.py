@@ -4,7 +4,7 @@ from contextlib import suppress
 from datetime import datetime
 from os import getenv
 from time import sleep
-from typing import Any, Dict, List, Literal, Optional, Union
+from typing import Any, Dict, FrozenSet, List, Literal, Optional, Tuple, Union
 
 from Database import Database  # type: ignore
 from logger import getLogger  # type: ignore
@@ -31,6 +31,9 @@ class Config:
         self.__configs = {config_type: {} for config_type in self._supported_config_types}
         self.__config = {}
         self.__extra_config = {}
+        # Validated variables of every service (by primary server name) with the service and the server names they were
+        # validated against, only the services that changed are validated again
+        self.__services_env: Dict[str, Tuple[Dict[str, str], FrozenSet[str], Dict[str, str]]] = {}
 
         # Signature (set of valid setting ids) as of the last successful apply. Used to detect when
         # the available settings change out-of-band (e.g. a PRO license became valid and its
@@ -42,6 +45,9 @@ class Config:
         # to draft in the DB instead of being hard-deleted, so they can be republished later.
         self._disable_cleanup = getenv("AUTOCONF_DISABLE_CLEANUP", "no").strip().lower() == "yes"
 
+        # Whether the last config save succeeded, only then the next one can be a patch of the changed keys
+        self._config_saved = False
+
         self._db = Database(self.__logger)
 
     def _update_settings(self):
@@ -49,9 +55,13 @@ class Config:
         if not plugins:
             self.__logger.error("No plugins in database, can't update settings...")
             return
-        self._settings = {}
+        settings = {}
         for plugin in plugins:
-            self._settings.update(plugin["settings"])
+            settings.update(plugin["settings"])
+        if settings != self._settings:
+            # The variables are validated against the settings
+            self.__services_env.clear()
+        self._settings = settings
 
     def settings_changed(self) -> bool:
         """Whether the set of valid setting ids differs from the last successful apply.
@@ -61,6 +71,62 @@ class Config:
         """
         return self._applied_settings_signature is not None and frozenset(self._settings) != self._applied_settings_signature
 
+    @staticmethod
+    def _diff_services(old: List[Dict[str, str]], new: List[Dict[str, str]]) -> Dict[str, str]:
+        """Return the services that differ between two lists by primary server name: "added", "removed" or "changed"."""
+        old_services, new_services = {}, {}
+        for services, by_name in ((old, old_services), (new, new_services)):
+            for service in services:
+                by_name.setdefault(service.get("SERVER_NAME", "").split(" ")[0], []).append(service)
+
+        diff = {}
+        for server_name in old_services.keys() | new_services.keys():
+            if server_name not in new_services:
+                diff[server_name] = "removed"
+            elif server_name not in old_services:
+                diff[server_name] = "added"
+            elif old_services[server_name] != new_services[server_name]:
+                diff[server_name] = "changed"
+        return diff
+
+    def __get_service_env(self, service: Dict[str, str], server_name: str, server_names: FrozenSet[str]) -> Dict[str, str]:
+        cached = self.__services_env.get(server_name)
+        if cached and cached[0] == service and cached[1] == server_names:
+            return cached[2]
+
+        env = {}
+        for variable, value in service.items():
+            if variable == "NAMESPACE" or variable.startswith("CUSTOM_CONF"):
+                continue
+
+            is_global = False
+            success, err = self._db.is_valid_setting(
+                variable,
+                value=value,
+                multisite=True,
+                extra_services=list(server_names),
+            )
+            if not success:
+                if self._type == "kubernetes":
+                    success, err = self._db.is_valid_setting(variable, value=value)
+                    if success:
+                        is_global = True
+                        self.__logger.warning(f"Variable {variable} is a global value and will be applied globally")
+                if not success:
+                    self.__logger.warning(f"Variable {variable}: {value} is not a valid autoconf setting ({err}), ignoring it")
+                    continue
+
+            if is_global or variable.startswith(f"{server_name}_"):
+                if variable == "SERVER_NAME":
+                    self.__logger.warning("Global variable SERVER_NAME can't be set via annotations, ignoring it")
+                    continue
+                env[variable] = value
+                continue
+            env[f"{server_name}_{variable}"] = value
+
+        self.__services_env[server_name] = (service.copy(), server_names, env)
+        return env
+
     def __get_full_env(self) -> dict:
         config = {"SERVER_NAME": "", "MULTISITE": "yes"}
         for service in self.__services:
@@ -76,38 +142,19 @@ class Config:
                 continue
             db_services.append(server_name)
 
+        # The services that didn't change since the last apply reuse their validated variables
+        server_names = frozenset(config["SERVER_NAME"].split() + db_services)
+        services = set()
         for service in self.__services:
             server_name = service["SERVER_NAME"].split(" ")[0]
             if not server_name:
                 continue
-            for variable, value in service.items():
-                if variable == "NAMESPACE" or variable.startswith("CUSTOM_CONF"):
-                    continue
+            services.add(server_name)
+            config.update(self.__get_service_env(service, server_name, server_names))
+
+        for server_name in self.__services_env.keys() - services:
+            del self.__services_env[server_name]
 
-                is_global = False
-                success, err = self._db.is_valid_setting(
-                    variable,
-                    value=value,
-                    multisite=True,
-                    extra_services=config["SERVER_NAME"].split() + db_services,
-                )
-                if not success:
-                    if self._type == "kubernetes":
-                        success, err = self._db.is_valid_setting(variable, value=value)
-                        if success:
-                            is_global = True
-                            self.__logger.warning(f"Variable {variable} is a global value and will be applied globally")
-                    if not success:
-                        self.__logger.warning(f"Variable {variable}: {value} is not a valid autoconf setting ({err}), ignoring it")
-                        continue
-
-                if is_global or variable.startswith(f"{server_name}_"):
-                    if variable == "SERVER_NAME":
-                        self.__logger.warning("Global variable SERVER_NAME can't be set via annotations, ignoring it")
-                        continue
-                    config[variable] = value
-                    continue
-                config[f"{server_name}_{variable}"] = value
         config["SERVER_NAME"] = config["SERVER_NAME"].strip()
         return config
 
@@ -126,15 +173,16 @@ class Config:
             self.__logger.debug(f"Instances changed: {self.__instances} -> {instances}")
             return True
 
-        if set(map(str, self.__services)) != set(map(str, services)):
-            self.__logger.debug(f"Services changed: {self.__services} -> {services}")
+        services_diff = self._diff_services(self.__services, services)
+        if services_diff:
+            self.__logger.debug("Services changed: " + ", ".join(f"{server_name} ({change})" for server_name, change in sorted(services_diff.items())))
             return True
 
-        if set(map(str, self.__configs.items())) != set(map(str, configs.items())):
+        if self.__configs != configs:
             self.__logger.debug(f"Configs changed: {self.__configs} -> {configs}")
             return True
 
-        if set(map(str, self.__extra_config.items())) != set(map(str, extra_config.items())):
+        if self.__extra_config != extra_config:
             self.__logger.debug(f"Extra config changed: {self.__extra_config} -> {extra_config}")
             return True
 
@@ -194,10 +242,13 @@ class Config:
         extra_config = extra_config or {}
 
         changes = []
+        config_patch = None
         if instances != self.__instances or first:
             self.__instances = instances
             changes.append("instances")
-        if services != self.__services or first:
+        services_diff = self._diff_services(self.__services, services)
+        if services_diff or first:
+            self.__logger.debug("Services changes: " + ", ".join(f"{server_name} ({change})" for server_name, change in sorted(services_diff.items())))
             self.__services = services
             changes.append("services")
         if configs != self.__configs or first:
@@ -214,6 +265,9 @@ class Config:
             if old_env != new_env or first:
                 self.__config = new_env
                 changes.append("config")
+                # Same services as the last apply: only the keys that changed are written to the database
+                if not first and self._config_saved and old_env and old_env.get("SERVER_NAME") == new_env.get("SERVER_NAME"):
+                    config_patch = {key: new_env.get(key) for key in old_env.keys() | new_env.keys() if old_env.get(key) != new_env.get(key)}
             if "extra_config" in changes:
                 self.__extra_config = extra_config.copy()
 
@@ -243,8 +297,20 @@ class Config:
         # save config to database
         changed_plugins = []
         if "config" in changes:
-            self.__logger.debug(f"Saving config in database: {self.__config}")
-            err = self._db.save_config(self.__config, "autoconf", changed=False, disable_cleanup=self._disable_cleanup)
+            err = None
+            if config_patch is not None:
+                self.__logger.debug(f"Saving config changes in database: {config_patch}")
+                services = set(self.__config.get("SERVER_NAME", "").split())
+                err = self._db.save_config_patch(
+                    {self._db.split_setting_key(key, services): value for key, value in config_patch.items()}, "autoconf", changed=False
+                )
+                if isinstance(err, str):
+                    self.__logger.warning(f"Can't save config changes in database: {err}, saving the whole config instead")
+                    err = None
+            if err is None:
+                self.__logger.debug(f"Saving config in database: {self.__config}")
+                err = self._db.save_config(self.__config, "autoconf", changed=False, disable_cleanup=self._disable_cleanup)
+            self._config_saved = not isinstance(err, str)
             if isinstance(err, str):
                 success = False
                 self.__logger.error(f"Can't save config in database: {err}, config may not work as expected")
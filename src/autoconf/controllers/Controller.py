@@ -31,6 +31,13 @@ class Controller(Config):
             recheck_interval = "300"
         self._settings_recheck_interval = int(recheck_interval)
 
+        # Interval (seconds) between two full listings reconciling the event-fed caches of the Docker and Swarm controllers. <= 0 disables it.
+        reconcile_interval = getenv("AUTOCONF_RECONCILE_INTERVAL", "300").strip()
+        if not reconcile_interval.lstrip("-").isdigit():
+            self._logger.warning(f"Invalid AUTOCONF_RECONCILE_INTERVAL value {reconcile_interval!r}, defaulting to 300")
+            reconcile_interval = "300"
+        self._reconcile_interval = int(reconcile_interval)
+
         namespaces = getenv("NAMESPACES")
         if namespaces:
             self._namespaces = namespaces.strip().split()
@@ -3,14 +3,14 @@
 from os import getenv
 from contextlib import suppress
 from time import sleep, time
-from typing import Any, Dict, List
-from threading import Lock
+from typing import Any, Dict, List, Optional, Set
+from threading import Lock, Thread
 from docker import DockerClient
 from re import compile as re_compile, split as re_split
 from traceback import format_exc
 
 from docker.models.containers import Container
-from docker.errors import DockerException
+from docker.errors import DockerException, NotFound
 from controllers.Controller import Controller
 
 
@@ -24,6 +24,13 @@ class DockerController(Controller):
         self.__pending_apply = False
         self.__last_event_time = 0.0
         self.__debounce_delay = 2  # seconds
+        # Running containers with a bunkerweb label, by id: filled by a listing and then kept up to date by the events
+        self.__containers: Dict[str, Container] = {}
+        self.__containers_synced = False
+        self.__containers_lock = Lock()
+        # One listing at a time, the ids updated by the events while it runs keep their event-fed entry
+        self.__sync_lock = Lock()
+        self.__touched_containers: Optional[Set[str]] = None
         self.__custom_confs_rx = re_compile(r"^bunkerweb.CUSTOM_CONF_(SERVER_STREAM|SERVER_HTTP|MODSEC_CRS|MODSEC|CRS_PLUGINS_BEFORE|CRS_PLUGINS_AFTER)_(.+)$")
         self.__ignored_labels_exact = set()
         self.__ignored_label_suffixes = set()
@@ -50,6 +57,105 @@ class DockerController(Controller):
             return True
         return False
 
+    # Labels of the indexed containers, and the statuses under which containers.list() returns a container.
+    __INDEXED_LABELS = ("bunkerweb.INSTANCE", "bunkerweb.SERVER_NAME")
+    __LISTED_STATUSES = frozenset({"running", "paused", "restarting"})
+
+    def __list_containers(self, label_key: str) -> List[Container]:
+        """Return the running containers with the label, from the index once it is synced with the events (newest first, like the API)."""
+        with self.__containers_lock:
+            if self.__containers_synced:
+                containers = [container for container in self.__containers.values() if label_key in (container.labels or {})]
+                return sorted(containers, key=lambda container: container.attrs.get("Created") or "", reverse=True)
+        return self.__client.containers.list(filters={"label": label_key})
+
+    @staticmethod
+    def __container_state(container: Container) -> tuple:
+        return (
+            container.name,
+            container.status,
+            container.health,
+            tuple(sorted((container.labels or {}).items())),
+            tuple((container.attrs.get("Config", {}) or {}).get("Env") or ()),
+        )
+
+    def __sync_containers(self) -> List[str]:
+        """List the labelled containers to fill the index, return the ids of the containers that changed since the previous index.
+
+        The listing inspects every container, the containers updated by an event meanwhile keep their entry from the event (their
+        change was already handled) instead of the older one of the listing.
+        """
+        with self.__sync_lock:
+            with self.__containers_lock:
+                self.__touched_containers = set()
+
+            containers = {}
+            try:
+                for label_key in self.__INDEXED_LABELS:
+                    for container in self.__client.containers.list(filters={"label": label_key}):
+                        containers[container.id] = container
+            finally:
+                with self.__containers_lock:
+                    touched, self.__touched_containers = self.__touched_containers, None
+
+            with self.__containers_lock:
+                for container_id in touched:
+                    if container_id in self.__containers:
+                        containers[container_id] = self.__containers[container_id]
+                    else:
+                        containers.pop(container_id, None)
+
+                changed = [
+                    container_id
+                    for container_id in self.__containers.keys() | containers.keys()
+                    if container_id not in self.__containers
+                    or container_id not in containers
+                    or self.__container_state(self.__containers[container_id]) != self.__container_state(containers[container_id])
+                ]
+                self.__containers = containers
+                self.__containers_synced = True
+            return changed
+
+    def __update_container_index(self, event) -> None:
+        """Inspect again the labelled container of a lifecycle event, or drop it from the index when it stopped or was removed."""
+        actor = event.get("Actor", {}) or {}
+        attributes = actor.get("Attributes") or {}
+        container_id = actor.get("ID") or event.get("id")
+        if not container_id or not isinstance(attributes, dict) or not any(label in attributes for label in self.__INDEXED_LABELS):
+            return
+
+        container = None
+        if event.get("Action", "").split(":")[0].strip() not in ("die", "stop", "destroy"):
+            with suppress(NotFound):
+                container = self.__client.containers.get(container_id)
+
+        with self.__containers_lock:
+            if container is not None and container.status in self.__LISTED_STATUSES:
+                self.__containers[container_id] = container
+            else:
+                self.__containers.pop(container_id, None)
+            if self.__touched_containers is not None:
+                self.__touched_containers.add(container_id)
+
+    def __reconcile(self) -> None:
+        """List the labelled containers again and schedule an apply if the index missed changes (e.g. while the event stream was down)."""
+        with self.__containers_lock:
+            synced = self.__containers_synced
+        changed = self.__sync_containers()
+        if synced and changed:
+            self._logger.info(f"Reconciled the container index, {len(changed)} container(s) changed without a matching event")
+            with self.__internal_lock:
+                self.__pending_apply = True
+                self.__last_event_time = time()
+
+    def __reconcile_worker(self):
+        while True:
+            sleep(self._reconcile_interval)
+            try:
+                self.__reconcile()
+            except BaseException:
+                self._logger.error(f"Exception while reconciling the container index :\n{format_exc()}")
+
     def _get_controller_containers(self, label_key: str) -> List[Container]:
         """
         Fetch containers based on a specific label and filter them by namespace.
@@ -62,7 +168,7 @@ class DockerController(Controller):
         """
         try:
             # Retrieve containers with the specific label
-            containers: List[Container] = self.__client.containers.list(filters={"label": label_key})
+            containers: List[Container] = self.__list_containers(label_key)
         except DockerException as e:
             self._logger.error(f"Failed to retrieve containers with label '{label_key}': {e}")
             raise
@@ -152,7 +258,7 @@ class DockerController(Controller):
     def get_configs(self) -> Dict[str, Dict[str, Any]]:
         configs = {config_type: {} for config_type in self._supported_config_types}
         # get site configs from labels
-        for container in self.__client.containers.list(filters={"label": "bunkerweb.SERVER_NAME"}):
+        for container in self.__list_containers("bunkerweb.SERVER_NAME"):
             labels = container.labels  # type: ignore (labels is inside a container)
             if isinstance(labels, list):
                 labels = {label: "" for label in labels}
@@ -257,92 +363,68 @@ class DockerController(Controller):
 
         return True
 
-    def process_events(self):
-        self._start_settings_recheck_worker()
-        locked = False
-        error = False
-        applied = False
+    def __read_events(self):
+        """Follow the container events: keep the index up to date and mark an apply as pending when an event is relevant."""
         while True:
             try:
-                for event in self.__client.events(decode=True, filters={"type": "container"}):
-                    applied = False
-                    self.__internal_lock.acquire()
-                    locked = True
-                    if not self.__process_event(event):
-                        self.__internal_lock.release()
-                        locked = False
-                        continue
-                    self._first_start = False
-
-                    # Mark event received and update time
-                    self.__pending_apply = True
-                    self.__last_event_time = time()
+                events = self.__client.events(decode=True, filters={"type": "container"})
+                # Listing after subscribing so that no change falls between the listing and the events
+                self.__reconcile()
+                for event in events:
+                    if event.get("Action", "").split(":")[0].strip() in self.__RELEVANT_EVENT_ACTIONS:
+                        self.__update_container_index(event)
+
+                    with self.__internal_lock:
+                        if not self.__process_event(event):
+                            continue
+                        self._first_start = False
+
+                        # Mark event received and update time
+                        self.__pending_apply = True
+                        self.__last_event_time = time()
                     self._logger.debug("Docker event received, will batch if more arrive...")
-                    self.__internal_lock.release()
-                    locked = False
-
-                    # Wait for debounce period
-                    while (time() - self.__last_event_time) < self.__debounce_delay:
-                        sleep(0.1)
-
-                    # Debounce period passed, try to apply
-                    self.__internal_lock.acquire()
-                    locked = True
+            except BaseException:
+                self._logger.error(f"Exception while reading Docker event :\n{format_exc()}")
+                self._logger.warning("Got exception, retrying in 10 seconds ...")
+                sleep(10)
 
-                    # Check if another event updated the time while we were waiting
-                    if (time() - self.__last_event_time) < self.__debounce_delay:
-                        self.__internal_lock.release()
-                        locked = False
-                        continue
+    def process_events(self):
+        self._start_settings_recheck_worker()
+        Thread(target=self.__read_events, daemon=True).start()
+        if self._reconcile_interval > 0:
+            Thread(target=self.__reconcile_worker, daemon=True).start()
 
-                    if not self.__pending_apply:
-                        self.__internal_lock.release()
-                        locked = False
-                        continue
+        while True:
+            sleep(0.1)
+            with self.__internal_lock:
+                # Wait for the debounce period to pass since the last event
+                if not self.__pending_apply or (time() - self.__last_event_time) < self.__debounce_delay:
+                    continue
+                self.__pending_apply = False
 
-                    self.__pending_apply = False
-
-                    try:
-                        while not applied:
-                            waiting = self.have_to_wait()
-                            self._update_settings()
-                            self._instances = self.get_instances()
-                            self._services = self.get_services()
-                            self._configs = self.get_configs()
-
-                            if not self.update_needed(self._instances, self._services, configs=self._configs):
-                                if locked:
-                                    self.__internal_lock.release()
-                                    locked = False
-                                applied = True
-                                continue
-
-                            if waiting:
-                                sleep(1)
-                                continue
-
-                            self._logger.info("Batched Docker event(s), deploying configuration...")
-                            if not self.apply_config():
-                                self._logger.error("Error while deploying new configuration")
-                            else:
-                                self._logger.info("Successfully deployed new configuration 🚀")
-                                self._set_autoconf_load_db()
+                try:
+                    applied = False
+                    while not applied:
+                        waiting = self.have_to_wait()
+                        self._update_settings()
+                        self._instances = self.get_instances()
+                        self._services = self.get_services()
+                        self._configs = self.get_configs()
+
+                        if not self.update_needed(self._instances, self._services, configs=self._configs):
                             applied = True
-                    except BaseException:
-                        self._logger.error(f"Exception while processing Docker event :\n{format_exc()}")
-
-                    if locked:
-                        self.__internal_lock.release()
-                        locked = False
-            except:
-                self._logger.error(f"Exception while reading Docker event :\n{format_exc()}")
-                error = True
-            finally:
-                if locked:
-                    with suppress(BaseException):
-                        self.__internal_lock.release()
-                    locked = False
-                if error is True:
-                    self._logger.warning("Got exception, retrying in 10 seconds ...")
-                    sleep(10)
-                    error = False
+                            continue
+
+                        if waiting:
+                            sleep(1)
+                            continue
+
+                        self._logger.info("Batched Docker event(s), deploying configuration...")
+                        if not self.apply_config():
+                            self._logger.error("Error while deploying new configuration")
+                        else:
+                            self._logger.info("Successfully deployed new configuration 🚀")
+                            self._set_autoconf_load_db()
+                        applied = True
+                except BaseException:
+                    self._logger.error(f"Exception while processing Docker event :\n{format_exc()}")
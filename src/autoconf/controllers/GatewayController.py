@@ -93,6 +93,9 @@ class GatewayController(KubernetesController):
         version = self._resource_versions.get(plural)
         if not version:
             return []
+        store = self._get_synced_store(plural[:-1])
+        if store:
+            return store.list()
         try:
             data = self._custom_objects.list_cluster_custom_object(
                 self._gateway_api_group,
@@ -209,6 +212,7 @@ class GatewayController(KubernetesController):
             if not gateway_namespace:
                 continue
 
+            self._record_dependency("gateway", gateway_namespace, gateway_name)
             gateway = self._gateways_cache.get((gateway_namespace, gateway_name))
             if not gateway:
                 continue
@@ -274,6 +278,7 @@ class GatewayController(KubernetesController):
             if not gateway_namespace:
                 continue
 
+            self._record_dependency("gateway", gateway_namespace, gateway_name)
             gateway = self._gateways_cache.get((gateway_namespace, gateway_name))
             if not gateway:
                 continue
@@ -297,6 +302,9 @@ class GatewayController(KubernetesController):
         return listeners
 
     def _read_secret(self, name: str, namespace: str):
+        return self._get_object("secret", namespace, name, lambda: self._fetch_secret(name, namespace))
+
+    def _fetch_secret(self, name: str, namespace: str):
         try:
             return self._corev1.read_namespaced_secret(name=name, namespace=namespace)
         except ApiException as e:
@@ -21,7 +21,7 @@ class IngressController(KubernetesController):
 
     def _get_controller_services(self) -> list:
         services = []
-        ingresses = self._networkingv1.list_ingress_for_all_namespaces(watch=False).items
+        ingresses = self._list_objects("ingress", lambda: self._networkingv1.list_ingress_for_all_namespaces(watch=False).items)
         for ingress in ingresses:
             if self._ingress_class:
                 ingress_class_name = getattr(ingress.spec, "ingress_class_name", None)
@@ -75,20 +75,23 @@ class IngressController(KubernetesController):
                     self._logger.warning("Ignoring unsupported ingress rule without backend service port.")
                     continue
 
-                service_list = self._corev1.list_namespaced_service(
+                backend_name = path.backend.service.name
+                k8s_service = self._get_object(
+                    "service",
                     namespace,
-                    watch=False,
-                    field_selector=f"metadata.name={path.backend.service.name}",
-                ).items
+                    backend_name,
+                    lambda: next(
+                        iter(self._corev1.list_namespaced_service(namespace, watch=False, field_selector=f"metadata.name={backend_name}").items), None
+                    ),
+                )
 
-                if not service_list:
+                if not k8s_service:
                     self._logger.warning(f"Ignoring ingress rule with service {path.backend.service.name} : service not found.")
                     self.note_missing_backend(namespace, path.backend.service.name)
                     continue
 
                 port = 80
                 if path.backend.service.port.name:
-                    k8s_service = service_list[0]
                     for svc_port in k8s_service.spec.ports:
                         if svc_port.name == path.backend.service.port.name:
                             port = svc_port.port
@@ -158,17 +161,21 @@ class IngressController(KubernetesController):
                     for host in tls.hosts:
                         for service in services:
                             if host in service["SERVER_NAME"].split():
-                                secrets_tls = self._corev1.list_namespaced_secret(
+                                secret_name = tls.secret_name
+                                secret_tls = self._get_object(
+                                    "secret",
                                     namespace,
-                                    watch=False,
-                                    field_selector=f"metadata.name={tls.secret_name}",
-                                ).items
-
-                                if not secrets_tls:
+                                    secret_name,
+                                    lambda: next(
+                                        iter(self._corev1.list_namespaced_secret(namespace, watch=False, field_selector=f"metadata.name={secret_name}").items),
+                                        None,
+                                    ),
+                                )
+
+                                if not secret_tls:
                                     self._logger.warning(f"Ignoring tls setting for {host} : secret {tls.secret_name} not found.")
                                     break
 
-                                secret_tls = secrets_tls[0]
                                 if not secret_tls.data:
                                     self._logger.warning(f"Ignoring tls setting for {host} : secret {tls.secret_name} contains no data.")
                                     break
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+from collections import defaultdict
 from contextlib import suppress
 from logging import DEBUG
 from os import getenv
@@ -7,13 +8,17 @@ from re import compile as re_compile, split as re_split
 from threading import Lock, Thread
 from time import sleep, time
 from traceback import format_exc
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 from kubernetes import client, config, watch
 from kubernetes.client import Configuration
 from kubernetes.client.exceptions import ApiException
 
 from controllers.Controller import Controller
+from controllers.ObjectStore import ObjectStore, object_metadata
+
+# (watch type, namespace, name) of an object an Ingress/Route translation read
+Dependency = Tuple[str, str, str]
 
 
 class KubernetesController(Controller):
@@ -35,6 +40,18 @@ class KubernetesController(Controller):
         self._pending_backends: Dict[Tuple[str, str], Dict[str, float]] = {}
         self._pending_backends_max_attempts = 5
         self._pending_backends_base_delay = 1.0  # seconds; doubles each attempt (1, 2, 4, 8, 16 → max ~31s)
+        # Local object stores by watch type, filled by the watches (see _get_stream_with_retries). Until a store is
+        # synced, the objects of its type are listed from the cluster like before.
+        self._stores: Dict[str, ObjectStore] = {}
+        # Translated services by Ingress/Route with the resourceVersion they were translated at and the objects
+        # (Services, Secrets, Gateways) they read: only the Ingresses/Routes that changed or whose dependencies
+        # changed are translated again.
+        self._translations_lock = Lock()
+        self._translations: Dict[Tuple[str, str, str], Tuple[str, List[dict], Set[Dependency]]] = {}
+        self._dependents: Dict[Dependency, Set[Tuple[str, str, str]]] = defaultdict(set)
+        self._dirty_dependencies: Set[Dependency] = set()
+        self._recorded_dependencies: Optional[Set[Dependency]] = None
+        self._instances_env: Optional[Dict[str, str]] = None
         super().__init__("kubernetes")
         config.load_incluster_config()
         self._managed_configmaps = set()
@@ -96,6 +113,98 @@ class KubernetesController(Controller):
             return True
         return False
 
+    # ------------------------------------------------------------------
+    # Local object stores and translation cache
+    # ------------------------------------------------------------------
+
+    def _get_store_filter(self, watch_type: str) -> Optional[Callable[[Any], bool]]:
+        """Return the predicate of the objects worth keeping in the store of a watch type (None keeps them all)."""
+
+        def annotated(annotation: str) -> Callable[[Any], bool]:
+            return lambda obj: annotation in (self._get_event_fields(obj)[1] or {})
+
+        if watch_type == "pod":
+            return annotated("bunkerweb.io/INSTANCE")
+        elif watch_type == "configmap":
+            return annotated("bunkerweb.io/CONFIG_TYPE")
+        elif watch_type == "secret":
+            return lambda obj: bool((data := self._get_event_fields(obj)[4]) and ("tls.crt" in data or "tls.key" in data))
+        return None
+
+    def _get_synced_store(self, watch_type: str) -> Optional[ObjectStore]:
+        store = self._stores.get(watch_type)
+        return store if store and store.synced else None
+
+    def _list_objects(self, watch_type: str, list_objects: Callable[[], list]) -> list:
+        """List the objects of a watch type from its store, or from the cluster while the store isn't synced."""
+        store = self._get_synced_store(watch_type)
+        return store.list() if store else list_objects()
+
+    def _record_dependency(self, watch_type: str, namespace: Optional[str], name: Optional[str]) -> None:
+        if self._recorded_dependencies is not None and name:
+            self._recorded_dependencies.add((watch_type, namespace or "", name))
+
+    def _get_object(self, watch_type: str, namespace: str, name: str, get_object: Callable[[], Any]) -> Optional[Any]:
+        """Get an object read by a translation (even a missing one, it's recorded as a dependency of the translation)."""
+        self._record_dependency(watch_type, namespace, name)
+        store = self._get_synced_store(watch_type)
+        return store.get(namespace, name) if store else get_object()
+
+    def _has_dependents(self, watch_type: str, namespace: Optional[str], name: Optional[str]) -> bool:
+        with self._translations_lock:
+            return (watch_type, namespace or "", name or "") in self._dependents
+
+    def _mark_dirty(self, watch_type: str, namespace: Optional[str], name: Optional[str]) -> None:
+        with self._translations_lock:
+            self._dirty_dependencies.add((watch_type, namespace or "", name or ""))
+
+    def _drop_translation(self, key: Tuple[str, str, str]) -> None:
+        """Drop a cached translation and its dependencies, the translations lock must be held."""
+        translation = self._translations.pop(key, None)
+        if not translation:
+            return
+        for dependency in translation[2]:
+            dependents = self._dependents.get(dependency)
+            if dependents is not None:
+                dependents.discard(key)
+                if not dependents:
+                    del self._dependents[dependency]
+
+    def _translate(self, controller_service) -> Tuple[Tuple[str, str, str], List[dict]]:
+        """Translate an Ingress/Route into services, reusing the last translation while neither it nor its dependencies changed."""
+        namespace, name, resource_version = object_metadata(controller_service)
+        kind = (controller_service.get("kind") or "") if isinstance(controller_service, dict) else type(controller_service).__name__
+        key = (kind, namespace, name)
+        with self._translations_lock:
+            translation = self._translations.get(key)
+        if translation and resource_version and translation[0] == resource_version:
+            # The services are merged in-place afterwards, hand out copies
+            return key, [service.copy() for service in translation[1]]
+
+        self._recorded_dependencies = set()
+        try:
+            services = self._to_services(controller_service)
+            dependencies = self._recorded_dependencies
+        finally:
+            self._recorded_dependencies = None
+
+        with self._translations_lock:
+            self._drop_translation(key)
+            if resource_version:
+                self._translations[key] = (resource_version, [service.copy() for service in services], dependencies)
+                for dependency in dependencies:
+                    self._dependents[dependency].add(key)
+        return key, services
+
+    def _update_settings(self):
+        settings = self._settings
+        super()._update_settings()
+        if self._settings != settings:
+            # The annotations are validated against the settings, translate everything again
+            with self._translations_lock:
+                self._translations.clear()
+                self._dependents.clear()
+
     # ------------------------------------------------------------------
     # Multi-Ingress merge helpers
     # ------------------------------------------------------------------
@@ -324,12 +433,33 @@ class KubernetesController(Controller):
         return result
 
     def get_services(self) -> list:
-        services = super().get_services()
+        with self._translations_lock:
+            dirty, self._dirty_dependencies = self._dirty_dependencies, set()
+            for dependency in dirty:
+                for key in list(self._dependents.get(dependency, ())):
+                    self._drop_translation(key)
+
+        services = []
+        translated = set()
+        for controller_service in self._get_controller_services():
+            key, controller_services = self._translate(controller_service)
+            translated.add(key)
+            services.extend(controller_services)
+
+        with self._translations_lock:
+            for key in self._translations.keys() - translated:
+                self._drop_translation(key)
+
         return self._merge_services_by_server_name(services)
 
+    def get_instances(self):
+        # The Ingress/Route annotations are the same for every pod, they are collected once per listing
+        self._instances_env = None
+        return super().get_instances()
+
     def _get_controller_instances(self) -> list:
         instances = []
-        pods = self._corev1.list_pod_for_all_namespaces(watch=False).items
+        pods = self._list_objects("pod", lambda: self._corev1.list_pod_for_all_namespaces(watch=False).items)
         for pod in pods:
             metadata = pod.metadata
             if not metadata:
@@ -386,12 +516,15 @@ class KubernetesController(Controller):
             for env in pod.env:
                 instance["env"][env.name] = env.value or ""
 
-        for controller_service in self._get_controller_services():
-            annotations = self._get_service_annotations(controller_service)
-            for annotation, value in annotations.items():
-                if not annotation.startswith("bunkerweb.io/"):
-                    continue
-                instance["env"][annotation.replace("bunkerweb.io/", "", 1)] = value
+        if self._instances_env is None:
+            self._instances_env = {}
+            for controller_service in self._get_controller_services():
+                annotations = self._get_service_annotations(controller_service)
+                for annotation, value in annotations.items():
+                    if not annotation.startswith("bunkerweb.io/"):
+                        continue
+                    self._instances_env[annotation.replace("bunkerweb.io/", "", 1)] = value
+        instance["env"].update(self._instances_env)
 
         return [instance]
 
@@ -399,7 +532,7 @@ class KubernetesController(Controller):
         configs = {config_type: {} for config_type in self._supported_config_types}
         config = {}
         managed_configmaps = set()
-        for configmap in self._corev1.list_config_map_for_all_namespaces(watch=False).items:
+        for configmap in self._list_objects("configmap", lambda: self._corev1.list_config_map_for_all_namespaces(watch=False).items):
             if not configmap.metadata.annotations or "bunkerweb.io/CONFIG_TYPE" not in configmap.metadata.annotations:
                 continue
 
@@ -479,7 +612,7 @@ class KubernetesController(Controller):
         return False
 
     def _process_event(self, event):
-        if self._first_start:
+        if self._first_start or event.get("type") == "RESYNC":
             return True
 
         obj = event.get("object")
@@ -496,9 +629,11 @@ class KubernetesController(Controller):
             self._logger.debug(f"Skipping {kind} {namespace}/{name} because of ignored annotations")
             return False
 
+        # The events reach this point only when they changed the store of their watch, an object that stopped
+        # matching the store filter (e.g. a pod which lost its annotation) comes as DELETED
         ret = False
         if kind == "Pod":
-            ret = annotations and "bunkerweb.io/INSTANCE" in annotations
+            ret = bool(annotations and "bunkerweb.io/INSTANCE" in annotations) or event.get("type") == "DELETED"
         elif kind == "ConfigMap":
             cfg_name = f"{namespace}/{name}" if namespace and name else ""
             event_type = event.get("type")
@@ -507,10 +642,9 @@ class KubernetesController(Controller):
                 ret = is_managed
             else:
                 ret = bool((annotations and "bunkerweb.io/CONFIG_TYPE" in annotations) or is_managed)
-        elif kind == "Service":
-            ret = True
-        elif kind == "Secret":
-            ret = data and "tls.crt" in data and "tls.key" in data
+        elif kind in ("Service", "Secret"):
+            # Only the Services and Secrets read (or looked for) by a translated Ingress/Route matter
+            ret = self._has_dependents(kind.lower(), namespace, name)
         else:
             ret = self._is_custom_event(kind, obj, annotations, namespace, name)
 
@@ -554,16 +688,56 @@ class KubernetesController(Controller):
             self._logger.info(f"Detected Kubernetes changes: {summary}")
         self._event_summary.clear()
 
+    def _sync_store(self, store: ObjectStore, what) -> List[Tuple[str, str]]:
+        """List the objects of a watch into its store, return the keys of the objects that changed since the last list."""
+        result = what(watch=False)
+        if isinstance(result, dict):  # Custom objects
+            items = result.get("items") or []
+            resource_version = (result.get("metadata") or {}).get("resourceVersion")
+        else:
+            items = result.items or []
+            resource_version = result.metadata.resource_version if result.metadata else None
+
+        changed = store.replace(items, resource_version)
+        self._logger.debug(f"Synced {store.count()} {store.kind} object(s) at resource version {resource_version}, {len(changed)} changed")
+        return changed
+
     def _get_stream_with_retries(self, watch_type, what, retries=5):
+        """Yield the events that changed the store of the watch type.
+
+        The store is filled by a LIST, then the watch starts (and resumes) at its resourceVersion: the existing objects
+        are not replayed. The objects that changed between two LISTs (first sync or after a 410 Gone) come as a single
+        RESYNC event.
+        """
+        store = self._stores[watch_type]
         attempt = 0
         ignored = False
         while attempt < retries:
             try:
+                if store.resource_version is None:
+                    changed = self._sync_store(store, what)
+                    for namespace, name in changed:
+                        self._mark_dirty(watch_type, namespace, name)
+                    if changed:
+                        yield {"type": "RESYNC", "object": None, "watch_type": watch_type, "changed": changed}
+
                 if not ignored:
                     self._logger.info(f"Starting Kubernetes watch for {watch_type}, attempt {attempt + 1}/{retries}")
                 ignored = False
-                yield from watch.Watch().stream(what)
+                for event in watch.Watch().stream(what, resource_version=store.resource_version, allow_watch_bookmarks=True):
+                    obj = event.get("object")
+                    effect = store.apply(event.get("type"), obj) if obj is not None else None
+                    if not effect:
+                        continue  # Bookmarks and events already in the store
+
+                    namespace, name, _ = object_metadata(obj)
+                    self._mark_dirty(watch_type, namespace, name)
+                    event["type"] = effect
+                    yield event
             except ApiException as e:
+                if e.status == 410:
+                    # The resource version is too old to resume the watch, list again
+                    store.invalidate()
                 if e.status == 410 and "Expired: too old resource version: " in e.reason:
                     self._logger.debug(f"{e.reason} while watching {watch_type}, resetting watch stream")
                     ignored = True
@@ -681,6 +855,7 @@ class KubernetesController(Controller):
     def process_events(self):
         self._start_settings_recheck_worker()
         watchers = self._get_watchers()
+        self._stores = {watch_type: ObjectStore(watch_type, self._get_store_filter(watch_type)) for watch_type in watchers}
         threads = [Thread(target=self._watch, args=(watch_type, watcher)) for watch_type, watcher in watchers.items()]
         backend_retry_thread = Thread(target=self._pending_backends_worker, daemon=True)
         backend_retry_thread.start()
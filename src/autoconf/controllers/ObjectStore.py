@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+ObjectKey = Tuple[str, str]
+
+
+def object_metadata(obj) -> Tuple[str, str, Optional[str]]:
+    """Return the namespace, the name and the resourceVersion of a Kubernetes model object or of a custom object (dict)."""
+    if isinstance(obj, dict):
+        metadata = obj.get("metadata") or {}
+        return metadata.get("namespace") or "", metadata.get("name") or "", metadata.get("resourceVersion")
+    metadata = getattr(obj, "metadata", None)
+    if not metadata:
+        return "", "", None
+    return metadata.namespace or "", metadata.name or "", metadata.resource_version
+
+
+class ObjectStore:
+    """Local copy of the objects of one Kubernetes resource, kept up to date by its watch events (like an informer).
+
+    The store is filled by a LIST and then only follows the events of a watch started at the resourceVersion of that
+    list, so the objects are never listed again unless the watch expires. Objects rejected by the keep predicate are not
+    stored (and are removed when they stop matching it) to keep the memory bounded on big clusters.
+    """
+
+    def __init__(self, kind: str, keep: Optional[Callable[[Any], bool]] = None):
+        self.kind = kind
+        self.resource_version: Optional[str] = None
+        self.synced = False
+        self._keep = keep
+        self._objects: Dict[ObjectKey, Any] = {}
+        self._lock = Lock()
+
+    def replace(self, items: Iterable[Any], resource_version: Optional[str]) -> List[ObjectKey]:
+        """Replace the objects with the items of a LIST and return the keys of the objects that changed."""
+        objects = {}
+        for obj in items:
+            namespace, name, _ = object_metadata(obj)
+            if name and (self._keep is None or self._keep(obj)):
+                objects[(namespace, name)] = obj
+
+        with self._lock:
+            changed = [
+                key
+                for key in self._objects.keys() | objects.keys()
+                if key not in self._objects or key not in objects or object_metadata(self._objects[key])[2] != object_metadata(objects[key])[2]
+            ]
+            self._objects = objects
+            self.resource_version = resource_version
+            self.synced = True
+        return changed
+
+    def apply(self, event_type: str, obj) -> Optional[str]:
+        """Apply a watch event and return its effect on the store (ADDED, MODIFIED or DELETED), None when nothing changed.
+
+        An object that doesn't match the keep predicate anymore is DELETED from the store.
+        """
+        namespace, name, resource_version = object_metadata(obj)
+        key = (namespace, name)
+        with self._lock:
+            if resource_version:
+                self.resource_version = resource_version
+            if not name:
+                return None
+
+            previous = self._objects.get(key)
+            if event_type == "DELETED" or (self._keep is not None and not self._keep(obj)):
+                if previous is None:
+                    return None
+                del self._objects[key]
+                return "DELETED"
+
+            if previous is not None and resource_version and object_metadata(previous)[2] == resource_version:
+                return None  # Already seen, e.g. replayed after the watch resumed
+            self._objects[key] = obj
+            return "MODIFIED" if previous is not None else "ADDED"
+
+    def invalidate(self) -> None:
+        """Forget the resourceVersion so that the next watch starts with a new LIST (e.g. after a 410 Gone)."""
+        with self._lock:
+            self.resource_version = None
+
+    def get(self, namespace: str, name: str) -> Optional[Any]:
+        with self._lock:
+            return self._objects.get((namespace or "", name))
+
+    def list(self) -> List[Any]:
+        """Return the objects sorted by namespace and name, like a LIST does."""
+        with self._lock:
+            return [obj for _, obj in sorted(self._objects.items(), key=lambda item: item[0])]
+
+    def count(self) -> int:
+        return len(self._objects)
@@ -5,13 +5,13 @@ from contextlib import suppress
 from time import sleep, time
 from traceback import format_exc
 from threading import Thread, Lock
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Set, Tuple
 from docker import DockerClient
 from re import split as re_split
 from base64 import b64decode
 
 from docker.models.services import Service
-from docker.errors import DockerException
+from docker.errors import DockerException, NotFound
 from controllers.Controller import Controller
 
 
@@ -22,12 +22,16 @@ class SwarmController(Controller):
         self.__internal_lock = Lock()
         # Protected alias so the base-class settings recheck worker shares the same lock object.
         self._internal_lock = self.__internal_lock
-        self.__swarm_instances = []
-        self.__swarm_services = []
-        self.__swarm_configs = []
         self.__pending_apply = False
         self.__last_event_time = 0.0
         self.__debounce_delay = 2  # seconds
+        # Labelled services and configs by id: filled by a listing and then kept up to date by the events
+        self.__indexes: Dict[str, Dict[str, Any]] = {"service": {}, "config": {}}
+        self.__indexes_synced = False
+        self.__indexes_lock = Lock()
+        # One listing at a time, the objects updated by the events while it runs keep their event-fed entry
+        self.__sync_lock = Lock()
+        self.__touched_objects: Optional[Set[Tuple[str, str]]] = None
         self._logger.warning("Swarm integration is deprecated and will be removed in a future release")
         self.__ignored_labels_exact = set()
         self.__ignored_label_suffixes = set()
@@ -54,6 +58,104 @@ class SwarmController(Controller):
             return True
         return False
 
+    # Labels of the indexed objects by event type
+    __INDEXED_LABELS = {"service": ("bunkerweb.INSTANCE", "bunkerweb.SERVER_NAME"), "config": ("bunkerweb.CONFIG_TYPE",)}
+
+    @staticmethod
+    def __labels(obj) -> dict:
+        return (obj.attrs.get("Spec", {}) or {}).get("Labels") or {}
+
+    def __collection(self, object_type: str):
+        return self.__client.services if object_type == "service" else self.__client.configs
+
+    def __list_indexed(self, object_type: str, label_key: str) -> list:
+        """Return the services or configs with the label, from the index once it is synced with the events."""
+        with self.__indexes_lock:
+            if self.__indexes_synced:
+                return [obj for obj in self.__indexes[object_type].values() if label_key in self.__labels(obj)]
+        return self.__collection(object_type).list(filters={"label": label_key})
+
+    def __sync_indexes(self) -> List[str]:
+        """List the labelled services and configs to fill the indexes, return the ids of the objects that changed since the previous indexes.
+
+        The objects updated by an event during the listing keep their entry from the event (their change was already handled)
+        instead of the older one of the listing.
+        """
+        with self.__sync_lock:
+            with self.__indexes_lock:
+                self.__touched_objects = set()
+
+            indexes = {}
+            try:
+                for object_type, label_keys in self.__INDEXED_LABELS.items():
+                    indexes[object_type] = {}
+                    for label_key in label_keys:
+                        for obj in self.__collection(object_type).list(filters={"label": label_key}):
+                            indexes[object_type][obj.id] = obj
+            finally:
+                with self.__indexes_lock:
+                    touched, self.__touched_objects = self.__touched_objects, None
+
+            changed = []
+            with self.__indexes_lock:
+                for object_type, object_id in touched:
+                    if object_id in self.__indexes[object_type]:
+                        indexes[object_type][object_id] = self.__indexes[object_type][object_id]
+                    else:
+                        indexes[object_type].pop(object_id, None)
+
+                for object_type, index in indexes.items():
+                    previous = self.__indexes[object_type]
+                    changed.extend(
+                        object_id
+                        for object_id in previous.keys() | index.keys()
+                        if object_id not in previous
+                        or object_id not in index
+                        or previous[object_id].attrs.get("Version") != index[object_id].attrs.get("Version")
+                    )
+                self.__indexes = indexes
+                self.__indexes_synced = True
+            return changed
+
+    def __update_index(self, event) -> tuple:
+        """Inspect again the service or config of an event (or drop it when removed), return its previous and current indexed versions."""
+        object_type = event["Type"]
+        object_id = event["Actor"]["ID"]
+        obj = None
+        if event.get("Action") != "remove":
+            with suppress(NotFound):
+                obj = self.__collection(object_type).get(object_id)
+
+        with self.__indexes_lock:
+            index = self.__indexes[object_type]
+            previous = index.pop(object_id, None)
+            if obj is not None and any(label in self.__labels(obj) for label in self.__INDEXED_LABELS[object_type]):
+                index[object_id] = obj
+            else:
+                obj = None
+            if self.__touched_objects is not None:
+                self.__touched_objects.add((object_type, object_id))
+        return previous, obj
+
+    def __reconcile(self) -> None:
+        """List the labelled services and configs again and schedule an apply if the indexes missed changes (e.g. while an event stream was down)."""
+        with self.__indexes_lock:
+            synced = self.__indexes_synced
+        changed = self.__sync_indexes()
+        if synced and changed:
+            self._logger.info(f"Reconciled the Swarm indexes, {len(changed)} service(s)/config(s) changed without a matching event")
+            with self.__internal_lock:
+                self.__pending_apply = True
+                self.__last_event_time = time()
+
+    def __reconcile_worker(self):
+        while True:
+            sleep(self._reconcile_interval)
+            try:
+                self.__reconcile()
+            except BaseException:
+                self._logger.error(f"Exception while reconciling the Swarm indexes :\n{format_exc()}")
+
     def _get_controller_swarm_services(self, label_key: str) -> List[Service]:
         """
         Fetch Swarm services based on a specific label and filter them by namespace.
@@ -66,7 +168,7 @@ class SwarmController(Controller):
         """
         try:
             # Retrieve services with the specific label
-            services: List[Service] = self.__client.services.list(filters={"label": label_key})
+            services: List[Service] = self.__list_indexed("service", label_key)
         except DockerException as e:
             self._logger.error(f"Failed to retrieve services with label '{label_key}': {e}")
             raise
@@ -114,7 +216,6 @@ class SwarmController(Controller):
         return self._get_controller_swarm_services(label_key="bunkerweb.SERVER_NAME")
 
     def _to_instances(self, controller_instance) -> List[dict]:
-        self.__swarm_instances.append(controller_instance.id)
         instances = []
         instance_env = {}
         container_spec = controller_instance.attrs.get("Spec", {}).get("TaskTemplate", {}).get("ContainerSpec", {}) or {}
@@ -139,7 +240,6 @@ class SwarmController(Controller):
         return instances
 
     def _to_services(self, controller_service) -> List[dict]:
-        self.__swarm_services.append(controller_service.id)
         service = {}
         for variable, value in controller_service.attrs["Spec"]["Labels"].items():
             if self.__should_ignore_label(variable):
@@ -150,11 +250,10 @@ class SwarmController(Controller):
         return [service]
 
     def get_configs(self) -> Dict[str, Dict[str, Any]]:
-        self.__swarm_configs = []
         configs = {}
         for config_type in self._supported_config_types:
             configs[config_type] = {}
-        for config in self.__client.configs.list(filters={"label": "bunkerweb.CONFIG_TYPE"}):
+        for config in self.__list_indexed("config", "bunkerweb.CONFIG_TYPE"):
             if not config.name or not config.attrs or not config.attrs.get("Spec", {}).get("Labels", {}) or not config.attrs.get("Spec", {}).get("Data", {}):
                 continue
 
@@ -179,7 +278,6 @@ class SwarmController(Controller):
                     continue
                 config_site = f"{labels['bunkerweb.CONFIG_SITE']}/"
             configs[config_type][f"{config_site}{config_name}"] = b64decode(config.attrs["Spec"]["Data"])
-            self.__swarm_configs.append(config.id)
         return configs
 
     def apply_config(self, force: bool = False) -> bool:
@@ -191,137 +289,83 @@ class SwarmController(Controller):
             force=force,
         )
 
-    def __process_event(self, event):
+    def __is_managed(self, event_type: str, obj) -> bool:
+        labels = self.__labels(obj)
+        if any(self.__should_ignore_label(label) for label in labels):
+            self._logger.info(f"Skipping Swarm {event_type} {obj.id} because of ignored labels")
+            return False
+        return not self._namespaces or any(labels.get("bunkerweb.NAMESPACE", "") == namespace for namespace in self._namespaces)
+
+    def __process_event(self, event, previous, current):
         if self._first_start:
             return True
+        # The event is relevant if the object is managed before or after it
+        return any(obj is not None and self.__is_managed(event["Type"], obj) for obj in (previous, current))
 
-        if "Actor" not in event or "ID" not in event["Actor"] or "Type" not in event:
-            return False
-        if event["Type"] not in ("service", "config"):
-            return False
-        if event["Type"] == "service":
-            if event["Actor"]["ID"] in self.__swarm_instances or event["Actor"]["ID"] in self.__swarm_services:
-                return True
-            try:
-                labels = self.__client.services.get(event["Actor"]["ID"]).attrs["Spec"].get("Labels", {}) or {}
-                if any(self.__should_ignore_label(label) for label in labels):
-                    self._logger.info(f"Skipping Swarm service {event['Actor']['ID']} because of ignored labels")
-                    return False
-                return ("bunkerweb.INSTANCE" in labels or "bunkerweb.SERVER_NAME" in labels) and (
-                    not self._namespaces or any(labels.get("bunkerweb.NAMESPACE", "") == namespace for namespace in self._namespaces)
-                )
-            except:
-                return False
-        if event["Type"] == "config":
-            if event["Actor"]["ID"] in self.__swarm_configs:
-                return True
-            try:
-                labels = self.__client.configs.get(event["Actor"]["ID"]).attrs["Spec"].get("Labels", {}) or {}
-                if any(self.__should_ignore_label(label) for label in labels):
-                    self._logger.info(f"Skipping Swarm config {event['Actor']['ID']} because of ignored labels")
-                    return False
-                return "bunkerweb.CONFIG_TYPE" in labels and (
-                    not self._namespaces or any(labels.get("bunkerweb.NAMESPACE", "") == namespace for namespace in self._namespaces)
-                )
-            except:
-                return False
-        return False
-
-    def __event(self, event_type):
+    def __event(self):
+        """Follow the service and config events in a single stream, so that the indexes are listed once per subscription."""
         while True:
-            locked = False
-            error = False
-            applied = False
             try:
-                for event in self.__client.events(decode=True, filters={"type": event_type}):
-                    applied = False
-                    self.__internal_lock.acquire()
-                    locked = True
-                    if not self.__process_event(event):
-                        self.__internal_lock.release()
-                        locked = False
+                events = self.__client.events(decode=True, filters={"type": list(self.__INDEXED_LABELS)})
+                # Listing after subscribing so that no change falls between the listing and the events
+                self.__reconcile()
+                for event in events:
+                    if "Actor" not in event or "ID" not in event["Actor"] or event.get("Type") not in self.__INDEXED_LABELS:
                         continue
-                    self._first_start = False
-
-                    # Mark event received and update time
-                    self.__pending_apply = True
-                    self.__last_event_time = time()
-                    self._logger.debug(f"Swarm event ({event_type}) received, will batch if more arrive...")
-                    self.__internal_lock.release()
-                    locked = False
+                    event_type = event["Type"]
+                    previous, current = self.__update_index(event)
 
-                    # Wait for debounce period
-                    while (time() - self.__last_event_time) < self.__debounce_delay:
-                        sleep(0.1)
+                    with self.__internal_lock:
+                        if not self.__process_event(event, previous, current):
+                            continue
+                        self._first_start = False
 
-                    # Debounce period passed, try to apply
-                    self.__internal_lock.acquire()
-                    locked = True
+                        # Mark event received and update time
+                        self.__pending_apply = True
+                        self.__last_event_time = time()
+                    self._logger.debug(f"Swarm event ({event_type}) received, will batch if more arrive...")
+            except BaseException:
+                self._logger.error(f"Exception while reading Swarm events :\n{format_exc()}")
+                self._logger.warning("Got exception, retrying in 10 seconds ...")
+                sleep(10)
 
-                    # Check if another event updated the time while we were waiting
-                    if (time() - self.__last_event_time) < self.__debounce_delay:
-                        self.__internal_lock.release()
-                        locked = False
-                        continue
+    def process_events(self):
+        self._start_settings_recheck_worker()
+        Thread(target=self.__event, daemon=True).start()
+        if self._reconcile_interval > 0:
+            Thread(target=self.__reconcile_worker, daemon=True).start()
 
-                    if not self.__pending_apply:
-                        self.__internal_lock.release()
-                        locked = False
-                        continue
+        while True:
+            sleep(0.1)
+            with self.__internal_lock:
+                # Wait for the debounce period to pass since the last event
+                if not self.__pending_apply or (time() - self.__last_event_time) < self.__debounce_delay:
+                    continue
+                self.__pending_apply = False
 
-                    self.__pending_apply = False
-
-                    try:
-                        while not applied:
-                            waiting = self.have_to_wait()
-                            self._update_settings()
-                            self._instances = self.get_instances()
-                            self._services = self.get_services()
-                            self._configs = self.get_configs()
-
-                            if not self.update_needed(self._instances, self._services, configs=self._configs):
-                                if locked:
-                                    self.__internal_lock.release()
-                                    locked = False
-                                applied = True
-                                continue
-
-                            if waiting:
-                                sleep(1)
-                                continue
-
-                            self._logger.info("Batched Swarm event(s), deploying configuration...")
-                            if not self.apply_config():
-                                self._logger.error("Error while deploying new configuration")
-                            else:
-                                self._logger.info(
-                                    "Successfully deployed new configuration 🚀",
-                                )
-                                self._set_autoconf_load_db()
+                try:
+                    applied = False
+                    while not applied:
+                        waiting = self.have_to_wait()
+                        self._update_settings()
+                        self._instances = self.get_instances()
+                        self._services = self.get_services()
+                        self._configs = self.get_configs()
+
+                        if not self.update_needed(self._instances, self._services, configs=self._configs):
                             applied = True
-                    except BaseException:
-                        self._logger.error(f"Exception while processing Swarm event ({event_type}) :\n{format_exc()}")
-
-                    if locked:
-                        self.__internal_lock.release()
-                        locked = False
-            except:
-                self._logger.error(f"Exception while reading Swarm event ({event_type}) :\n{format_exc()}")
-                error = True
-            finally:
-                if locked:
-                    with suppress(BaseException):
-                        self.__internal_lock.release()
-                    locked = False
-                if error is True:
-                    self._logger.warning("Got exception, retrying in 10 seconds ...")
-                    sleep(10)
-
-    def process_events(self):
-        self._start_settings_recheck_worker()
-        event_types = ("service", "config")
-        threads = [Thread(target=self.__event, args=(event_type,)) for event_type in event_types]
-        for thread in threads:
-            thread.start()
-        for thread in threads:
-            thread.join()
+                            continue
+
+                        if waiting:
+                            sleep(1)
+                            continue
+
+                        self._logger.info("Batched Swarm event(s), deploying configuration...")
+                        if not self.apply_config():
+                            self._logger.error("Error while deploying new configuration")
+                        else:
+                            self._logger.info("Successfully deployed new configuration 🚀")
+                            self._set_autoconf_load_db()
+                        applied = True
+                except BaseException:
+                    self._logger.error(f"Exception while processing Swarm event(s) :\n{format_exc()}")
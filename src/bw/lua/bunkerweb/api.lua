@@ -47,6 +47,7 @@ local get_body_data = ngx_req.get_body_data
 local get_body_file = ngx_req.get_body_file
 local decode = cjson.decode
 local encode = cjson.encode
+local array_mt = cjson.array_mt
 local match = string.match
 local require_plugin = helpers.require_plugin
 local new_plugin = helpers.new_plugin
@@ -260,37 +261,41 @@ api.global.POST["^/stop$"] = function(self)
 	return self:response(HTTP_OK, "success", "stop successful")
 end
 
-api.global.POST["^/confs$"] = function(self)
-	local tmp = "/var/tmp/bunkerweb/api_" .. self.ctx.bw.uri:sub(2) .. ".tar.gz"
-	local destination = "/usr/share/bunkerweb/" .. self.ctx.bw.uri:sub(2)
-	if self.ctx.bw.uri == "/confs" then
-		destination = "/etc/nginx"
-	elseif self.ctx.bw.uri == "/data" then
-		destination = "/data"
-	elseif self.ctx.bw.uri == "/cache" then
-		destination = "/var/cache/bunkerweb"
-	elseif self.ctx.bw.uri == "/custom_configs" then
-		destination = "/etc/bunkerweb/configs"
-	elseif self.ctx.bw.uri == "/plugins" then
-		destination = "/etc/bunkerweb/plugins"
-	elseif self.ctx.bw.uri == "/pro_plugins" then
-		destination = "/etc/bunkerweb/pro/plugins"
-	end
+local FILE_SYNC = "/usr/share/bunkerweb/utils/file_sync.py"
+
+local function get_destination(target)
+	if target == "confs" then
+		return "/etc/nginx"
+	elseif target == "data" then
+		return "/data"
+	elseif target == "cache" then
+		return "/var/cache/bunkerweb"
+	elseif target == "custom_configs" then
+		return "/etc/bunkerweb/configs"
+	elseif target == "plugins" then
+		return "/etc/bunkerweb/plugins"
+	elseif target == "pro_plugins" then
+		return "/etc/bunkerweb/pro/plugins"
+	end
+	return "/usr/share/bunkerweb/" .. target
+end
+
+local function save_upload(path)
 	local form, err = upload:new(4096)
 	if not form then
-		return self:response(HTTP_BAD_REQUEST, "error", err)
+		return false, HTTP_BAD_REQUEST, err
 	end
 	form:set_timeout(1000)
-	local file, err = open(tmp, "w+")
+	local file, err = open(path, "w+")
 	if not file then
-		return self:response(HTTP_INTERNAL_SERVER_ERROR, "error", err)
+		return false, HTTP_INTERNAL_SERVER_ERROR, err
 	end
 	while true do
 		-- luacheck: ignore 421
 		local typ, res, err = form:read()
 		if not typ then
 			file:close()
-			return self:response(HTTP_BAD_REQUEST, "error", err)
+			return false, HTTP_BAD_REQUEST, err
 		end
 		if typ == "eof" then
 			break
@@ -301,8 +306,33 @@ api.global.POST["^/confs$"] = function(self)
 	end
 	file:flush()
 	file:close()
-	local staging = "/var/tmp/bunkerweb/staging_" .. self.ctx.bw.uri:sub(2)
-	local backup = "/var/tmp/bunkerweb/backup_" .. self.ctx.bw.uri:sub(2)
+	return true
+end
+
+local function run_file_sync(command, destination, path, output)
+	local status = execute(
+		"python3 " .. FILE_SYNC .. " " .. command .. " " .. destination .. " " .. path .. " > " .. output .. " 2>&1"
+	)
+	local file = open(output, "r")
+	local out = ""
+	if file then
+		out = file:read("*a")
+		file:close()
+	end
+	os.remove(output)
+	return status == 0 or status == true, out
+end
+
+api.global.POST["^/confs$"] = function(self)
+	local target = self.ctx.bw.uri:sub(2)
+	local tmp = "/var/tmp/bunkerweb/api_" .. target .. ".tar.gz"
+	local destination = get_destination(target)
+	local ok, http_status, err = save_upload(tmp)
+	if not ok then
+		return self:response(http_status, "error", err)
+	end
+	local staging = "/var/tmp/bunkerweb/staging_" .. target
+	local backup = "/var/tmp/bunkerweb/backup_" .. target
 	local cmds = {
 		-- Extract into a staging area first (validates the archive before touching destination)
 		"rm -rf " .. staging,
@@ -339,17 +369,70 @@ api.global.POST["^/confs$"] = function(self)
 	return self:response(HTTP_OK, "success", "saved data at " .. destination)
 end
 
-api.global.POST["^/data$"] = api.global.POST["^/confs$"]
-
-api.global.POST["^/cache$"] = api.global.POST["^/confs$"]
-
-api.global.POST["^/custom_configs$"] = api.global.POST["^/confs$"]
+-- Delta sync, step 1 : the body is the manifest of the sender, reply with the hashes we don't have
+api.global.POST["^/confs/manifest$"] = function(self)
+	local target = match(self.ctx.bw.uri, "^/([%w_]+)/manifest$")
+	local manifest = "/var/tmp/bunkerweb/api_" .. target .. ".manifest.json"
+	read_body()
+	local data = get_body_data()
+	if data then
+		local file, err = open(manifest, "w")
+		if not file then
+			return self:response(HTTP_INTERNAL_SERVER_ERROR, "error", err)
+		end
+		file:write(data)
+		file:close()
+	else
+		manifest = get_body_file()
+		if not manifest then
+			return self:response(HTTP_BAD_REQUEST, "error", "missing manifest")
+		end
+	end
+	local ok, out = run_file_sync(
+		"missing",
+		get_destination(target),
+		manifest,
+		"/var/tmp/bunkerweb/api_" .. target .. ".missing.json"
+	)
+	if data then
+		os.remove(manifest)
+	end
+	if not ok then
+		return self:response(HTTP_INTERNAL_SERVER_ERROR, "error", out)
+	end
+	local ok_decode, missing = pcall(decode, out)
+	if not ok_decode or type(missing) ~= "table" then
+		return self:response(HTTP_INTERNAL_SERVER_ERROR, "error", "invalid file_sync output : " .. out)
+	end
+	return self:response(HTTP_OK, "success", missing)
+end
 
-api.global.POST["^/plugins$"] = api.global.POST["^/confs$"]
+-- Delta sync, step 2 : the archive holds the manifest and the missing blobs
+api.global.POST["^/confs/delta$"] = function(self)
+	local target = match(self.ctx.bw.uri, "^/([%w_]+)/delta$")
+	local tmp = "/var/tmp/bunkerweb/api_" .. target .. ".delta.tar.gz"
+	local ok, http_status, err = save_upload(tmp)
+	if not ok then
+		return self:response(http_status, "error", err)
+	end
+	local destination = get_destination(target)
+	local out
+	ok, out = run_file_sync("apply", destination, tmp, "/var/tmp/bunkerweb/api_" .. target .. ".delta.log")
+	os.remove(tmp)
+	if not ok then
+		return self:response(HTTP_INTERNAL_SERVER_ERROR, "error", out)
+	end
+	return self:response(HTTP_OK, "success", "synced data at " .. destination)
+end
 
-api.global.POST["^/pro_plugins$"] = api.global.POST["^/confs$"]
+for _, target in ipairs({ "data", "cache", "custom_configs", "plugins", "pro_plugins" }) do
+	api.global.POST["^/" .. target .. "$"] = api.global.POST["^/confs$"]
+	api.global.POST["^/" .. target .. "/manifest$"] = api.global.POST["^/confs/manifest$"]
+	api.global.POST["^/" .. target .. "/delta$"] = api.global.POST["^/confs/delta$"]
+end
 
-api.global.POST["^/unban$"] = function(self)
+-- Read and decode the JSON body of the request, return nil, status, msg when it can't be
+local function read_json_body()
 	read_body()
 	local data = get_body_data()
 	if not data then
@@ -357,70 +440,134 @@ api.global.POST["^/unban$"] = function(self)
 		if data_file then
 			local file, err = open(data_file)
 			if not file then
-				return self:response(HTTP_INTERNAL_SERVER_ERROR, "error", err)
+				return nil, HTTP_INTERNAL_SERVER_ERROR, err
 			end
 			data = file:read("*a")
 			file:close()
 		end
 	end
-	local ok, ip = pcall(decode, data)
+	local ok, body = pcall(decode, data)
 	if not ok then
-		return self:response(HTTP_INTERNAL_SERVER_ERROR, "error", "can't decode JSON : " .. ip)
+		return nil, HTTP_INTERNAL_SERVER_ERROR, "can't decode JSON : " .. body
+	end
+	if type(body) ~= "table" then
+		return nil, HTTP_BAD_REQUEST, "invalid payload"
+	end
+	-- An empty list decodes to an empty table like an empty object, it is marked as a list
+	if next(body) == nil and match(data, "^%s*%[") then
+		setmetatable(body, array_mt)
+	end
+	return body
+end
+
+-- Whether a decoded body is a list of items (an empty list included)
+local function is_list(body)
+	return body[1] ~= nil or getmetatable(body) == array_mt
+end
+
+-- Apply a list of items with the batch function of utils (add_bans or remove_bans) and return the
+-- overall status with one { ip, status, msg } result per item
+local function apply_batch(items, prepare, apply, describe)
+	local results = {}
+	local prepared = {}
+	local indexes = {}
+	for i, item in ipairs(items) do
+		local entry, msg = nil, "invalid payload"
+		if type(item) == "table" then
+			entry, msg = prepare(item)
+		end
+		if entry then
+			prepared[#prepared + 1] = entry
+			indexes[#prepared] = i
+		else
+			results[i] = { HTTP_BAD_REQUEST, msg }
+		end
+	end
+	for j, result in ipairs(apply(prepared)) do
+		if result[1] then
+			results[indexes[j]] = { HTTP_OK, describe(prepared[j]) }
+		else
+			results[indexes[j]] = { HTTP_INTERNAL_SERVER_ERROR, result[2] }
+		end
 	end
 
+	local status = HTTP_OK
+	-- Encoded as a JSON array even when the list is empty
+	local data = setmetatable({}, array_mt)
+	for i, item in ipairs(items) do
+		local item_status, msg = results[i][1], results[i][2]
+		if item_status ~= HTTP_OK and status ~= HTTP_INTERNAL_SERVER_ERROR then
+			status = item_status
+		end
+		data[i] = {
+			ip = type(item) == "table" and item["ip"] or nil,
+			status = item_status == HTTP_OK and "success" or "error",
+			msg = msg,
+		}
+	end
+	return status, data
+end
+
+local function prepare_unban(ip)
 	-- Validate IP address
-	if not ip["ip"] or (not is_ipv4(ip["ip"]) and not is_ipv6(ip["ip"])) then
-		return self:response(HTTP_BAD_REQUEST, "error", "invalid IP address")
+	if not ip["ip"] or type(ip["ip"]) ~= "string" or (not is_ipv4(ip["ip"]) and not is_ipv6(ip["ip"])) then
+		return nil, "invalid IP address"
 	end
 
-	local ban_scope = ip["ban_scope"] or "global"
-	local service = ip["service"]
-	local response_msg = "ip " .. ip["ip"] .. " unbanned"
+	local unban = { ip = ip["ip"], ban_scope = ip["ban_scope"] or "global", service = ip["service"] }
 
 	-- Validate ban scope
-	if ban_scope ~= "global" and ban_scope ~= "service" then
-		logger:log(ERR, "Invalid ban scope: " .. ban_scope .. ", defaulting to global")
-		ban_scope = "global"
+	if unban.ban_scope ~= "global" and unban.ban_scope ~= "service" then
+		logger:log(ERR, "Invalid ban scope: " .. tostring(unban.ban_scope) .. ", defaulting to global")
+		unban.ban_scope = "global"
 	end
 
 	-- For service-specific unbans, validate the service
-	if ban_scope == "service" then
-		if not service or RESERVED_SERVICE_NAMES[service] then
+	if unban.ban_scope == "service" then
+		if not unban.service or RESERVED_SERVICE_NAMES[unban.service] then
 			logger:log(ERR, "Invalid service name for service-specific unban, defaulting to global unban")
-			ban_scope = "global"
-			service = nil
-		else
-			response_msg = response_msg .. " for service " .. service
+			unban.ban_scope = "global"
+			unban.service = nil
 		end
 	end
+	return unban
+end
+
+local function describe_unban(unban)
+	if unban.ban_scope == "service" then
+		return "ip " .. unban.ip .. " unbanned for service " .. unban.service
+	end
+	return "ip " .. unban.ip .. " unbanned"
+end
+
+api.global.POST["^/unban$"] = function(self)
+	local ip, err_status, err = read_json_body()
+	if not ip then
+		return self:response(err_status, "error", err)
+	end
+
+	-- A list of unbans is applied in one request, every unban is tried and the results are returned in data
+	if is_list(ip) then
+		local status, results = apply_batch(ip, prepare_unban, utils.remove_bans, describe_unban)
+		return self:response(status, status == HTTP_OK and "success" or "error", results)
+	end
+
+	local unban, msg = prepare_unban(ip)
+	if not unban then
+		return self:response(HTTP_BAD_REQUEST, "error", msg)
+	end
 
 	-- Use utils.remove_ban to remove the ban(s)
-	local ok, err = utils.remove_ban(ip["ip"], service, ban_scope)
+	local ok
+	ok, err = utils.remove_ban(unban.ip, unban.service, unban.ban_scope)
 	if not ok then
 		return self:response(HTTP_INTERNAL_SERVER_ERROR, "error", "failed to remove ban: " .. err)
 	end
 
-	return self:response(HTTP_OK, "success", response_msg)
+	return self:response(HTTP_OK, "success", describe_unban(unban))
 end
 
-api.global.POST["^/ban$"] = function(self)
-	read_body()
-	local data = get_body_data()
-	if not data then
-		local data_file = get_body_file()
-		if data_file then
-			local file, err = open(data_file)
-			if not file then
-				return self:response(HTTP_INTERNAL_SERVER_ERROR, "error", err)
-			end
-			data = file:read("*a")
-			file:close()
-		end
-	end
-	local ok, ip = pcall(decode, data)
-	if not ok then
-		return self:response(HTTP_INTERNAL_SERVER_ERROR, "error", "can't decode JSON : " .. ip)
-	end
+local function prepare_ban(ip)
 	local ban = {
 		ip = "",
 		exp = 86400,
@@ -446,18 +593,18 @@ api.global.POST["^/ban$"] = function(self)
 	end
 
 	-- Validate IP address
-	if not ban.ip or (not is_ipv4(ban.ip) and not is_ipv6(ban.ip)) then
-		return self:response(HTTP_BAD_REQUEST, "error", "invalid IP address")
+	if not ban.ip or type(ban.ip) ~= "string" or (not is_ipv4(ban.ip) and not is_ipv6(ban.ip)) then
+		return nil, "invalid IP address"
 	end
 
 	-- Validate expiration
 	if ban.exp and (type(ban.exp) ~= "number" or ban.exp < 0) then
-		return self:response(HTTP_BAD_REQUEST, "error", "exp must be a non-negative number")
+		return nil, "exp must be a non-negative number"
 	end
 
 	-- Validate ban scope
 	if ban.ban_scope ~= "global" and ban.ban_scope ~= "service" then
-		logger:log(ERR, "Invalid ban scope: " .. ban.ban_scope .. ", defaulting to global")
+		logger:log(ERR, "Invalid ban scope: " .. tostring(ban.ban_scope) .. ", defaulting to global")
 		ban.ban_scope = "global"
 	end
 
@@ -476,17 +623,42 @@ api.global.POST["^/ban$"] = function(self)
 		logger:log(ERR, "can't get country code " .. err)
 	end
 	ban.country = country
+	ban.ttl = ban.exp
+	return ban
+end
+
+local function describe_ban(ban)
+	-- Create a more informative response message
+	local scope_text = ban.ban_scope == "global" and "globally" or ("for service " .. ban.service)
+	local duration_text = not ban["exp"] and "permanently" or ("for " .. ban["exp"] .. " seconds")
+	return "ip " .. ban.ip .. " banned " .. scope_text .. " " .. duration_text
+end
+
+api.global.POST["^/ban$"] = function(self)
+	local ip, err_status, err = read_json_body()
+	if not ip then
+		return self:response(err_status, "error", err)
+	end
+
+	-- A list of bans is applied in one request, every ban is tried and the results are returned in data,
+	-- the Redis writes of the whole list are done in a single transaction
+	if is_list(ip) then
+		local status, results = apply_batch(ip, prepare_ban, utils.add_bans, describe_ban)
+		return self:response(status, status == HTTP_OK and "success" or "error", results)
+	end
+
+	local ban, msg = prepare_ban(ip)
+	if not ban then
+		return self:response(HTTP_BAD_REQUEST, "error", msg)
+	end
 
 	-- Use utils.add_ban to ensure ban is applied to datastore and Redis
-	local ok, err = utils.add_ban(ban.ip, ban.reason, ban.exp, ban.service, ban.country, ban.ban_scope)
+	local ok
+	ok, err = utils.add_ban(ban.ip, ban.reason, ban.exp, ban.service, ban.country, ban.ban_scope)
 	if not ok then
 		return self:response(HTTP_INTERNAL_SERVER_ERROR, "error", "failed to add ban: " .. err)
 	end
-
-	-- Create a more informative response message
-	local scope_text = ban.ban_scope == "global" and "globally" or ("for service " .. ban.service)
-	local duration_text = not ban["exp"] and "permanently" or ("for " .. ban["exp"] .. " seconds")
-	return self:response(HTTP_OK, "success", "ip " .. ip["ip"] .. " banned " .. scope_text .. " " .. duration_text)
+	return self:response(HTTP_OK, "success", describe_ban(ban))
 end
 
 api.global.GET["^/bans$"] = function(self)
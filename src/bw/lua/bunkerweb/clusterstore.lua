@@ -216,28 +216,28 @@ function clusterstore:multi(calls)
 	if not self.redis_client then
 		return false, "client is not instantiated"
 	end
-	-- Start transaction
-	local ok, err = self.redis_client:multi()
-	if not ok then
-		return false, "multi() failed : " .. err
-	end
-	-- Loop on calls
+	-- Queue the whole transaction in a pipeline so that it's sent in a single round trip
+	self.redis_client:init_pipeline(#calls + 2)
+	self.redis_client:multi()
 	for _, call in ipairs(calls) do
-		local method = call[1]
-		local args = unpack(call[2])
-		ok, err = self.redis_client[method](self.redis_client, args)
-		if not ok then
-			return false, method .. "() failed : " .. err
-		end
+		self.redis_client[call[1]](self.redis_client, unpack(call[2]))
 	end
-	-- Exec transaction
-	local exec, err = self.redis_client:exec()
-	if not exec then
-		return false, "exec() failed : " .. err
+	self.redis_client:exec()
+	local results, err = self.redis_client:commit_pipeline()
+	if not results then
+		if is_connection_error(err) then
+			self.healthy = false
+		end
+		return false, "commit_pipeline() failed : " .. err
 	end
+	-- Error replies are { false, err } tables, EXEC replies with one when a call couldn't be queued
+	local exec = results[#results]
 	if type(exec) ~= "table" then
 		return false, "exec() result is not a table"
 	end
+	if exec[1] == false then
+		return false, "exec() failed : " .. tostring(exec[2])
+	end
 	return true, "success", exec
 end
 
@@ -55,6 +55,126 @@ local other_datastore = other_dict and cdatastore:new(other_dict) or nil
 -- Short TTL for locally cached bans so unbans propagate from Redis within this window
 local BAN_LOCAL_CACHE_TTL = 30
 
+-- Redis ban index (sorted sets by expiration and date, per-service and per-reason sets and a count hash)
+-- maintained alongside every ban so listings can be paginated without scanning the whole keyspace.
+-- Keep in sync with BAN_INDEX_SCRIPT of src/common/utils/ban_index.py
+local BAN_INDEX_SCRIPT = [[
+	local op = ARGV[1]
+	local now = tonumber(ARGV[2])
+	local function count(field, increment)
+		if redis.call("HINCRBY", "bans_index_counts", field, increment) <= 0 then
+			redis.call("HDEL", "bans_index_counts", field)
+		end
+	end
+	local function unindex(key)
+		redis.call("ZREM", "bans_index", key)
+		redis.call("ZREM", "bans_index_date", key)
+		local raw = redis.call("HGET", "bans_index_meta", key)
+		if not raw then
+			return 0
+		end
+		redis.call("HDEL", "bans_index_meta", key)
+		local ok, meta = pcall(cjson.decode, raw)
+		if ok and type(meta) == "table" then
+			redis.call("SREM", "bans_index_service_" .. meta.service, key)
+			redis.call("SREM", "bans_index_reason_" .. meta.reason, key)
+			count("total", -1)
+			count("scope_" .. meta.scope, -1)
+			count("service_" .. meta.service, -1)
+			count("reason_" .. meta.reason, -1)
+			count("country_" .. meta.country, -1)
+		end
+		return 1
+	end
+	local function index(key)
+		unindex(key)
+		local raw = redis.call("GET", key)
+		if not raw then
+			return 0
+		end
+		local ttl = redis.call("TTL", key)
+		local ok, data = pcall(cjson.decode, raw)
+		if not ok or type(data) ~= "table" then
+			data = { reason = raw }
+		end
+		local scope, service = "global", "_"
+		local key_service = string.match(key, "^bans_service_(.+)_ip_")
+		if key_service then
+			scope, service = "service", key_service
+		end
+		local reason = type(data.reason) == "string" and data.reason or "unknown"
+		local country = type(data.country) == "string" and data.country or "unknown"
+		local expire = "+inf"
+		if ttl > 0 and data.permanent ~= true then
+			expire = now + ttl
+		end
+		redis.call("ZADD", "bans_index", expire, key)
+		redis.call("ZADD", "bans_index_date", tonumber(data.date) or now, key)
+		redis.call(
+			"HSET",
+			"bans_index_meta",
+			key,
+			cjson.encode({ scope = scope, service = service, reason = reason, country = country })
+		)
+		redis.call("SADD", "bans_index_service_" .. service, key)
+		redis.call("SADD", "bans_index_reason_" .. reason, key)
+		count("total", 1)
+		count("scope_" .. scope, 1)
+		count("service_" .. service, 1)
+		count("reason_" .. reason, 1)
+		count("country_" .. country, 1)
+		return 1
+	end
+	local function prune(limit)
+		local removed = 0
+		for _, key in ipairs(redis.call("ZRANGEBYSCORE", "bans_index", "-inf", now, "LIMIT", 0, limit)) do
+			local ttl = redis.call("TTL", key)
+			if ttl == -2 then
+				removed = removed + unindex(key)
+			elseif ttl == -1 then
+				redis.call("ZADD", "bans_index", "+inf", key)
+			else
+				redis.call("ZADD", "bans_index", now + ttl, key)
+			end
+		end
+		return removed
+	end
+	if op == "ban" then
+		local ttl = tonumber(ARGV[4]) or 0
+		if ttl > 0 then
+			redis.call("SET", KEYS[1], ARGV[3], "EX", ttl)
+		else
+			redis.call("SET", KEYS[1], ARGV[3])
+		end
+		local ok, err = pcall(index, KEYS[1])
+		if ok then
+			ok, err = pcall(prune, tonumber(ARGV[5]) or 100)
+		end
+		if not ok then
+			redis.log(redis.LOG_WARNING, "Ban index update error : " .. tostring(err))
+		end
+		return 1
+	elseif op == "unban" then
+		local removed = 0
+		for _, key in ipairs(KEYS) do
+			redis.call("DEL", key)
+			removed = removed + unindex(key)
+		end
+		return removed
+	elseif op == "index" then
+		local indexed = 0
+		for _, key in ipairs(KEYS) do
+			indexed = indexed + index(key)
+		end
+		return indexed
+	elseif op == "prune" then
+		return prune(tonumber(ARGV[3]) or 1000)
+	end
+	return redis.error_reply("unknown ban index operation " .. tostring(op))
+]]
+-- Maximum number of expired entries removed from the ban index on each new ban
+local BAN_INDEX_PRUNE_LIMIT = 100
+
 local utils = {}
 
 math.randomseed(os.time())
@@ -1009,19 +1129,14 @@ utils.is_banned = function(ip, server_name)
 	return banned, reason, ttl, reason_data
 end
 
-utils.add_ban = function(ip, reason, ttl, service, country, ban_scope, reason_data)
-	-- Validate IP address
-	if not ip or (not utils.is_ipv4(ip) and not utils.is_ipv6(ip)) then
-		return false, "invalid IP address"
-	end
-
+-- Return the key, the encoded data and the TTL (nil for permanent bans) of a ban
+local function new_ban(ip, reason, ttl, service, country, ban_scope, reason_data)
 	-- Determine ban key based on scope
 	local ban_key = "bans_ip_" .. ip
 	if ban_scope == "service" and service then
 		ban_key = "bans_service_" .. service .. "_ip_" .. ip
 	end
 
-	-- Set on local datastore
 	local ban_data = encode({
 		reason = reason,
 		service = service or "unknown",
@@ -1033,8 +1148,10 @@ utils.add_ban = function(ip, reason, ttl, service, country, ban_scope, reason_da
 	})
 
 	-- Convert 0 TTL to nil for permanent bans in local datastore
-	local effective_ttl = (not ttl or ttl == 0) and nil or ttl
+	return ban_key, ban_data, (not ttl or ttl == 0) and nil or ttl
+end
 
+local function set_local_ban(ban_key, ban_data, effective_ttl)
 	local ok, err = datastore:set_with_retries(ban_key, ban_data, effective_ttl)
 	if not ok then
 		return false, "datastore:set_with_retries() error : " .. err
@@ -1049,6 +1166,21 @@ utils.add_ban = function(ip, reason, ttl, service, country, ban_scope, reason_da
 			logger:log(WARN, "other datastore set_with_retries() error: " .. err2)
 		end
 	end
+	return true, "success"
+end
+
+utils.add_ban = function(ip, reason, ttl, service, country, ban_scope, reason_data)
+	-- Validate IP address
+	if not ip or (not utils.is_ipv4(ip) and not utils.is_ipv6(ip)) then
+		return false, "invalid IP address"
+	end
+
+	-- Set on local datastore
+	local ban_key, ban_data, effective_ttl = new_ban(ip, reason, ttl, service, country, ban_scope, reason_data)
+	local ok, err = set_local_ban(ban_key, ban_data, effective_ttl)
+	if not ok then
+		return false, err
+	end
 
 	-- Set on redis
 	local use_redis, err = utils.get_variable("USE_REDIS", false)
@@ -1065,12 +1197,18 @@ utils.add_ban = function(ip, reason, ttl, service, country, ban_scope, reason_da
 		return false, "can't connect to redis server : " .. err
 	end
 
-	-- For Redis, set without expiration if permanent, otherwise with EX and ttl
-	if not ttl or ttl == 0 then
-		ok, err = clusterstore:call("set", ban_key, ban_data)
-	else
-		ok, err = clusterstore:call("set", ban_key, ban_data, "EX", ttl)
-	end
+	-- For Redis, set without expiration if permanent, otherwise with EX and ttl, and update the ban index
+	ok, err = clusterstore:call(
+		"eval",
+		BAN_INDEX_SCRIPT,
+		1,
+		ban_key,
+		"ban",
+		ngx.time(),
+		ban_data,
+		effective_ttl or 0,
+		BAN_INDEX_PRUNE_LIMIT
+	)
 
 	if not ok then
 		clusterstore:close()
@@ -1080,16 +1218,87 @@ utils.add_ban = function(ip, reason, ttl, service, country, ban_scope, reason_da
 	return true, "success"
 end
 
-utils.remove_ban = function(ip, service, ban_scope)
-	-- Validate IP address
-	if not ip or (not utils.is_ipv4(ip) and not utils.is_ipv6(ip)) then
-		return false, "invalid IP address"
+-- Run the ban index script once per call in a single pipelined Redis transaction, the script is loaded
+-- first so that the calls only carry its SHA1. Return ok, err and the reply of each call.
+local function ban_index_transaction(calls)
+	local clusterstore = require "bunkerweb.clusterstore":new()
+	local ok, err = clusterstore:connect()
+	if not ok then
+		return false, "can't connect to redis server : " .. err
 	end
+	local sha
+	sha, err = clusterstore:call("script", "load", BAN_INDEX_SCRIPT)
+	if not sha then
+		clusterstore:close()
+		return false, "redis SCRIPT LOAD failed : " .. tostring(err)
+	end
+	for i, call in ipairs(calls) do
+		calls[i] = { "evalsha", { sha, unpack(call) } }
+	end
+	local replies
+	ok, err, replies = clusterstore:multi(calls)
+	clusterstore:close()
+	if not ok then
+		return false, "redis transaction failed : " .. err
+	end
+	return true, "success", replies
+end
 
-	-- Set default scope to global
-	if not ban_scope then
-		ban_scope = "global"
+-- Add a list of bans ({ ip, reason, ttl, service, country, ban_scope, reason_data } tables) and return
+-- a { ok, msg } result per ban, the Redis writes of the whole list are done in one pipelined transaction.
+utils.add_bans = function(bans)
+	local results = {}
+	local calls = {}
+	local indexes = {}
+	local now = ngx.time()
+	for i, ban in ipairs(bans) do
+		if not ban.ip or (not utils.is_ipv4(ban.ip) and not utils.is_ipv6(ban.ip)) then
+			results[i] = { false, "invalid IP address" }
+		else
+			local ban_key, ban_data, effective_ttl =
+				new_ban(ban.ip, ban.reason, ban.ttl, ban.service, ban.country, ban.ban_scope, ban.reason_data)
+			results[i] = { set_local_ban(ban_key, ban_data, effective_ttl) }
+			if results[i][1] then
+				-- The expired entries of the ban index only need to be pruned once per list
+				calls[#calls + 1] = { 1, ban_key, "ban", now, ban_data, effective_ttl or 0, 0 }
+				indexes[#calls] = i
+			end
+		end
+	end
+	if #calls == 0 then
+		return results
 	end
+	calls[#calls][7] = BAN_INDEX_PRUNE_LIMIT
+
+	local use_redis, err = utils.get_variable("USE_REDIS", false)
+	if not use_redis then
+		err = "can't get USE_REDIS variable : " .. err
+	elseif use_redis ~= "yes" then
+		return results
+	end
+
+	local ok, replies
+	if use_redis then
+		ok, err, replies = ban_index_transaction(calls)
+	end
+	for j, i in ipairs(indexes) do
+		if not use_redis then
+			results[i] = { nil, err }
+		elseif not ok then
+			results[i] = { false, err }
+		elseif type(replies[j]) == "table" and replies[j][1] == false then
+			results[i] = { false, "redis SET failed : " .. tostring(replies[j][2]) }
+		end
+	end
+	return results
+end
+
+-- Remove a list of bans ({ ip, service, ban_scope } tables, a global unban also removes the service bans
+-- of the IP) and return a { ok, msg } result per unban. The bans are removed from the local datastores
+-- first and then from Redis in one pipelined transaction (best-effort).
+utils.remove_bans = function(unbans)
+	local results = {}
+	local keys_to_delete = {}
 
 	-- Helper: delete a ban key from all local datastores
 	local function delete_local(key)
@@ -1097,58 +1306,93 @@ utils.remove_ban = function(ip, service, ban_scope)
 		if other_datastore then
 			other_datastore:delete(key)
 		end
+		keys_to_delete[#keys_to_delete + 1] = key
+	end
+
+	-- Service bans by IP, only listed once per call
+	local service_bans
+	local function get_service_bans(ip)
+		if not service_bans then
+			service_bans = {}
+			for _, store in ipairs({ datastore, other_datastore }) do
+				for _, k in ipairs(store:keys()) do
+					local service_ip = k:match("^bans_service_.*_ip_(.+)$")
+					if service_ip then
+						service_bans[service_ip] = service_bans[service_ip] or {}
+						table.insert(service_bans[service_ip], k)
+					end
+				end
+			end
+		end
+		return service_bans[ip] or {}
 	end
 
-	-- Collect keys to delete and remove from local datastores FIRST.
+	-- Remove from local datastores FIRST.
 	-- This ensures unbans take effect locally even if Redis is unreachable.
-	local keys_to_delete = {}
-	if ban_scope == "service" and service then
-		local ban_key = "bans_service_" .. service .. "_ip_" .. ip
-		keys_to_delete[#keys_to_delete + 1] = ban_key
-		delete_local(ban_key)
-	else
-		-- Delete global ban
-		local global_key = "bans_ip_" .. ip
-		keys_to_delete[#keys_to_delete + 1] = global_key
-		delete_local(global_key)
-
-		-- Delete all service-specific bans for this IP
-		local suffix = "_ip_" .. ip
-		for _, k in ipairs(datastore:keys()) do
-			if k:sub(1, 13) == "bans_service_" and k:sub(-#suffix) == suffix then
-				keys_to_delete[#keys_to_delete + 1] = k
-				delete_local(k)
-			end
-		end
-		if other_datastore then
-			for _, k in ipairs(other_datastore:keys()) do
-				if k:sub(1, 13) == "bans_service_" and k:sub(-#suffix) == suffix then
-					keys_to_delete[#keys_to_delete + 1] = k
+	for i, unban in ipairs(unbans) do
+		local ip = unban.ip
+		if not ip or (not utils.is_ipv4(ip) and not utils.is_ipv6(ip)) then
+			results[i] = { false, "invalid IP address" }
+		else
+			if unban.ban_scope == "service" and unban.service then
+				delete_local("bans_service_" .. unban.service .. "_ip_" .. ip)
+			else
+				-- Delete global ban and all service-specific bans for this IP
+				delete_local("bans_ip_" .. ip)
+				for _, k in ipairs(get_service_bans(ip)) do
 					delete_local(k)
 				end
 			end
+			results[i] = { true, "success" }
 		end
 	end
+	if #keys_to_delete == 0 then
+		return results
+	end
 
 	-- Now delete from Redis (best-effort — local unbans already applied above)
 	local use_redis, err = utils.get_variable("USE_REDIS", false)
 	if not use_redis then
-		return nil, "can't get USE_REDIS variable : " .. err
+		for i, result in ipairs(results) do
+			if result[1] then
+				results[i] = { nil, "can't get USE_REDIS variable : " .. err }
+			end
+		end
+		return results
 	end
 	if use_redis == "yes" then
-		local clusterstore = require "bunkerweb.clusterstore":new()
-		local ok, connect_err = clusterstore:connect()
-		if not ok then
-			logger:log(ERR, "can't connect to redis for unban: " .. connect_err)
-		else
-			for _, key in ipairs(keys_to_delete) do
-				clusterstore:call("del", key)
+		-- Delete the keys and their ban index entries, by chunks to keep the script arguments bounded
+		local calls = {}
+		local now = ngx.time()
+		for start = 1, #keys_to_delete, 1000 do
+			local keys = { unpack(keys_to_delete, start, math_min(start + 999, #keys_to_delete)) }
+			local call = { #keys }
+			for _, key in ipairs(keys) do
+				call[#call + 1] = key
+			end
+			call[#call + 1] = "unban"
+			call[#call + 1] = now
+			calls[#calls + 1] = call
+		end
+		local ok, del_err, replies = ban_index_transaction(calls)
+		if ok then
+			for _, reply in ipairs(replies) do
+				if type(reply) == "table" and reply[1] == false then
+					ok, del_err = false, tostring(reply[2])
+				end
 			end
-			clusterstore:close()
+		end
+		if not ok then
+			logger:log(ERR, "can't delete bans from redis: " .. del_err)
 		end
 	end
 
-	return true, "success"
+	return results
+end
+
+utils.remove_ban = function(ip, service, ban_scope)
+	local result = utils.remove_bans({ { ip = ip, service = service, ban_scope = ban_scope or "global" } })[1]
+	return result[1], result[2]
 end
 
 utils.new_cachestore = function(ctx, pool)
@@ -1,16 +1,19 @@
 #!/usr/bin/env python3
 
 from contextlib import suppress
-from copy import deepcopy
-from typing import Literal, Optional, Union
+from http.cookiejar import CookiePolicy
+from threading import BoundedSemaphore, Lock
+from time import perf_counter
+from typing import Any, Dict, Literal, Optional, Union
 from os import getenv
 from urllib.parse import urlsplit
-from requests import request
+from requests import Session
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ConnectionError
 from urllib3 import disable_warnings  # new
 from urllib3.exceptions import InsecureRequestWarning  # new
 
-from common_utils import parse_host  # type: ignore
+from common_utils import getenv_positive_int, parse_host  # type: ignore
 from logger import getLogger  # type: ignore
 
 # Suppress urllib3 InsecureRequestWarning when verify=False (default: enabled)
@@ -19,6 +22,63 @@ if getenv("API_SUPPRESS_INSECURE_WARNING", "1").lower() in ("1", "true", "yes",
         disable_warnings(InsecureRequestWarning)
 
 
+# Keep-alive connections kept per instance and requests allowed in flight per instance at the same time
+API_POOL_MAXSIZE = getenv_positive_int("API_POOL_MAXSIZE", 8)
+API_MAX_CONCURRENCY_PER_INSTANCE = getenv_positive_int("API_MAX_CONCURRENCY_PER_INSTANCE", 4)
+
+
+class _NoCookiesPolicy(CookiePolicy):
+    """Cookie policy rejecting every cookie, the instances API is stateless."""
+
+    netscape = True
+    rfc2965 = hide_cookie2 = False
+
+    def set_ok(self, cookie, request) -> bool:
+        return False
+
+    def return_ok(self, cookie, request) -> bool:
+        return False
+
+
+class _EndpointPool:
+    """Keep-alive HTTP session shared by every API client of a BunkerWeb instance, with its metrics."""
+
+    def __init__(self):
+        self.session = Session()
+        self.session.cookies.set_policy(_NoCookiesPolicy())
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=API_POOL_MAXSIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.adapter = adapter
+        self.semaphore = BoundedSemaphore(API_MAX_CONCURRENCY_PER_INSTANCE)
+        self.lock = Lock()
+        self.requests = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency: float, failed: bool) -> None:
+        with self.lock:
+            self.requests += 1
+            self.failures += int(failed)
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def metrics(self) -> Dict[str, Any]:
+        # urllib3 counts the connections each pool had to open, every other request reused one
+        pools = self.adapter.poolmanager.pools
+        new_connections = sum(getattr(pools.get(key), "num_connections", 0) for key in pools.keys())
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "failures": self.failures,
+                "avg_latency_ms": round(self.total_latency / self.requests * 1000, 3) if self.requests else 0.0,
+                "max_latency_ms": round(self.max_latency * 1000, 3),
+                "new_connections": new_connections,
+                "reused_connections": max(0, self.requests - new_connections),
+            }
+
+
 class API:
     """
     Thin HTTP client for BunkerWeb API with centralized endpoint building.
@@ -27,8 +87,12 @@ class API:
     - API.from_instance(dict) to build scheme/port/host from DB instance data
     - API.from_url_or_parts(hostname_or_url, ...) for ad-hoc construction
     - SSL verification and CA bundle controlled via env or constructor
+    - Keep-alive sessions shared per endpoint by the whole process, see API.metrics()
     """
 
+    __pools: Dict[str, _EndpointPool] = {}
+    __pools_lock = Lock()
+
     def __init__(self, endpoint: str, host: Optional[str] = None, token: Optional[str] = None):
         try:
             scheme, hostname, port = parse_host(endpoint)
@@ -52,16 +116,20 @@ class API:
     def host(self) -> str:
         return self.__host
 
+    @property
+    def token(self) -> Optional[str]:
+        return self.__token
+
     def request(
         self,
         method: Union[Literal["POST"], Literal["GET"]],
         url: str,
-        data: Optional[Union[dict, bytes]] = None,
+        data: Optional[Union[dict, list, bytes]] = None,
         files=None,
         timeout=(5, 10),
     ) -> tuple[bool, str, Optional[int], Optional[dict]]:
         kwargs = {}
-        if isinstance(data, dict):
+        if isinstance(data, (dict, list)):
             kwargs["json"] = data
         elif isinstance(data, bytes):
             kwargs["data"] = data
@@ -77,25 +145,28 @@ class API:
             headers["Authorization"] = f"Bearer {self.__token}"
 
         try:
-            resp = request(
+            resp = self.__send(
+                self.__endpoint,
                 method,
                 f"{self.__endpoint}{url if not url.startswith('/') else url[1:]}",
                 timeout=timeout,
-                headers=deepcopy(headers),
+                headers=headers,
                 verify=False,  # TODO: see what to do about SSL verification
-                **deepcopy(kwargs),
+                **kwargs,
             )
         except ConnectionError as e:
             scheme = urlsplit(self.__endpoint).scheme
             if scheme == "https":
                 self.__logger.warning(f"SSL connection error when contacting {self.__endpoint}{url}, trying HTTP: {e}")
-                resp = request(
+                http_endpoint = f"http://{self.__endpoint.removeprefix('https://')}"
+                resp = self.__send(
+                    http_endpoint,
                     method,
-                    f"http://{self.__endpoint.lstrip('https://')}{url if not url.startswith('/') else url[1:]}",
+                    f"{http_endpoint}{url if not url.startswith('/') else url[1:]}",
                     timeout=timeout,
-                    headers=deepcopy(headers),
+                    headers=headers,
                     verify=False,
-                    **deepcopy(kwargs),
+                    **kwargs,
                 )
                 self.__logger.debug(f"Response after retrying with HTTP: status={resp.status_code}, reason={resp.reason}, text={resp.text}")
             else:
@@ -105,6 +176,44 @@ class API:
 
         return True, "ok", resp.status_code, resp.json()
 
+    @classmethod
+    def __pool(cls, endpoint: str) -> _EndpointPool:
+        with cls.__pools_lock:
+            pool = cls.__pools.get(endpoint)
+            if pool is None:
+                pool = cls.__pools[endpoint] = _EndpointPool()
+            return pool
+
+    @classmethod
+    def __send(cls, endpoint: str, method: str, url: str, **kwargs):
+        pool = cls.__pool(endpoint)
+        start = perf_counter()
+        failed = True
+        try:
+            with pool.semaphore:
+                resp = pool.session.request(method, url, **kwargs)
+            failed = resp.status_code >= 500
+            return resp
+        finally:
+            pool.record(perf_counter() - start, failed)
+
+    @classmethod
+    def metrics(cls) -> Dict[str, Dict[str, Any]]:
+        """Per-endpoint request count, failures, latency and connection reuse since the process started."""
+        with cls.__pools_lock:
+            pools = dict(cls.__pools)
+        return {endpoint: pool.metrics() for endpoint, pool in pools.items()}
+
+    @classmethod
+    def close_sessions(cls) -> None:
+        """Close every pooled connection, they will be opened again when needed."""
+        with cls.__pools_lock:
+            pools = list(cls.__pools.values())
+            cls.__pools.clear()
+        for pool in pools:
+            with suppress(Exception):
+                pool.session.close()
+
     # ------------------ Builders ------------------
     @staticmethod
     def __default_http_port() -> int:
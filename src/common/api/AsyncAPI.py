@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+from asyncio import AbstractEventLoop, Semaphore, StreamReader, StreamWriter, get_running_loop, open_connection, wait_for
+from collections import deque
+from contextlib import suppress
+from json import dumps, loads
+from ssl import CERT_NONE, SSLContext, SSLError, create_default_context
+from typing import Deque, Dict, Literal, Optional, Tuple, Union
+from urllib.parse import urlsplit
+from weakref import WeakKeyDictionary
+
+from API import API, API_MAX_CONCURRENCY_PER_INSTANCE, API_POOL_MAXSIZE  # type: ignore
+from logger import getLogger  # type: ignore
+
+# Certificates aren't verified, like API.request does, the instances' API usually serves a self-signed one
+SSL_CONTEXT: SSLContext = create_default_context()
+SSL_CONTEXT.check_hostname = False
+SSL_CONTEXT.verify_mode = CERT_NONE
+
+Connection = Tuple[StreamReader, StreamWriter]
+
+
+class _AsyncEndpointPool:
+    """Idle keep-alive connections to a BunkerWeb instance, shared by the coroutines of an event loop."""
+
+    def __init__(self):
+        self.idle: Deque[Connection] = deque()
+        self.semaphore = Semaphore(API_MAX_CONCURRENCY_PER_INSTANCE)
+
+    def acquire(self) -> Optional[Connection]:
+        while self.idle:
+            reader, writer = self.idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return None
+
+    def release(self, connection: Connection) -> None:
+        if len(self.idle) < API_POOL_MAXSIZE:
+            self.idle.append(connection)
+        else:
+            connection[1].close()
+
+    def close(self) -> None:
+        while self.idle:
+            self.idle.pop()[1].close()
+
+
+class AsyncAPI:
+    """
+    asyncio counterpart of API for the coroutines of the FastAPI control plane.
+
+    Speaks HTTP/1.1 over asyncio streams and keeps the connections alive per endpoint and per
+    event loop, so a fan-out never blocks a worker thread. Requests and results are the same as API.request.
+    """
+
+    __pools: "WeakKeyDictionary[AbstractEventLoop, Dict[str, _AsyncEndpointPool]]" = WeakKeyDictionary()
+
+    def __init__(self, endpoint: str, host: str, token: Optional[str] = None):
+        self.__endpoint = endpoint
+        self.__host = host
+        self.__token = token
+        self.__logger = getLogger("API")
+
+    @classmethod
+    def from_api(cls, api: API) -> "AsyncAPI":
+        return cls(api.endpoint, api.host, api.token)
+
+    @property
+    def endpoint(self) -> str:
+        return self.__endpoint
+
+    @property
+    def host(self) -> str:
+        return self.__host
+
+    async def request(
+        self,
+        method: Union[Literal["POST"], Literal["GET"]],
+        url: str,
+        data: Optional[Union[dict, list, bytes]] = None,
+        timeout=(5, 10),
+    ) -> tuple[bool, str, Optional[int], Optional[dict]]:
+        headers = {"Host": self.__host, "User-Agent": "bwapi"}
+        if self.__token:
+            headers["Authorization"] = f"Bearer {self.__token}"
+
+        if isinstance(data, (dict, list)):
+            body = dumps(data).encode()
+            headers["Content-Type"] = "application/json"
+        elif isinstance(data, bytes):
+            body = data
+        elif data is None:
+            body = b""
+        else:
+            return False, f"Unsupported data type: {type(data)}", None, None
+
+        path = f"/{url.lstrip('/')}"
+        try:
+            try:
+                status, raw = await self.__send(self.__endpoint, method, path, headers, body, timeout)
+            except (OSError, SSLError) as e:
+                if urlsplit(self.__endpoint).scheme != "https":
+                    return False, f"Connection error: {e}", None, None
+                self.__logger.warning(f"SSL connection error when contacting {self.__endpoint}{url}, trying HTTP: {e}")
+                status, raw = await self.__send(f"http://{self.__endpoint.removeprefix('https://')}", method, path, headers, body, timeout)
+        except Exception as e:
+            return False, f"Request failed: {e}", None, None
+
+        try:
+            return True, "ok", status, loads(raw)
+        except ValueError as e:
+            return False, f"Request failed: invalid JSON response ({e})", status, None
+
+    @classmethod
+    def __pool(cls, endpoint: str) -> _AsyncEndpointPool:
+        pools = cls.__pools.setdefault(get_running_loop(), {})
+        pool = pools.get(endpoint)
+        if pool is None:
+            pool = pools[endpoint] = _AsyncEndpointPool()
+        return pool
+
+    @classmethod
+    async def __send(cls, endpoint: str, method: str, path: str, headers: Dict[str, str], body: bytes, timeout) -> Tuple[int, bytes]:
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        parts = urlsplit(endpoint)
+        request = (
+            f"{method} {path} HTTP/1.1\r\n" + "".join(f"{name}: {value}\r\n" for name, value in headers.items()) + f"Content-Length: {len(body)}\r\n\r\n"
+        ).encode() + body
+
+        pool = cls.__pool(endpoint)
+        async with pool.semaphore:
+            connection = pool.acquire()
+            if connection is not None:
+                try:
+                    return await wait_for(cls.__exchange(pool, connection, request), read_timeout)
+                except ConnectionError:
+                    # The instance closed the idle connection before answering, send the request again on a new one
+                    connection[1].close()
+                except BaseException:
+                    connection[1].close()
+                    raise
+
+            https = parts.scheme == "https"
+            port = parts.port or (443 if https else 80)
+            connection = await wait_for(open_connection(parts.hostname, port, ssl=SSL_CONTEXT if https else None), connect_timeout)
+            try:
+                return await wait_for(cls.__exchange(pool, connection, request), read_timeout)
+            except BaseException:
+                connection[1].close()
+                raise
+
+    @staticmethod
+    async def __exchange(pool: _AsyncEndpointPool, connection: Connection, request: bytes) -> Tuple[int, bytes]:
+        reader, writer = connection
+        writer.write(request)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by the instance")
+        try:
+            version, status = status_line.decode("latin-1").split(" ", 2)[:2]
+            status = int(status)
+        except ValueError as e:
+            raise ValueError(f"invalid HTTP status line {status_line!r}") from e
+
+        response_headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == "HTTP/1.1" and response_headers.get("connection", "").lower() != "close"
+        if "chunked" in response_headers.get("transfer-encoding", "").lower():
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";", 1)[0].strip() or b"0", 16)
+                if size == 0:
+                    # Skip the trailers
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            raw = b"".join(chunks)
+        elif "content-length" in response_headers:
+            raw = await reader.readexactly(int(response_headers["content-length"]))
+        else:
+            raw = await reader.read()
+            keep_alive = False
+
+        if keep_alive:
+            pool.release(connection)
+        else:
+            writer.close()
+        return status, raw
+
+    @classmethod
+    def close_connections(cls) -> None:
+        """Close the idle connections of the running event loop, they will be opened again when needed."""
+        with suppress(RuntimeError):
+            for pool in cls.__pools.pop(get_running_loop(), {}).values():
+                pool.close()
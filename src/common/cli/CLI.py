@@ -2,15 +2,15 @@
 
 from contextlib import suppress
 from datetime import datetime
-from json import JSONDecodeError, loads
+from ipaddress import ip_address
 from operator import itemgetter
 from os import environ, get_terminal_size, getenv, sep
 from os.path import join
 from pathlib import Path
 from subprocess import DEVNULL, STDOUT, run
-from sys import argv as sys_argv, path as sys_path
+from sys import argv as sys_argv, path as sys_path, stdin
 from traceback import format_exc
-from typing import Any, Optional, Tuple
+from typing import Any, List, Optional, Tuple
 
 for deps_path in [join(sep, "usr", "share", "bunkerweb", *paths) for paths in (("deps", "python"), ("utils",), ("api",), ("db",))]:
     if deps_path not in sys_path:
@@ -20,7 +20,11 @@ from API import API  # type: ignore
 from ApiCaller import ApiCaller  # type: ignore
 from logger import getLogger  # type: ignore
 
-from common_utils import get_redis_client, handle_docker_secrets  # type: ignore
+from ban_index import ensure_ban_index, iter_bans  # type: ignore
+from common_utils import batch_results, get_redis_client, handle_docker_secrets  # type: ignore
+
+# Failed IPs detailed in the output of a bulk ban or unban, the others are only counted
+MAX_FAILED_DETAILS = 20
 
 
 def format_remaining_time(seconds):
@@ -51,6 +55,25 @@ def format_remaining_time(seconds):
     return " ".join(time_parts)
 
 
+def read_ips(file: str) -> Tuple[List[str], List[str]]:
+    """Read the IP addresses of a file ("-" for stdin), one per line (the first field of CSV lines is used), empty lines and comments are ignored.
+
+    Return the valid IP addresses without duplicates and the invalid lines.
+    """
+    ips, invalid = {}, []
+    with stdin if file == "-" else open(file, "r", encoding="utf-8") as f:
+        for line in f:
+            value = line.split("#", 1)[0].replace(",", " ").strip()
+            if not value:
+                continue
+            value = value.split()[0]
+            try:
+                ips[str(ip_address(value))] = None
+            except ValueError:
+                invalid.append(value)
+    return list(ips), invalid
+
+
 class CLI(ApiCaller):
     # ANSI color and style constants
     RESET = "\033[0m"
@@ -214,8 +237,8 @@ class CLI(ApiCaller):
             return False, self.__format_error(f"Failed to unban {ip}: {e}")
         return False, self.__format_error(f"Failed to unban {ip}")
 
-    def ban(self, ip: str, exp: float, reason: str, service: str = "bwcli") -> Tuple[bool, str]:
-        """Ban an IP address globally or from a specific service"""
+    def __get_ban_scope(self, service: str, target: str) -> Tuple[str, str]:
+        """Return the ban scope and the service of a ban, the scope is global unless a valid service is specified"""
         # Auto-set scope to service if a non-default service is specified
         ban_scope = "global"
         if service != "bwcli" and service:
@@ -234,13 +257,18 @@ class CLI(ApiCaller):
                 if isinstance(services, str):
                     services = services.split()
                 if not service or service == "bwcli" or service not in services:
-                    self.__logger.warning(f"Invalid service '{service}' for IP {ip}, defaulting to global ban")
+                    self.__logger.warning(f"Invalid service '{service}' for {target}, defaulting to global ban")
                     ban_scope = "global"
                     service = "bwcli"
             except Exception as e:
                 self.__logger.warning(f"Error validating service: {e}, defaulting to global ban")
                 ban_scope = "global"
                 service = "bwcli"
+        return ban_scope, service
+
+    def ban(self, ip: str, exp: float, reason: str, service: str = "bwcli") -> Tuple[bool, str]:
+        """Ban an IP address globally or from a specific service"""
+        ban_scope, service = self.__get_ban_scope(service, f"IP {ip}")
 
         try:
             data = {"ip": ip, "exp": exp, "reason": reason, "service": service or "bwcli", "ban_scope": ban_scope}
@@ -260,6 +288,66 @@ class CLI(ApiCaller):
             return False, self.__format_error(f"Failed to ban {ip}: {e}")
         return False, self.__format_error(f"Failed to ban {ip}")
 
+    def __send_batch(self, url: str, items: List[dict], action: str, success_msg: str, invalid: List[str]) -> Tuple[bool, str]:
+        """Send a bulk ban or unban to every instance in one request (per API_BATCH_SIZE IPs) and format its per-IP results"""
+        skipped = ""
+        if invalid:
+            skipped = (
+                f"\n{self.ICON_WARNING} Skipped {len(invalid)} invalid IP address{'es' if len(invalid) > 1 else ''}: {', '.join(invalid[:MAX_FAILED_DETAILS])}"
+            )
+            if len(invalid) > MAX_FAILED_DETAILS:
+                skipped += ", ..."
+        if not items:
+            return False, self.__format_error(f"No valid IP address to {action}{skipped}")
+
+        try:
+            _, responses = self.send_batch_to_apis(url, items, response=True)
+        except BaseException as e:
+            return False, self.__format_error(f"Failed to {action} {len(items)} IPs: {e}{skipped}")
+
+        failed = [result for result in batch_results(items, responses) if result["status"] != "success"]
+        if not failed:
+            return True, self.__format_success(f"{success_msg}{skipped}")
+
+        lines = [f"Failed to {action} {len(failed)}/{len(items)} IPs on some instances"]
+        for result in failed[:MAX_FAILED_DETAILS]:
+            lines.append(f"{self.BOLD}{result['ip']}{self.RESET}: " + "; ".join(f"{host}: {msg}" for host, msg in result["failed"].items()))
+        if len(failed) > MAX_FAILED_DETAILS:
+            lines.append(f"... and {len(failed) - MAX_FAILED_DETAILS} more")
+        return False, self.__format_error("\n".join(lines) + skipped)
+
+    def unban_file(self, file: str, service: Optional[str] = None) -> Tuple[bool, str]:
+        """Unban the IP addresses listed in a file globally or from a specific service"""
+        try:
+            ips, invalid = read_ips(file)
+        except OSError as e:
+            return False, self.__format_error(f"Failed to read {file}: {e}")
+
+        ban_scope = "service" if service else "global"
+        items = [{"ip": ip, "ban_scope": ban_scope} | ({"service": service} if service else {}) for ip in ips]
+        scope_text = f"from service {self.CYAN}{service}{self.RESET}" if service else f"{self.GREEN}globally{self.RESET}"
+        return self.__send_batch(
+            "/unban", items, "unban", f"{self.ICON_UNLOCK} {self.BOLD}{len(items)}{self.RESET} IPs have been unbanned {scope_text}", invalid
+        )
+
+    def ban_file(self, file: str, exp: float, reason: str, service: str = "bwcli") -> Tuple[bool, str]:
+        """Ban the IP addresses listed in a file globally or from a specific service"""
+        try:
+            ips, invalid = read_ips(file)
+        except OSError as e:
+            return False, self.__format_error(f"Failed to read {file}: {e}")
+
+        ban_scope, service = self.__get_ban_scope(service, f"the IPs of {file}")
+        items = [{"ip": ip, "exp": exp, "reason": reason, "service": service or "bwcli", "ban_scope": ban_scope} for ip in ips]
+        scope_text = f"{self.GREEN}globally{self.RESET}" if ban_scope == "global" else f"for service {self.CYAN}{service}{self.RESET}"
+        duration = f"{self.RED}permanently{self.RESET}" if not exp else f"{self.YELLOW}{format_remaining_time(exp)}{self.RESET}"
+        success_msg = (
+            f"{self.ICON_LOCK} {self.BOLD}{len(items)}{self.RESET} IPs have been banned {scope_text}\n"
+            f"{self.ICON_CLOCK} Duration: {duration}\n"
+            f"{self.ICON_INFO} Reason: {self.ITALIC}{reason}{self.RESET}"
+        )
+        return self.__send_batch("/ban", items, "ban", success_msg, invalid)
+
     def bans(self) -> Tuple[bool, str]:
         """Get all bans from the system"""
         servers = {}
@@ -277,50 +365,9 @@ class CLI(ApiCaller):
         if self.__redis:
             try:
                 servers["redis"] = []
-                # Get global bans
-                for key in self.__redis.scan_iter("bans_ip_*"):
-                    key_str = key.decode("utf-8") if isinstance(key, bytes) else key
-                    ip = key_str.replace("bans_ip_", "")
-                    data = self.__redis.get(key)
-                    if not data:
-                        continue
-                    exp = self.__redis.ttl(key)
-                    raw_value = data.decode("utf-8", "replace")
-                    try:
-                        ban_data = loads(raw_value)
-                    except (JSONDecodeError, ValueError) as e:
-                        self.__logger.warning(f"Failed to decode ban data for {ip}, using raw value as reason: {e}")
-                        ban_data = {"reason": raw_value, "service": "unknown", "date": 0, "country": "unknown", "ban_scope": "global", "permanent": False}
-                    ban_data["ip"] = ip
-                    # If permanent flag is set, override TTL to 0
-                    if ban_data.get("permanent", False):
-                        exp = 0
-                    ban_data["exp"] = exp
-                    ban_data["ban_scope"] = ban_data.get("ban_scope", "global")
-                    servers["redis"].append(ban_data)
-
-                # Get service-specific bans
-                for key in self.__redis.scan_iter("bans_service_*_ip_*"):
-                    key_str = key.decode("utf-8") if isinstance(key, bytes) else key
-                    service, ip = key_str.replace("bans_service_", "").rsplit("_ip_", 1)
-                    data = self.__redis.get(key)
-                    if not data:
-                        continue
-                    exp = self.__redis.ttl(key)
-                    raw_value = data.decode("utf-8", "replace")
-                    try:
-                        ban_data = loads(raw_value)
-                    except (JSONDecodeError, ValueError) as e:
-                        self.__logger.warning(f"Failed to decode ban data for {ip} on service {service}, using raw value as reason: {e}")
-                        ban_data = {"reason": raw_value, "service": service, "date": 0, "country": "unknown", "ban_scope": "service", "permanent": False}
-                    ban_data["ip"] = ip
-                    # If permanent flag is set, override TTL to 0
-                    if ban_data.get("permanent", False):
-                        exp = 0
-                    ban_data["exp"] = exp
-                    ban_data["service"] = service
-                    ban_data["ban_scope"] = "service"
-                    servers["redis"].append(ban_data)
+                # Read the bans through the ban index: batched ranges, each fetched with one pipelined GET+TTL round-trip
+                ensure_ban_index(self.__redis)
+                servers["redis"] = list(iter_bans(self.__redis, by="date", logger=self.__logger))
             except Exception as e:
                 self.__logger.error(f"Failed to get bans from redis: {e}")
 
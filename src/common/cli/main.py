@@ -23,12 +23,14 @@ if __name__ == "__main__":
 
         # Unban subparser
         parser_unban = subparsers.add_parser("unban", help="remove a ban from the cache")
-        parser_unban.add_argument("ip", type=str, help="IP address to unban")
+        parser_unban.add_argument("ip", type=str, nargs="?", help="IP address to unban")
+        parser_unban.add_argument("-f", "--file", type=str, help='file listing the IP addresses to unban, one per line ("-" for stdin)', default=None)
         parser_unban.add_argument("-service", type=str, help="service to unban from (default: unban globally)", default=None)
 
         # Ban subparser
         parser_ban = subparsers.add_parser("ban", help="add a ban to the cache")
-        parser_ban.add_argument("ip", type=str, help="IP address to ban")
+        parser_ban.add_argument("ip", type=str, nargs="?", help="IP address to ban")
+        parser_ban.add_argument("-f", "--file", type=str, help='file listing the IP addresses to ban, one per line ("-" for stdin)', default=None)
 
         ban_time = getenv("BAD_BEHAVIOR_BAN_TIME", "86400")
         if not ban_time.isdigit():
@@ -69,6 +71,9 @@ if __name__ == "__main__":
         # Parse args
         args, unknown_args = parser.parse_known_args()
 
+        if args.command in ("ban", "unban") and (args.ip is None) == (args.file is None):
+            parser.error(f"{args.command}: exactly one of ip or --file is required")
+
         logger.debug(f"args : {args}")
         logger.debug(f"unknown_args : {unknown_args}")
 
@@ -77,8 +82,12 @@ if __name__ == "__main__":
 
         # Execute command
         ret, err = False, "unknown command"
-        if args.command == "unban":
+        if args.command == "unban" and args.file:
+            ret, err = cli.unban_file(args.file, args.service)
+        elif args.command == "unban":
             ret, err = cli.unban(args.ip, args.service)
+        elif args.command == "ban" and args.file:
+            ret, err = cli.ban_file(args.file, args.exp, args.reason, args.service)
         elif args.command == "ban":
             ret, err = cli.ban(args.ip, args.exp, args.reason, args.service)
         elif args.command == "bans":
@@ -1,34 +1,47 @@
 #!/usr/bin/env python3
 
+from contextlib import ExitStack, suppress
 from datetime import datetime
 import re
-from json import dumps, loads
+from json import JSONDecodeError, dumps, loads
 from os import getenv
 from os.path import join, sep
 from pathlib import Path
-from subprocess import PIPE, run
-from shutil import which
+from subprocess import DEVNULL, PIPE, Popen, run
+from shutil import copyfileobj, which
 from sys import exit as sys_exit, path as sys_path
+from tempfile import TemporaryFile
 from time import sleep
-from typing import Literal
-from zipfile import ZIP_DEFLATED, ZipFile
+from typing import IO, Any, Callable, Dict, Iterable, List, Literal, Optional, Pattern, Set, Tuple
+from zipfile import ZIP_DEFLATED, BadZipFile, ZipFile
 
 for deps_path in [join(sep, "usr", "share", "bunkerweb", *paths) for paths in (("deps", "python"), ("utils",), ("db",))]:
     if deps_path not in sys_path:
         sys_path.append(deps_path)
 
+from sqlalchemy import delete, func, insert, select, update
 from sqlalchemy.engine.url import make_url
 
-from common_utils import bytes_hash, safe_zip_extractall  # type: ignore
-from Database import Database  # type: ignore
+from common_utils import bytes_hash  # type: ignore
+from Database import JOB_CACHE_BLOB_CHUNK_SIZE, Database  # type: ignore
 from logger import getLogger  # type: ignore
-from model import Base  # type: ignore
+from model import Base, Jobs_cache, Jobs_cache_blob_chunks, Jobs_cache_blobs  # type: ignore
 
 LOGGER = getLogger("BACKUP")
 
 BACKUP_DIR = Path(getenv("BACKUP_DIRECTORY", "/var/lib/bunkerweb/backups"))
 DB_LOCK_FILE = Path(sep, "var", "lib", "bunkerweb", "db.lock")
 
+CHUNK_SIZE = 1024 * 1024
+# Incremental backups store the job cache blobs next to the dump and list them in the manifest,
+# the blobs already stored by a previous backup are referenced by the name of that backup
+MANIFEST_NAME = "manifest.json"
+BLOBS_DIR = "blobs"
+BLOBS_TABLES = (Jobs_cache_blobs.__tablename__, Jobs_cache_blob_chunks.__tablename__)
+SQLITE_BLOBS_INSERT = re.compile(rb'^INSERT INTO "?(' + b"|".join(table.encode() for table in BLOBS_TABLES) + rb')"? ')
+# SET directives unknown to older PostgreSQL servers (e.g., transaction_timeout)
+PG_SET_BLACKLIST = re.compile(rb"^\s*SET\s+(transaction_timeout|idle_session_timeout)\s*=.*;\s*$", re.IGNORECASE)
+
 
 def acquire_db_lock():
     """Acquire the database lock to prevent concurrent access to the database."""
@@ -56,9 +69,115 @@ def update_cache_file(db: Database, backup_dir: Path) -> str:
     return ""
 
 
-def backup_database(current_time: datetime, db: Database = None, backup_dir: Path = BACKUP_DIR):
-    """Backup the database."""
+def copy_lines(source: IO[bytes], write: Callable[[bytes], Any], skip: Pattern[bytes]) -> None:
+    """Copy source by lines (long lines by chunks) without the lines whose beginning matches skip."""
+    at_line_start, skipping = True, False
+    while chunk := source.readline(CHUNK_SIZE):
+        if at_line_start:
+            skipping = skip.match(chunk) is not None
+        if not skipping:
+            write(chunk)
+        at_line_start = chunk.endswith(b"\n")
+
+
+def read_manifest(backup_file: Path) -> Dict[str, Any]:
+    """Return the manifest of an incremental backup, an empty dict for a full backup."""
+    with suppress(BadZipFile, KeyError, OSError, JSONDecodeError), ZipFile(backup_file, "r") as zipf:
+        return loads(zipf.read(MANIFEST_NAME))
+    return {}
+
+
+def get_referenced_backups(backup_files: Iterable[Path]) -> Set[str]:
+    """Return the names of the backups holding job cache blobs referenced by the given incremental backups."""
+    return {blob["archive"] for backup_file in backup_files for blob in read_manifest(backup_file).get("blobs", {}).values() if blob.get("archive")}
+
+
+def write_blobs(db: Database, zipf: ZipFile, previous_backups: Iterable[Path]) -> Dict[str, Dict[str, Any]]:
+    """Store the job cache blobs in the backup, except the ones already stored by one of the previous backups."""
+    allowed = {backup_file.name for backup_file in previous_backups}
+    stored: Dict[str, str] = {}
+    for backup_file in sorted(previous_backups, reverse=True):
+        for checksum, blob in read_manifest(backup_file).get("blobs", {}).items():
+            archive = blob.get("archive") or backup_file.name
+            if archive in allowed:
+                stored.setdefault(checksum, archive)
+
+    blobs = {}
+    table = Jobs_cache_blobs.__table__
+    chunks = Jobs_cache_blob_chunks.__table__
+    with db.sql_engine.connect() as conn:
+        rows = conn.execute(select(table.c.checksum, table.c.size, table.c.refcount, table.c.creation_date)).all()
+        for row in rows:
+            archive = stored.get(row.checksum)
+            if not archive:
+                # One chunk at a time, the blobs are never in memory
+                data = conn.execute(select(table.c.data).where(table.c.checksum == row.checksum)).scalar()
+                if data is None:
+                    continue
+                with zipf.open(f"{BLOBS_DIR}/{row.checksum}", "w", force_zip64=True) as entry:
+                    entry.write(data)
+                    if len(data) < row.size:
+                        for seq in conn.execute(select(chunks.c.seq).where(chunks.c.checksum == row.checksum).order_by(chunks.c.seq)).scalars().all():
+                            entry.write(conn.execute(select(chunks.c.data).where(chunks.c.checksum == row.checksum, chunks.c.seq == seq)).scalar())
+            blobs[row.checksum] = {
+                "archive": archive,
+                "size": row.size,
+                "refcount": row.refcount,
+                "creation_date": row.creation_date.isoformat() if row.creation_date else None,
+            }
+
+    referenced = sum(bool(blob["archive"]) for blob in blobs.values())
+    LOGGER.info(f"Stored {len(blobs) - referenced} job cache blobs, {referenced} unchanged ones are referenced")
+    return blobs
+
+
+def dump_to_zip(cmd: List[str], env: Dict[str, str], zipf: ZipFile, name: str, *, stdin: bytes = b"", skip: Optional[Pattern[bytes]] = None) -> Tuple[int, str]:
+    """Stream the output of the dump command into the archive entry, return its return code and its stderr."""
+    with TemporaryFile() as stderr_file:
+        proc = Popen(cmd, stdin=PIPE if stdin else DEVNULL, stdout=PIPE, stderr=stderr_file, env=env)
+        if stdin:
+            proc.stdin.write(stdin)
+            proc.stdin.close()
+        with zipf.open(name, "w", force_zip64=True) as entry:
+            if skip:
+                copy_lines(proc.stdout, entry.write, skip)
+            else:
+                copyfileobj(proc.stdout, entry, CHUNK_SIZE)
+        proc.wait()
+        stderr_file.seek(0)
+        return proc.returncode, stderr_file.read().decode(errors="replace")
+
+
+def restore_from_zip(
+    cmd: List[str], env: Dict[str, str], source: IO[bytes], *, preamble: bytes = b"", skip: Optional[Pattern[bytes]] = None
+) -> Tuple[int, str]:
+    """Stream the archive entry into the restore command, return its return code and its stderr."""
+    with TemporaryFile() as stderr_file:
+        proc = Popen(cmd, stdin=PIPE, stdout=DEVNULL, stderr=stderr_file, env=env)
+        try:
+            proc.stdin.write(preamble)
+            if skip:
+                copy_lines(source, proc.stdin.write, skip)
+            else:
+                copyfileobj(source, proc.stdin, CHUNK_SIZE)
+        except BrokenPipeError:
+            pass  # The command stopped reading, its stderr tells why
+        finally:
+            with suppress(BrokenPipeError):
+                proc.stdin.close()
+        proc.wait()
+        stderr_file.seek(0)
+        return proc.returncode, stderr_file.read().decode(errors="replace")
+
+
+def backup_database(current_time: datetime, db: Database = None, backup_dir: Path = BACKUP_DIR, *, incremental_from: Optional[List[Path]] = None):
+    """Backup the database.
+
+    With incremental_from, the job cache blobs are stored apart from the dump and the ones already stored
+    by one of these backups (of the same directory) are only referenced.
+    """
     db = db or Database(LOGGER)
+    incremental = incremental_from is not None
 
     database_url = make_url(db.database_uri)
     database: Literal["sqlite", "mariadb", "mysql", "postgresql", "oracle"] = database_url.drivername.split("+")[0]
@@ -69,22 +188,22 @@ def backup_database(current_time: datetime, db: Database = None, backup_dir: Pat
 
     # Get table names from the SQLAlchemy model
     model_tables = list(Base.metadata.tables.keys())
-    LOGGER.info(f"Backing up {len(model_tables)} tables defined in the model")
+    LOGGER.info(f"Backing up {len(model_tables)} tables defined in the model{' (incremental)' if incremental else ''}")
 
     while "Table 'db.test_" in stderr and (datetime.now().astimezone() - current_time).total_seconds() < 10:
+        stdin = b""
+        skip = None
         if database == "sqlite":
             db_path = Path(database_url.database)
 
             LOGGER.info("Creating a backup for the SQLite database ...")
 
-            # Full SQLite database dump
-            proc = run(
-                ["sqlite3", db_path.as_posix()],
-                input=".dump\n".encode(),
-                stdout=PIPE,
-                stderr=PIPE,
-                env={"PATH": getenv("PATH", ""), "PYTHONPATH": getenv("PYTHONPATH", "")},
-            )
+            # Full SQLite database dump, the rows of the blobs table are left out of incremental backups
+            cmd = ["sqlite3", db_path.as_posix()]
+            env = {"PATH": getenv("PATH", ""), "PYTHONPATH": getenv("PYTHONPATH", "")}
+            stdin = ".dump\n".encode()
+            if incremental:
+                skip = SQLITE_BLOBS_INSERT
         else:
             url = make_url(db.database_uri)
             db_user = url.username or ""
@@ -125,6 +244,10 @@ def backup_database(current_time: datetime, db: Database = None, backup_dir: Pat
                     ]
                 )
 
+                # The blobs tables are created again from the model on restore
+                if incremental:
+                    cmd.extend(f"--ignore-table={db_database_name}.{table}" for table in BLOBS_TABLES)
+
                 # Avoid --set-gtid-purged for broad compatibility (MariaDB variant doesn't support it)
 
                 # Apply additional arguments from query parameters
@@ -134,12 +257,7 @@ def backup_database(current_time: datetime, db: Database = None, backup_dir: Pat
                     elif key == "charset":
                         cmd.extend(["--default-character-set", value])
 
-                proc = run(
-                    cmd,
-                    stdout=PIPE,
-                    stderr=PIPE,
-                    env={"MYSQL_PWD": db_password, "PATH": getenv("PATH", ""), "PYTHONPATH": getenv("PYTHONPATH", "")},
-                )
+                env = {"MYSQL_PWD": db_password, "PATH": getenv("PATH", ""), "PYTHONPATH": getenv("PYTHONPATH", "")}
             elif database == "postgresql":
                 LOGGER.info("Creating a backup for the PostgreSQL database ...")
 
@@ -168,6 +286,9 @@ def backup_database(current_time: datetime, db: Database = None, backup_dir: Pat
                     ]
                 )
 
+                if incremental:
+                    cmd.extend(f"--exclude-table-data={table}" for table in BLOBS_TABLES)
+
                 # Apply additional arguments from query parameters
                 pg_env = {"PGPASSWORD": db_password}
                 for key, value in db_query_args.items():
@@ -175,46 +296,112 @@ def backup_database(current_time: datetime, db: Database = None, backup_dir: Pat
                         pg_env["PGSSLMODE"] = value
                     elif key == "sslrootcert":
                         pg_env["PGSSLROOTCERT"] = value
-                proc = run(
-                    cmd,
-                    stdout=PIPE,
-                    stderr=PIPE,
-                    env={"PATH": getenv("PATH", ""), "PYTHONPATH": getenv("PYTHONPATH", "")} | pg_env,
-                )
+                env = {"PATH": getenv("PATH", ""), "PYTHONPATH": getenv("PYTHONPATH", "")} | pg_env
             elif database == "oracle":
                 LOGGER.warning("Creating a database backup for Oracle is not supported")
                 return db
 
-        stderr = proc.stderr.decode() if hasattr(proc, "stderr") and proc.stderr else ""
-        if "Table 'db.test_" not in stderr and proc.returncode != 0:
+        # The dump is streamed into the archive, it is never held in memory
+        with ZipFile(backup_file, "w", compression=ZIP_DEFLATED) as zipf:
+            returncode, stderr = dump_to_zip(cmd, env, zipf, backup_file.with_suffix(".sql").name, stdin=stdin, skip=skip)
+            if returncode == 0 and incremental:
+                blobs = write_blobs(db, zipf, incremental_from)
+                zipf.writestr(MANIFEST_NAME, dumps({"version": 1, "incremental": True, "blobs": blobs}, indent=2))
+
+        if "Table 'db.test_" not in stderr and returncode != 0:
+            backup_file.unlink(missing_ok=True)
             LOGGER.error(f"Failed to dump the database: {stderr}")
             sys_exit(1)
 
     if (datetime.now().astimezone() - current_time).total_seconds() >= 10:
+        backup_file.unlink(missing_ok=True)
         LOGGER.error("Failed to dump the database: Timeout reached")
         sys_exit(1)
 
-    with ZipFile(backup_file, "w", compression=ZIP_DEFLATED) as zipf:
-        zipf.writestr(backup_file.with_suffix(".sql").name, proc.stdout)
-
     backup_file.chmod(0o600)
 
     LOGGER.info(f"💾 Backup {backup_file.name} created successfully in {backup_dir}")
     return db, backup_file
 
 
+def restore_blobs(db: Database, backup_file: Path, manifest: Dict[str, Any]) -> None:
+    """Insert the job cache blobs of an incremental backup, reading them from the backups holding them.
+
+    The blobs are read after the dump, in another snapshot, so their references are recounted from the restored cache rows.
+    """
+    table = Jobs_cache_blobs.__table__
+    chunks = Jobs_cache_blob_chunks.__table__
+    cache_table = Jobs_cache.__table__
+    # The dump of MariaDB/MySQL incremental backups doesn't create the tables
+    table.create(db.sql_engine, checkfirst=True)
+    chunks.create(db.sql_engine, checkfirst=True)
+
+    with ExitStack() as stack, db.sql_engine.begin() as conn:
+        archives: Dict[str, ZipFile] = {}
+        for checksum, blob in manifest.get("blobs", {}).items():
+            archive = blob.get("archive") or backup_file.name
+            if archive not in archives:
+                archives[archive] = stack.enter_context(ZipFile(backup_file.with_name(archive), "r"))
+            # Stored by chunks like Database.upsert_job_cache does
+            with archives[archive].open(f"{BLOBS_DIR}/{checksum}") as entry:
+                conn.execute(
+                    insert(table).values(
+                        checksum=checksum,
+                        data=entry.read(JOB_CACHE_BLOB_CHUNK_SIZE),
+                        size=blob["size"],
+                        refcount=blob["refcount"],
+                        creation_date=datetime.fromisoformat(blob["creation_date"]) if blob.get("creation_date") else datetime.now().astimezone(),
+                    )
+                )
+                seq = 0
+                while chunk := entry.read(JOB_CACHE_BLOB_CHUNK_SIZE):
+                    seq += 1
+                    conn.execute(insert(chunks).values(checksum=checksum, seq=seq, data=chunk))
+
+        # A blob removed by a cleanup between the dump and the backup of the blobs is lost, the jobs will recreate these cache files
+        dangling = conn.execute(
+            delete(cache_table).where(
+                cache_table.c.data.is_(None), cache_table.c.checksum.is_not(None), cache_table.c.checksum.not_in(select(table.c.checksum))
+            )
+        ).rowcount
+        if dangling:
+            LOGGER.warning(f"Removed {dangling} job cache files whose blob is missing from the backup, the jobs will recreate them")
+
+        references = (
+            select(func.count(cache_table.c.id))
+            .where(cache_table.c.checksum == table.c.checksum, cache_table.c.data.is_(None))
+            .correlate(table)
+            .scalar_subquery()
+        )
+        conn.execute(update(table).values(refcount=references))
+        unused = select(table.c.checksum).where(table.c.refcount <= 0)
+        conn.execute(delete(chunks).where(chunks.c.checksum.in_(unused)))
+        conn.execute(delete(table).where(table.c.refcount <= 0))
+    LOGGER.info(f"Restored {len(manifest.get('blobs', {}))} job cache blobs")
+
+
 def restore_database(backup_file: Path, db: Database = None) -> Database:
     """Restore the database from a backup."""
     db = db or Database(LOGGER)
+
+    # Check that the backups holding the blobs of an incremental backup are there before dropping anything
+    manifest = read_manifest(backup_file)
+    for archive in {blob["archive"] for blob in manifest.get("blobs", {}).values() if blob.get("archive")}:
+        if not backup_file.with_name(archive).is_file():
+            LOGGER.error(f"Backup {archive}, which holds job cache blobs of {backup_file.name}, is missing, aborting restore")
+            sys_exit(1)
+
     Base.metadata.drop_all(db.sql_engine)
     database_url = make_url(db.database_uri)
     database: Literal["sqlite", "mariadb", "mysql", "postgresql", "oracle"] = database_url.drivername.split("+")[0]
+    preamble = b""
+    skip = None
 
     if database == "sqlite":
         db_path = Path(database_url.database)
 
         # Clear the database
-        proc = run(
+        run(
             ["sqlite3", db_path.as_posix(), ".read", "/dev/null"],
             stdout=PIPE,
             stderr=PIPE,
@@ -223,17 +410,8 @@ def restore_database(backup_file: Path, db: Database = None) -> Database:
 
         LOGGER.info("Restoring the SQLite database ...")
 
-        tmp_file = Path(sep, "var", "tmp", "bunkerweb", backup_file.with_suffix(".sql").name)
-        with ZipFile(backup_file, "r") as zipf:
-            safe_zip_extractall(zipf, tmp_file.parent)
-
-        proc = run(
-            ["sqlite3", db_path.as_posix(), f".read {tmp_file.as_posix()}"],
-            stdout=PIPE,
-            stderr=PIPE,
-            env={"PATH": getenv("PATH", ""), "PYTHONPATH": getenv("PYTHONPATH", "")},
-        )
-        tmp_file.unlink(missing_ok=True)
+        cmd = ["sqlite3", db_path.as_posix()]
+        env = {"PATH": getenv("PATH", ""), "PYTHONPATH": getenv("PYTHONPATH", "")}
     else:
         url = make_url(db.database_uri)
         db_user = url.username or ""
@@ -257,14 +435,7 @@ def restore_database(backup_file: Path, db: Database = None) -> Database:
                 elif key == "charset":
                     cmd.extend(["--default-character-set", value])
 
-            with ZipFile(backup_file, "r") as zipf:
-                proc = run(
-                    cmd,
-                    stdout=PIPE,
-                    stderr=PIPE,
-                    env={"PATH": getenv("PATH", ""), "PYTHONPATH": getenv("PYTHONPATH", ""), "MYSQL_PWD": db_password},
-                    input=zipf.read(backup_file.with_suffix(".sql").name),
-                )
+            env = {"PATH": getenv("PATH", ""), "PYTHONPATH": getenv("PYTHONPATH", ""), "MYSQL_PWD": db_password}
         elif database == "postgresql":
             LOGGER.info("Restoring the PostgreSQL database ...")
 
@@ -291,46 +462,37 @@ def restore_database(backup_file: Path, db: Database = None) -> Database:
                     pg_env["PGSSLMODE"] = value
                 elif key == "sslrootcert":
                     pg_env["PGSSLROOTCERT"] = value
-
-            with ZipFile(backup_file, "r") as zipf:
-                sql_name = backup_file.with_suffix(".sql").name
-                sql_data = zipf.read(sql_name)
-
-                # Sanitize dump for cross-version compatibility:
-                # - Remove SET directives unknown to older servers (e.g., transaction_timeout)
-                sql_text = sql_data.decode("utf-8", errors="ignore")
-                set_blacklist = re.compile(r"^\s*SET\s+(transaction_timeout|idle_session_timeout)\s*=.*;\s*$", re.IGNORECASE)
-                sanitized_lines = [line for line in sql_text.splitlines(True) if not set_blacklist.match(line)]
-                sanitized_sql = "".join(sanitized_lines).encode()
-
-                # Stabilize restore by setting safe defaults before feeding dump
-                # Avoid superuser-only settings to preserve compatibility
-                preamble = (
-                    "SET client_min_messages = WARNING;\n"
-                    "SET statement_timeout = 0;\n"
-                    "SET lock_timeout = '5s';\n"
-                    "SET idle_in_transaction_session_timeout = '5min';\n"
-                    "SET client_encoding = 'UTF8';\n"
-                    "SET standard_conforming_strings = on;\n"
-                    "SET search_path = public, pg_catalog;\n"
-                ).encode()
-                input_bytes = preamble + sanitized_sql
-
-                proc = run(
-                    cmd,
-                    stdout=PIPE,
-                    stderr=PIPE,
-                    input=input_bytes,
-                    env={"PATH": getenv("PATH", ""), "PYTHONPATH": getenv("PYTHONPATH", "")} | pg_env,
-                )
+            env = {"PATH": getenv("PATH", ""), "PYTHONPATH": getenv("PYTHONPATH", "")} | pg_env
+
+            # Sanitize dump for cross-version compatibility by removing SET directives unknown to older servers
+            skip = PG_SET_BLACKLIST
+
+            # Stabilize restore by setting safe defaults before feeding dump
+            # Avoid superuser-only settings to preserve compatibility
+            preamble = (
+                "SET client_min_messages = WARNING;\n"
+                "SET statement_timeout = 0;\n"
+                "SET lock_timeout = '5s';\n"
+                "SET idle_in_transaction_session_timeout = '5min';\n"
+                "SET client_encoding = 'UTF8';\n"
+                "SET standard_conforming_strings = on;\n"
+                "SET search_path = public, pg_catalog;\n"
+            ).encode()
         elif database == "oracle":
             LOGGER.warning("Restoring a database backup for Oracle is not supported")
             return db
 
-    if proc.returncode != 0:
-        LOGGER.error(f"Failed to restore the database: {proc.stderr.decode()}")
+    # The dump is streamed from the archive into the restore command
+    with ZipFile(backup_file, "r") as zipf, zipf.open(backup_file.with_suffix(".sql").name) as sql_file:
+        returncode, stderr = restore_from_zip(cmd, env, sql_file, preamble=preamble, skip=skip)
+
+    if returncode != 0:
+        LOGGER.error(f"Failed to restore the database: {stderr}")
         sys_exit(1)
 
+    if manifest:
+        restore_blobs(db, backup_file, manifest)
+
     err = db.checked_changes(plugins_changes="all", value=True)
     if err:
         LOGGER.error(f"Error while applying changes to the database: {err}, you may need to reload the application")
@@ -12,10 +12,9 @@ for deps_path in [join(sep, "usr", "share", "bunkerweb", *paths) for paths in ((
     if deps_path not in sys_path:
         sys_path.append(deps_path)
 
-from Database import Database  # type: ignore
 from logger import getLogger  # type: ignore
-from jobs import Job  # type: ignore
-from backup import backup_database, update_cache_file, acquire_db_lock, DB_LOCK_FILE
+from jobs import Job, get_job_db  # type: ignore
+from backup import backup_database, get_referenced_backups, update_cache_file, acquire_db_lock, DB_LOCK_FILE
 
 LOGGER = getLogger("BACKUP")
 status = 0
@@ -67,7 +66,7 @@ try:
 
         db = JOB.db
     else:
-        db = Database(LOGGER, sqlalchemy_string=getenv("DATABASE_URI"))
+        db = get_job_db(LOGGER)
 
     backed_up = False
     if force_backup or not already_done:
@@ -78,7 +77,13 @@ try:
                 LOGGER.info("First start of the scheduler, skipping backup ...")
                 sys_exit(0)
 
-        db, _ = backup_database(current_time, db, backup_dir)
+        incremental_from = None
+        if not force_backup and getenv("BACKUP_INCREMENTAL", "no") == "yes":
+            # Only the backups that will survive the rotation can hold the unchanged job cache blobs
+            existing_files = sorted(backup_dir.glob("backup-*.zip"))
+            incremental_from = existing_files[-(backup_rotation - 1) :] if backup_rotation > 1 else []  # noqa: E203
+
+        db, _ = backup_database(current_time, db, backup_dir, incremental_from=incremental_from)
         backed_up = True
 
         if not force_backup:
@@ -94,8 +99,14 @@ try:
             # Calculate the number of files to remove
             num_files_to_remove = len(sorted_files) - backup_rotation
 
+            # Keep the backups holding job cache blobs of the incremental backups that are kept
+            referenced = get_referenced_backups(sorted_files[num_files_to_remove:])
+
             # Remove the oldest backup files
             for file in sorted_files[:num_files_to_remove]:
+                if file.name in referenced:
+                    LOGGER.warning(f"Keeping old backup file: {file}, as it holds job cache blobs of a more recent incremental backup ...")
+                    continue
                 LOGGER.warning(f"Removing old backup file: {file}, as the rotation limit has been reached ...")
                 file.unlink()
 
@@ -1,13 +1,12 @@
 #!/usr/bin/env python3
 
 from contextlib import suppress
-from datetime import datetime, timedelta
+from functools import partial
 from ipaddress import ip_address, ip_network
 from os import getenv, sep
-from os.path import join, normpath
+from os.path import join
 from re import compile as re_compile
 from sys import exit as sys_exit, path as sys_path
-from time import sleep
 from traceback import format_exc
 from typing import Tuple
 
@@ -15,12 +14,11 @@ for deps_path in [join(sep, "usr", "share", "bunkerweb", *paths) for paths in ((
     if deps_path not in sys_path:
         sys_path.append(deps_path)
 
-from requests import get
-from requests.exceptions import ConnectionError
-
 from common_utils import bytes_hash  # type: ignore
 from logger import getLogger  # type: ignore
+from ip_ranges import build_range_table, collapse_ip_entries, format_ip_ranges  # type: ignore
 from jobs import Job  # type: ignore
+from list_fetcher import ListFetcher, ListSource  # type: ignore
 
 rdns_rx = re_compile(rb"^[^ ]+$")
 asn_rx = re_compile(rb"^\d+$")
@@ -56,6 +54,7 @@ def check_line(kind: str, line: bytes) -> Tuple[bool, bytes]:
 LOGGER = getLogger("BLACKLIST")
 status = 0
 
+IP_KINDS = ("IP", "IGNORE_IP")
 KINDS = ("IP", "RDNS", "ASN", "USER_AGENT", "URI", "IGNORE_IP", "IGNORE_RDNS", "IGNORE_ASN", "IGNORE_USER_AGENT", "IGNORE_URI")
 
 COMMUNITY_LISTS = {
@@ -158,7 +157,7 @@ try:
 
     if not any(url for urls in services_blacklist_urls.values() for url in urls.values()):
         LOGGER.warning("No blacklist URL is configured, nothing to do...")
-        for file in list(JOB.job_path.rglob("*.list")):
+        for file in [*JOB.job_path.rglob("*.list"), *JOB.job_path.rglob("*.ranges")]:
             if file.parent == JOB.job_path:
                 LOGGER.warning(f"Removing no longer used url file {file} ...")
                 deleted, err = JOB.del_cache(file)
@@ -170,8 +169,15 @@ try:
                 LOGGER.warning(f"Couldn't delete file {file} from cache : {err}")
         sys_exit(0)
 
+    # Download every URL once, in parallel, the first kind using an URL decides how its lines are checked
+    sources = {}
+    for kinds in services_blacklist_urls.values():
+        for kind, urls_list in kinds.items():
+            for url in urls_list:
+                sources.setdefault(url, ListSource(url, partial(check_line, kind), kind != "USER_AGENT"))
+    results = ListFetcher(LOGGER, "blacklist").fetch_job_lists(JOB, sources.values())
+
     urls = set()
-    failed_urls = set()
     processed_urls = set()  # Track which URLs have been processed globally
     # Initialize aggregation per kind with service tracking
     aggregated_recap = {
@@ -192,9 +198,10 @@ try:
             if not urls_list:
                 if JOB.job_path.joinpath(service, f"{kind}.list").is_file():
                     LOGGER.warning(f"{service} blacklist for {kind} is cached but no URL is configured, removing from cache...")
-                    deleted, err = JOB.del_cache(f"{kind}.list", service_id=service)
-                    if not deleted:
-                        LOGGER.warning(f"Couldn't delete {service} {kind}.list from cache : {err}")
+                    for file_name in (f"{kind}.list", f"{kind}.ranges"):
+                        deleted, err = JOB.del_cache(file_name, service_id=service)
+                        if not deleted:
+                            LOGGER.warning(f"Couldn't delete {service} {file_name} from cache : {err}")
                 continue
 
             # Track that this service provided URLs for the current kind
@@ -202,111 +209,40 @@ try:
 
             # Use set to avoid duplicate entries
             unique_entries = set()
-            content = b""
             for url in urls_list:
-                url_file = f"{bytes_hash(url, algorithm='sha1')}.list"
-                cached_url = JOB.get_cache(url_file, with_info=True, with_data=True)
-                try:
-                    # Only count URLs that haven't been processed globally
-                    if url not in processed_urls:
-                        aggregated_recap[kind]["total_urls"] += 1
-
-                    # If the URL has recently been downloaded, use cache
-                    if url in failed_urls:
-                        if url not in processed_urls:
-                            aggregated_recap[kind]["failed_count"] += 1
-                    elif (
-                        isinstance(cached_url, dict)
-                        and cached_url.get("last_update")
-                        and cached_url["last_update"] > (datetime.now().astimezone() - timedelta(hours=1)).timestamp()
-                    ):
-                        LOGGER.debug(f"URL {url} has already been downloaded less than 1 hour ago, skipping download...")
-                        if url not in processed_urls:
-                            aggregated_recap[kind]["skipped_urls"] += 1
-                        # Process cached data and add to unique_entries
-                        cached_data = cached_url.get("data", b"")
-                        if cached_data:
-                            # Skip first line (URL comment) and process entries
-                            for line in cached_data.split(b"\n")[1:]:
-                                line = line.strip()
-                                if line:
-                                    unique_entries.add(line)
-                    else:
-                        failed = False
-                        LOGGER.info(f"Downloading blacklist data from {url} ...")
-                        if url.startswith("file://"):
-                            try:
-                                with open(normpath(url[7:]), "rb") as f:
-                                    iterable = f.readlines()
-                            except OSError as e:
-                                status = 2
-                                LOGGER.debug(format_exc())
-                                LOGGER.error(f"Error while opening file {url[7:]} : {e}")
-                                failed_urls.add(url)
-                                if url_file not in urls:
-                                    aggregated_recap[kind]["failed_count"] += 1
-                                failed = True
-                        else:
-                            max_retries = 3
-                            retry_count = 0
-                            while retry_count < max_retries:
-                                try:
-                                    resp = get(url, stream=True, timeout=10)
-                                    break
-                                except ConnectionError as e:
-                                    retry_count += 1
-                                    if retry_count == max_retries:
-                                        raise e
-                                    LOGGER.warning(f"Connection refused, retrying in 3 seconds... ({retry_count}/{max_retries})")
-                                    sleep(3)
-
-                            if resp.status_code != 200:
-                                status = 2
-                                LOGGER.warning(f"Got status code {resp.status_code}, skipping...")
-                                failed_urls.add(url)
-                                if url_file not in urls:
-                                    aggregated_recap[kind]["failed_count"] += 1
-                                failed = True
-                            else:
-                                iterable = resp.iter_lines()
-
-                        if not failed:
-                            if url not in processed_urls:
-                                aggregated_recap[kind]["downloaded_urls"] += 1
-
-                            url_content = b""
-                            count_lines = 0
-                            for line in iterable:
-                                line = line.strip()
-                                if not line or line.startswith((b"#", b";")):
-                                    continue
-                                elif kind != "USER_AGENT":
-                                    line = line.split(b" ")[0]
-                                ok, data = check_line(kind, line)
-                                if ok:
-                                    unique_entries.add(data)
-                                    url_content += data + b"\n"
-                                    count_lines += 1
-                            if url not in processed_urls:
-                                aggregated_recap[kind]["total_lines"] += count_lines
-
-                            cached, err = JOB.cache_file(url_file, b"# Downloaded from " + url.encode("utf-8") + b"\n" + url_content)
-                            if not cached:
-                                LOGGER.error(f"Error while caching url content for {url}: {err}")
-                except BaseException as e:
-                    status = 2
-                    LOGGER.debug(format_exc())
-                    LOGGER.error(f"Exception while getting {service} blacklist from {url} :\n{e}")
-                    failed_urls.add(url)
-                    if url not in processed_urls:
-                        aggregated_recap[kind]["failed_count"] += 1
-                finally:
-                    # Mark URL as processed to avoid double counting
-                    processed_urls.add(url)
-                    urls.add(url_file)
+                result = results[url]
+                urls.add(result.url_file)
 
-            # Build final content from unique entries, sorted for consistency
-            content = b"\n".join(sorted(unique_entries)) + b"\n" if unique_entries else b""
+                # Only count URLs that haven't been processed globally
+                if url not in processed_urls:
+                    processed_urls.add(url)
+                    aggregated_recap[kind]["total_urls"] += 1
+                    if result.state == "failed":
+                        status = 2
+                        LOGGER.error(f"Error while getting {service} blacklist from {url} : {result.error}")
+                        aggregated_recap[kind]["failed_count"] += 1
+                    elif result.state == "downloaded":
+                        aggregated_recap[kind]["downloaded_urls"] += 1
+                        aggregated_recap[kind]["total_lines"] += len(result.entries)
+                    else:
+                        aggregated_recap[kind]["skipped_urls"] += 1
+
+                unique_entries.update(result.entries)
+
+            if kind in IP_KINDS and unique_entries:
+                # Collapse overlapping and adjacent entries, the range table is written next to the text list
+                ranges, stats = collapse_ip_entries(unique_entries)
+                LOGGER.info(f"{service} {kind}.list: {stats['entries']} entries collapsed into {stats['ranges']} ranges")
+                content = format_ip_ranges(ranges)
+                range_table = build_range_table(ranges)
+                if bytes_hash(range_table) != JOB.cache_hash(f"{kind}.ranges", service_id=service):
+                    cached, err = JOB.cache_file(f"{kind}.ranges", range_table, service_id=service)
+                    if not cached:
+                        LOGGER.error(f"Error while caching blacklist range table : {err}")
+                        status = 2
+            else:
+                # Build final content from unique entries, sorted for consistency
+                content = b"\n".join(sorted(unique_entries)) + b"\n" if unique_entries else b""
 
             if not content:
                 continue
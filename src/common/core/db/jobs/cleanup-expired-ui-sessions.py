@@ -9,14 +9,14 @@ for deps_path in [join(sep, "usr", "share", "bunkerweb", *paths) for paths in ((
     if deps_path not in sys_path:
         sys_path.append(deps_path)
 
-from Database import Database  # type: ignore
+from jobs import get_job_db  # type: ignore
 from logger import getLogger  # type: ignore
 
 LOGGER = getLogger("DB.CLEANUP-EXPIRED-UI-SESSIONS")
 status = 0
 
 try:
-    DB = Database(LOGGER, sqlalchemy_string=getenv("DATABASE_URI"))
+    DB = get_job_db(LOGGER)
     max_age_days = int(getenv("DATABASE_MAX_SESSION_AGE_DAYS", "14"))
     ret = DB.cleanup_expired_ui_sessions(max_age_days)
     if not ret.startswith("Removed"):
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+from os import sep
+from os.path import join
+from sys import exit as sys_exit, path as sys_path
+from traceback import format_exc
+
+for deps_path in [join(sep, "usr", "share", "bunkerweb", *paths) for paths in (("deps", "python"), ("utils",), ("db",))]:
+    if deps_path not in sys_path:
+        sys_path.append(deps_path)
+
+from jobs import get_job_db  # type: ignore
+from logger import getLogger  # type: ignore
+
+LOGGER = getLogger("DB.CLEANUP-JOBS-CACHE-BLOBS")
+status = 0
+
+try:
+    DB = get_job_db(LOGGER)
+    ret = DB.cleanup_job_cache_blobs()
+    if not ret.startswith("Removed"):
+        LOGGER.error(ret)
+        sys_exit(1)
+    LOGGER.info(ret)
+except SystemExit as e:
+    status = e.code
+except BaseException as e:
+    status = 2
+    LOGGER.debug(format_exc())
+    LOGGER.error(f"Exception while running cleanup-jobs-cache-blobs.py :\n{e}")
+
+sys_exit(status)
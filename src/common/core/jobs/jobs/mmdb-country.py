@@ -1,8 +1,6 @@
 #!/usr/bin/env python3
 
 from datetime import date, datetime, timedelta
-from gzip import decompress
-from io import BytesIO
 from os import sep
 from os.path import join
 from pathlib import Path
@@ -22,6 +20,7 @@ from requests.exceptions import ConnectionError
 from logger import getLogger  # type: ignore
 from common_utils import bytes_hash, file_hash  # type: ignore
 from jobs import Job  # type: ignore
+from mmdb_download import download_mmdb  # type: ignore
 
 LOGGER = getLogger("JOBS.MMDB-COUNTRY")
 status = 0
@@ -68,14 +67,21 @@ try:
     JOB = Job(LOGGER, __file__)
 
     if dl_mmdb:
-        job_cache = JOB.get_cache("country.mmdb", with_info=True, with_data=True)
+        job_cache = JOB.get_cache("country.mmdb", with_info=True, with_data=False)
         if isinstance(job_cache, dict):
+            # Hash the local copy of the cache file when it is the cached version, the content is only fetched from the database otherwise
+            cache_path = JOB.job_path.joinpath("country.mmdb")
+            if cache_path.is_file() and file_hash(cache_path) == job_cache.get("checksum"):
+                cache_sha1 = file_hash(cache_path, algorithm="sha1")
+            else:
+                cache_sha1 = bytes_hash(JOB.get_cache("country.mmdb") or b"%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%", algorithm="sha1")
+
             skip_dl = True
             if response is None:
                 response = request_mmdb()
 
             if response and response.status_code == 200:
-                skip_dl = response.content.find(bytes_hash(job_cache.get("data", b"%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%"), algorithm="sha1").encode()) != -1
+                skip_dl = response.content.find(cache_sha1.encode()) != -1
             elif job_cache.get("last_update") and job_cache["last_update"] < (datetime.now().astimezone() - timedelta(weeks=1)).timestamp():
                 LOGGER.warning("Unable to check if the cache file is the latest version from db-ip.com and file is older than 1 week, checking anyway...")
                 skip_dl = False
@@ -87,37 +93,13 @@ try:
         # Compute the mmdb URL
         mmdb_url = f"https://download.db-ip.com/free/dbip-country-lite-{date.today().strftime('%Y-%m')}.mmdb.gz"
 
-        # Download the mmdb file and save it to tmp
+        # Download the mmdb file to tmp, it is decompressed, hashed and validated on the fly
         LOGGER.info(f"Downloading mmdb file from url {mmdb_url} ...")
-        file_content = BytesIO()
         try:
-            max_retries = 3
-            retry_count = 0
-            while retry_count < max_retries:
-                try:
-                    with get(mmdb_url, stream=True, timeout=5) as resp:
-                        resp.raise_for_status()
-                        for chunk in resp.iter_content(chunk_size=4 * 1024):
-                            if chunk:
-                                file_content.write(chunk)
-                    break
-                except ConnectionError as e:
-                    retry_count += 1
-                    if retry_count == max_retries:
-                        raise e
-                    LOGGER.warning(f"Connection refused, retrying in 3 seconds... ({retry_count}/{max_retries})")
-                    sleep(3)
-
-            assert file_content
-
-            # Decompress it
-            LOGGER.info("Decompressing mmdb file ...")
-            file_content.seek(0)
-            tmp_path.write_bytes(decompress(file_content.getvalue()))
+            new_hash = download_mmdb(mmdb_url, tmp_path, LOGGER)["sha512"]
 
             if job_cache:
                 # Check if file has changed
-                new_hash = file_hash(tmp_path)
                 if new_hash == job_cache.get("checksum"):
                     LOGGER.info("New file is identical to cache file, reload is not needed")
                     sys_exit(0)
@@ -129,10 +111,10 @@ try:
             LOGGER.warning("Falling back to project cached mmdb file.")
             dl_mmdb = False
 
-    # Try to load it
-    LOGGER.info("Checking if mmdb file is valid ...")
-    if tmp_path.is_file():
-        with open_database(tmp_path.as_posix()) as reader:
+    if not dl_mmdb:
+        # Try to load it
+        LOGGER.info("Checking if mmdb file is valid ...")
+        with open_database(tmp_path.as_posix()):
             pass
 
     # Move it to cache folder
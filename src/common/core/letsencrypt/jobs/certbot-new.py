@@ -7,10 +7,9 @@ from json import dumps, loads
 from os import getenv, sep
 from os.path import join
 from pathlib import Path
-from re import MULTILINE, search
 from select import select
 from shutil import rmtree
-from subprocess import DEVNULL, PIPE, STDOUT, Popen, run
+from subprocess import DEVNULL, PIPE, Popen
 from sys import exit as sys_exit, path as sys_path
 from time import monotonic, sleep
 from threading import Event, Lock, Thread
@@ -31,10 +30,11 @@ for deps_path in [join(sep, "usr", "share", "bunkerweb", *paths) for paths in ((
 
 from requests import get
 
-from common_utils import bytes_hash, effective_cpu_count, file_hash  # type: ignore
+from common_utils import bytes_hash, effective_cpu_count  # type: ignore
 from jobs import Job  # type: ignore
 from logger import getLogger  # type: ignore
 
+from certbot_inventory import CertificateInventory
 from letsencrypt_utils import (
     CERTBOT_BIN,
     DEPS_PATH,
@@ -115,13 +115,6 @@ def format_server_names(names: Set[str]) -> str:
     return ",".join(sorted(names, key=lambda value: (0 if value.startswith("*.") else 1, value)))
 
 
-def parse_certbot_domains(certificate_block: str) -> str:
-    match = search(r"^\s*(Domains|Identifiers):\s+(.+)$", certificate_block, MULTILINE)
-    if not match:
-        return ""
-    return " ".join(match.group(2).split()).replace(" ", ",")
-
-
 def normalize_server_url(url: str) -> str:
     return url.strip().rstrip("/")
 
@@ -831,82 +824,11 @@ try:
     # ? Fetch existing certificates
     cmd_env = build_certbot_env(JOB, DEPS_PATH)
 
-    proc = run(
-        [
-            CERTBOT_BIN,
-            "certificates",
-            "-n",
-            "--config-dir",
-            DATA_PATH.as_posix(),
-            "--work-dir",
-            WORK_DIR,
-            "--logs-dir",
-            LOGS_DIR,
-            *certbot_log_backup_flags(cmd_env),
-        ],
-        stdin=DEVNULL,
-        stdout=PIPE,
-        stderr=STDOUT,
-        text=True,
-        env=cmd_env,
-        check=False,
-    )
-    stdout = proc.stdout
-    existing_certificates = {}
-
-    LOGGER_CERTBOT.debug(f"Certbot output:\n{stdout}")
-
-    # ? Check if the command was successful
-    if proc.returncode != 0:
-        LOGGER.error(f"Failed to fetch existing certificates, force the generation of certificates: \n{stdout}")
-        services = {service: config | {"force_renew": True} for service, config in services.items()}
-    else:
-        # ? Parse existing certificates
-        for certificate_block in stdout.split("Certificate Name: ")[1:]:
-            certificate_lines = certificate_block.splitlines()
-            if not certificate_lines:
-                continue
-
-            service = certificate_lines[0].split()[0].strip()
-            domains = parse_certbot_domains(certificate_block)
-
-            existing_certificates[service] = {"active": False, "server_names": domains, "server_names_set": normalize_server_names(domains)}
-
-            renewal_file = DATA_PATH.joinpath("renewal", f"{service}.conf")
-            if renewal_file.is_file():
-                renewal_content = renewal_file.read_text()
-
-                match_profile = search(r"^preferred_profile\s*=\s*(\S+)$", renewal_content, MULTILINE)
-                profile = match_profile.group(1) if match_profile else ""
-
-                match_challenge = search(r"^pref_challs\s*=\s*(\S+)$", renewal_content, MULTILINE)
-                challenge = match_challenge.group(1).split(",")[0].replace("-01", "") if match_challenge else ""
-
-                match_authenticator = search(r"^authenticator\s*=\s*(\S+)$", renewal_content, MULTILINE)
-                authenticator = match_authenticator.group(1).replace("dns-", "") if match_authenticator else ""
-
-                match_credentials = search(rf"^dns_{authenticator}_credentials\s*=\s*(\S+)$", renewal_content, MULTILINE)
-                credentials_hash = ""
-                if match_credentials and match_credentials.group(1):
-                    credentials_path = Path(match_credentials.group(1))
-                    if credentials_path.is_file():
-                        credentials_hash = file_hash(credentials_path, algorithm="sha256")
-
-                match_server = search(r"^server\s*=\s*(\S+)$", renewal_content, MULTILINE)
-                server = match_server.group(1) if match_server else ""
-
-                existing_certificates[service].update(
-                    {
-                        "challenge": challenge,
-                        "authenticator": authenticator,
-                        "credentials_hash": credentials_hash,
-                        "staging": "acme-staging" in server,
-                        "profile": profile,
-                        "acme_server_url": normalize_server_url(server),
-                    }
-                )
+    # The certificates and renewal configurations are read in-process, unchanged files are only parsed once per scheduler
+    inventory = CertificateInventory(DATA_PATH, LOGGER)
+    existing_certificates = {service: certificate | {"active": False} for service, certificate in inventory.certificates.items()}
 
-        LOGGER_CERTBOT.debug(f"Existing certificates: {existing_certificates}")
+    LOGGER_CERTBOT.debug(f"Existing certificates: {existing_certificates}")
 
     zerossl_api_key_hashes = load_zerossl_api_key_hashes()
     LOGGER_CERTBOT.debug(f"Stored ZeroSSL API key hashes: {list(zerossl_api_key_hashes.keys())}")
@@ -977,6 +899,10 @@ try:
             continue
         if not config["activated"]:
             continue
+        if service not in existing_certificates:
+            covering = inventory.covering(normalize_server_names(config["server_names"])) - set(services)
+            if covering:
+                LOGGER.info(f"[Service: {service}] Server names are already covered by the unused certificate(s) {', '.join(sorted(covering))}.")
         pending_services.append((service, config))
 
     if pending_services:
@@ -0,0 +1,129 @@
+from collections import defaultdict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Set, Tuple, TypeVar
+
+from cryptography import x509
+
+from common_utils import file_hash  # type: ignore
+
+T = TypeVar("T")
+
+# Parsed files by resolved path, with the (mtime, size) they were parsed at.
+# The inode is not part of the key: each job run extracts the cached tarball again (new inodes, same mtimes).
+_PARSED: Dict[Tuple[str, str], Tuple[Tuple[int, int], Any]] = {}
+_PARSED_LOCK = Lock()
+
+
+def _cached_parse(kind: str, path: Path, parse: Callable[[Path], T]) -> T:
+    resolved = path.resolve(strict=True)
+    stat = resolved.stat()
+    key, stamp = (kind, resolved.as_posix()), (stat.st_mtime_ns, stat.st_size)
+    with _PARSED_LOCK:
+        cached = _PARSED.get(key)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    value = parse(resolved)
+    with _PARSED_LOCK:
+        _PARSED[key] = (stamp, value)
+    return value
+
+
+def _parse_renewal_conf(path: Path) -> Dict[str, str]:
+    """Return the first value of every ``key = value`` line of a certbot renewal configuration."""
+    values = {}
+    for line in path.read_text().splitlines():
+        key, sep, value = line.partition("=")
+        key = key.strip()
+        if sep and key and not key.startswith(("#", "[")) and key not in values:
+            values[key] = value.strip()
+    return values
+
+
+def _parse_certificate(path: Path) -> Dict[str, Any]:
+    """Return the names (common name first, like certbot) and the validity of the leaf certificate of a PEM chain."""
+    cert = x509.load_pem_x509_certificate(path.read_bytes())
+    names = [str(attribute.value).lower() for attribute in cert.subject.get_attributes_for_oid(x509.NameOID.COMMON_NAME)]
+    try:
+        san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+        names.extend(str(name).lower() for name in san.get_values_for_type(x509.DNSName) + san.get_values_for_type(x509.IPAddress))
+    except x509.ExtensionNotFound:
+        pass
+
+    return {
+        "names": list(dict.fromkeys(names)),
+        "not_before": cert.not_valid_before_utc,
+        "not_after": cert.not_valid_after_utc,
+        "serial_number": cert.serial_number,
+    }
+
+
+class CertificateInventory:
+    """Certificates managed by certbot in a config directory, read in-process instead of from ``certbot certificates``.
+
+    Like certbot, the lineages are the ``renewal/*.conf`` files and the certificate is the ``fullchain`` they point to
+    (``live/<name>/fullchain.pem`` if that path doesn't exist anymore). Invalid lineages are skipped.
+    """
+
+    def __init__(self, config_dir: Path, logger=None):
+        self.config_dir = config_dir
+        self.certificates: Dict[str, Dict[str, Any]] = {}
+        self.domains: Dict[str, Set[str]] = defaultdict(set)
+
+        renewal_dir = config_dir.joinpath("renewal")
+        if not renewal_dir.is_dir():
+            return
+
+        for renewal_file in sorted(renewal_dir.glob("*.conf")):
+            name = renewal_file.stem
+            try:
+                certificate = self.__load(name, renewal_file)
+            except BaseException as e:
+                if logger:
+                    logger.warning(f"Ignoring invalid certificate lineage {name}: {e}")
+                continue
+
+            self.certificates[name] = certificate
+            for domain in certificate["server_names_set"]:
+                self.domains[domain].add(name)
+
+    def __load(self, name: str, renewal_file: Path) -> Dict[str, Any]:
+        renewal = _cached_parse("renewal", renewal_file, _parse_renewal_conf)
+
+        fullchain = Path(renewal.get("fullchain") or self.config_dir.joinpath("live", name, "fullchain.pem"))
+        if not fullchain.exists():
+            fullchain = self.config_dir.joinpath("live", name, "fullchain.pem")
+        certificate = _cached_parse("certificate", fullchain, _parse_certificate)
+
+        authenticator = renewal.get("authenticator", "").replace("dns-", "")
+        credentials_hash = ""
+        credentials = renewal.get(f"dns_{authenticator}_credentials")
+        if credentials and Path(credentials).is_file():
+            credentials_hash = _cached_parse("credentials", Path(credentials), lambda path: file_hash(path, algorithm="sha256"))
+
+        server = renewal.get("server", "")
+        return {
+            "server_names": ",".join(certificate["names"]),
+            "server_names_set": set(certificate["names"]),
+            "challenge": renewal.get("pref_challs", "").split(",")[0].replace("-01", ""),
+            "authenticator": authenticator,
+            "credentials_hash": credentials_hash,
+            "staging": "acme-staging" in server,
+            "profile": renewal.get("preferred_profile", ""),
+            "acme_server_url": server.strip().rstrip("/"),
+            "not_before": certificate["not_before"],
+            "not_after": certificate["not_after"],
+            "serial_number": certificate["serial_number"],
+            "fullchain": fullchain,
+        }
+
+    def covering(self, domains: Set[str]) -> Set[str]:
+        """Return the names of the certificates covering all the given domains."""
+        names: Optional[Set[str]] = None
+        for domain in domains:
+            certificates = self.domains.get(domain.lower(), set())
+            names = certificates if names is None else names & certificates
+            if not names:
+                break
+        return set(names or ())
@@ -33,8 +33,9 @@ from requests import get
 from requests.exceptions import ConnectionError
 
 from common_utils import bytes_hash, create_plugin_tar_gz, safe_tar_extractall, safe_zip_extractall  # type: ignore
-from Database import Database  # type: ignore
+from jobs import get_job_db  # type: ignore
 from logger import getLogger  # type: ignore
+from plugin_tree import plugin_checksum  # type: ignore
 
 EXTERNAL_PLUGINS_DIR = Path(sep, "etc", "bunkerweb", "plugins")
 TMP_DIR = Path(sep, "var", "tmp", "bunkerweb", "plugins")
@@ -57,8 +58,7 @@ def _set_plugin_permissions(plugin_path: Path) -> None:
 
 def _plugin_checksum_matches_database(plugin_path: Path, checksum: str) -> bool:
     try:
-        plugin_content = create_plugin_tar_gz(plugin_path, arc_root=plugin_path.name)
-        return bytes_hash(plugin_content, algorithm="sha256") == checksum
+        return plugin_checksum(plugin_path, arc_root=plugin_path.name) == checksum
     except BaseException as e:
         LOGGER.debug(format_exc())
         LOGGER.warning(f"Could not verify plugin {plugin_path.name} integrity before skipping reinstall: {e}")
@@ -160,7 +160,7 @@ try:
         LOGGER.info("No external plugins to download")
         sys_exit(0)
 
-    db = Database(LOGGER, sqlalchemy_string=getenv("DATABASE_URI"))
+    db = get_job_db(LOGGER)
     plugin_nbr = 0
 
     # Loop on URLs
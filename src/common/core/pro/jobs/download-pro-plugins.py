@@ -23,8 +23,9 @@ from requests import get
 from requests.exceptions import ConnectionError
 
 from common_utils import bytes_hash, get_os_info, get_integration, get_version, create_plugin_tar_gz, safe_zip_extractall  # type: ignore
-from Database import Database  # type: ignore
+from jobs import get_job_db  # type: ignore
 from logger import getLogger  # type: ignore
+from plugin_tree import plugin_checksum  # type: ignore
 
 API_ENDPOINT = "https://api.bunkerweb.io"
 PREVIEW_ENDPOINT = "https://assets.bunkerity.com/bw-pro/preview"
@@ -56,8 +57,7 @@ def _set_plugin_permissions(plugin_path: Path) -> None:
 
 def _plugin_checksum_matches_database(plugin_path: Path, checksum: str) -> bool:
     try:
-        plugin_content = create_plugin_tar_gz(plugin_path, arc_root=plugin_path.name)
-        return bytes_hash(plugin_content, algorithm="sha256") == checksum
+        return plugin_checksum(plugin_path, arc_root=plugin_path.name) == checksum
     except BaseException as e:
         LOGGER.debug(format_exc())
         LOGGER.warning(f"Could not verify Pro plugin {plugin_path.name} integrity before skipping reinstall: {e}")
@@ -180,7 +180,7 @@ def install_plugin(plugin_path: Path, db, preview: bool = True) -> bool:
 
 
 try:
-    db = Database(LOGGER, sqlalchemy_string=getenv("DATABASE_URI"))
+    db = get_job_db(LOGGER)
     _cleanup_stale_plugin_dirs()
     db_metadata = db.get_metadata()
     current_date = datetime.now().astimezone()
@@ -1,24 +1,21 @@
 #!/usr/bin/env python3
 
 from contextlib import suppress
-from datetime import datetime, timedelta
 from ipaddress import ip_address, ip_network
 from os import getenv, sep
-from os.path import join, normpath
+from os.path import join
 from sys import exit as sys_exit, path as sys_path
-from time import sleep
 from traceback import format_exc
 
 for deps_path in [join(sep, "usr", "share", "bunkerweb", *paths) for paths in (("deps", "python"), ("utils",), ("db",))]:
     if deps_path not in sys_path:
         sys_path.append(deps_path)
 
-from requests import get
-from requests.exceptions import ConnectionError
-
 from logger import getLogger  # type: ignore
 from common_utils import bytes_hash  # type: ignore
+from ip_ranges import build_range_table, collapse_ip_entries, format_ip_ranges  # type: ignore
 from jobs import Job  # type: ignore
+from list_fetcher import ListFetcher, ListSource  # type: ignore
 
 
 def check_line(line):
@@ -79,7 +76,7 @@ try:
 
     if not any(services_realip_urls.values()):
         LOGGER.warning("No URL configured, nothing to do...")
-        for file in list(JOB.job_path.rglob("*.list")):
+        for file in [*JOB.job_path.rglob("*.list"), *JOB.job_path.rglob("*.ranges")]:
             if file.parent == JOB.job_path:
                 LOGGER.warning(f"Removing no longer used url file {file} ...")
                 deleted, err = JOB.del_cache(file)
@@ -91,8 +88,11 @@ try:
                 LOGGER.warning(f"Couldn't delete file {file} from cache : {err}")
         sys_exit(0)
 
+    # Download every URL once, in parallel
+    sources = {url: ListSource(url, check_line, False) for urls_list in services_realip_urls.values() for url in urls_list}
+    results = ListFetcher(LOGGER, "Real IP").fetch_job_lists(JOB, sources.values())
+
     urls = set()
-    failed_urls = set()
     processed_urls = set()  # Track which URLs have been processed globally
     # Initialize aggregation per kind with service tracking
     aggregated_recap = {
@@ -111,113 +111,40 @@ try:
 
         # Use set to avoid duplicate entries
         unique_entries = set()
-        content = b""
         for url in urls_list:
-            url_file = f"{bytes_hash(url, algorithm='sha1')}.list"
-            cached_url = JOB.get_cache(url_file, with_info=True, with_data=True)
-            try:
-                # Only count URLs that haven't been processed globally
-                if url not in processed_urls:
-                    aggregated_recap["total_urls"] += 1
-
-                # If the URL has recently been downloaded, use cache
-                if url in failed_urls:
-                    if url not in processed_urls:
-                        aggregated_recap["failed_count"] += 1
-                elif (
-                    isinstance(cached_url, dict)
-                    and cached_url.get("last_update")
-                    and cached_url["last_update"] > (datetime.now().astimezone() - timedelta(hours=1)).timestamp()
-                ):
-                    LOGGER.debug(f"URL {url} has already been downloaded less than 1 hour ago, skipping download...")
-                    if url not in processed_urls:
-                        aggregated_recap["skipped_urls"] += 1
-                    # Process cached data and add to unique_entries
-                    cached_data = cached_url.get("data", b"")
-                    if cached_data:
-                        # Skip first line (URL comment) and process entries
-                        for line in cached_data.split(b"\n")[1:]:
-                            line = line.strip()
-                            if line:
-                                unique_entries.add(line)
-                else:
-                    LOGGER.info(f"Downloading Real IP data from {url} ...")
-                    failed = False
-                    if url.startswith("file://"):
-                        try:
-                            with open(normpath(url[7:]), "rb") as f:
-                                iterable = f.readlines()
-                        except OSError as e:
-                            status = 2
-                            LOGGER.debug(format_exc())
-                            LOGGER.error(f"Error while opening file {url[7:]} : {e}")
-                            failed_urls.add(url)
-                            if url_file not in urls:
-                                aggregated_recap["failed_count"] += 1
-                            failed = True
-                    else:
-                        max_retries = 3
-                        retry_count = 0
-                        while retry_count < max_retries:
-                            try:
-                                resp = get(url, stream=True, timeout=10)
-                                break
-                            except ConnectionError as e:
-                                retry_count += 1
-                                if retry_count == max_retries:
-                                    raise e
-                                LOGGER.warning(f"Connection refused, retrying in 3 seconds... ({retry_count}/{max_retries})")
-                                sleep(3)
-
-                        if resp.status_code != 200:
-                            status = 2
-                            LOGGER.warning(f"Got status code {resp.status_code}, skipping...")
-                            failed_urls.add(url)
-                            if url_file not in urls:
-                                aggregated_recap["failed_count"] += 1
-                            failed = True
-                        else:
-                            iterable = resp.iter_lines()
-
-                    if not failed:
-                        if url not in processed_urls:
-                            aggregated_recap["downloaded_urls"] += 1
-
-                        url_content = b""
-                        count_lines = 0
-                        for line in iterable:
-                            line = line.strip()
-                            if not line or line.startswith((b"#", b";")):
-                                continue
-                            ok, data = check_line(line)
-                            if ok:
-                                unique_entries.add(data)
-                                url_content += data + b"\n"
-                                count_lines += 1
-                        if url not in processed_urls:
-                            aggregated_recap["total_lines"] += count_lines
-
-                        cached, err = JOB.cache_file(url_file, b"# Downloaded from " + url.encode("utf-8") + b"\n" + url_content)
-                        if not cached:
-                            LOGGER.error(f"Error while caching url content for {url}: {err}")
-            except BaseException as e:
-                status = 2
-                LOGGER.debug(format_exc())
-                LOGGER.error(f"Exception while getting {service} greylist from {url} :\n{e}")
-                failed_urls.add(url)
-                if url not in processed_urls:
-                    aggregated_recap["failed_count"] += 1
-            finally:
-                # Mark URL as processed to avoid double counting
+            result = results[url]
+            urls.add(result.url_file)
+
+            # Only count URLs that haven't been processed globally
+            if url not in processed_urls:
                 processed_urls.add(url)
-                urls.add(url_file)
+                aggregated_recap["total_urls"] += 1
+                if result.state == "failed":
+                    status = 2
+                    LOGGER.error(f"Error while getting {service} Real IP list from {url} : {result.error}")
+                    aggregated_recap["failed_count"] += 1
+                elif result.state == "downloaded":
+                    aggregated_recap["downloaded_urls"] += 1
+                    aggregated_recap["total_lines"] += len(result.entries)
+                else:
+                    aggregated_recap["skipped_urls"] += 1
 
-        # Build final content from unique entries, sorted for consistency
-        content = b"\n".join(sorted(unique_entries)) + b"\n" if unique_entries else b""
+            unique_entries.update(result.entries)
 
-        if not content:
+        if not unique_entries:
             continue
 
+        # Collapse overlapping and adjacent entries, the range table is written next to the text list
+        ranges, stats = collapse_ip_entries(unique_entries)
+        LOGGER.info(f"{service} combined.list: {stats['entries']} entries collapsed into {stats['ranges']} ranges")
+        content = format_ip_ranges(ranges)
+        range_table = build_range_table(ranges)
+        if bytes_hash(range_table) != JOB.cache_hash("combined.ranges", service_id="" if service == "global" else service):
+            cached, err = JOB.cache_file("combined.ranges", range_table, service_id="" if service == "global" else service)
+            if not cached:
+                LOGGER.error(f"Error while caching range table for {service} : {err}")
+                status = 2
+
         # Check if file has changed
         new_hash = bytes_hash(content)
         old_hash = JOB.cache_hash("combined.list", service_id="" if service == "global" else service)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+
+from contextlib import suppress
+from logging import Logger
+from os import getenv
+from pathlib import Path
+from select import select
+from socket import AF_UNIX, SOCK_DGRAM, socket
+from time import sleep
+from typing import Any, Callable, Iterable, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+CHANGES_CHANNEL = "bunkerweb_changes"
+NOTIFIER_BACKENDS = ("auto", "postgresql", "redis", "local", "none")
+
+
+def encode_changes(changes: Iterable[str]) -> str:
+    return ",".join(sorted(set(changes)))
+
+
+def decode_changes(payload: Any) -> Set[str]:
+    if isinstance(payload, bytes):
+        payload = payload.decode("utf-8", "ignore")
+    return {change for change in str(payload or "").split(",") if change}
+
+
+class ChangeNotifier:
+    """Change notification channel between the database writers and the scheduler.
+
+    Database publishes a change when a transaction sets one of the scheduler's change flags (Metadata and Plugins), whether by an
+    ORM flush or a bulk statement run through its session. Other writes, such as the job cache ones, are not announced.
+
+    The base class has no push channel: ``wait`` only sleeps, so the caller keeps polling the metadata.
+    """
+
+    name = "none"
+
+    def __init__(self, logger: Logger):
+        self.logger = logger
+        self.listening = False
+
+    def publish(self, changes: Iterable[str]) -> None:
+        """Tell the listeners that some changes were committed, errors are never raised to the writer."""
+
+    def listen(self) -> bool:
+        """Start listening for changes, returns True if notifications will be pushed."""
+        return False
+
+    def wait(self, timeout: float) -> Set[str]:
+        """Wait at most timeout seconds for notifications and return the changes they announced."""
+        sleep(timeout)
+        return set()
+
+    def close(self) -> None:
+        """Release the resources held by the channel."""
+        self.listening = False
+
+
+class PostgresChangeNotifier(ChangeNotifier):
+    """PostgreSQL LISTEN/NOTIFY channel."""
+
+    name = "postgresql"
+
+    def __init__(self, logger: Logger, get_engine: Callable[[], Engine]):
+        super().__init__(logger)
+        self._get_engine = get_engine
+        self._connection: Optional[Connection] = None
+
+    def publish(self, changes: Iterable[str]) -> None:
+        try:
+            with self._get_engine().connect() as conn:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANGES_CHANNEL, "payload": encode_changes(changes)})
+                conn.commit()
+        except BaseException as e:
+            self.logger.debug(f"Couldn't publish the changes on the {CHANGES_CHANNEL} PostgreSQL channel: {e}")
+
+    def listen(self) -> bool:
+        self.close()
+        try:
+            self._connection = self._get_engine().connect().execution_options(isolation_level="AUTOCOMMIT")
+            self._connection.exec_driver_sql(f"LISTEN {CHANGES_CHANNEL}")
+        except BaseException as e:
+            self.logger.warning(f"Couldn't listen on the {CHANGES_CHANNEL} PostgreSQL channel, falling back to polling: {e}")
+            self.close()
+            return False
+        self.listening = True
+        return True
+
+    def wait(self, timeout: float) -> Set[str]:
+        if not self.listening or self._connection is None:
+            return super().wait(timeout)
+
+        changes = set()
+        try:
+            driver_connection = self._connection.connection.driver_connection
+            for notify in driver_connection.notifies(timeout=timeout, stop_after=1):
+                changes |= decode_changes(notify.payload)
+            if changes:
+                # Drain the notifications sent by the same burst of writes
+                for notify in driver_connection.notifies(timeout=0.05):
+                    changes |= decode_changes(notify.payload)
+        except BaseException as e:
+            self.logger.warning(f"Lost the {CHANGES_CHANNEL} PostgreSQL channel, listening again: {e}")
+            self.listen()
+        return changes
+
+    def close(self) -> None:
+        if self._connection is not None:
+            with suppress(BaseException):
+                self._connection.close()
+            self._connection = None
+        super().close()
+
+
+class RedisChangeNotifier(ChangeNotifier):
+    """Redis pub/sub channel."""
+
+    name = "redis"
+
+    def __init__(self, logger: Logger, redis_url: str):
+        super().__init__(logger)
+        from redis import from_url
+
+        self._client = from_url(redis_url, socket_keepalive=True)
+        self._pubsub = None
+
+    def publish(self, changes: Iterable[str]) -> None:
+        try:
+            self._client.publish(CHANGES_CHANNEL, encode_changes(changes))
+        except BaseException as e:
+            self.logger.debug(f"Couldn't publish the changes on the {CHANGES_CHANNEL} Redis channel: {e}")
+
+    def listen(self) -> bool:
+        self.close()
+        try:
+            self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(CHANGES_CHANNEL)
+        except BaseException as e:
+            self.logger.warning(f"Couldn't subscribe to the {CHANGES_CHANNEL} Redis channel, falling back to polling: {e}")
+            self.close()
+            return False
+        self.listening = True
+        return True
+
+    def wait(self, timeout: float) -> Set[str]:
+        if not self.listening or self._pubsub is None:
+            return super().wait(timeout)
+
+        changes = set()
+        try:
+            message = self._pubsub.get_message(timeout=timeout)
+            while message:
+                if message.get("type") == "message":
+                    changes |= decode_changes(message.get("data"))
+                message = self._pubsub.get_message(timeout=0)
+        except BaseException as e:
+            self.logger.warning(f"Lost the {CHANGES_CHANNEL} Redis channel, subscribing again: {e}")
+            self.listen()
+        return changes
+
+    def close(self) -> None:
+        if self._pubsub is not None:
+            with suppress(BaseException):
+                self._pubsub.close()
+            self._pubsub = None
+        super().close()
+
+
+class LocalChangeNotifier(ChangeNotifier):
+    """Unix datagram socket next to the SQLite database file, shared by every container mounting its volume."""
+
+    name = "local"
+
+    def __init__(self, logger: Logger, socket_path: Path):
+        super().__init__(logger)
+        self.socket_path = socket_path
+        self._socket: Optional[socket] = None
+
+    def publish(self, changes: Iterable[str]) -> None:
+        if not self.socket_path.exists():
+            return
+
+        try:
+            with socket(AF_UNIX, SOCK_DGRAM) as sock:
+                sock.setblocking(False)
+                sock.sendto(encode_changes(changes).encode("utf-8"), self.socket_path.as_posix())
+        except OSError as e:
+            # Nobody is listening or the listener is too busy to read, it will catch up when polling
+            self.logger.debug(f"Couldn't publish the changes on {self.socket_path}: {e}")
+
+    def listen(self) -> bool:
+        self.close()
+        try:
+            self.socket_path.unlink(missing_ok=True)
+            self._socket = socket(AF_UNIX, SOCK_DGRAM)
+            self._socket.bind(self.socket_path.as_posix())
+            self._socket.setblocking(False)
+            self.socket_path.chmod(0o660)
+        except OSError as e:
+            self.logger.warning(f"Couldn't listen on {self.socket_path}, falling back to polling: {e}")
+            self.close()
+            return False
+        self.listening = True
+        return True
+
+    def wait(self, timeout: float) -> Set[str]:
+        if not self.listening or self._socket is None:
+            return super().wait(timeout)
+
+        changes = set()
+        readable, _, _ = select([self._socket], [], [], timeout)
+        if readable:
+            with suppress(BlockingIOError):
+                while True:
+                    changes |= decode_changes(self._socket.recv(4096))
+        return changes
+
+    def close(self) -> None:
+        if self._socket is not None:
+            with suppress(OSError):
+                self._socket.close()
+            self._socket = None
+            self.socket_path.unlink(missing_ok=True)
+        super().close()
+
+
+def create_change_notifier(logger: Logger, database: str, get_engine: Callable[[], Engine], sqlite_path: Optional[Path] = None) -> ChangeNotifier:
+    """Create the change notification channel selected by DATABASE_CHANGES_NOTIFIER.
+
+    With ``auto``, PostgreSQL uses LISTEN/NOTIFY, SQLite a local socket next to the database file and
+    the other databases use Redis when DATABASE_CHANGES_REDIS_URL is set.
+    """
+    backend = getenv("DATABASE_CHANGES_NOTIFIER", "auto").strip().lower()
+    if backend not in NOTIFIER_BACKENDS:
+        logger.warning(f"Invalid DATABASE_CHANGES_NOTIFIER value: {backend}, using default value (auto)")
+        backend = "auto"
+
+    redis_url = getenv("DATABASE_CHANGES_REDIS_URL", "").strip()
+    if backend == "auto":
+        if redis_url:
+            backend = "redis"
+        elif database.startswith("postgresql"):
+            backend = "postgresql"
+        elif database.startswith("sqlite") and sqlite_path:
+            backend = "local"
+        else:
+            backend = "none"
+
+    try:
+        if backend == "postgresql":
+            if not database.startswith("postgresql"):
+                raise ValueError("the postgresql change notifier requires a PostgreSQL database")
+            return PostgresChangeNotifier(logger, get_engine)
+        if backend == "redis":
+            if not redis_url:
+                raise ValueError("DATABASE_CHANGES_REDIS_URL is not set")
+            return RedisChangeNotifier(logger, redis_url)
+        if backend == "local":
+            if not sqlite_path:
+                raise ValueError("the local change notifier requires a SQLite database")
+            return LocalChangeNotifier(logger, sqlite_path.with_name(f"{sqlite_path.name}.notify"))
+    except BaseException as e:
+        logger.warning(f"Couldn't set up the {backend} change notifier, changes will only be detected by polling: {e}")
+    return ChangeNotifier(logger)
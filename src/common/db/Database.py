@@ -1,25 +1,27 @@
 #!/usr/bin/env python3
 
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from contextlib import contextmanager, suppress
+from contextlib import ExitStack, contextmanager, suppress
 from copy import deepcopy
 from datetime import datetime, timedelta
 from functools import wraps
+from itertools import chain
 from json import JSONDecodeError, loads
 from logging import Logger
 from os import _exit, getenv, sep
 from os.path import join as os_join
 from pathlib import Path
-from re import DOTALL, Match, compile as re_compile, escape, error as RegexError, search
+from re import Match, compile as re_compile, escape, search
 from sys import argv, path as sys_path
 from threading import Lock
 from traceback import format_exc
-from typing import Any, Callable, Dict, List, Literal, Optional, Set, Tuple, TypeVar, Union
-from time import sleep
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Literal, Optional, Set, Tuple, TypeVar, Union
+from time import monotonic, sleep
 from uuid import uuid4
 from warnings import filterwarnings
 
+from ChangeNotifier import ChangeNotifier, create_change_notifier
 from model import (
     Base,
     Instances,
@@ -31,6 +33,8 @@ from model import (
     Jobs,
     Plugin_pages,
     Jobs_cache,
+    Jobs_cache_blobs,
+    Jobs_cache_blob_chunks,
     Jobs_runs,
     Custom_configs,
     Selects,
@@ -41,6 +45,7 @@ from model import (
     Template_settings,
     Template_custom_configs,
     Metadata,
+    Config_generation,
     Users,
     UserSessions,
 )
@@ -49,21 +54,38 @@ for deps_path in [os_join(sep, "usr", "share", "bunkerweb", *paths) for paths in
     if deps_path not in sys_path:
         sys_path.append(deps_path)
 
-from common_utils import bytes_hash, create_plugin_tar_gz, is_valid_host  # type: ignore
+from common_utils import bytes_hash, create_plugin_tar_gz, file_hash, is_valid_host  # type: ignore
+from setting_validator import SettingValidator, compile_setting_regex  # type: ignore
 
 from pymysql import install_as_MySQLdb
-from sqlalchemy import case, create_engine, event, MetaData as sql_metadata, func, join, select as db_select, text
+from sqlalchemy import (
+    and_,
+    case,
+    create_engine,
+    event,
+    inspect as sql_inspect,
+    MetaData as sql_metadata,
+    func,
+    join,
+    or_,
+    select as db_select,
+    text,
+)
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.engine import Engine
 from sqlalchemy.engine.url import make_url
 from sqlalchemy.exc import (
     ArgumentError,
     DatabaseError,
+    IntegrityError,
     OperationalError,
     ProgrammingError,
     SAWarning,
     SQLAlchemyError,
 )
-from sqlalchemy.orm import joinedload, scoped_session, sessionmaker, aliased
+from sqlalchemy.orm import ORMExecuteState, Session, joinedload, scoped_session, sessionmaker, aliased
 from sqlalchemy.pool import QueuePool
 from sqlite3 import Connection as SQLiteConnection
 
@@ -92,6 +114,11 @@ DEFAULT_POOL_MAX_OVERFLOW = 20
 DEFAULT_POOL_TIMEOUT = 5
 DEFAULT_POOL_RECYCLE = 1800
 DEFAULT_POOL_PRE_PING = True
+# Number of config views (argument combinations of get_config) kept per config generation, 0 disables the cache
+DEFAULT_CONFIG_CACHE_SIZE = 32
+# Files are stored in the job cache blobs by chunks of this size, one row per chunk, so no single value sent to the database
+# is bigger (max_allowed_packet on MySQL/MariaDB must still be above it)
+JOB_CACHE_BLOB_CHUNK_SIZE = 4 * 1024 * 1024
 
 
 def retry_on_transient_db_errors(func: Callable[..., T]) -> Callable[..., T]:
@@ -137,6 +164,20 @@ class Database:
         "Create a global modsec-crs config and scope it with a Host rule instead."
     )
     SUFFIX_RX = re_compile(r"(?P<setting>.+)_(?P<suffix>\d+)$")
+    # Change flags watched by the scheduler and the change published when one of them is set to True, by an ORM flush or a bulk
+    # statement run through the session (the scheduler re-reads them on every notification, so no other write needs to publish)
+    CHANGE_FLAGS = {
+        "custom_configs_changed": "custom_configs",
+        "external_plugins_changed": "external_plugins",
+        "pro_plugins_changed": "pro_plugins",
+        "instances_changed": "instances",
+        "reload_ui_plugins": "ui_plugins",
+        "config_changed": "plugins_config",
+    }
+    # Models read by get_config, a transaction writing one of them bumps the config generation
+    CONFIG_MODELS = (Plugins, Settings, Global_values, Services, Services_settings, Templates, Template_settings)
+    CONFIG_TABLES = frozenset(model.__tablename__ for model in CONFIG_MODELS)
+    CHANGE_FLAGS_TABLES = frozenset((Metadata.__tablename__, Plugins.__tablename__))
 
     def __init__(
         self, logger: Logger, sqlalchemy_string: Optional[str] = None, *, external: bool = False, pool: Optional[bool] = None, log: bool = True, **kwargs
@@ -161,6 +202,20 @@ class Database:
         except ValueError:
             self.logger.warning(f"Invalid DATABASE_REQUEST_RETRY_DELAY value: {request_retry_delay}, using default value (0.25)")
 
+        self._config_cache_size = DEFAULT_CONFIG_CACHE_SIZE
+        config_cache_size = getenv("DATABASE_CONFIG_CACHE_SIZE", str(DEFAULT_CONFIG_CACHE_SIZE))
+        if config_cache_size.isdigit():
+            self._config_cache_size = int(config_cache_size)
+        else:
+            self.logger.warning(f"Invalid DATABASE_CONFIG_CACHE_SIZE value: {config_cache_size}, using default value ({DEFAULT_CONFIG_CACHE_SIZE})")
+        self._config_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._config_cache_generation: Optional[int] = None
+        self._config_cache_lock = Lock()
+        self._config_generation_table: Optional[bool] = None
+        self._config_generation_checked = 0.0
+        # (config generation, validator, service ids) used by is_valid_setting outside of a caller's transaction
+        self._setting_validator: Optional[Tuple[int, SettingValidator, FrozenSet[str]]] = None
+
         if pool:
             self.logger.warning("The pool parameter is deprecated, it will be removed in the next version")
 
@@ -376,7 +431,14 @@ class Database:
         if log:
             self.logger.info(f"✅ Database connection established{'' if not self.readonly else ' in read-only mode'}")
 
-        self._session_factory = scoped_session(sessionmaker(bind=self.sql_engine, autoflush=True, expire_on_commit=False))
+        self._session_factory = self._create_session_factory()
+
+        self._change_notifier: ChangeNotifier = create_change_notifier(
+            self.logger,
+            match.group("database"),
+            lambda: self.sql_engine,
+            Path(match.group("path")) if match.group("database").startswith("sqlite") else None,
+        )
 
         if match.group("database").startswith("sqlite"):
             db_path = Path(match.group("path"))
@@ -390,6 +452,9 @@ class Database:
     def close(self) -> None:
         """Explicitly close all sessions and dispose the engine pool.
         Only call during controlled shutdown when no other threads are using this instance."""
+        if getattr(self, "_change_notifier", None):
+            self._change_notifier.close()
+
         if getattr(self, "_session_factory", None):
             self._session_factory.remove()
 
@@ -401,6 +466,85 @@ class Database:
         with suppress(Exception):
             self.close()
 
+    def _create_session_factory(self) -> scoped_session:
+        """Create the session factory, tracking the change flags set by each transaction to notify the listeners on commit."""
+        factory = sessionmaker(bind=self.sql_engine, autoflush=True, expire_on_commit=False)
+        event.listen(factory, "before_flush", self._collect_config_changes)
+        event.listen(factory, "after_flush", self._collect_flushed_changes)
+        event.listen(factory, "do_orm_execute", self._collect_bulk_changes)
+        event.listen(factory, "before_commit", self._bump_config_generation)
+        event.listen(factory, "after_commit", self._publish_changes)
+        event.listen(factory, "after_rollback", self._discard_changes)
+        return scoped_session(factory)
+
+    def _collect_flushed_changes(self, session: Session, _) -> None:
+        for instance in session.dirty:
+            if not isinstance(instance, (Metadata, Plugins)):
+                continue
+            state = sql_inspect(instance)
+            for flag, change in self.CHANGE_FLAGS.items():
+                if flag in state.attrs and True in state.attrs[flag].history.added:
+                    session.info.setdefault("bw_changes", set()).add(change)
+
+    def _collect_config_changes(self, session: Session, *_) -> None:
+        if any(isinstance(instance, self.CONFIG_MODELS) for instance in chain(session.new, session.dirty, session.deleted)):
+            session.info["bw_config_changed"] = True
+
+    def _collect_bulk_changes(self, orm_execute_state: ORMExecuteState) -> None:
+        """Track the changes of the bulk statements (query().update()/delete(), session.execute(insert/update/delete(...))) that bypass the flush."""
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+            return
+        table_name = getattr(getattr(orm_execute_state.statement, "table", None), "name", None)
+        if table_name in self.CONFIG_TABLES:
+            orm_execute_state.session.info["bw_config_changed"] = True
+        if orm_execute_state.is_delete or table_name not in self.CHANGE_FLAGS_TABLES:
+            return
+        with suppress(Exception):
+            # The flags are either bound in the statement (values()/query().update()) or given to execute() (executemany included)
+            parameters = orm_execute_state.parameters
+            rows = [orm_execute_state.statement.compile().params, *(parameters if isinstance(parameters, (list, tuple)) else (parameters or {},))]
+            for flag, change in self.CHANGE_FLAGS.items():
+                if any(row.get(flag) is True for row in rows):
+                    orm_execute_state.session.info.setdefault("bw_changes", set()).add(change)
+
+    def _publish_changes(self, session: Session) -> None:
+        changes = session.info.pop("bw_changes", None)
+        if changes:
+            self._change_notifier.publish(changes)
+
+    def _discard_changes(self, session: Session) -> None:
+        session.info.pop("bw_changes", None)
+        session.info.pop("bw_config_changed", None)
+
+    def _has_config_generation(self, session: Optional[Session] = None) -> bool:
+        """Whether the bw_config_generation table exists, it is missing until init_tables() created it.
+
+        A missing table is looked up again on every write (given its session) and at most every 30 seconds on reads, so that
+        the processes started before the table was created keep bumping the generation the others cache their configs with.
+        """
+        if not self._config_generation_table and (session is not None or monotonic() >= self._config_generation_checked + 30):
+            self._config_generation_checked = monotonic()
+            with suppress(SQLAlchemyError):
+                bind = session.connection() if session is not None else self.sql_engine
+                self._config_generation_table = sql_inspect(bind).has_table(Config_generation.__tablename__)
+        return bool(self._config_generation_table)
+
+    def _bump_config_generation(self, session: Session) -> None:
+        self._collect_config_changes(session)
+        if not session.info.pop("bw_config_changed", False) or not self._has_config_generation(session):
+            return
+        session.query(Config_generation).filter_by(id=1).update({Config_generation.generation: Config_generation.generation + 1}, synchronize_session=False)
+
+    def listen_for_changes(self) -> bool:
+        """Start listening on the change notification channel, returns True when changes will be pushed."""
+        if self.readonly:
+            return False
+        return self._change_notifier.listen()
+
+    def wait_for_changes(self, timeout: float) -> Set[str]:
+        """Wait at most timeout seconds for committed changes, returns the announced ones (sleeps when nothing is pushed)."""
+        return self._change_notifier.wait(timeout)
+
     def _empty_if_none(self, value: Any) -> Any:
         """Return an empty string if the value is None or convert None values in collections"""
         if value is None:
@@ -514,7 +658,7 @@ class Database:
         with LOCK:
             if self._session_factory is not None:
                 self._session_factory.remove()
-            self._session_factory = scoped_session(sessionmaker(bind=self.sql_engine, autoflush=True, expire_on_commit=False))
+            self._session_factory = self._create_session_factory()
 
         if fallback or readonly:
             with self.sql_engine.connect() as conn:
@@ -610,13 +754,12 @@ class Database:
                 elif multiple and db_setting.multiple is None:
                     return False, "not multiple"
 
-                if value is not None:
-                    try:
-                        regex_flags = DOTALL if db_setting.type == "file" else 0
-                        if not self.__ignore_regex_check and search(db_setting.regex, value, regex_flags) is None:
-                            return False, f"not matching regex: {db_setting.regex!r}"
-                    except RegexError:
+                if value is not None and not self.__ignore_regex_check:
+                    pattern = compile_setting_regex(db_setting.regex, db_setting.type == "file")
+                    if pattern is None:
                         return False, f"invalid regex: {db_setting.regex!r}"
+                    elif pattern.search(value) is None:
+                        return False, f"not matching regex: {db_setting.regex!r}"
 
                 return True, ""
             except (ProgrammingError, OperationalError) as e:
@@ -625,9 +768,58 @@ class Database:
         if session:
             return check_setting(session, setting, value, multisite)
 
+        # Outside of a transaction, the settings and services snapshot of the current config generation is used
+        cached = self._get_setting_validator()
+        if cached:
+            validator, services = cached
+            parsed = validator.parse_key(setting)
+            if parsed is None:
+                extra = frozenset(extra_services or ())
+                parsed = validator.parse_key(setting, extra | services)
+                if parsed is None:
+                    match = self.SUFFIX_RX.search(setting)
+                    if match and (validator.parse_key(match.group("setting")) or validator.parse_key(match.group("setting"), extra | services)):
+                        return False, "not multiple"
+                    return False, "missing"
+                elif parsed.service not in extra:
+                    multisite = True
+
+            rule = validator.rules[parsed.setting]
+            if multisite and rule.context != "multisite":
+                return False, "not multisite"
+            if value is not None and not self.__ignore_regex_check:
+                if rule.pattern is None:
+                    return False, f"invalid regex: {rule.regex!r}"
+                elif rule.pattern.search(value) is None:
+                    return False, f"not matching regex: {rule.regex!r}"
+            return True, ""
+
         with self._db_session() as session:
             return check_setting(session, setting, value, multisite)
 
+    def _get_setting_validator(self) -> Optional[Tuple[SettingValidator, FrozenSet[str]]]:
+        """Return the validator of the settings and the service ids, rebuilt when the config generation moves (None without generations)."""
+        if not self._has_config_generation():
+            return None
+        generation = self.get_config_generation()
+        if generation is None:
+            return None
+
+        cached = self._setting_validator
+        if cached and cached[0] == generation:
+            return cached[1], cached[2]
+
+        with suppress(SQLAlchemyError), self._db_session() as session:
+            settings = {
+                setting.id: {"context": setting.context, "regex": setting.regex, "type": setting.type, "multiple": setting.multiple}
+                for setting in session.query(Settings).with_entities(Settings.id, Settings.context, Settings.regex, Settings.type, Settings.multiple)
+            }
+            services = frozenset(service.id for service in session.query(Services).with_entities(Services.id))
+            # Keyed by the generation read before loading them, a concurrent change is picked up by the next call
+            self._setting_validator = (generation, SettingValidator(settings, ignore_regex_check=self.__ignore_regex_check), services)
+            return self._setting_validator[1], self._setting_validator[2]
+        return None
+
     def initialize_db(self, version: str, integration: str = "Unknown") -> str:
         """Initialize the database"""
         with self._db_session() as session:
@@ -820,6 +1012,14 @@ class Database:
         except Exception as e:
             return False, str(e)
 
+        # The config generation is kept in its own single-row table so that databases that weren't migrated yet can still load Metadata
+        self._config_generation_table = None
+        self._config_generation_checked = 0.0
+        with suppress(IntegrityError), self._db_session() as session:
+            if not session.query(Config_generation).filter_by(id=1).count():
+                session.add(Config_generation(id=1, generation=0))
+                session.commit()
+
         # Reflecting the metadata with a timeout
         current_time = datetime.now().astimezone()
         timeout_seconds = 10
@@ -2420,6 +2620,258 @@ class Database:
 
         return changed_plugins
 
+    @classmethod
+    def split_setting_key(cls, key: str, services: Optional[Union[List[str], Set[str]]] = None) -> Tuple[Optional[str], str, int]:
+        """Split a flat config key into its (service, setting, suffix) parts, services are matched like in save_config."""
+        service_id = None
+        if services:
+            underscore_pos = key.find("_")
+            while underscore_pos != -1:
+                if key[:underscore_pos] in services:
+                    service_id = key[:underscore_pos]
+                    key = key[underscore_pos + 1 :]  # noqa: E203
+                    break
+                underscore_pos = key.find("_", underscore_pos + 1)
+
+        suffix = 0
+        match = cls.SUFFIX_RX.search(key)
+        if match:
+            suffix = int(match.group("suffix"))
+            key = match.group("setting")
+        return service_id, key, suffix
+
+    def _bulk_upsert(self, session: Session, model: Any, rows: List[Dict[str, Any]], conflict_columns: List[str], update_columns: List[str]) -> None:
+        """Insert rows or update them when they already exist, in a single statement for the current dialect."""
+        if not rows:
+            return
+
+        dialect = self.sql_engine.dialect.name
+        if dialect in ("mysql", "mariadb"):
+            stmt = mysql_insert(model).values(rows)
+            stmt = stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in update_columns})
+        elif dialect in ("postgresql", "sqlite"):
+            stmt = (postgresql_insert if dialect == "postgresql" else sqlite_insert)(model).values(rows)
+            stmt = stmt.on_conflict_do_update(index_elements=conflict_columns, set_={column: stmt.excluded[column] for column in update_columns})
+        else:
+            for row in rows:
+                conflict_filter = {column: row[column] for column in conflict_columns}
+                if not session.query(model).filter_by(**conflict_filter).update({column: row[column] for column in update_columns}, synchronize_session=False):
+                    session.add(model(**row))
+            return
+        session.execute(stmt)
+
+    def save_config_patch(
+        self,
+        changes: Dict[Tuple[Optional[str], str, int], Optional[Any]],
+        method: str,
+        changed: Optional[bool] = True,
+        file_names: Optional[Dict[Tuple[Optional[str], str, int], Optional[str]]] = None,
+    ) -> Union[str, Set[str]]:
+        """Apply only the given setting changes, without reading or rewriting the rest of the config.
+
+        Args:
+            changes: (service_id, setting_id, suffix) -> value, service_id is None for global values.
+                     A None value removes the row (back to the inherited/default value) if it is
+                     owned by the same method.
+            file_names: File names of the "file" settings, keyed like changes.
+
+        Returns the changed plugins like save_config, or an error message. Adding, removing or
+        drafting services is not a patch, use save_config for SERVER_NAME and IS_DRAFT changes.
+        """
+        normalized: Dict[Tuple[Optional[str], str, int], Optional[str]] = {}
+        for (service_id, setting_id, suffix), value in changes.items():
+            if setting_id == "DATABASE_URI":
+                continue
+            if setting_id == "IS_DRAFT" or (setting_id == "SERVER_NAME" and not service_id):
+                return f"Setting {setting_id} manages services and can't be patched, use save_config instead"
+            normalized[(service_id or None, setting_id, int(suffix or 0))] = None if value is None else str(value)
+
+        if not normalized:
+            return set()
+
+        normalized_file_names = {(k[0] or None, k[1], int(k[2] or 0)): ("" if v is None else v.strip()) for k, v in (file_names or {}).items()}
+        setting_ids = {setting_id for _, setting_id, _ in normalized} | {"USE_TEMPLATE"}
+        service_ids = {service_id for service_id, _, _ in normalized if service_id}
+        changed_plugins = set()
+        changed_services = False
+        service_template_change = False
+
+        with self._db_session() as session:
+            if self.readonly:
+                return "The database is read-only, the changes will not be saved"
+
+            settings = {
+                setting.id: setting
+                for setting in session.query(Settings)
+                .with_entities(Settings.id, Settings.default, Settings.plugin_id, Settings.type, Settings.context)
+                .filter(Settings.id.in_(setting_ids))
+            }
+            for service_id, setting_id, _ in normalized:
+                if setting_id not in settings:
+                    return f"Setting {setting_id} doesn't exist"
+                if service_id and settings[setting_id].context != "multisite":
+                    return f"Setting {setting_id} is a global setting and can't be set for a service"
+
+            if service_ids:
+                existing_services = {service.id for service in session.query(Services).with_entities(Services.id).filter(Services.id.in_(service_ids))}
+                missing_services = sorted(service_ids - existing_services)
+                if missing_services:
+                    return f"Service {missing_services[0]} doesn't exist"
+
+            # Only the rows of the patched settings are loaded
+            global_rows = {
+                (None, row.setting_id, row.suffix or 0): row
+                for row in session.query(Global_values)
+                .with_entities(Global_values.setting_id, Global_values.suffix, Global_values.value, Global_values.file_name, Global_values.method)
+                .filter(Global_values.setting_id.in_(setting_ids))
+            }
+            service_rows = {}
+            if service_ids:
+                service_rows = {
+                    (row.service_id, row.setting_id, row.suffix or 0): row
+                    for row in session.query(Services_settings)
+                    .with_entities(
+                        Services_settings.service_id,
+                        Services_settings.setting_id,
+                        Services_settings.suffix,
+                        Services_settings.value,
+                        Services_settings.file_name,
+                        Services_settings.method,
+                    )
+                    .filter(Services_settings.service_id.in_(service_ids), Services_settings.setting_id.in_(setting_ids))
+                }
+
+            def current_value(key: Tuple[Optional[str], str, int]) -> Optional[str]:
+                if key in normalized:
+                    return normalized[key]
+                row = global_rows.get(key) if key[0] is None else service_rows.get(key)
+                return self._empty_if_none(row.value) if row else None
+
+            global_template = current_value((None, "USE_TEMPLATE", 0)) or ""
+            used_templates = {}
+            for service_id in {service_id for service_id, _, _ in normalized}:
+                template = current_value((service_id, "USE_TEMPLATE", 0)) if service_id else None
+                used_templates[service_id] = template if template is not None else global_template
+
+            template_defaults = {}
+            if any(used_templates.values()):
+                for template_setting in (
+                    session.query(Template_settings)
+                    .with_entities(Template_settings.template_id, Template_settings.setting_id, Template_settings.suffix, Template_settings.default)
+                    .filter(
+                        Template_settings.template_id.in_({template for template in used_templates.values() if template}),
+                        Template_settings.setting_id.in_(setting_ids),
+                    )
+                ):
+                    template_defaults[(template_setting.template_id, template_setting.setting_id, template_setting.suffix or 0)] = template_setting.default
+
+            upserts = {Global_values: [], Services_settings: []}
+            deletes = {Global_values: [], Services_settings: []}
+            touched_services = set()
+
+            for key, value in normalized.items():
+                service_id, setting_id, suffix = key
+                setting = settings[setting_id]
+                model = Services_settings if service_id else Global_values
+                row = service_rows.get(key) if service_id else global_rows.get(key)
+                key_filter = {"setting_id": setting_id, "suffix": suffix} | ({"service_id": service_id} if service_id else {})
+
+                if value is None:
+                    if row and (row.method == method or {row.method, method} <= {"ui", "api"}):
+                        deletes[model].append(key_filter)
+                        changed_plugins.add(setting.plugin_id)
+                    continue
+
+                template = used_templates[service_id]
+                default = template_defaults.get((template, setting_id, suffix)) if template else None
+                if default is None:
+                    if service_id:
+                        # A service value equal to the global one is inherited, like in save_config
+                        default = current_value((None, setting_id, suffix))
+                    if default is None:
+                        default = self._empty_if_none(setting.default)
+                is_default = setting_id != "SERVER_NAME" and value == self._empty_if_none(default)
+
+                current_file_name = self._empty_if_none(row.file_name) if row else ""
+                value_changed = bool(row and self._empty_if_none(row.value) != value)
+                file_name = None
+                file_name_changed = False
+                if setting.type == "file":
+                    if key in normalized_file_names:
+                        file_name = normalized_file_names[key] or None
+                        file_name_changed = normalized_file_names[key] != current_file_name
+                    elif value_changed and current_file_name:
+                        file_name_changed = True
+                    elif not value_changed:
+                        file_name = current_file_name or None
+
+                should_update = not row
+                if not row:
+                    if is_default:
+                        continue
+                else:
+                    should_update = (value_changed and self._methods_are_compatible(method, row.method, allow_scheduler_override=True)) or (
+                        method == "autoconf" and row.method != "autoconf"
+                    )
+                    if not should_update and not file_name_changed:
+                        continue
+                    if should_update and is_default:
+                        deletes[model].append(key_filter)
+                        changed_plugins.add(setting.plugin_id)
+                        continue
+
+                full_key = f"{setting_id}_{suffix}" if suffix else setting_id
+                self.logger.debug(f"{'Updating' if row else 'Adding'} setting {full_key}{f' for service {service_id}' if service_id else ''}")
+                upserts[model].append(key_filter | {"value": value, "file_name": file_name, "method": method})
+                if should_update:
+                    changed_plugins.add(setting.plugin_id)
+
+                if service_id:
+                    touched_services.add(service_id)
+                if setting_id == "USE_TEMPLATE":
+                    service_template_change = True
+                elif setting_id == "SERVER_NAME":
+                    changed_services = True
+
+            for model, key_filters in deletes.items():
+                if key_filters:
+                    session.query(model).filter(
+                        or_(*(and_(*(getattr(model, column) == value for column, value in key_filter.items())) for key_filter in key_filters))
+                    ).delete(synchronize_session=False)
+                    touched_services.update(key_filter["service_id"] for key_filter in key_filters if "service_id" in key_filter)
+
+            self._bulk_upsert(session, Global_values, upserts[Global_values], ["setting_id", "suffix"], ["value", "file_name", "method"])
+            self._bulk_upsert(session, Services_settings, upserts[Services_settings], ["service_id", "setting_id", "suffix"], ["value", "file_name", "method"])
+
+            if touched_services:
+                session.query(Services).filter(Services.id.in_(touched_services)).update(
+                    {Services.last_update: datetime.now().astimezone()}, synchronize_session=False
+                )
+
+            if changed_services:
+                changed_plugins = set(plugin.id for plugin in session.query(Plugins).with_entities(Plugins.id).all())
+
+            if changed:
+                with suppress(ProgrammingError, OperationalError):
+                    metadata = session.query(Metadata).get(1)
+                    if metadata is not None:
+                        if not metadata.first_config_saved:
+                            metadata.first_config_saved = True
+                        if service_template_change:
+                            metadata.custom_configs_changed = True
+                            metadata.last_custom_configs_change = datetime.now().astimezone()
+
+                    if changed_plugins:
+                        session.query(Plugins).filter(Plugins.id.in_(changed_plugins)).update({Plugins.config_changed: True}, synchronize_session=False)
+
+            try:
+                session.commit()
+            except BaseException as e:
+                session.rollback()
+                return str(e)
+
+        return changed_plugins
+
     def delete_custom_configs(
         self, keys: Set[Tuple[Optional[str], str, str]]
     ) -> Tuple[str, Set[Tuple[Optional[str], str, str]], Set[Tuple[Optional[str], str, str]]]:
@@ -2779,6 +3231,12 @@ class Database:
 
             return config
 
+    def get_config_generation(self) -> Optional[int]:
+        """Get the config generation, bumped by every transaction that changes the settings, services or templates."""
+        with suppress(SQLAlchemyError), self._db_session() as session:
+            return session.query(Config_generation.generation).filter_by(id=1).scalar()
+        return None
+
     @retry_on_transient_db_errors
     def get_config(
         self,
@@ -2789,7 +3247,43 @@ class Database:
         *,
         service: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """Get the config from the database"""
+        """Get the config from the database, served from the snapshot cache while the config generation is unchanged"""
+        generation = self.get_config_generation() if self._config_cache_size and self._has_config_generation() else None
+        if generation is None:
+            return self._compute_config(global_only, methods, with_drafts, filtered_settings, service=service)
+
+        key = (global_only, with_drafts, frozenset(filtered_settings or ()), service or "")
+        with self._config_cache_lock:
+            if self._config_cache_generation != generation:
+                self._config_cache.clear()
+                self._config_cache_generation = generation
+            config = self._config_cache.get(key)
+            if config is not None:
+                self._config_cache.move_to_end(key)
+
+        if config is None:
+            # The snapshot keeps the methods so the values only view is derived from it
+            config = self._compute_config(global_only, True, with_drafts, filtered_settings, service=service)
+            with self._config_cache_lock:
+                if self._config_cache_generation == generation:
+                    self._config_cache[key] = config
+                    while len(self._config_cache) > self._config_cache_size:
+                        self._config_cache.popitem(last=False)
+
+        # Callers may update the returned config, the snapshot itself is never handed out
+        if methods:
+            return {setting: data.copy() for setting, data in config.items()}
+        return {setting: data["value"] for setting, data in config.items()}
+
+    def _compute_config(
+        self,
+        global_only: bool = False,
+        methods: bool = False,
+        with_drafts: bool = False,
+        filtered_settings: Optional[Union[List[str], Set[str], Tuple[str]]] = None,
+        *,
+        service: Optional[str] = None,
+    ) -> Dict[str, Any]:
         filtered_settings = set(filtered_settings or [])
 
         if filtered_settings and not global_only:
@@ -2954,8 +3448,23 @@ class Database:
         if multiple:
             with self._db_session() as session:
                 query = session.query(Settings).with_entities(Settings.id, Settings.default).filter(Settings.multiple.in_(multiple.keys()))
+                multiple_settings = query.all()
+
+                # Batch query: fetch the template defaults of every multiple setting at once
+                template_defaults = {}
+                used_templates = {template for template in templates.values() if template}
+                if used_templates and multiple_settings:
+                    for template_setting in (
+                        session.query(Template_settings)
+                        .with_entities(Template_settings.template_id, Template_settings.setting_id, Template_settings.suffix, Template_settings.default)
+                        .filter(
+                            Template_settings.template_id.in_(used_templates),
+                            Template_settings.setting_id.in_([setting.id for setting in multiple_settings]),
+                        )
+                    ):
+                        template_defaults[(template_setting.template_id, template_setting.setting_id, template_setting.suffix)] = template_setting.default
 
-                for setting in query:
+                for setting in multiple_settings:
                     group_key = multiple_groups.get(setting.id)
                     if group_key is None or group_key not in multiple:
                         continue
@@ -2970,12 +3479,8 @@ class Database:
 
                             default = self._empty_if_none(setting.default)
                             value = deepcopy(default)
-                            if template:
-                                template_setting = (
-                                    session.query(Template_settings).filter_by(template_id=template, setting_id=setting.id, suffix=suffix).first()
-                                )
-                                if template_setting is not None:
-                                    value = self._empty_if_none(template_setting.default)
+                            if template and (template, setting.id, suffix) in template_defaults:
+                                value = self._empty_if_none(template_defaults[(template, setting.id, suffix)])
 
                             if key not in config:
                                 config[key] = (
@@ -3378,7 +3883,10 @@ class Database:
             if self.readonly:
                 return "The database is read-only, the changes will not be saved"
 
+            released = [row.checksum for row in session.query(Jobs_cache.checksum).filter_by(**filters).filter(Jobs_cache.data.is_(None))]
             session.query(Jobs_cache).filter_by(**filters).delete(synchronize_session=False)
+            for checksum in released:
+                self._release_job_cache_blob(session, checksum)
 
             try:
                 session.commit()
@@ -3387,43 +3895,129 @@ class Database:
 
         return ""
 
+    def _store_job_cache_blob(self, session, checksum: str, data: Union[bytes, Path]) -> None:
+        """Reference the blob with this checksum, storing its content only if no cache file already holds it.
+
+        A file is read by chunks of JOB_CACHE_BLOB_CHUNK_SIZE bytes, the first one is stored in the blob and the following ones
+        in bw_jobs_cache_blob_chunks, so that no stored value is ever rewritten.
+        """
+        if self._reference_job_cache_blob(session, checksum):
+            return
+
+        with ExitStack() as stack:
+            file = None
+            if isinstance(data, bytes):
+                chunk, size = data, len(data)
+            else:
+                file = stack.enter_context(data.open("rb"))
+                chunk, size = file.read(JOB_CACHE_BLOB_CHUNK_SIZE), data.stat().st_size
+
+            # Another writer can store the same new blob concurrently, the insert waits for it and then fails on the checksum:
+            # only the savepoint is rolled back and the blob it stored is referenced instead
+            try:
+                with session.begin_nested():
+                    session.add(Jobs_cache_blobs(checksum=checksum, data=chunk, size=size, refcount=1, creation_date=datetime.now().astimezone()))
+            except IntegrityError:
+                self._reference_job_cache_blob(session, checksum)
+                return
+
+            seq = 0
+            while file and (chunk := file.read(JOB_CACHE_BLOB_CHUNK_SIZE)):
+                seq += 1
+                session.add(Jobs_cache_blob_chunks(checksum=checksum, seq=seq, data=chunk))
+                # One chunk at a time in the session
+                session.flush()
+
+    def _reference_job_cache_blob(self, session, checksum: str) -> bool:
+        """Add a reference to the blob with this checksum, returns False when it isn't stored yet."""
+        return bool(
+            session.query(Jobs_cache_blobs)
+            .filter(Jobs_cache_blobs.checksum == checksum)
+            .update({Jobs_cache_blobs.refcount: Jobs_cache_blobs.refcount + 1}, synchronize_session=False)
+        )
+
+    def _release_job_cache_blob(self, session, checksum: Optional[str]) -> None:
+        """Drop one reference to a blob, unreferenced blobs are deleted by cleanup_job_cache_blobs."""
+        if checksum:
+            session.query(Jobs_cache_blobs).filter(Jobs_cache_blobs.checksum == checksum, Jobs_cache_blobs.refcount > 0).update(
+                {Jobs_cache_blobs.refcount: Jobs_cache_blobs.refcount - 1}, synchronize_session=False
+            )
+
+    def cleanup_job_cache_blobs(self) -> str:
+        """Recount the references of the job cache blobs and remove the unused ones."""
+        with self._db_session() as session:
+            if self.readonly:
+                return "The database is read-only, the changes will not be saved"
+
+            # Cache rows can also be removed in bulk with their job, plugin or service, so the stored counts are recomputed
+            references = (
+                session.query(func.count(Jobs_cache.id))
+                .filter(Jobs_cache.checksum == Jobs_cache_blobs.checksum, Jobs_cache.data.is_(None))
+                .correlate(Jobs_cache_blobs)
+                .scalar_subquery()
+            )
+            session.query(Jobs_cache_blobs).update({Jobs_cache_blobs.refcount: references}, synchronize_session=False)
+            # The chunks are deleted explicitly, foreign keys aren't enforced by SQLite
+            unused = session.query(Jobs_cache_blobs.checksum).filter(Jobs_cache_blobs.refcount <= 0).scalar_subquery()
+            session.query(Jobs_cache_blob_chunks).filter(Jobs_cache_blob_chunks.checksum.in_(unused)).delete(synchronize_session=False)
+            deleted = session.query(Jobs_cache_blobs).filter(Jobs_cache_blobs.refcount <= 0).delete(synchronize_session=False)
+
+            try:
+                session.commit()
+            except BaseException as e:
+                return str(e)
+
+        return f"Removed {deleted} unused job cache blobs"
+
     def upsert_job_cache(
         self,
         service_id: Optional[str],
         file_name: str,
-        data: bytes,
+        data: Union[bytes, Path],
         *,
         job_name: Optional[str] = None,
         checksum: Optional[str] = None,
     ) -> str:
-        """Update the plugin cache in the database"""
+        """Update the plugin cache in the database, data can be a file that is then read by chunks"""
         job_name = job_name or argv[0].replace(".py", "")
         service_id = service_id or None
         with self._db_session() as session:
             if self.readonly:
                 return "The database is read-only, the changes will not be saved"
 
-            cache = session.query(Jobs_cache).filter_by(job_name=job_name, service_id=service_id, file_name=file_name).first()
+            # Only the checksum is compared, the stored content is never loaded
+            cache = (
+                session.query(Jobs_cache)
+                .with_entities(Jobs_cache.id, Jobs_cache.checksum, Jobs_cache.data.is_(None).label("deduplicated"))
+                .filter_by(job_name=job_name, service_id=service_id, file_name=file_name)
+                .first()
+            )
 
-            if not cache:
-                session.add(
-                    Jobs_cache(
-                        job_name=job_name,
-                        service_id=service_id,
-                        file_name=file_name,
-                        data=data,
-                        last_update=datetime.now().astimezone(),
-                        checksum=checksum,
-                    )
-                )
+            if cache and checksum is not None and cache.checksum == checksum:
+                # Data unchanged — refresh timestamp to reset expiry window
+                session.query(Jobs_cache).filter_by(id=cache.id).update({Jobs_cache.last_update: datetime.now().astimezone()}, synchronize_session=False)
             else:
-                if checksum is None or cache.checksum != checksum:
-                    cache.data = data
-                    cache.last_update = datetime.now().astimezone()
-                    cache.checksum = checksum
+                checksum = checksum or (file_hash(data) if isinstance(data, Path) else bytes_hash(data))
+                self._store_job_cache_blob(session, checksum, data)
+
+                if not cache:
+                    session.add(
+                        Jobs_cache(
+                            job_name=job_name,
+                            service_id=service_id,
+                            file_name=file_name,
+                            data=None,
+                            last_update=datetime.now().astimezone(),
+                            checksum=checksum,
+                        )
+                    )
                 else:
-                    # Data unchanged — refresh timestamp to reset expiry window
-                    cache.last_update = datetime.now().astimezone()
+                    if cache.deduplicated:
+                        self._release_job_cache_blob(session, cache.checksum)
+                    session.query(Jobs_cache).filter_by(id=cache.id).update(
+                        {Jobs_cache.data: None, Jobs_cache.last_update: datetime.now().astimezone(), Jobs_cache.checksum: checksum},
+                        synchronize_session=False,
+                    )
 
             try:
                 session.commit()
@@ -4735,7 +5329,9 @@ class Database:
         if with_info:
             entities.extend([Jobs_cache.last_update, Jobs_cache.checksum])
         if with_data:
-            entities.append(Jobs_cache.data)
+            entities.extend(
+                [func.coalesce(Jobs_cache.data, Jobs_cache_blobs.data).label("data"), Jobs_cache_blobs.checksum.label("blob"), Jobs_cache_blobs.size]
+            )
 
         filters = {"job_name": job_name, "file_name": file_name, "service_id": service_id or None}
 
@@ -4744,34 +5340,47 @@ class Database:
                 job = session.query(Jobs).filter_by(name=job_name, plugin_id=plugin_id).first()
                 if not job:
                     return None
-            data = session.query(Jobs_cache).with_entities(*entities).filter_by(**filters).first()
+            query = session.query(Jobs_cache).with_entities(*entities)
+            if with_data:
+                query = query.outerjoin(Jobs_cache_blobs, (Jobs_cache_blobs.checksum == Jobs_cache.checksum) & Jobs_cache.data.is_(None))
+            data = query.filter(*(getattr(Jobs_cache, key) == value for key, value in filters.items())).first()
+            content = self._join_job_cache_blob_chunks(session, data.blob, data.data, data.size) if data and with_data else None
 
         if not data:
             return None
         elif with_data and not with_info:
-            return data.data
+            return content
 
         ret_data = {}
         if with_info:
             ret_data["last_update"] = data.last_update.timestamp() if data.last_update is not None else "Never"
             ret_data["checksum"] = data.checksum
         if with_data:
-            ret_data["data"] = data.data
+            ret_data["data"] = content
         return ret_data
 
-    def get_jobs_cache_files(self, *, with_data: bool = True, job_name: str = "", plugin_id: str = "") -> List[Dict[str, Any]]:
-        """Get jobs cache files."""
+    def get_jobs_cache_files(
+        self, *, with_data: bool = True, job_name: str = "", plugin_id: str = "", checksums: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Get jobs cache files, optionally only the ones with the given checksums."""
         with self._db_session() as session:
             filters = {}
             entities = [Jobs_cache.job_name, Jobs_cache.service_id, Jobs_cache.file_name, Jobs_cache.last_update, Jobs_cache.checksum]
             if with_data:
-                entities.append(Jobs_cache.data)
+                entities.extend(
+                    [func.coalesce(Jobs_cache.data, Jobs_cache_blobs.data).label("data"), Jobs_cache_blobs.checksum.label("blob"), Jobs_cache_blobs.size]
+                )
             query = session.query(Jobs_cache).with_entities(*entities)
+            if with_data:
+                query = query.outerjoin(Jobs_cache_blobs, (Jobs_cache_blobs.checksum == Jobs_cache.checksum) & Jobs_cache.data.is_(None))
 
             if job_name:
-                query = query.filter_by(job_name=job_name)
+                query = query.filter(Jobs_cache.job_name == job_name)
                 filters["name"] = job_name
 
+            if checksums is not None:
+                query = query.filter(Jobs_cache.checksum.in_(set(checksums)))
+
             db_cache = query.all()
 
             if not db_cache:
@@ -4807,10 +5416,17 @@ class Database:
                     }
                 )
                 if with_data:
-                    cache_files[-1]["data"] = cache.data
+                    cache_files[-1]["data"] = self._join_job_cache_blob_chunks(session, cache.blob, cache.data, cache.size)
 
             return cache_files
 
+    def _join_job_cache_blob_chunks(self, session, checksum: Optional[str], data: Optional[bytes], size: Optional[int]) -> Optional[bytes]:
+        """Append the following chunks of a blob stored by chunks to its first one."""
+        if not checksum or data is None or size is None or len(data) >= size:
+            return data
+        chunks = session.query(Jobs_cache_blob_chunks.data).filter_by(checksum=checksum).order_by(Jobs_cache_blob_chunks.seq)
+        return b"".join(chain((data,), (chunk.data for chunk in chunks)))
+
     def add_instance(
         self,
         hostname: str,
@@ -5066,6 +5682,12 @@ class Database:
 
         return ""
 
+    def get_last_instances_change(self) -> Optional[datetime]:
+        """Get the date of the last change made to the instances, None when it is unknown."""
+        with suppress(SQLAlchemyError), self._db_session() as session:
+            return session.query(Metadata).with_entities(Metadata.last_instances_change).filter(Metadata.id == 1).scalar()
+        return None
+
     def get_instances(self, *, method: Optional[str] = None, autoconf: bool = False) -> List[Dict[str, Any]]:
         """Get instances."""
         with self._db_session() as session:
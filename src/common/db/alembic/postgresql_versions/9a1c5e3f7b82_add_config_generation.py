@@ -0,0 +1,34 @@
+"""Add the config generation counter
+
+Revision ID: 9a1c5e3f7b82
+Revises: a47e2d8c5b16
+Create Date: 2026-10-18 11:03:27.482193
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "9a1c5e3f7b82"
+down_revision: Union[str, None] = "a47e2d8c5b16"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The counter has its own table so that bw_metadata keeps loading on the databases that weren't migrated yet
+    if not sa.inspect(op.get_bind()).has_table("bw_config_generation"):
+        op.create_table(
+            "bw_config_generation",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("generation", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.bulk_insert(sa.table("bw_config_generation", sa.column("id", sa.Integer()), sa.column("generation", sa.Integer())), [{"id": 1, "generation": 0}])
+
+
+def downgrade() -> None:
+    op.drop_table("bw_config_generation")
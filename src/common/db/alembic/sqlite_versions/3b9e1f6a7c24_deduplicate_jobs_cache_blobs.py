@@ -0,0 +1,92 @@
+"""Deduplicate the jobs cache blobs
+
+Revision ID: 3b9e1f6a7c24
+Revises: f46c56af5b20
+Create Date: 2026-10-18 09:12:40.114852
+
+"""
+
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9e1f6a7c24"
+down_revision: Union[str, None] = "f46c56af5b20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    # The table may already exist if it was created by the scheduler on startup
+    if not inspector.has_table("bw_jobs_cache_blobs"):
+        op.create_table(
+            "bw_jobs_cache_blobs",
+            sa.Column("checksum", sa.String(128), nullable=False),
+            sa.Column("data", sa.LargeBinary(length=(2**32) - 1), nullable=False),
+            sa.Column("size", sa.Integer(), nullable=False),
+            sa.Column("refcount", sa.Integer(), nullable=False),
+            sa.Column("creation_date", sa.DateTime(timezone=True), nullable=False),
+            sa.PrimaryKeyConstraint("checksum"),
+        )
+
+    # The chunks following the first one of the files stored by chunks
+    if not inspector.has_table("bw_jobs_cache_blob_chunks"):
+        op.create_table(
+            "bw_jobs_cache_blob_chunks",
+            sa.Column("checksum", sa.String(128), nullable=False),
+            sa.Column("seq", sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column("data", sa.LargeBinary(length=(2**32) - 1), nullable=False),
+            sa.ForeignKeyConstraint(["checksum"], ["bw_jobs_cache_blobs.checksum"], onupdate="cascade", ondelete="cascade"),
+            sa.PrimaryKeyConstraint("checksum", "seq"),
+        )
+
+    if "ix_bw_jobs_cache_checksum" not in {index["name"] for index in inspector.get_indexes("bw_jobs_cache")}:
+        op.create_index("ix_bw_jobs_cache_checksum", "bw_jobs_cache", ["checksum"])
+
+    # Move the inline cache contents into the blobs table, one row at a time to keep the memory usage bounded
+    jobs_cache = sa.table("bw_jobs_cache", sa.column("id", sa.Integer()), sa.column("data", sa.LargeBinary()), sa.column("checksum", sa.String(128)))
+    blobs = sa.table(
+        "bw_jobs_cache_blobs",
+        sa.column("checksum", sa.String(128)),
+        sa.column("data", sa.LargeBinary()),
+        sa.column("size", sa.Integer()),
+        sa.column("refcount", sa.Integer()),
+        sa.column("creation_date", sa.DateTime(timezone=True)),
+    )
+    stored = {row.checksum for row in conn.execute(sa.select(blobs.c.checksum))}
+    rows = conn.execute(sa.select(jobs_cache.c.id, jobs_cache.c.checksum).where(jobs_cache.c.data.is_not(None), jobs_cache.c.checksum.is_not(None))).fetchall()
+    for row in rows:
+        if row.checksum not in stored:
+            data = conn.execute(sa.select(jobs_cache.c.data).where(jobs_cache.c.id == row.id)).scalar()
+            conn.execute(blobs.insert().values(checksum=row.checksum, data=data, size=len(data), refcount=0, creation_date=datetime.now().astimezone()))
+            stored.add(row.checksum)
+        conn.execute(jobs_cache.update().where(jobs_cache.c.id == row.id).values(data=None))
+
+    # Count the references once every row has been moved
+    references = sa.select(sa.func.count(jobs_cache.c.id)).where(jobs_cache.c.checksum == blobs.c.checksum, jobs_cache.c.data.is_(None)).scalar_subquery()
+    conn.execute(blobs.update().values(refcount=references))
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+
+    # Put the contents back in the cache rows before dropping the blobs table
+    jobs_cache = sa.table("bw_jobs_cache", sa.column("id", sa.Integer()), sa.column("data", sa.LargeBinary()), sa.column("checksum", sa.String(128)))
+    blobs = sa.table("bw_jobs_cache_blobs", sa.column("checksum", sa.String(128)), sa.column("data", sa.LargeBinary()))
+    chunks = sa.table("bw_jobs_cache_blob_chunks", sa.column("checksum", sa.String(128)), sa.column("seq", sa.Integer()), sa.column("data", sa.LargeBinary()))
+    rows = conn.execute(sa.select(jobs_cache.c.id, jobs_cache.c.checksum).where(jobs_cache.c.data.is_(None), jobs_cache.c.checksum.is_not(None))).fetchall()
+    for row in rows:
+        data = conn.execute(sa.select(blobs.c.data).where(blobs.c.checksum == row.checksum)).scalar()
+        if data is not None:
+            data += b"".join(conn.execute(sa.select(chunks.c.data).where(chunks.c.checksum == row.checksum).order_by(chunks.c.seq)).scalars())
+            conn.execute(jobs_cache.update().where(jobs_cache.c.id == row.id).values(data=data))
+
+    op.drop_index("ix_bw_jobs_cache_checksum", table_name="bw_jobs_cache")
+    op.drop_table("bw_jobs_cache_blob_chunks")
+    op.drop_table("bw_jobs_cache_blobs")
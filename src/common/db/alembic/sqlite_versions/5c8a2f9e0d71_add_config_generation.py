@@ -0,0 +1,34 @@
+"""Add the config generation counter
+
+Revision ID: 5c8a2f9e0d71
+Revises: 3b9e1f6a7c24
+Create Date: 2026-10-18 11:03:27.482193
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "5c8a2f9e0d71"
+down_revision: Union[str, None] = "3b9e1f6a7c24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The counter has its own table so that bw_metadata keeps loading on the databases that weren't migrated yet
+    if not sa.inspect(op.get_bind()).has_table("bw_config_generation"):
+        op.create_table(
+            "bw_config_generation",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("generation", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.bulk_insert(sa.table("bw_config_generation", sa.column("id", sa.Integer()), sa.column("generation", sa.Integer())), [{"id": 1, "generation": 0}])
+
+
+def downgrade() -> None:
+    op.drop_table("bw_config_generation")
@@ -200,14 +200,34 @@ class Jobs_cache(Base):
     job_name = Column(String(128), ForeignKey("bw_jobs.name", onupdate="cascade", ondelete="cascade"), nullable=False, index=True)
     service_id = Column(String(256), ForeignKey("bw_services.id", onupdate="cascade", ondelete="cascade"), nullable=True, index=True)
     file_name = Column(String(256), nullable=False)
+    # NULL when the content is stored once in bw_jobs_cache_blobs under the row checksum
     data = Column(LargeBinary(length=(2**32) - 1), nullable=True)
     last_update = Column(DateTime(timezone=True), nullable=True)
-    checksum = Column(String(128), nullable=True)
+    checksum = Column(String(128), nullable=True, index=True)
 
     job = relationship("Jobs", back_populates="cache")
     service = relationship("Services", back_populates="jobs_cache")
 
 
+class Jobs_cache_blobs(Base):
+    __tablename__ = "bw_jobs_cache_blobs"
+
+    checksum = Column(String(128), primary_key=True)
+    # First chunk of the content, the following ones are stored in bw_jobs_cache_blob_chunks (size is the total size)
+    data = Column(LargeBinary(length=(2**32) - 1), nullable=False)
+    size = Column(Integer, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0)
+    creation_date = Column(DateTime(timezone=True), nullable=False)
+
+
+class Jobs_cache_blob_chunks(Base):
+    __tablename__ = "bw_jobs_cache_blob_chunks"
+
+    checksum = Column(String(128), ForeignKey("bw_jobs_cache_blobs.checksum", onupdate="cascade", ondelete="cascade"), primary_key=True)
+    seq = Column(Integer, primary_key=True, autoincrement=False)
+    data = Column(LargeBinary(length=(2**32) - 1), nullable=False)
+
+
 class Jobs_runs(Base):
     __tablename__ = "bw_jobs_runs"
 
@@ -361,6 +381,13 @@ class Metadata(Base):
     version = Column(String(32), default="1.6.13", nullable=False)
 
 
+class Config_generation(Base):
+    __tablename__ = "bw_config_generation"
+
+    id = Column(Integer, primary_key=True, default=1)
+    generation = Column(Integer, default=0, nullable=False)
+
+
 ## UI Models
 
 THEMES_ENUM = Enum("light", "dark", name="themes_enum")
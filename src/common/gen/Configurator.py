@@ -9,7 +9,7 @@ from logging import Logger
 from os import getenv, listdir, sep
 from os.path import join
 from pathlib import Path
-from re import DOTALL, compile as re_compile, error as RegexError, search as re_search
+from re import compile as re_compile, error as RegexError
 from sys import path as sys_path
 from typing import Dict, List, Literal, Optional, Set, Tuple, Union
 
@@ -17,6 +17,7 @@ if join(sep, "usr", "share", "bunkerweb", "utils") not in sys_path:
     sys_path.append(join(sep, "usr", "share", "bunkerweb", "utils"))
 
 from common_utils import bytes_hash, create_plugin_tar_gz  # type: ignore
+from setting_validator import SettingValidator  # type: ignore
 
 
 class Configurator:
@@ -48,6 +49,7 @@ class Configurator:
 
         # Pre-compile regex patterns cache
         self.__compiled_regexes = {}
+        self.__validator: Optional[SettingValidator] = None
 
         # Pre-defined exclusion sets for config processing
         self.__excluded_prefixes = ("_", "PYTHON", "KUBERNETES_", "SVC_", "LB_", "SUPERVISOR_")
@@ -343,58 +345,22 @@ class Configurator:
         return config
 
     def __check_var(self, variable: str) -> Tuple[bool, str]:
-        value = self.__variables[variable]
-        # MULTISITE=no
-        if not self.__multisite:
-            where, real_var = self.__find_var(variable)
-            if not where:
-                return False, f"variable name {variable} doesn't exist"
-
-            try:
-                regex_flags = DOTALL if where[real_var].get("type") == "file" else 0
-                if not self.__ignore_regex_check and re_search(where[real_var]["regex"], value, regex_flags) is None:
-                    return (False, f"value {value} doesn't match regex {where[real_var]['regex']}")
-            except RegexError:
-                self.__logger.warning(f"Invalid regex for {variable} : {where[real_var]['regex']}, ignoring regex check")
-
-            return True, "ok"
-        # MULTISITE=yes
-        prefixed, real_var = self.__var_is_prefixed(variable)
-        where, real_var = self.__find_var(real_var)
-        if not where:
-            return False, f"variable name {variable} doesn't exist"
-        elif prefixed and where[real_var]["context"] != "multisite":
-            return False, f"context of {variable} isn't multisite"
-
-        try:
-            regex_flags = DOTALL if where[real_var].get("type") == "file" else 0
-            if not self.__ignore_regex_check and re_search(where[real_var]["regex"], value, regex_flags) is None:
-                return (False, f"value {value} doesn't match regex {where[real_var]['regex']}")
-        except RegexError:
-            self.__logger.warning(f"Invalid regex for {variable} : {where[real_var]['regex']}, ignoring regex check")
-
-        return True, "ok"
-
-    def __find_var(self, variable: str) -> Tuple[Optional[Dict[str, str]], str]:
-        targets = [
-            self.get_settings(),
-            self.get_plugins_settings("core"),
-            self.get_plugins_settings("external"),
-            self.get_plugins_settings("pro"),
-        ]
-        for target in targets:
-            if variable in target:
-                return target, variable
-            for real_var, settings in target.items():
-                if "multiple" in settings and re_search(f"^{real_var}_[0-9]+$", variable):
-                    return target, real_var
-        return None, variable
-
-    def __var_is_prefixed(self, variable: str) -> Tuple[bool, str]:
-        for server in self.__servers:
-            if variable.startswith(f"{server}_"):
-                return True, variable.replace(f"{server}_", "", 1)
-        return False, variable
+        # Service prefixed variables are only accepted with MULTISITE=yes
+        return self.__get_validator().check(variable, self.__variables[variable], self.__servers if self.__multisite else ())
+
+    def __get_validator(self) -> SettingValidator:
+        """Build the validator of the settings and plugins once, with their regexes compiled."""
+        if self.__validator is None:
+            self.__validator = SettingValidator.from_plugins(
+                self.get_settings(),
+                self.get_plugins_settings("core"),
+                self.get_plugins_settings("external"),
+                self.get_plugins_settings("pro"),
+                ignore_regex_check=self.__ignore_regex_check,
+            )
+            for setting, regex in self.__validator.invalid_regexes.items():
+                self.__logger.warning(f"Invalid regex for {setting} : {regex}, ignoring regex check")
+        return self.__validator
 
     def __validate_plugin(self, plugin: dict) -> Tuple[bool, str]:
         if not all(key in plugin for key in self.__mandatory_plugin_keys):
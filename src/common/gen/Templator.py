@@ -7,18 +7,22 @@ from ctypes.util import find_library
 from functools import lru_cache
 from importlib import import_module
 from glob import glob
+from hashlib import sha256
+from json import JSONDecodeError, dumps, loads
 from math import ceil
 import multiprocessing as mp
+from os import walk
 from os.path import basename, join, sep
 from pathlib import Path
 from random import choice
+from shutil import rmtree
 from ssl import PROTOCOL_TLS_SERVER, SSLContext
 from string import ascii_letters, digits
 from re import search as re_search, escape as re_escape
 from subprocess import run
 from sys import path as sys_path
 from time import perf_counter
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type
 
 deps_path = join("usr", "share", "bunkerweb", "deps", "python")
 if deps_path not in sys_path:
@@ -28,10 +32,18 @@ from common_utils import effective_cpu_count  # type: ignore
 from logger import getLogger  # type: ignore
 
 from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Undefined
+from jinja2.runtime import Context
 
 logger = getLogger("TEMPLATOR")
 _ssl_ecdh_curve_resolution_logged = False
 
+INCREMENTAL_STATE_VERSION = 1
+INCREMENTAL_STATE_DIR = Path(sep, "var", "tmp", "bunkerweb", "templator")
+# Helpers whose result depends on the filesystem or on randomness: templates using them are always re-rendered
+VOLATILE_TEMPLATE_HELPERS = frozenset(("import", "random", "read_lines", "is_custom_conf"))
+_MISSING_VALUE = "\x00missing"
+_recorded_dependencies: Optional[Set[str]] = None
+
 
 @lru_cache(maxsize=1)
 def _set1_groups_list_probe():
@@ -302,6 +314,119 @@ def create_custom_undefined_class(default_config: Dict[str, Any]):
     return ConfigurableCustomUndefined
 
 
+class _RecordingContext(Context):
+    """Jinja context recording every top-level variable resolved by a template."""
+
+    def resolve_or_missing(self, key: str) -> Any:
+        if _recorded_dependencies is not None:
+            _recorded_dependencies.add(f"v:{key}")
+        return super().resolve_or_missing(key)
+
+
+class _RecordingDict(dict):
+    """Dictionary recording the keys read through the ``all`` template variable."""
+
+    __slots__ = ()
+
+    @staticmethod
+    def _record(key: Any) -> None:
+        if _recorded_dependencies is not None:
+            _recorded_dependencies.add(f"a:{key}")
+
+    def __getitem__(self, key: Any) -> Any:
+        self._record(key)
+        return super().__getitem__(key)
+
+    def __contains__(self, key: Any) -> bool:
+        self._record(key)
+        return super().__contains__(key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        self._record(key)
+        return super().get(key, default)
+
+    def __iter__(self):
+        self._record("*")
+        return super().__iter__()
+
+    def __len__(self) -> int:
+        self._record("*")
+        return super().__len__()
+
+    def items(self):
+        self._record("*")
+        return super().items()
+
+    def keys(self):
+        self._record("*")
+        return super().keys()
+
+    def values(self):
+        self._record("*")
+        return super().values()
+
+
+def _hash_items(items: Iterable[Tuple[str, Any]]) -> str:
+    """Return a stable digest of (key, value) pairs."""
+    digest = sha256()
+    for key, value in sorted(items, key=lambda item: item[0]):
+        digest.update(f"{key}={value!r}\x00".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _RenderScope:
+    """Values a rendered file of a given scope (global or one server) can depend on."""
+
+    __slots__ = ("template_vars", "default_config", "unchanged", "_digest", "_all_digest")
+
+    def __init__(self, template_vars: Dict[str, Any], default_config: Dict[str, Any]):
+        self.template_vars = template_vars
+        self.default_config = default_config
+        self.unchanged = False
+        self._digest: Optional[str] = None
+        self._all_digest: Optional[str] = None
+
+    @property
+    def digest(self) -> str:
+        """Digest of every setting of the scope."""
+        if self._digest is None:
+            self._digest = _hash_items(
+                [(f"v:{k}", v) for k, v in self.template_vars.items() if k != "all" and not callable(v)]
+                + [("a:*", self.all_digest)]
+                + [(f"d:{k}", v) for k, v in self.default_config.items()]
+            )
+        return self._digest
+
+    @property
+    def all_digest(self) -> str:
+        """Digest of the ``all`` template variable."""
+        if self._all_digest is None:
+            self._all_digest = _hash_items(dict.items(self.template_vars["all"]))
+        return self._all_digest
+
+    def dependencies_digest(self, deps: Iterable[str]) -> str:
+        """Digest of the current values of the recorded dependencies.
+
+        Args:
+            deps (Iterable[str]): Dependencies recorded while rendering (``v:NAME`` for variables, ``a:NAME`` for ``all`` keys).
+
+        Returns:
+            str: The digest.
+        """
+        items = []
+        for dep in deps:
+            kind, _, key = dep.partition(":")
+            if kind == "a":
+                value = self.all_digest if key == "*" else dict.get(self.template_vars["all"], key, _MISSING_VALUE)
+            else:
+                value = self.template_vars.get(key, _MISSING_VALUE)
+                if key == "all" or callable(value):
+                    value = key
+                value = (value, self.default_config.get(key, _MISSING_VALUE))
+            items.append((dep, value))
+        return _hash_items(items)
+
+
 def _ensure_fork_start_method() -> None:
     """Force fork start method when available so child processes inherit globals."""
     with suppress(RuntimeError):
@@ -323,6 +448,7 @@ class Templator:
         config: Dict[str, Any],
         default_config: Dict[str, Any],
         full_config: Dict[str, Any],
+        incremental: bool = False,
     ):
         """Initialize the Templator with paths and configuration.
 
@@ -334,6 +460,7 @@ class Templator:
             output (str): Path to the output directory.
             target (str): Target path.
             config (Dict[str, Any]): Configuration dictionary.
+            incremental (bool, optional): Only re-render the files whose inputs changed since the last run. Defaults to False.
         """
         if not isinstance(templates, str):
             raise TypeError("templates must be a string")
@@ -363,6 +490,10 @@ class Templator:
         self._default_config = default_config
         self._full_config = full_config
         self._custom_undefined = create_custom_undefined_class(default_config)
+        self._incremental = incremental
+        self._state_path = INCREMENTAL_STATE_DIR.joinpath(f"{sha256(self._output.resolve().as_posix().encode()).hexdigest()[:16]}.json")
+        self._templates_fingerprint = ""
+        self._templates_changed = True
 
         if config.get("MULTISITE", "no") == "yes":
             server_names = config.get("SERVER_NAME", "www.example.com").strip().split()
@@ -444,15 +575,38 @@ class Templator:
 
         self._server_env_cache: Dict[str, Environment] = {}
 
-    def render(self) -> None:
-        """Render the templates based on the provided configuration."""
+    def render(self) -> Set[str]:
+        """Render the templates based on the provided configuration.
+
+        Returns:
+            Set[str]: Output paths (relative to the output directory) that were written or removed.
+        """
         global _ssl_ecdh_curve_resolution_logged
 
         _ensure_fork_start_method()
         _ssl_ecdh_curve_resolution_logged = False
         if self._uses_auto_ssl_ecdh_curve():
             resolve_ssl_ecdh_curve("auto")
-        self._render_global()
+
+        previous_state = self._load_state() if self._incremental else {}
+        if not self._incremental:
+            # A full render invalidates whatever an earlier incremental render recorded
+            self._state_path.unlink(missing_ok=True)
+        else:
+            self._templates_fingerprint = self._compute_templates_fingerprint()
+            self._templates_changed = previous_state.get("templates") != self._templates_fingerprint
+            if not previous_state:
+                logger.info("No previous render state found, rendering every template ...")
+                self._clear_output()
+            elif self._templates_changed:
+                logger.info("Templates changed since the last render, checking every rendered file ...")
+
+        changed: Set[str] = set()
+        previous_servers: Dict[str, Dict[str, Any]] = previous_state.get("servers", {})
+        new_state: Dict[str, Any] = {"servers": {}}
+        new_state["global"], global_changed = self._render_global(previous_state.get("global"))
+        changed.update(global_changed)
+
         servers = [self._config.get("SERVER_NAME", "www.example.com").strip()]
         if self._config.get("MULTISITE", "no") == "yes":
             servers = self._config.get("SERVER_NAME", "www.example.com").strip().split()
@@ -470,19 +624,139 @@ class Templator:
             future_to_batch = {}
             for i in range(0, len(servers), batch_size):
                 batch = servers[i : i + batch_size]  # noqa: E203
-                future = executor.submit(self._render_server_batch, batch)
+                future = executor.submit(self._render_server_batch, batch, {server: previous_servers[server] for server in batch if server in previous_servers})
                 future_to_batch[future] = len(batch)
 
             completed_servers = 0
             show_progress = len(servers) >= 100
             for future in as_completed(future_to_batch):
-                future.result()  # Raise any exceptions
+                batch_state, batch_changed = future.result()  # Raise any exceptions
+                new_state["servers"].update(batch_state)
+                changed.update(batch_changed)
                 completed_servers += future_to_batch[future]
                 if show_progress:
                     progress_pct = (completed_servers / len(servers)) * 100
                     elapsed = perf_counter() - server_start
                     logger.info(f"Progress: {completed_servers}/{len(servers)} servers ({progress_pct:.1f}%) in {elapsed:.1f}s")
 
+        if self._incremental:
+            changed.update(self._remove_stale_outputs(previous_state, new_state))
+            self._save_state(new_state)
+            logger.info(f"Incremental rendering done, {len(changed)} file(s) changed")
+        return changed
+
+    def _load_state(self) -> Dict[str, Any]:
+        """Load the state of the previous incremental render, expanding the interned dependency sets.
+
+        Returns:
+            Dict[str, Any]: The previous state or an empty dict when it is missing, outdated or unusable.
+        """
+        try:
+            state = loads(self._state_path.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable render state {self._state_path}: {e}")
+            return {}
+
+        if not isinstance(state, dict) or state.get("version") != INCREMENTAL_STATE_VERSION or state.get("target") != self._target:
+            return {}
+
+        keysets = state.pop("keysets", [])
+        for scope in (state.get("global") or {}, *state.get("servers", {}).values()):
+            for entry in scope.get("files", {}).values():
+                entry[0] = keysets[entry[0]]
+        return state
+
+    def _save_state(self, state: Dict[str, Any]) -> None:
+        """Persist the render state, interning the dependency sets which are mostly shared between servers.
+
+        Args:
+            state (Dict[str, Any]): State built by the current render.
+        """
+        keysets: List[List[str]] = []
+        keyset_ids: Dict[Tuple[str, ...], int] = {}
+
+        def intern_files(files: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+            interned = {}
+            for path, (deps, deps_digest, content_hash) in files.items():
+                deps = tuple(deps)
+                if deps not in keyset_ids:
+                    keyset_ids[deps] = len(keysets)
+                    keysets.append(list(deps))
+                interned[path] = [keyset_ids[deps], deps_digest, content_hash]
+            return interned
+
+        data = {
+            "version": INCREMENTAL_STATE_VERSION,
+            "target": self._target,
+            "templates": self._templates_fingerprint,
+            "global": {**state["global"], "files": intern_files(state["global"]["files"])},
+            "servers": {server: {**scope, "files": intern_files(scope["files"])} for server, scope in state["servers"].items()},
+        }
+        data["keysets"] = keysets
+
+        try:
+            self._state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._state_path.with_suffix(".tmp")
+            tmp_path.write_text(dumps(data, separators=(",", ":")))
+            tmp_path.replace(self._state_path)
+        except OSError as e:
+            logger.error(f"Error writing render state to {self._state_path}: {e}")
+
+    def _compute_templates_fingerprint(self) -> str:
+        """Compute a fingerprint of every template file reachable by the Jinja loader.
+
+        Returns:
+            str: Digest of the (path, size, mtime) of every template.
+        """
+        items = []
+        for searchpath in self._jinja_env.loader.searchpath:
+            for root, _, files in walk(searchpath):
+                for file in files:
+                    file_path = join(root, file)
+                    with suppress(OSError):
+                        file_stat = Path(file_path).stat()
+                        items.append((file_path, (file_stat.st_size, file_stat.st_mtime_ns)))
+        return _hash_items(items)
+
+    def _clear_output(self) -> None:
+        """Remove every file from the output directory."""
+        for file in self._output.glob("*"):
+            if file.is_symlink() or file.is_file():
+                file.unlink()
+            elif file.is_dir():
+                rmtree(file.as_posix(), ignore_errors=True)
+
+    def _remove_stale_outputs(self, previous_state: Dict[str, Any], new_state: Dict[str, Any]) -> Set[str]:
+        """Remove the files rendered by the previous run that were not rendered by this one.
+
+        Args:
+            previous_state (Dict[str, Any]): State of the previous render.
+            new_state (Dict[str, Any]): State of the current render.
+
+        Returns:
+            Set[str]: Removed paths, relative to the output directory.
+        """
+
+        def rendered_paths(state: Dict[str, Any]) -> Set[str]:
+            paths = set((state.get("global") or {}).get("files", {}))
+            for scope in state.get("servers", {}).values():
+                paths.update(scope.get("files", {}))
+            return paths
+
+        removed = rendered_paths(previous_state) - rendered_paths(new_state)
+        for path in removed:
+            real_path = self._output.joinpath(path)
+            real_path.unlink(missing_ok=True)
+            # Drop the directories of a removed server once they are empty
+            parent = real_path.parent
+            with suppress(OSError):
+                while parent != self._output and not any(parent.iterdir()):
+                    parent.rmdir()
+                    parent = parent.parent
+        return removed
+
     def __getstate__(self) -> Dict[str, Any]:
         state = self.__dict__.copy()
         state.pop("_jinja_env", None)
@@ -550,7 +824,7 @@ class Templator:
         """
         searchpath = [self._templates]
         searchpath.extend(p.as_posix() for p in (*self._core.glob("*/confs"), *self._plugins.glob("*/confs"), *self._pro_plugins.glob("*/confs")) if p.is_dir())
-        return Environment(  # nosec B701 - rendering NGINX config files (not HTML); HTML autoescape would corrupt valid NGINX syntax.
+        env = Environment(  # nosec B701 - rendering NGINX config files (not HTML); HTML autoescape would corrupt valid NGINX syntax.
             loader=FileSystemLoader(searchpath=searchpath),
             lstrip_blocks=True,
             trim_blocks=True,
@@ -560,6 +834,8 @@ class Templator:
             cache_size=-1,
             undefined=self._custom_undefined,
         )
+        env.context_class = _RecordingContext
+        return env
 
     def _categorize_templates(self) -> Dict[str, List[str]]:
         """Pre-categorize templates by context for faster lookup.
@@ -619,15 +895,28 @@ class Templator:
         self._template_path_cache[cache_key] = result
         return result
 
-    def _write_config(self) -> None:
-        """Write the configuration to a variables.env file."""
+    def _write_config(self, previous: Optional[Dict[str, Any]] = None) -> Tuple[Optional[List[Any]], bool]:
+        """Write the configuration to a variables.env file.
+
+        Args:
+            previous (Optional[Dict[str, Any]], optional): Files of the previous global render state. Defaults to None.
+
+        Returns:
+            Tuple[Optional[List[Any]], bool]: The state entry of the file and whether it was written.
+        """
         real_path = self._output / "variables.env"
         try:
             real_path.parent.mkdir(parents=True, exist_ok=True)
-            config_lines = [f"{k}={v}\n" for k, v in self._full_config.items()]
-            real_path.write_text("".join(config_lines))
+            content = "".join(f"{k}={v}\n" for k, v in self._full_config.items())
+            content_hash = sha256(content.encode("utf-8")).hexdigest()
+            entry = [[], "", content_hash]
+            if previous and previous.get("variables.env", [None, None, None])[2] == content_hash and real_path.is_file():
+                return entry, False
+            real_path.write_text(content)
+            return entry, True
         except IOError as e:
             logger.error(f"Error writing configuration to {real_path}: {e}")
+        return None, False
 
     def _get_server_config(self, server: str, global_only_config: Dict[str, Any], server_specific_config: Dict[str, Any]) -> Dict[str, Any]:
         """Get the configuration for a specific server.
@@ -651,11 +940,27 @@ class Templator:
 
         return filtered_config
 
-    def _render_global(self) -> None:
-        """Render global templates."""
+    def _render_global(self, previous: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Set[str]]:
+        """Render global templates.
+
+        Args:
+            previous (Optional[Dict[str, Any]], optional): Previous render state of the global scope. Defaults to None.
+
+        Returns:
+            Tuple[Dict[str, Any], Set[str]]: The new render state of the global scope and the changed paths.
+        """
         global_start = perf_counter()
 
-        self._write_config()
+        previous_files = (previous or {}).get("files", {})
+        files: Dict[str, List[Any]] = {}
+        changed: Set[str] = set()
+
+        entry, written = self._write_config(previous_files)
+        if entry:
+            files["variables.env"] = entry
+        if written:
+            changed.add("variables.env")
+
         templates = self._find_templates(
             [
                 "global",
@@ -666,27 +971,42 @@ class Templator:
         )
 
         template_vars = self._base_template_vars.copy()
-        template_vars["all"] = self._full_config
+        template_vars["all"] = _RecordingDict(self._full_config) if self._incremental else self._full_config
         template_vars.update(self._config)
 
+        scope = _RenderScope(template_vars, self._default_config)
         for template in templates:
-            self._render_template(template, template_vars)
+            self._render_template(template, template_vars, scope=scope, previous=previous_files, files=files, changed=changed)
         logger.debug(f"Global rendering completed in {perf_counter() - global_start:.3f}s")
+        return {"files": files}, changed
 
-    def _render_server_batch(self, servers: List[str]) -> None:
+    def _render_server_batch(self, servers: List[str], previous: Optional[Dict[str, Dict[str, Any]]] = None) -> Tuple[Dict[str, Dict[str, Any]], Set[str]]:
         """Render templates for a batch of servers.
 
         Args:
             servers (List[str]): List of server names to render.
+            previous (Optional[Dict[str, Dict[str, Any]]], optional): Previous render state of the servers. Defaults to None.
+
+        Returns:
+            Tuple[Dict[str, Dict[str, Any]], Set[str]]: The new render state of the servers and the changed paths.
         """
+        previous = previous or {}
+        state = {}
+        changed: Set[str] = set()
         for server in servers:
-            self._render_server(server)
+            state[server], server_changed = self._render_server(server, previous.get(server))
+            changed.update(server_changed)
+        return state, changed
 
-    def _render_server(self, server: str) -> None:
+    def _render_server(self, server: str, previous: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Set[str]]:
         """Render templates for a specific server.
 
         Args:
             server (str): Server name.
+            previous (Optional[Dict[str, Any]], optional): Previous render state of the server. Defaults to None.
+
+        Returns:
+            Tuple[Dict[str, Any], Set[str]]: The new render state of the server and the changed paths.
         """
         templates = self._find_templates(
             [
@@ -700,24 +1020,45 @@ class Templator:
         )
 
         subpath = None
-        config = self._config.copy()
-        full_config = self._full_config.copy()
-        default_config = self._default_config.copy()
         if self._config.get("MULTISITE", "no") == "yes":
             subpath = server
             config = self._get_server_config(server, self._global_only_config, self._server_specific_config.get(server, {}))
             full_config = self._get_server_config(server, self._global_only_full_config, self._server_specific_full_config.get(server, {}))
             default_config = self._get_server_config(server, self._global_only_default_config, self._server_specific_default_config.get(server, {}))
+        else:
+            config = self._config.copy()
+            full_config = self._full_config.copy()
+            default_config = self._default_config.copy()
 
         server_custom_undefined = create_custom_undefined_class(default_config)
 
         template_vars = self._base_template_vars.copy()
-        template_vars["all"] = full_config
+        template_vars["all"] = _RecordingDict(full_config) if self._incremental else full_config
         template_vars.update(config)
 
+        scope = _RenderScope(template_vars, default_config)
+        previous_files = {}
+        if previous:
+            # When none of the server's settings changed, only the templates relying on volatile helpers can differ
+            scope.unchanged = not self._templates_changed and previous.get("scope") == scope.digest
+            previous_files = previous.get("files", {})
+
+        files: Dict[str, List[Any]] = {}
+        changed: Set[str] = set()
         for template in templates:
             name = basename(template) if any(template.endswith(root_conf) for root_conf in self._global_templates) else None
-            self._render_template(template, template_vars, subpath=subpath, name=name, custom_undefined=server_custom_undefined)
+            self._render_template(
+                template,
+                template_vars,
+                subpath=subpath,
+                name=name,
+                custom_undefined=server_custom_undefined,
+                scope=scope,
+                previous=previous_files,
+                files=files,
+                changed=changed,
+            )
+        return {"scope": scope.digest if self._incremental else "", "files": files}, changed
 
     def _render_template(
         self,
@@ -726,16 +1067,40 @@ class Templator:
         subpath: Optional[str] = None,
         name: Optional[str] = None,
         custom_undefined: Optional[Type[Undefined]] = None,
+        scope: Optional["_RenderScope"] = None,
+        previous: Optional[Dict[str, List[Any]]] = None,
+        files: Optional[Dict[str, List[Any]]] = None,
+        changed: Optional[Set[str]] = None,
     ) -> None:
         """Render a single template.
 
+        In incremental mode, the template is skipped when none of the dependencies recorded by the
+        previous render changed, and the output file is only rewritten when its content differs.
+
         Args:
             template (str): Template name.
             subpath (Optional[str], optional): Subpath under the output directory. Defaults to None.
             config (Optional[Dict[str, Any]], optional): Configuration dictionary. Defaults to None.
             name (Optional[str], optional): Output file name. Defaults to None.
+            scope (Optional[_RenderScope], optional): Values the dependencies are checked against. Defaults to None.
+            previous (Optional[Dict[str, List[Any]]], optional): Previous render state of the scope files. Defaults to None.
+            files (Optional[Dict[str, List[Any]]], optional): Render state of the scope files, filled by this method. Defaults to None.
+            changed (Optional[Set[str]], optional): Changed paths, filled by this method. Defaults to None.
         """
-        real_path = Path(self._output, subpath or "", name or template)
+        global _recorded_dependencies
+
+        rel_path = Path(subpath or "", name or template).as_posix()
+        real_path = self._output.joinpath(rel_path)
+        previous_entry = (previous or {}).get(rel_path)
+
+        if self._incremental and previous_entry and scope and real_path.is_file():
+            deps, deps_digest, _ = previous_entry
+            if not any(f"v:{helper}" in deps for helper in VOLATILE_TEMPLATE_HELPERS) and (
+                scope.unchanged or (not self._templates_changed and scope.dependencies_digest(deps) == deps_digest)
+            ):
+                files[rel_path] = previous_entry
+                return
+
         try:
             if custom_undefined:
                 cache_key = "server_env"
@@ -752,14 +1117,35 @@ class Templator:
                             undefined=custom_undefined,
                         )
                     )
+                    self._server_env_cache[cache_key].context_class = _RecordingContext
                 jinja_template = self._server_env_cache[cache_key].get_template(template)
             else:
                 jinja_template = self._jinja_env.get_template(template)
 
             real_path.parent.mkdir(parents=True, exist_ok=True)
 
-            rendered_content = jinja_template.render(template_vars)
+            if not self._incremental:
+                real_path.write_text(jinja_template.render(template_vars))
+                if changed is not None:
+                    changed.add(rel_path)
+                return
+
+            _recorded_dependencies = set()
+            try:
+                rendered_content = jinja_template.render(template_vars)
+                deps = sorted(_recorded_dependencies)
+            finally:
+                _recorded_dependencies = None
+
+            content_hash = sha256(rendered_content.encode("utf-8")).hexdigest()
+            if files is not None and scope:
+                files[rel_path] = [deps, scope.dependencies_digest(deps), content_hash]
+            if previous_entry and previous_entry[2] == content_hash and real_path.is_file():
+                return
+
             real_path.write_text(rendered_content)
+            if changed is not None:
+                changed.add(rel_path)
         except Exception as e:
             logger.error(f"Error rendering template {template}: {e}")
 
@@ -36,6 +36,8 @@ if __name__ == "__main__":
         parser.add_argument("--output", default=join(sep, "etc", "nginx"), type=str, help="where to write the rendered files")
         parser.add_argument("--target", default=join(sep, "etc", "nginx"), type=str, help="where nginx will search for configurations files")
         parser.add_argument("--variables", type=str, help="path to the file containing environment variables")
+        parser.add_argument("--incremental", action="store_true", help="only render the files whose settings or templates changed since the last run")
+        parser.add_argument("--changes", type=str, help="path to the file where the list of changed output files will be written")
         args = parser.parse_args()
 
         settings_path = Path(args.settings)
@@ -127,15 +129,16 @@ if __name__ == "__main__":
             default_config = {setting: data["default"] for setting, data in full_config.items()}
             full_config = {setting: data["value"] for setting, data in full_config.items()}
 
-        # Remove old files
-        LOGGER.info("Removing old files ...")
-        files = glob(join(args.output, "*"))
-        for file in files:
-            file = Path(file)
-            if file.is_symlink() or file.is_file():
-                file.unlink()
-            elif file.is_dir():
-                rmtree(file.as_posix(), ignore_errors=True)
+        if not args.incremental:
+            # Remove old files
+            LOGGER.info("Removing old files ...")
+            files = glob(join(args.output, "*"))
+            for file in files:
+                file = Path(file)
+                if file.is_symlink() or file.is_file():
+                    file.unlink()
+                elif file.is_dir():
+                    rmtree(file.as_posix(), ignore_errors=True)
 
         # Render the templates
         LOGGER.info("Rendering templates ...")
@@ -149,8 +152,14 @@ if __name__ == "__main__":
             config,
             default_config,
             full_config,
+            incremental=args.incremental,
         )
-        templator.render()
+        changed = templator.render()
+
+        if args.changes:
+            changes_path = Path(args.changes)
+            changes_path.parent.mkdir(parents=True, exist_ok=True)
+            changes_path.write_text("".join(f"{path}\n" for path in sorted(changed)))
     except SystemExit as e:
         raise e
     except:
@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
 
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from copy import deepcopy
 from io import BytesIO
-from os import sep
+from os import getenv, sep
 from os.path import join
+from pathlib import Path
 from sys import path as sys_path
 from tarfile import open as tar_open
+from threading import Lock
 from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 from urllib.parse import urlsplit
 
@@ -16,8 +17,22 @@ for deps_path in [join(sep, "usr", "share", "bunkerweb", *paths) for paths in ((
         sys_path.append(deps_path)
 
 from API import API  # type: ignore
+from common_utils import API_BATCH_SIZE, batch_item_result, getenv_positive_int  # type: ignore
+from file_sync import HashCache, build_delta_archive, build_manifest
 from logger import getLogger
 
+API_FANOUT_MAX_WORKERS = getenv_positive_int("API_FANOUT_MAX_WORKERS", 32)
+
+# Process-wide executor shared by every fan-out, so concurrent callers can't multiply the threads and connections
+FANOUT_EXECUTOR = ThreadPoolExecutor(max_workers=API_FANOUT_MAX_WORKERS, thread_name_prefix="bw-api-fanout")
+
+# Only ship the files the instances don't already have, instances without the manifest endpoint get the whole archive
+API_DELTA_SYNC = getenv("API_DELTA_SYNC", "yes").lower() == "yes"
+
+# File hashes of the directories sent to the instances, kept between pushes
+HASH_CACHES: Dict[str, HashCache] = {}
+HASH_CACHES_LOCK = Lock()
+
 
 class ApiCaller:
     def __init__(self, apis: Optional[List[API]] = None):
@@ -37,50 +52,153 @@ class ApiCaller:
             sent, err, status, resp = api.request(method, url, files=files, data=data, timeout=timeout)
             return api, sent, err, status, resp
 
-        ret = True
         url = url.lstrip("/")
-        responses = {} if response else None
 
         if files:
+            # Read the buffers once, the immutable content is then shared by the requests sent to every instance
             for buffer in files.values():
                 buffer.seek(0, 0)  # Ensure the file pointer is at the beginning
+            files = {name: (name, buffer.read()) for name, buffer in files.items()}
+
+        return self.__collect([FANOUT_EXECUTOR.submit(send_request, api, files) for api in self.apis], url, response)
+
+    def send_batch_to_apis(self, url: str, items: List[Dict[str, Any]], timeout=(5, 10), response: bool = False) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """POST every item to every instance with a single request per instance (per API_BATCH_SIZE items).
+
+        Instances that don't support lists on this endpoint yet (their error has no per-item results in data)
+        get the items one by one. The responses are keyed by API endpoint (instances can share a hostname), always
+        have one result per item sent in data and contain the unreachable instances too, so that batch_results()
+        can tell which items failed where.
+        """
+
+        def send_chunk(api: API, chunk: List[Dict[str, Any]]) -> Tuple[bool, str, Optional[int], Optional[dict]]:
+            if len(chunk) == 1:
+                sent, err, status, resp = api.request("POST", url, data=chunk[0], timeout=timeout)
+                return sent, err, status, {**(resp or {}), "data": [batch_item_result(chunk[0], sent, err, status, resp)]}
+
+            sent, err, status, resp = api.request("POST", url, data=chunk, timeout=timeout)
+            if not sent or isinstance((resp or {}).get("data"), list):
+                return sent, err, status, resp
+
+            self.__logger.debug(f"{api.endpoint}{url} doesn't accept batches, sending the {len(chunk)} items one by one")
+            results = [api.request("POST", url, data=item, timeout=timeout) for item in chunk]
+            failed = next((result for result in results if not result[0] or result[2] != 200), None)
+            data = [batch_item_result(item, *result) for item, result in zip(chunk, results)]
+            if failed is not None:
+                return True, failed[1], failed[2] or 500, {"status": "error", "msg": (failed[3] or {}).get("msg") or failed[1], "data": data}
+            return True, "ok", 200, {"status": "success", "msg": "success", "data": data}
+
+        def send_batch(api: API):
+            data = []
+            ret = (True, "ok", 200, None)
+            for start in range(0, len(items), API_BATCH_SIZE):
+                sent, err, status, resp = send_chunk(api, items[start : start + API_BATCH_SIZE])  # noqa: E203
+                data.extend((resp or {}).get("data") or [])
+                if not sent:
+                    return api, sent, err, status, {"status": "error", "msg": err, "data": data}
+                if ret[2] == 200:
+                    ret = (sent, err, status, resp)
+            return api, *ret[:3], {**(ret[3] or {}), "data": data}
+
+        url = url.lstrip("/")
+        if not items:
+            return True, {} if response else None
+        futures = {api: FANOUT_EXECUTOR.submit(send_batch, api) for api in self.apis}
+        ret, _ = self.__collect(list(futures.values()), url, False)
+        if not response:
+            return ret, None
 
-        with ThreadPoolExecutor() as executor:
-            future_to_api = {executor.submit(send_request, api, deepcopy(files) if files else None): api for api in self.apis}
-            for future in as_completed(future_to_api):
-                try:
-                    api, sent, err, status, resp = future.result()
-                    if not sent:
+        # The unreachable instances are reported too, with the results of the chunks they got before failing
+        responses = {}
+        for api, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                responses[api.endpoint] = {"status": "error", "msg": str(error), "data": []}
+            else:
+                result = future.result()
+                responses[api.endpoint] = result[4] or {"status": "error", "msg": result[2], "data": []}
+        return ret, responses
+
+    def __collect(self, futures: list, url: str, response: bool) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        ret = True
+        responses = {} if response else None
+        for future in as_completed(futures):
+            try:
+                api, sent, err, status, resp = future.result()
+                if not sent:
+                    ret = False
+                    self.__logger.error(f"Can't send API request to {api.endpoint}{url} : {err}")
+                else:
+                    if status != 200:
                         ret = False
-                        self.__logger.error(f"Can't send API request to {api.endpoint}{url} : {err}")
+                        self.__logger.error(f"Error while sending API request to {api.endpoint}{url} : status = {status}, msg = {resp.get('msg')}")
                     else:
-                        if status != 200:
-                            ret = False
-                            self.__logger.error(f"Error while sending API request to {api.endpoint}{url} : status = {status}, msg = {resp.get('msg')}")
-                        else:
-                            self.__logger.info(f"Successfully sent API request to {api.endpoint}{url}")
-
-                        if resp and response:
-                            # Extract hostname from endpoint (supports http and https)
-                            try:
-                                host = urlsplit(api.endpoint).hostname or api.endpoint
-                            except Exception:
-                                host = api.endpoint.replace("http://", "").replace("https://", "").split(":")[0]
-                            if responses is not None:
-                                responses[host] = resp if isinstance(resp, dict) else resp.json()
-                except Exception as exc:
-                    ret = False
-                    self.__logger.error(f"API request generated an exception: {exc}")
+                        self.__logger.info(f"Successfully sent API request to {api.endpoint}{url}")
+
+                    if resp and response:
+                        # Extract hostname from endpoint (supports http and https)
+                        try:
+                            host = urlsplit(api.endpoint).hostname or api.endpoint
+                        except Exception:
+                            host = api.endpoint.replace("http://", "").replace("https://", "").split(":")[0]
+                        if responses is not None:
+                            responses[host] = resp if isinstance(resp, dict) else resp.json()
+            except Exception as exc:
+                ret = False
+                self.__logger.error(f"API request generated an exception: {exc}")
 
         return ret, responses
 
     def send_files(self, path: str, url: str, timeout=(5, 10), response: bool = False) -> Union[bool, Tuple[bool, Optional[Dict[str, Any]]]]:
-        with BytesIO() as tgz:
-            with tar_open(mode="w:gz", fileobj=tgz, dereference=True, compresslevel=3) as tf:
-                tf.add(path, arcname=".")
-            tgz.seek(0, 0)
-            files = {"archive.tar.gz": tgz}
-            ret = self.send_to_apis("POST", url, files=files, timeout=timeout, response=response)
-            if response:
-                return ret[0], ret[1]
-            return ret[0]
+        url = url.lstrip("/")
+        root = Path(path)
+        archive_lock = Lock()
+        archives: Dict[Optional[Tuple[str, ...]], bytes] = {}
+
+        def get_archive(missing: Optional[Tuple[str, ...]] = None) -> bytes:
+            # Archives are built once per distinct set of missing blobs (None is the full archive) and shared by the instances
+            with archive_lock:
+                if missing not in archives:
+                    if missing is None:
+                        with BytesIO() as tgz:
+                            with tar_open(mode="w:gz", fileobj=tgz, dereference=True, compresslevel=3) as tf:
+                                tf.add(path, arcname=".")
+                            archives[missing] = tgz.getvalue()
+                    else:
+                        archives[missing] = build_delta_archive(root, manifest, missing)
+                return archives[missing]
+
+        def sync_files(api: API):
+            if manifest is not None:
+                sent, err, status, resp = api.request("POST", f"{url}/manifest", data=manifest, timeout=timeout)
+                if sent and status == 200:
+                    missing = tuple(sorted(resp.get("data") or []))
+                    archive = get_archive(missing)
+                    sent, err, status, resp = api.request("POST", f"{url}/delta", files={"archive.tar.gz": ("archive.tar.gz", archive)}, timeout=timeout)
+                    if sent and status == 200:
+                        self.__logger.debug(f"Sent {len(missing)}/{len(manifest['files'])} files of {path} to {api.endpoint} ({len(archive)} bytes)")
+                        return api, sent, err, status, resp
+                    self.__logger.warning(
+                        f"Delta sync of {path} failed on {api.endpoint}{url}/delta ({err if not sent else resp.get('msg')}), sending the whole directory"
+                    )
+                elif sent and status != 404:
+                    self.__logger.warning(
+                        f"Delta sync of {path} failed on {api.endpoint}{url}/manifest (status = {status}, msg = {resp.get('msg')}), sending the whole directory"
+                    )
+
+            sent, err, status, resp = api.request("POST", url, files={"archive.tar.gz": ("archive.tar.gz", get_archive())}, timeout=timeout)
+            return api, sent, err, status, resp
+
+        manifest = None
+        if API_DELTA_SYNC and root.is_dir():
+            with HASH_CACHES_LOCK:
+                cache = HASH_CACHES.setdefault(root.as_posix(), HashCache(root))
+            try:
+                manifest = build_manifest(cache)
+            except BaseException as e:
+                self.__logger.warning(f"Couldn't build the manifest of {path}, sending the whole directory: {e}")
+
+        ret = self.__collect([FANOUT_EXECUTOR.submit(sync_files, api) for api in self.apis], url, response)
+        if response:
+            return ret[0], ret[1]
+        return ret[0]
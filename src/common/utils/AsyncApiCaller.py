@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+from asyncio import gather
+from os import sep
+from os.path import join
+from sys import path as sys_path
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+# Update system path for dependencies
+for deps_path in [join(sep, "usr", "share", "bunkerweb", *paths) for paths in (("deps", "python"), ("utils",), ("api",))]:
+    if deps_path not in sys_path:
+        sys_path.append(deps_path)
+
+from AsyncAPI import AsyncAPI  # type: ignore
+from common_utils import API_BATCH_SIZE, batch_item_result  # type: ignore
+from logger import getLogger  # type: ignore
+
+Result = Tuple[AsyncAPI, bool, str, Optional[int], Optional[dict]]
+
+
+class AsyncApiCaller:
+    """asyncio counterpart of ApiCaller, the requests to the instances are sent concurrently from the event loop."""
+
+    def __init__(self, apis: Optional[List[AsyncAPI]] = None):
+        self.apis = apis or []
+        self.__logger = getLogger("API.CALLER")
+
+    async def send_to_apis(
+        self,
+        method: Union[Literal["POST"], Literal["GET"]],
+        url: str,
+        data: Optional[Union[Dict[str, Any], List[Any]]] = None,
+        timeout=(5, 10),
+        response: bool = False,
+    ) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        async def send_request(api: AsyncAPI) -> Result:
+            return api, *await api.request(method, url, data=data, timeout=timeout)
+
+        url = url.lstrip("/")
+        return self.__collect(await gather(*(send_request(api) for api in self.apis), return_exceptions=True), url, response)
+
+    async def send_batch_to_apis(self, url: str, items: List[Dict[str, Any]], timeout=(5, 10), response: bool = False) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """POST every item to every instance with a single request per instance (per API_BATCH_SIZE items).
+
+        Instances that don't support lists on this endpoint yet (their error has no per-item results in data)
+        get the items one by one, concurrently. The responses are keyed by API endpoint (instances can share
+        a hostname), always have one result per item sent in data and contain the unreachable instances too,
+        so that batch_results() can tell which items failed where.
+        """
+
+        async def send_chunk(api: AsyncAPI, chunk: List[Dict[str, Any]]) -> Tuple[bool, str, Optional[int], Optional[dict]]:
+            if len(chunk) == 1:
+                sent, err, status, resp = await api.request("POST", url, data=chunk[0], timeout=timeout)
+                return sent, err, status, {**(resp or {}), "data": [batch_item_result(chunk[0], sent, err, status, resp)]}
+
+            sent, err, status, resp = await api.request("POST", url, data=chunk, timeout=timeout)
+            if not sent or isinstance((resp or {}).get("data"), list):
+                return sent, err, status, resp
+
+            self.__logger.debug(f"{api.endpoint}{url} doesn't accept batches, sending the {len(chunk)} items one by one")
+            results = await gather(*(api.request("POST", url, data=item, timeout=timeout) for item in chunk))
+            failed = next((result for result in results if not result[0] or result[2] != 200), None)
+            data = [batch_item_result(item, *result) for item, result in zip(chunk, results)]
+            if failed is not None:
+                return True, failed[1], failed[2] or 500, {"status": "error", "msg": (failed[3] or {}).get("msg") or failed[1], "data": data}
+            return True, "ok", 200, {"status": "success", "msg": "success", "data": data}
+
+        async def send_batch(api: AsyncAPI) -> Result:
+            data = []
+            ret = (True, "ok", 200, None)
+            for start in range(0, len(items), API_BATCH_SIZE):
+                sent, err, status, resp = await send_chunk(api, items[start : start + API_BATCH_SIZE])  # noqa: E203
+                data.extend((resp or {}).get("data") or [])
+                if not sent:
+                    return api, sent, err, status, {"status": "error", "msg": err, "data": data}
+                if ret[2] == 200:
+                    ret = (sent, err, status, resp)
+            return api, *ret[:3], {**(ret[3] or {}), "data": data}
+
+        url = url.lstrip("/")
+        if not items:
+            return True, {} if response else None
+        results = await gather(*(send_batch(api) for api in self.apis), return_exceptions=True)
+        ret, _ = self.__collect(results, url, False)
+        if not response:
+            return ret, None
+
+        # The unreachable instances are reported too, with the results of the chunks they got before failing
+        responses = {}
+        for api, result in zip(self.apis, results):
+            if isinstance(result, BaseException):
+                responses[api.endpoint] = {"status": "error", "msg": str(result), "data": []}
+            else:
+                responses[api.endpoint] = result[4] or {"status": "error", "msg": result[2], "data": []}
+        return ret, responses
+
+    def __collect(self, results: List[Union[Result, BaseException]], url: str, response: bool) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        ret = True
+        responses = {} if response else None
+        for result in results:
+            if isinstance(result, BaseException):
+                ret = False
+                self.__logger.error(f"API request generated an exception: {result}")
+                continue
+
+            api, sent, err, status, resp = result
+            if not sent:
+                ret = False
+                self.__logger.error(f"Can't send API request to {api.endpoint}{url} : {err}")
+                continue
+
+            if status != 200:
+                ret = False
+                self.__logger.error(f"Error while sending API request to {api.endpoint}{url} : status = {status}, msg = {(resp or {}).get('msg')}")
+            else:
+                self.__logger.info(f"Successfully sent API request to {api.endpoint}{url}")
+
+            if resp and responses is not None:
+                responses[urlsplit(api.endpoint).hostname or api.endpoint] = resp
+
+        return ret, responses
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+
+from json import JSONDecodeError, loads
+from time import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+# Redis keys of the ban index, they are maintained alongside every ban by utils.add_ban / utils.remove_ban (src/bw/lua/bunkerweb/utils.lua)
+BANS_INDEX = "bans_index"  # sorted set: ban key -> expiration timestamp (+inf for permanent bans)
+BANS_INDEX_DATE = "bans_index_date"  # sorted set: ban key -> ban date
+BANS_INDEX_META = "bans_index_meta"  # hash: ban key -> JSON with the indexed scope, service, reason and country
+BANS_INDEX_COUNTS = "bans_index_counts"  # hash: total, scope_<scope>, service_<service>, reason_<reason> and country_<country> counters
+BANS_INDEX_SERVICE_PREFIX = "bans_index_service_"  # set of ban keys per service ("_" for global bans)
+BANS_INDEX_REASON_PREFIX = "bans_index_reason_"  # set of ban keys per reason
+BANS_INDEX_READY = "bans_index_ready"  # set once the bans that existed before the index have been indexed
+BANS_INDEX_VERSION = "1"
+
+BAN_KEY_PATTERNS = ("bans_ip_*", "bans_service_*_ip_*")
+
+# Keep in sync with the BAN_INDEX_SCRIPT of src/bw/lua/bunkerweb/utils.lua
+BAN_INDEX_SCRIPT = """
+local op = ARGV[1]
+local now = tonumber(ARGV[2])
+local function count(field, increment)
+    if redis.call("HINCRBY", "bans_index_counts", field, increment) <= 0 then
+        redis.call("HDEL", "bans_index_counts", field)
+    end
+end
+local function unindex(key)
+    redis.call("ZREM", "bans_index", key)
+    redis.call("ZREM", "bans_index_date", key)
+    local raw = redis.call("HGET", "bans_index_meta", key)
+    if not raw then
+        return 0
+    end
+    redis.call("HDEL", "bans_index_meta", key)
+    local ok, meta = pcall(cjson.decode, raw)
+    if ok and type(meta) == "table" then
+        redis.call("SREM", "bans_index_service_" .. meta.service, key)
+        redis.call("SREM", "bans_index_reason_" .. meta.reason, key)
+        count("total", -1)
+        count("scope_" .. meta.scope, -1)
+        count("service_" .. meta.service, -1)
+        count("reason_" .. meta.reason, -1)
+        count("country_" .. meta.country, -1)
+    end
+    return 1
+end
+local function index(key)
+    unindex(key)
+    local raw = redis.call("GET", key)
+    if not raw then
+        return 0
+    end
+    local ttl = redis.call("TTL", key)
+    local ok, data = pcall(cjson.decode, raw)
+    if not ok or type(data) ~= "table" then
+        data = { reason = raw }
+    end
+    local scope, service = "global", "_"
+    local key_service = string.match(key, "^bans_service_(.+)_ip_")
+    if key_service then
+        scope, service = "service", key_service
+    end
+    local reason = type(data.reason) == "string" and data.reason or "unknown"
+    local country = type(data.country) == "string" and data.country or "unknown"
+    local expire = "+inf"
+    if ttl > 0 and data.permanent ~= true then
+        expire = now + ttl
+    end
+    redis.call("ZADD", "bans_index", expire, key)
+    redis.call("ZADD", "bans_index_date", tonumber(data.date) or now, key)
+    redis.call(
+        "HSET",
+        "bans_index_meta",
+        key,
+        cjson.encode({ scope = scope, service = service, reason = reason, country = country })
+    )
+    redis.call("SADD", "bans_index_service_" .. service, key)
+    redis.call("SADD", "bans_index_reason_" .. reason, key)
+    count("total", 1)
+    count("scope_" .. scope, 1)
+    count("service_" .. service, 1)
+    count("reason_" .. reason, 1)
+    count("country_" .. country, 1)
+    return 1
+end
+local function prune(limit)
+    local removed = 0
+    for _, key in ipairs(redis.call("ZRANGEBYSCORE", "bans_index", "-inf", now, "LIMIT", 0, limit)) do
+        local ttl = redis.call("TTL", key)
+        if ttl == -2 then
+            removed = removed + unindex(key)
+        elseif ttl == -1 then
+            redis.call("ZADD", "bans_index", "+inf", key)
+        else
+            redis.call("ZADD", "bans_index", now + ttl, key)
+        end
+    end
+    return removed
+end
+if op == "ban" then
+    local ttl = tonumber(ARGV[4]) or 0
+    if ttl > 0 then
+        redis.call("SET", KEYS[1], ARGV[3], "EX", ttl)
+    else
+        redis.call("SET", KEYS[1], ARGV[3])
+    end
+    local ok, err = pcall(index, KEYS[1])
+    if ok then
+        ok, err = pcall(prune, tonumber(ARGV[5]) or 100)
+    end
+    if not ok then
+        redis.log(redis.LOG_WARNING, "Ban index update error : " .. tostring(err))
+    end
+    return 1
+elseif op == "unban" then
+    local removed = 0
+    for _, key in ipairs(KEYS) do
+        redis.call("DEL", key)
+        removed = removed + unindex(key)
+    end
+    return removed
+elseif op == "index" then
+    local indexed = 0
+    for _, key in ipairs(KEYS) do
+        indexed = indexed + index(key)
+    end
+    return indexed
+elseif op == "prune" then
+    return prune(tonumber(ARGV[3]) or 1000)
+end
+return redis.error_reply("unknown ban index operation " .. tostring(op))
+"""
+
+
+def _decode(value: Any) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def _eval(redis_client, keys: List[Any], *args: Any) -> int:
+    return int(redis_client.eval(BAN_INDEX_SCRIPT, len(keys), *keys, *args) or 0)
+
+
+def index_ban_keys(redis_client, keys: Iterable[Any]) -> int:
+    """(Re)index the given ban keys, the ones that don't exist anymore are removed from the index."""
+    keys = list(keys)
+    if not keys:
+        return 0
+    return _eval(redis_client, keys, "index", int(time()))
+
+
+def rebuild_ban_index(redis_client, *, batch_size: int = 500) -> int:
+    """Index the bans that were stored before the index existed (one-time SCAN) and mark the index as ready."""
+    indexed = 0
+    for pattern in BAN_KEY_PATTERNS:
+        batch = []
+        for key in redis_client.scan_iter(match=pattern, count=1000):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                indexed += index_ban_keys(redis_client, batch)
+                batch = []
+        indexed += index_ban_keys(redis_client, batch)
+    redis_client.set(BANS_INDEX_READY, BANS_INDEX_VERSION)
+    return indexed
+
+
+def prune_ban_index(redis_client, *, batch_size: int = 1000, max_batches: int = 100) -> int:
+    """Remove the expired bans from the index and return how many were removed."""
+    removed = 0
+    for _ in range(max_batches):
+        batch_removed = _eval(redis_client, [], "prune", int(time()), batch_size)
+        removed += batch_removed
+        if batch_removed < batch_size:
+            break
+    return removed
+
+
+def ensure_ban_index(redis_client) -> None:
+    """Make sure the index is built and doesn't reference expired bans anymore."""
+    if redis_client.get(BANS_INDEX_READY) != BANS_INDEX_VERSION.encode():
+        rebuild_ban_index(redis_client)
+    prune_ban_index(redis_client)
+
+
+def get_ban_keys(
+    redis_client,
+    start: int = 0,
+    stop: int = -1,
+    *,
+    by: str = "expiration",
+    desc: bool = False,
+    service: Optional[str] = None,
+    reason: Optional[str] = None,
+) -> Tuple[List[str], int]:
+    """Return a ranged slice of ban keys ordered by expiration or ban date, optionally restricted to a service ("_" for global bans) and/or reason,
+    along with the total number of matching bans."""
+    source = BANS_INDEX_DATE if by == "date" else BANS_INDEX
+    filters = []
+    if service is not None:
+        filters.append(BANS_INDEX_SERVICE_PREFIX + service)
+    if reason is not None:
+        filters.append(BANS_INDEX_REASON_PREFIX + reason)
+
+    if not filters:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zcard(source)
+        pipe.zrange(source, start, stop, desc=desc)
+        total, keys = pipe.execute()
+    else:
+        # Sets count as a score of 1, the 0 weight keeps the scores of the sorted set as is
+        tmp_key = f"bans_index_tmp_{uuid4().hex}"
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.zinterstore(tmp_key, {source: 1} | {key: 0 for key in filters}, aggregate="SUM")
+        pipe.zrange(tmp_key, start, stop, desc=desc)
+        pipe.delete(tmp_key)
+        total, keys, _ = pipe.execute()
+    return [_decode(key) for key in keys], int(total or 0)
+
+
+def get_ban_counts(redis_client) -> Dict[str, int]:
+    """Return the counters of the index (total, scope_<scope>, service_<service>, reason_<reason>, country_<country>)."""
+    return {_decode(field): int(value) for field, value in redis_client.hgetall(BANS_INDEX_COUNTS).items()}
+
+
+def count_bans(redis_client, min_score: Any = "-inf", max_score: Any = "+inf", *, by: str = "expiration") -> int:
+    """Count the bans whose expiration timestamp (or ban date) is in the given range (Redis ZCOUNT syntax)."""
+    return int(redis_client.zcount(BANS_INDEX_DATE if by == "date" else BANS_INDEX, min_score, max_score))
+
+
+def parse_ban(key: str, data: Any, ttl: int, logger=None) -> dict:
+    """Build a ban dict (ip, exp, ban_scope, permanent + the stored ban data) from a ban key, its raw value and its TTL."""
+    raw_value = _decode(data)
+    if key.startswith("bans_service_"):
+        service, ip = key[len("bans_service_") :].rsplit("_ip_", 1)  # noqa: E203
+        scope = "service"
+    else:
+        service, ip = "unknown", key[len("bans_ip_") :]  # noqa: E203
+        scope = "global"
+
+    try:
+        ban_data = loads(raw_value)
+        if not isinstance(ban_data, dict):
+            raise ValueError("ban data is not an object")
+    except (JSONDecodeError, ValueError) as e:
+        if logger:
+            logger.warning(f"Failed to decode ban data for {ip}{f' on service {service}' if scope == 'service' else ''}, using raw value as reason: {e}")
+        ban_data = {"reason": raw_value, "service": service, "date": 0, "country": "unknown", "ban_scope": scope, "permanent": False}
+
+    ban_data["ban_scope"] = scope
+    if scope == "service":
+        ban_data["service"] = service
+    ban_data["permanent"] = ban_data.get("permanent", False) or ttl == -1 or ttl == 0
+    exp = 0 if ban_data["permanent"] else ttl
+    return {"ip": ip, "exp": exp} | ban_data
+
+
+def get_bans(redis_client, keys: List[str], logger=None) -> List[dict]:
+    """Fetch the given bans with one pipelined GET + TTL round-trip, stale keys are dropped from the index."""
+    if not keys:
+        return []
+
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipe.get(key)
+        pipe.ttl(key)
+    results = pipe.execute()
+
+    bans = []
+    missing = []
+    for idx, key in enumerate(keys):
+        data = results[2 * idx]
+        if data is None:
+            missing.append(key)
+            continue
+        bans.append(parse_ban(key, data, results[2 * idx + 1], logger))
+
+    if missing:
+        index_ban_keys(redis_client, missing)
+    return bans
+
+
+def iter_bans(redis_client, *, batch_size: int = 1000, logger=None, **kwargs) -> Iterator[dict]:
+    """Iterate over all the indexed bans (see get_ban_keys for the ordering and filtering keyword arguments) in batches."""
+    start = 0
+    while True:
+        keys, _ = get_ban_keys(redis_client, start, start + batch_size - 1, **kwargs)
+        if not keys:
+            break
+        bans = get_bans(redis_client, keys, logger)
+        yield from bans
+        if len(keys) < batch_size:
+            break
+        # Stale keys were dropped from the index, which shifted the following ones
+        start += len(bans)
@@ -77,6 +77,15 @@ def getenv_bool(name: str, default: str = "no") -> bool:
     return getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
 
 
+def getenv_positive_int(name: str, default: int) -> int:
+    value = getenv(name, "").strip()
+    return int(value) if value.isdigit() and int(value) > 0 else default
+
+
+# Maximum number of items (bans, unbans) sent to an instance in one request, bigger batches are sent in several chunks
+API_BATCH_SIZE = getenv_positive_int("API_BATCH_SIZE", 1000)
+
+
 def handle_docker_secrets() -> Dict[str, str]:
     """Handle Docker secrets by reading from /run/secrets directory (Alpine only)"""
     secrets = {}
@@ -198,7 +207,7 @@ def file_hash(file: Union[str, Path], *, algorithm: str = "sha512") -> str:
 
     with file.open("rb") as f:
         while True:
-            data = f.read(1024)
+            data = f.read(64 * 1024)
             if not data:
                 break
             _hash.update(data)
@@ -589,3 +598,29 @@ def get_redis_client(
         if logger:
             logger.error(f"Failed to connect to Redis: {e}")
         return None
+
+
+def batch_item_result(item: Dict[str, Any], sent: bool, err: str, status: Optional[int], resp: Optional[dict]) -> Dict[str, Any]:
+    """Result of a batch item sent on its own, in the format of the per-item results returned by the instances for a list."""
+    if not sent:
+        return {"ip": item.get("ip"), "status": "error", "msg": err}
+    return {"ip": item.get("ip"), "status": "success" if status == 200 else "error", "msg": (resp or {}).get("msg")}
+
+
+def batch_results(items: List[Dict[str, Any]], responses: Dict[str, dict]) -> List[Dict[str, Any]]:
+    """Merge the per-item results of every instance returned by send_batch_to_apis(response=True) into one result per item.
+
+    An item is a success when every instance applied it, otherwise the instances that didn't are listed in failed (by API endpoint) with their message.
+    """
+    results = []
+    for index, item in enumerate(items):
+        failed = {}
+        for endpoint, resp in responses.items():
+            data = resp.get("data") if isinstance(resp, dict) else None
+            result = data[index] if isinstance(data, list) and index < len(data) and isinstance(data[index], dict) else None
+            if result is None:
+                failed[endpoint] = str((resp or {}).get("msg") or "no result")
+            elif result.get("status") != "success":
+                failed[endpoint] = str(result.get("msg") or "error")
+        results.append({"ip": item.get("ip"), "status": "error" if failed else "success", "failed": failed})
+    return results
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""Manifest-based synchronization of a directory with the BunkerWeb instances.
+
+The sender describes the directory with a manifest (relative path -> sha256 and mode), each instance answers with the
+hashes it has nowhere in its own copy and the sender only ships those blobs. The scheduler uses build_manifest and
+build_delta_archive, the instances API runs this file with the ``missing`` and ``apply`` commands.
+"""
+
+from argparse import ArgumentParser
+from contextlib import suppress
+from hashlib import sha256
+from io import BytesIO
+from json import dumps, loads
+from os import chmod, replace, sep, walk
+from pathlib import Path
+from re import compile as re_compile
+from shutil import copyfile, move, rmtree
+from sys import exit as sys_exit, stderr
+from tarfile import TarInfo, open as tar_open
+from tempfile import mkdtemp
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MANIFEST_VERSION = 1
+STATE_PATH = Path(sep, "var", "tmp", "bunkerweb", "file_sync")
+HASH_CHUNK_SIZE = 1024 * 1024
+BLOB_NAME_RX = re_compile(r"^blobs/[0-9a-f]{64}$")
+
+
+def hash_file(path: Path) -> str:
+    file_hash = sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+class HashCache:
+    """File hashes of a directory, only computed again when the size or the modification time of a file changes."""
+
+    def __init__(self, root: Path, state_file: Optional[Path] = None):
+        self.root = root
+        self.state_file = state_file
+        self.lock = Lock()
+        self.__entries: Dict[str, Tuple[int, int, str]] = {}
+        if state_file and state_file.is_file():
+            with suppress(ValueError, TypeError, OSError):
+                self.__entries = {rel: tuple(entry) for rel, entry in loads(state_file.read_text()).items()}
+
+    def scan(self) -> Tuple[Dict[str, Tuple[str, int]], List[str]]:
+        """Return the files of the directory with their hash and mode, and its sub-directories."""
+        files = {}
+        dirs = []
+        entries = {}
+        for current, dirnames, filenames in walk(self.root, followlinks=True):
+            current_path = Path(current)
+            dirnames.sort()
+            for dirname in dirnames:
+                dirs.append(current_path.joinpath(dirname).relative_to(self.root).as_posix())
+            for filename in sorted(filenames):
+                path = current_path.joinpath(filename)
+                rel = path.relative_to(self.root).as_posix()
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue  # Dangling symlink, tar would fail on it too
+
+                entry = self.__entries.get(rel)
+                if not entry or entry[0] != stat.st_size or entry[1] != stat.st_mtime_ns:
+                    entry = (stat.st_size, stat.st_mtime_ns, hash_file(path))
+                entries[rel] = entry
+                files[rel] = (entry[2], stat.st_mode & 0o7777)
+        self.__entries = entries
+        return files, dirs
+
+    def save(self) -> None:
+        if not self.state_file:
+            return
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.state_file.with_suffix(".tmp")
+        tmp_file.write_text(dumps(self.__entries, separators=(",", ":")))
+        replace(tmp_file, self.state_file)
+
+
+def build_manifest(cache: HashCache) -> dict:
+    with cache.lock:
+        files, dirs = cache.scan()
+    return {"version": MANIFEST_VERSION, "files": {rel: list(entry) for rel, entry in files.items()}, "dirs": dirs}
+
+
+def build_delta_archive(root: Path, manifest: dict, missing: Iterable[str]) -> bytes:
+    """Tar and gzip the manifest with one copy of each missing blob."""
+    sources = {}
+    for rel, (file_hash, _) in manifest["files"].items():
+        sources.setdefault(file_hash, rel)
+
+    with BytesIO() as tgz:
+        with tar_open(mode="w:gz", fileobj=tgz, compresslevel=3) as tf:
+            content = dumps(manifest, separators=(",", ":")).encode("utf-8")
+            info = TarInfo("manifest.json")
+            info.size = len(content)
+            tf.addfile(info, BytesIO(content))
+            for file_hash in sorted(set(missing)):
+                if file_hash not in sources:
+                    raise ValueError(f"Instance asked for unknown blob {file_hash}")
+                tf.add(root.joinpath(sources[file_hash]), arcname=f"blobs/{file_hash}", recursive=False)
+        return tgz.getvalue()
+
+
+def _state_file(destination: Path) -> Path:
+    return STATE_PATH.joinpath(f"{sha256(destination.as_posix().encode('utf-8')).hexdigest()[:16]}.json")
+
+
+def _check_relative(rel: str) -> str:
+    parts = Path(rel).parts
+    if not parts or Path(rel).is_absolute() or ".." in parts:
+        raise ValueError(f"Invalid path in manifest: {rel}")
+    return rel
+
+
+def missing_hashes(destination: Path, manifest: dict) -> List[str]:
+    """Return the hashes of the manifest that the destination doesn't already hold under any path."""
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version: {manifest.get('version')}")
+
+    present = set()
+    if destination.is_dir():
+        cache = HashCache(destination, _state_file(destination))
+        files, _ = cache.scan()
+        cache.save()
+        present = {file_hash for file_hash, _ in files.values()}
+    return sorted({file_hash for file_hash, _ in manifest["files"].values()} - present)
+
+
+def apply_delta(destination: Path, archive: Path) -> Tuple[int, int]:
+    """Make the destination match the manifest of the archive, returns the numbers of written and removed files."""
+    STATE_PATH.mkdir(parents=True, exist_ok=True)
+    staging = Path(mkdtemp(prefix="staging_", dir=STATE_PATH))
+    try:
+        manifest = None
+        with tar_open(archive, "r:gz") as tf:
+            for member in tf:
+                if not member.isfile():
+                    raise ValueError(f"Unexpected archive member: {member.name}")
+                if member.name == "manifest.json":
+                    manifest = loads(tf.extractfile(member).read())
+                    continue
+                if not BLOB_NAME_RX.match(member.name):
+                    raise ValueError(f"Unexpected archive member: {member.name}")
+
+                blob_hash = sha256()
+                blob_path = staging.joinpath(member.name.split("/", 1)[1])
+                with tf.extractfile(member) as src, blob_path.open("wb") as dst:
+                    while chunk := src.read(HASH_CHUNK_SIZE):
+                        blob_hash.update(chunk)
+                        dst.write(chunk)
+                if blob_hash.hexdigest() != blob_path.name:
+                    raise ValueError(f"Corrupted blob {blob_path.name}")
+
+        if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError("Missing or unsupported manifest in the archive")
+
+        destination.mkdir(parents=True, exist_ok=True)
+        cache = HashCache(destination, _state_file(destination))
+        current, current_dirs = cache.scan()
+        local_sources = {file_hash: destination.joinpath(rel) for rel, (file_hash, _) in current.items()}
+        expected_dirs = {_check_relative(rel) for rel in manifest["dirs"]}
+
+        # Stage every new or changed file first, nothing in the destination is touched if a blob is missing
+        pending = []
+        for rel, (file_hash, mode) in manifest["files"].items():
+            _check_relative(rel)
+            if rel in current and current[rel][0] == file_hash:
+                if current[rel][1] != mode:
+                    chmod(destination.joinpath(rel), mode)
+                continue
+
+            source = staging.joinpath(file_hash)
+            if not source.is_file():
+                source = local_sources.get(file_hash)
+                if source is None:
+                    raise ValueError(f"Missing blob {file_hash} for {rel}")
+            staged = staging.joinpath("files", str(len(pending)))
+            staged.parent.mkdir(exist_ok=True)
+            copyfile(source, staged)
+            chmod(staged, mode)
+            pending.append((staged, destination.joinpath(rel)))
+
+        removed = 0
+        for rel in current:
+            if rel not in manifest["files"]:
+                destination.joinpath(rel).unlink(missing_ok=True)
+                removed += 1
+        for rel in sorted(current_dirs, reverse=True):
+            if rel not in expected_dirs:
+                rmtree(destination.joinpath(rel), ignore_errors=True)
+        for rel in sorted(expected_dirs):
+            destination.joinpath(rel).mkdir(parents=True, exist_ok=True)
+
+        for staged, target in pending:
+            if target.is_dir() and not target.is_symlink():
+                rmtree(target)
+            move(staged.as_posix(), target.as_posix())
+
+        # Refresh the cached hashes with the new modification times
+        cache.scan()
+        cache.save()
+        return len(pending), removed
+    finally:
+        rmtree(staging, ignore_errors=True)
+
+
+def main():
+    parser = ArgumentParser(description="Manifest-based directory synchronization used by the BunkerWeb API")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    missing_parser = subparsers.add_parser("missing", help="print the hashes of the manifest missing from the destination")
+    missing_parser.add_argument("destination", type=Path)
+    missing_parser.add_argument("manifest", type=Path)
+    apply_parser = subparsers.add_parser("apply", help="apply a delta archive to the destination")
+    apply_parser.add_argument("destination", type=Path)
+    apply_parser.add_argument("archive", type=Path)
+    args = parser.parse_args()
+
+    try:
+        if args.command == "missing":
+            print(dumps(missing_hashes(args.destination, loads(args.manifest.read_bytes()))))
+        else:
+            written, removed = apply_delta(args.destination, args.archive)
+            print(f"{written} file(s) written, {removed} file(s) removed")
+    except BaseException as e:
+        print(f"file_sync {args.command} failed: {e}", file=stderr)
+        sys_exit(1)
+
+
+if __name__ == "__main__":
+    main()
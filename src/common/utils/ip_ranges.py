@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+from bisect import bisect_right
+from ipaddress import IPv4Address, IPv6Address, ip_address
+from socket import AF_INET, AF_INET6, inet_pton
+from struct import Struct
+from typing import Dict, Iterable, List, Tuple
+
+RANGE_TABLE_MAGIC = b"BWRT"
+RANGE_TABLE_VERSION = 1
+RANGE_TABLE_HEADER = Struct(">4sB3xII")  # magic, version, IPv4 ranges count, IPv6 ranges count
+IPV4_RANGE = Struct(">II")
+IPV6_RANGE = Struct(">QQQQ")  # start and end, each split in two 64-bit halves
+
+Ranges = List[Tuple[int, int]]
+BITS = {4: 32, 6: 128}
+
+
+def parse_ip_entry(entry: bytes) -> Tuple[int, int, int]:
+    """Return the version and the first and last addresses of an IP address or network (host bits are ignored)."""
+    address, _, prefix = entry.decode("utf-8").partition("/")
+    version = 6 if ":" in address else 4
+    bits = BITS[version]
+    start = int.from_bytes(inet_pton(AF_INET6 if version == 6 else AF_INET, address), "big")
+    prefixlen = int(prefix) if prefix else bits
+    if not 0 <= prefixlen <= bits:
+        raise ValueError(f"Invalid prefix length in {entry!r}")
+    host_mask = (1 << (bits - prefixlen)) - 1
+    start &= ~host_mask
+    return version, start, start | host_mask
+
+
+def merge_ranges(ranges: Iterable[Tuple[int, int]]) -> Ranges:
+    """Sort ranges and merge the overlapping and adjacent ones."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def collapse_ip_entries(entries: Iterable[bytes]) -> Tuple[Dict[int, Ranges], Dict[str, int]]:
+    """Collapse IP addresses and networks into sorted, non-overlapping ranges per IP version, with statistics."""
+    ranges = {4: [], 6: []}
+    count = 0
+    for entry in entries:
+        count += 1
+        version, start, end = parse_ip_entry(entry)
+        ranges[version].append((start, end))
+
+    ranges = {version: merge_ranges(version_ranges) for version, version_ranges in ranges.items()}
+    stats = {
+        "entries": count,
+        "ranges": len(ranges[4]) + len(ranges[6]),
+        "ipv4_addresses": sum(end - start + 1 for start, end in ranges[4]),
+    }
+    return ranges, stats
+
+
+def range_to_cidrs(start: int, end: int, bits: int) -> Iterable[Tuple[int, int]]:
+    """Minimal list of (network address, prefix length) covering exactly [start, end]."""
+    while start <= end:
+        size = min((start & -start).bit_length() - 1 if start else bits, (end - start + 1).bit_length() - 1)
+        yield start, bits - size
+        start += 1 << size
+
+
+def format_ip_ranges(ranges: Dict[int, Ranges]) -> bytes:
+    """One CIDR per line, IPv4 first, single addresses are written without their prefix length."""
+    lines = []
+    for version, address_class in ((4, IPv4Address), (6, IPv6Address)):
+        bits = BITS[version]
+        for start, end in ranges.get(version, []):
+            for network, prefixlen in range_to_cidrs(start, end, bits):
+                address = str(address_class(network))
+                lines.append((address if prefixlen == bits else f"{address}/{prefixlen}").encode("utf-8"))
+    return b"\n".join(lines) + b"\n" if lines else b""
+
+
+def build_range_table(ranges: Dict[int, Ranges]) -> bytes:
+    """Sorted, non-overlapping [start, end] ranges packed big-endian, IPv4 first then IPv6."""
+    ipv4 = ranges.get(4, [])
+    ipv6 = ranges.get(6, [])
+    mask = (1 << 64) - 1
+    return b"".join(
+        [RANGE_TABLE_HEADER.pack(RANGE_TABLE_MAGIC, RANGE_TABLE_VERSION, len(ipv4), len(ipv6))]
+        + [IPV4_RANGE.pack(start, end) for start, end in ipv4]
+        + [IPV6_RANGE.pack(start >> 64, start & mask, end >> 64, end & mask) for start, end in ipv6]
+    )
+
+
+def load_range_table(data: bytes) -> Dict[int, Ranges]:
+    magic, version, ipv4_count, ipv6_count = RANGE_TABLE_HEADER.unpack_from(data)
+    if magic != RANGE_TABLE_MAGIC or version != RANGE_TABLE_VERSION:
+        raise ValueError("Invalid or unsupported IP range table")
+
+    offset = RANGE_TABLE_HEADER.size
+    ipv4 = [IPV4_RANGE.unpack_from(data, offset + i * IPV4_RANGE.size) for i in range(ipv4_count)]
+    offset += ipv4_count * IPV4_RANGE.size
+    ipv6 = []
+    for i in range(ipv6_count):
+        start_high, start_low, end_high, end_low = IPV6_RANGE.unpack_from(data, offset + i * IPV6_RANGE.size)
+        ipv6.append(((start_high << 64) | start_low, (end_high << 64) | end_low))
+    return {4: ipv4, 6: ipv6}
+
+
+def ranges_contain(ranges: Ranges, value: int) -> bool:
+    index = bisect_right(ranges, (value, float("inf"))) - 1
+    return index >= 0 and ranges[index][0] <= value <= ranges[index][1]
+
+
+def range_table_contains(ranges: Dict[int, Ranges], ip: str) -> bool:
+    address = ip_address(ip)
+    return ranges_contain(ranges[address.version], int(address))
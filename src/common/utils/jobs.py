@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from inspect import currentframe, getframeinfo
 from io import BytesIO
@@ -8,17 +9,18 @@ from logging import Logger
 from os import getenv, replace
 from os.path import sep
 from pathlib import Path
-from shutil import rmtree
+from shutil import copyfileobj, rmtree
 from tarfile import TarFile, open as tar_open
 from threading import Lock
 from traceback import format_exc
-from typing import Any, Dict, Literal, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple, Union
 from tempfile import NamedTemporaryFile
 from stat import S_IMODE
 
 from common_utils import bytes_hash, file_hash, safe_tar_extractall
 
 LOCK = Lock()
+CHUNK_SIZE = 1024 * 1024
 EXPIRE_TIME = {
     "hour": timedelta(hours=1).total_seconds(),
     "day": timedelta(days=1).total_seconds(),
@@ -27,8 +29,8 @@ EXPIRE_TIME = {
 }
 
 
-def _write_atomic(target: Path, data: bytes) -> None:
-    """Write data to target atomically to avoid partial files."""
+def _write_atomic(target: Path, data: Union[bytes, Path]) -> None:
+    """Write data (or copy the data file by chunks) to target atomically to avoid partial files."""
     target.parent.mkdir(parents=True, exist_ok=True)
     existing_mode = None
     try:
@@ -41,7 +43,11 @@ def _write_atomic(target: Path, data: bytes) -> None:
     while attempt < 3:
         attempt += 1
         with NamedTemporaryFile(dir=target.parent, prefix=f".{target.name}.", delete=False) as tmp:
-            tmp.write(data)
+            if isinstance(data, Path):
+                with data.open("rb") as source:
+                    copyfileobj(source, tmp, CHUNK_SIZE)
+            else:
+                tmp.write(data)
             tmp.flush()
             tmp_path = Path(tmp.name)
 
@@ -63,6 +69,63 @@ def _write_atomic(target: Path, data: bytes) -> None:
     raise last_exc or FileNotFoundError(f"Failed to write atomically to {target}")
 
 
+class JobsRun:
+    """Database handle and snapshots shared by the jobs of a scheduler run.
+
+    The metadata is read once per run and the cache files listing (without their data) once per plugin,
+    the listing of a plugin is read again after one of its jobs changed its cache.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.__metadata: Optional[Dict[str, Any]] = None
+        self.__cache_files: Dict[str, List[Dict[str, Any]]] = {}
+        self.__lock = Lock()
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        with self.__lock:
+            if self.__metadata is None:
+                self.__metadata = self.db.get_metadata()
+            return self.__metadata
+
+    def get_cache_files(self, plugin_id: str) -> List[Dict[str, Any]]:
+        with self.__lock:
+            if plugin_id not in self.__cache_files:
+                self.__cache_files[plugin_id] = self.db.get_jobs_cache_files(with_data=False, plugin_id=plugin_id)
+            return self.__cache_files[plugin_id]
+
+    def invalidate_cache_files(self, plugin_id: str) -> None:
+        with self.__lock:
+            self.__cache_files.pop(plugin_id, None)
+
+
+# Set by the scheduler while it runs the jobs in-process, see jobs_run()
+JOBS_RUN: Optional[JobsRun] = None
+
+
+@contextmanager
+def jobs_run(db) -> Iterator[JobsRun]:
+    """Share the given database handle and the run snapshots with the jobs started in this process until the block exits."""
+    global JOBS_RUN
+    previous = JOBS_RUN
+    JOBS_RUN = JobsRun(db)
+    try:
+        yield JOBS_RUN
+    finally:
+        JOBS_RUN = previous
+
+
+def get_job_db(logger: Logger):
+    """Return the database handle of the current scheduler run, or a new one when the job runs on its own."""
+    if JOBS_RUN is not None:
+        return JOBS_RUN.db
+
+    from Database import Database  # type: ignore
+
+    return Database(logger, sqlalchemy_string=getenv("DATABASE_URI"))
+
+
 class Job:
     def __init__(self, logger: Logger, job_path: Optional[Union[str, Path]] = None, db=None, *, deprecated: bool = False):
         """Initialize Job class."""
@@ -96,11 +159,8 @@ class Job:
 
         self.job_path.mkdir(parents=True, exist_ok=True)
 
-        self.db = db
-        if not self.db:
-            from Database import Database  # type: ignore
-
-            self.db = Database(logger, sqlalchemy_string=getenv("DATABASE_URI"))
+        self.run = JOBS_RUN if JOBS_RUN is not None and db in (None, JOBS_RUN.db) else None
+        self.db = db or get_job_db(logger)
         self.logger = logger or self.db.logger
 
         # Tracks whether the most recent cache restore succeeded. Callers that subsequently
@@ -111,7 +171,7 @@ class Job:
 
         if not deprecated:
             try:
-                db_metadata = self.db.get_metadata()
+                db_metadata = self.run.metadata if self.run else self.db.get_metadata()
                 if not isinstance(db_metadata, str) and not db_metadata["scheduler_first_start"]:
                     self.restore_ok = self.restore_cache(manual=False)
             except BaseException as e:
@@ -123,30 +183,59 @@ class Job:
                 self.logger.error(f"Exception while auto-restoring cache in Job.__init__ for plugin '{self.job_path.name}': {e}")
 
     def restore_cache(self, *, job_name: str = "", plugin_id: str = "", manual: bool = True) -> bool:
-        """Restore job cache files from database."""
+        """Restore job cache files from database, only the files that differ from the local ones are downloaded."""
         ret = True
-        job_cache_files = self.db.get_jobs_cache_files(plugin_id=plugin_id or self.job_path.name)  # type: ignore
+        plugin_id = plugin_id or self.job_path.name
+        if self.run:
+            job_cache_files = self.run.get_cache_files(plugin_id)
+        else:
+            job_cache_files = self.db.get_jobs_cache_files(with_data=False, plugin_id=plugin_id)  # type: ignore
 
         job_name = job_name or self.job_name
         plugin_cache_files = set()
         ignored_dirs = set()
+        to_restore = []
 
         for job_cache_file in job_cache_files:
             cache_path = self.job_path.joinpath(job_cache_file["service_id"] or "", job_cache_file["file_name"])
             plugin_cache_files.add(cache_path)
 
+            if job_cache_file["file_name"].endswith(".tgz"):
+                if job_cache_file["job_name"] != job_name:
+                    ignored_dirs.add(self.__extract_path(cache_path, job_cache_file["file_name"]).as_posix())
+                    continue
+            elif job_cache_file["job_name"] != job_name:
+                continue
+            elif job_cache_file["checksum"] and self.__is_up_to_date(cache_path, job_cache_file["checksum"]):
+                ignored_dirs.add(cache_path.parent.as_posix())
+                continue
+            to_restore.append(job_cache_file)
+
+        data = {}
+        if to_restore:
+            checksums = None if any(not job_cache_file["checksum"] for job_cache_file in to_restore) else {f["checksum"] for f in to_restore}
+            try:
+                for job_cache_file in self.db.get_jobs_cache_files(job_name=job_name, plugin_id=plugin_id, checksums=checksums):  # type: ignore
+                    data[(job_cache_file["service_id"], job_cache_file["file_name"])] = job_cache_file["data"]
+            except BaseException as e:
+                self.logger.error(f"Exception while fetching the cache files of job '{job_name}' (plugin '{plugin_id}') :\n{e}")
+                return False
+
+        for job_cache_file in to_restore:
+            cache_path = self.job_path.joinpath(job_cache_file["service_id"] or "", job_cache_file["file_name"])
+            content = data.get((job_cache_file["service_id"], job_cache_file["file_name"]))
+            if content is None:
+                # The cache file was changed or deleted since it was listed
+                self.logger.debug(f"Cache file {cache_path} is not in the database anymore, skipping its restoration")
+                continue
+
             try:
                 if job_cache_file["file_name"].endswith(".tgz"):
-                    extract_path = cache_path.parent
-                    if job_cache_file["file_name"].startswith("folder:"):
-                        extract_path = Path(job_cache_file["file_name"].split("folder:", 1)[1].rsplit(".tgz", 1)[0])
-                    if job_cache_file["job_name"] != job_name:
-                        ignored_dirs.add(extract_path.as_posix())
-                        continue
+                    extract_path = self.__extract_path(cache_path, job_cache_file["file_name"])
                     with LOCK:
                         rmtree(extract_path, ignore_errors=True)
                         extract_path.mkdir(parents=True, exist_ok=True)
-                        with tar_open(fileobj=BytesIO(job_cache_file["data"]), mode="r:gz") as tar:
+                        with tar_open(fileobj=BytesIO(content), mode="r:gz") as tar:
                             assert isinstance(tar, TarFile)
                             try:
                                 # tar_filter="auto" preserves symlinks when the archive contains
@@ -166,9 +255,7 @@ class Job:
                                 )
                                 ret = False
                     continue
-                elif job_cache_file["job_name"] != job_name:
-                    continue
-                _write_atomic(cache_path, job_cache_file["data"])
+                _write_atomic(cache_path, content)
                 ignored_dirs.add(cache_path.parent.as_posix())
                 self.logger.debug(
                     "Restored cache file " + ((job_cache_file["service_id"] + "/") if job_cache_file["service_id"] else "") + job_cache_file["file_name"]
@@ -200,6 +287,19 @@ class Job:
 
         return ret
 
+    @staticmethod
+    def __extract_path(cache_path: Path, file_name: str) -> Path:
+        if file_name.startswith("folder:"):
+            return Path(file_name.split("folder:", 1)[1].rsplit(".tgz", 1)[0])
+        return cache_path.parent
+
+    @staticmethod
+    def __is_up_to_date(cache_path: Path, checksum: str) -> bool:
+        try:
+            return cache_path.is_file() and file_hash(cache_path) == checksum
+        except OSError:
+            return False
+
     def get_cache(
         self, name: Union[str, Path], *, job_name: str = "", service_id: str = "", plugin_id: str = "", with_info: bool = False, with_data: bool = True
     ) -> Optional[Union[Dict[str, Any], bytes]]:
@@ -257,22 +357,25 @@ class Job:
         ret, err = True, "success"
         cache_path = self.job_path.joinpath(service_id, name)
 
+        # Files are copied, hashed and stored by chunks, they are never loaded in memory as a whole
         if isinstance(file_cache, bytes):
             content = file_cache
         else:
             if isinstance(file_cache, str):
                 file_cache = Path(file_cache)
             assert isinstance(file_cache, Path)
-            content = file_cache.read_bytes()
+            content = file_cache
 
-        if not name.startswith("folder:") and (overwrite_file or not cache_path.is_file()):
+        if not name.startswith("folder:") and (overwrite_file or not cache_path.is_file()) and content != cache_path:
             _write_atomic(cache_path, content)
 
         if not checksum:
-            checksum = bytes_hash(content)
+            checksum = file_hash(content) if isinstance(content, Path) else bytes_hash(content)
 
         try:
             err = self.db.upsert_job_cache(service_id, name, content, job_name=job_name or self.job_name, checksum=checksum)  # type: ignore
+            if self.run:
+                self.run.invalidate_cache_files(self.job_path.name)
             if err:
                 ret = False
 
@@ -314,6 +417,8 @@ class Job:
 
         try:
             self.db.delete_job_cache(name, job_name=job_name, service_id=service_id)  # type: ignore
+            if self.run:
+                self.run.invalidate_cache_files(self.job_path.name)
         except:
             return False, f"exception :\n{format_exc()}"
         return ret, err
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from logging import Logger
+from os.path import normpath
+from threading import local
+from time import sleep
+from traceback import format_exc
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from requests import Session
+from requests.exceptions import ConnectionError
+
+from common_utils import bytes_hash, getenv_positive_int  # type: ignore
+
+LIST_DOWNLOAD_MAX_WORKERS = getenv_positive_int("LIST_DOWNLOAD_MAX_WORKERS", 4)
+
+CHUNK_SIZE = 64 * 1024
+COMMENT_PREFIXES = (b"#", b";")
+VALIDATOR_HEADERS = {b"ETag": "If-None-Match", b"Last-Modified": "If-Modified-Since"}
+
+CheckLine = Callable[[bytes], Tuple[bool, bytes]]
+
+
+@dataclass(frozen=True)
+class ListSource:
+    """A list URL and how to read its lines."""
+
+    url: str
+    check_line: CheckLine
+    first_token: bool = True  # Only keep what is before the first space of each line
+
+
+@dataclass
+class FetchedList:
+    url: str
+    url_file: str
+    state: str = "failed"  # cached, not_modified, downloaded or failed
+    entries: List[bytes] = field(default_factory=list)
+    validators: Dict[bytes, bytes] = field(default_factory=dict)
+    error: str = ""
+
+
+def parse_lines(lines: Iterable[bytes], check_line: CheckLine, first_token: bool = True) -> List[bytes]:
+    """Keep the valid entries of a list, lines are consumed one at a time so the whole list is never held twice."""
+    entries = []
+    append = entries.append
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith(COMMENT_PREFIXES):
+            continue
+        if first_token:
+            line = line.split(b" ")[0]
+        ok, data = check_line(line)
+        if ok:
+            append(data)
+    return entries
+
+
+def read_cached_list(data: bytes) -> Tuple[Dict[bytes, bytes], List[bytes]]:
+    """Split a cached list into its validators (from the header comments) and its entries."""
+    validators = {}
+    entries = []
+    for line in data.split(b"\n"):
+        if line.startswith(b"# "):
+            name, _, value = line[2:].partition(b": ")
+            if name in VALIDATOR_HEADERS and value:
+                validators[name] = value
+            continue
+        line = line.strip()
+        if line:
+            entries.append(line)
+    return validators, entries
+
+
+def format_cached_list(url: str, validators: Dict[bytes, bytes], entries: List[bytes]) -> bytes:
+    header = [b"# Downloaded from " + url.encode("utf-8")] + [b"# " + name + b": " + value for name, value in validators.items()]
+    return b"\n".join(header + entries) + b"\n"
+
+
+class ListFetcher:
+    """Download the lists used by the blacklist, whitelist, greylist and realip jobs.
+
+    URLs are fetched in parallel with a bounded pool. Lists downloaded less than ``max_age`` ago come from the job
+    cache, older ones are requested again with the ETag and Last-Modified validators saved in the cached list, so an
+    unchanged list costs a 304 instead of a full download.
+    """
+
+    def __init__(
+        self,
+        logger: Logger,
+        name: str = "list",
+        *,
+        max_workers: int = LIST_DOWNLOAD_MAX_WORKERS,
+        max_age: timedelta = timedelta(hours=1),
+        timeout=10,
+        max_retries: int = 3,
+    ):
+        self.logger = logger
+        self.name = name
+        self.max_workers = max_workers
+        self.max_age = max_age
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.__local = local()
+
+    @staticmethod
+    def url_file(url: str) -> str:
+        return f"{bytes_hash(url, algorithm='sha1')}.list"
+
+    def __session(self) -> Session:
+        session = getattr(self.__local, "session", None)
+        if session is None:
+            session = self.__local.session = Session()
+        return session
+
+    def fetch(self, source: ListSource, cached: Optional[bytes] = None) -> FetchedList:
+        """Fetch one list, ``cached`` is the previously cached list used for the conditional request."""
+        result = FetchedList(source.url, self.url_file(source.url))
+        validators, cached_entries = read_cached_list(cached) if cached else ({}, [])
+
+        try:
+            if source.url.startswith("file://"):
+                with open(normpath(source.url[7:]), "rb") as f:
+                    result.entries = parse_lines(f, source.check_line, source.first_token)
+                result.state = "downloaded"
+                return result
+
+            headers = {VALIDATOR_HEADERS[name]: value.decode("utf-8", "ignore") for name, value in validators.items()}
+            retry_count = 0
+            while True:
+                try:
+                    resp = self.__session().get(source.url, headers=headers, stream=True, timeout=self.timeout)
+                    break
+                except ConnectionError:
+                    retry_count += 1
+                    if retry_count == self.max_retries:
+                        raise
+                    self.logger.warning(f"Connection refused, retrying in 3 seconds... ({retry_count}/{self.max_retries})")
+                    sleep(3)
+
+            with resp:
+                if resp.status_code == 304 and cached:
+                    result.state = "not_modified"
+                    result.entries = cached_entries
+                    result.validators = validators
+                    return result
+                if resp.status_code != 200:
+                    result.error = f"Got status code {resp.status_code}"
+                    return result
+
+                result.entries = parse_lines(resp.iter_lines(chunk_size=CHUNK_SIZE), source.check_line, source.first_token)
+                for name in VALIDATOR_HEADERS:
+                    value = resp.headers.get(name.decode("utf-8"))
+                    if value:
+                        result.validators[name] = value.encode("utf-8")
+            result.state = "downloaded"
+        except BaseException as e:
+            self.logger.debug(format_exc())
+            result.error = str(e)
+        return result
+
+    def fetch_all(self, sources: Iterable[ListSource], cached: Optional[Dict[str, bytes]] = None) -> Dict[str, FetchedList]:
+        """Fetch every source in parallel, returns the results by URL."""
+        cached = cached or {}
+        sources = list(sources)
+        if not sources:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(sources)), thread_name_prefix="bw-list-fetch") as executor:
+            return {result.url: result for result in executor.map(lambda source: self.fetch(source, cached.get(source.url)), sources)}
+
+    def fetch_job_lists(self, job, sources: Iterable[ListSource]) -> Dict[str, FetchedList]:
+        """Fetch the sources through the job cache, the database is only accessed from the calling thread."""
+        results = {}
+        cached = {}
+        to_fetch = {}
+        min_update = (datetime.now().astimezone() - self.max_age).timestamp()
+
+        for source in sources:
+            if source.url in results or source.url in to_fetch:
+                continue
+            url_file = self.url_file(source.url)
+            cached_url = job.get_cache(url_file, with_info=True, with_data=True)
+            if not isinstance(cached_url, dict) or not cached_url.get("data"):
+                to_fetch[source.url] = source
+                continue
+
+            if cached_url.get("last_update") and cached_url["last_update"] > min_update:
+                self.logger.debug(f"URL {source.url} has already been downloaded less than 1 hour ago, skipping download...")
+                validators, entries = read_cached_list(cached_url["data"])
+                results[source.url] = FetchedList(source.url, url_file, "cached", entries, validators)
+                continue
+
+            cached[source.url] = cached_url["data"]
+            to_fetch[source.url] = source
+
+        for url in to_fetch:
+            self.logger.info(f"Downloading {self.name} data from {url} ...")
+
+        for url, result in self.fetch_all(to_fetch.values(), cached).items():
+            results[url] = result
+            if result.state == "failed":
+                continue
+            if result.state == "not_modified":
+                self.logger.debug(f"URL {url} has not been modified since the last download")
+                # Same checksum: the database only refreshes the last update date, the local file is kept
+                data = cached[url]
+                cache_ok, err = job.cache_file(result.url_file, data, checksum=bytes_hash(data), overwrite_file=False)
+            else:
+                cache_ok, err = job.cache_file(result.url_file, format_cached_list(url, result.validators, result.entries))
+            if not cache_ok:
+                self.logger.error(f"Error while caching url content for {url}: {err}")
+
+        return results
@@ -1,28 +1,40 @@
+from atexit import register as atexit_register
 from logging import (
     CRITICAL,
     DEBUG,
     ERROR,
     FileHandler,
+    Formatter,
     INFO,
     WARNING,
+    Handler,
     Logger,
+    LogRecord,
     StreamHandler,
     _nameToLevel,
     addLevelName,
     basicConfig,
+    getLevelName,
     getLogger as logging_getLogger,
+    makeLogRecord,
     setLoggerClass,
 )
-from logging.handlers import SysLogHandler
-from os import getenv, sep
+from logging.handlers import QueueHandler, QueueListener, SysLogHandler
+from multiprocessing.util import Finalize
+from os import getenv, getpid, register_at_fork, sep
 from os.path import join
+from queue import Full, Queue
 from re import match
 from socket import SOCK_DGRAM, SOCK_STREAM
-from typing import Optional, Union
+from threading import Lock
+from typing import Dict, List, Optional, Union
 
 LOG_FORMAT = "%(asctime)s [%(name)s] [%(process)d] [%(levelname)s] - %(message)s"
 DATE_FORMAT = "[%Y-%m-%d %H:%M:%S %z]"
 
+DEFAULT_LOG_QUEUE_SIZE = 10000
+LOG_QUEUE_POLICIES = ("drop", "block")
+
 # Regex patterns for validation
 FILE_PATH_PATTERN = r"^(/[\w\-./]+|[A-Za-z]:\\[\w\-./\\]+)$"
 SYSLOG_ADDRESS_PATTERN = r"^((udp|tcp)://)?(/[\w\-./]+|[\w\-.]+(:\d{1,5})?)$"
@@ -35,6 +47,54 @@ class BWLogger(Logger):
         super().__init__(name, level)
 
 
+class BWQueueHandler(QueueHandler):
+    """Queue handler that drops the records (and counts them) when the queue is full, unless it is set to block."""
+
+    def __init__(self, queue: Queue, block: bool):
+        super().__init__(queue)
+        self.block = block
+        self.enqueued = 0
+        self.dropped = 0
+        self._counters_lock = Lock()
+        # The records are formatted by the handlers of the listener
+        self.setFormatter(Formatter("%(message)s"))
+
+    def enqueue(self, record: LogRecord) -> None:
+        try:
+            self.queue.put(record, block=self.block)
+        except Full:
+            with self._counters_lock:
+                self.dropped += 1
+            return
+        with self._counters_lock:
+            self.enqueued += 1
+
+
+class BWQueueListener(QueueListener):
+    """Queue listener writing the records to the log sinks and reporting the records dropped by the handler."""
+
+    def __init__(self, queue: Queue, handlers: List[Handler], queue_handler: BWQueueHandler):
+        super().__init__(queue, *handlers, respect_handler_level=True)
+        self.queue_handler = queue_handler
+        self.reported_drops = 0
+
+    def handle(self, record: LogRecord) -> None:
+        super().handle(record)
+        dropped = self.queue_handler.dropped
+        if dropped > self.reported_drops:
+            super().handle(
+                makeLogRecord(
+                    {
+                        "name": "LOGGER",
+                        "levelno": WARNING,
+                        "levelname": getLevelName(WARNING),
+                        "msg": f"{dropped - self.reported_drops} log record(s) dropped because the log queue was full",
+                    }
+                )
+            )
+            self.reported_drops = dropped
+
+
 # Set the custom logger class as the default
 setLoggerClass(BWLogger)
 
@@ -108,7 +168,77 @@ if not log_types or "stderr" in env_log_types:
         warnings.append("No valid log types configured. Defaulting to stderr.")
     log_types["stderr"] = {"handler": StreamHandler()}
 
-basicConfig(format=LOG_FORMAT, datefmt=DATE_FORMAT, level=default_level, handlers=[handler["handler"] for handler in log_types.values()], force=True)
+log_handlers: List[Handler] = [handler["handler"] for handler in log_types.values()]
+log_queue_handler: Optional[BWQueueHandler] = None
+log_queue_listener: Optional[BWQueueListener] = None
+
+# With LOG_QUEUE=yes, the log calls only put the records in a bounded queue and a thread writes them to the log sinks
+if getenv("LOG_QUEUE", "no").lower() == "yes":
+    log_queue_size = getenv("LOG_QUEUE_SIZE", str(DEFAULT_LOG_QUEUE_SIZE))
+    if not log_queue_size.isdigit() or int(log_queue_size) < 1:
+        warnings.append(f"The log queue size '{log_queue_size}' is invalid. Using the default size of {DEFAULT_LOG_QUEUE_SIZE}.")
+        log_queue_size = DEFAULT_LOG_QUEUE_SIZE
+    log_queue_policy = getenv("LOG_QUEUE_POLICY", "drop").lower()
+    if log_queue_policy not in LOG_QUEUE_POLICIES:
+        warnings.append(f"The log queue policy '{log_queue_policy}' is invalid. Records will be dropped when the queue is full.")
+        log_queue_policy = "drop"
+
+    log_formatter = Formatter(LOG_FORMAT, DATE_FORMAT)
+    for handler in log_handlers:
+        handler.setFormatter(log_formatter)
+    log_queue_handler = BWQueueHandler(Queue(int(log_queue_size)), log_queue_policy == "block")
+
+
+def _start_log_queue_listener() -> None:
+    """Start the thread writing the queued records to the log sinks of this process."""
+    global log_queue_listener
+    assert log_queue_handler is not None
+    log_queue_listener = BWQueueListener(log_queue_handler.queue, log_handlers, log_queue_handler)
+    log_queue_listener.start()
+
+
+def _stop_log_queue_listener() -> None:
+    """Write the records left in the queue and stop the listener thread."""
+    if log_queue_listener is not None and log_queue_listener._thread is not None:
+        log_queue_listener.stop()
+
+
+def _reset_log_queue_after_fork() -> None:
+    """Give forked processes (e.g. the Templator render workers) their own queue and listener.
+
+    Threads don't survive a fork, and the copied queue may hold the parent's records or a lock held at fork time.
+    """
+    assert log_queue_handler is not None
+    log_queue_handler.queue = Queue(log_queue_handler.queue.maxsize)
+    log_queue_handler._counters_lock = Lock()
+    log_queue_handler.enqueued = log_queue_handler.dropped = 0
+    _start_log_queue_listener()
+    # multiprocessing children leave with os._exit(), only its finalizers are run
+    Finalize(None, _stop_log_queue_listener, exitpriority=10)
+
+
+def get_log_queue_stats() -> Dict[str, Union[bool, int]]:
+    """Return the counters of the log queue of this process."""
+    if log_queue_handler is None:
+        return {"enabled": False, "queued": 0, "enqueued": 0, "dropped": 0, "capacity": 0, "pid": getpid()}
+    return {
+        "enabled": True,
+        "queued": log_queue_handler.queue.qsize(),
+        "enqueued": log_queue_handler.enqueued,
+        "dropped": log_queue_handler.dropped,
+        "capacity": log_queue_handler.queue.maxsize,
+        "pid": getpid(),
+    }
+
+
+if log_queue_handler is not None:
+    _start_log_queue_listener()
+    atexit_register(_stop_log_queue_listener)
+    register_at_fork(after_in_child=_reset_log_queue_after_fork)
+
+basicConfig(
+    format=LOG_FORMAT, datefmt=DATE_FORMAT, level=default_level, handlers=[log_queue_handler] if log_queue_handler is not None else log_handlers, force=True
+)
 
 # Set the default logging level for specific SQLAlchemy components
 database_default_level = _nameToLevel.get(getenv("DATABASE_LOG_LEVEL", "WARNING").upper(), WARNING)
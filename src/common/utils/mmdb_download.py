@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+from hashlib import new as new_hash
+from logging import Logger
+from os import replace
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from time import sleep
+from typing import Dict
+from zlib import MAX_WBITS, decompressobj
+
+from maxminddb import open_database
+from requests import get
+from requests.exceptions import ConnectionError
+
+CHUNK_SIZE = 64 * 1024
+HASH_ALGORITHMS = ("sha1", "sha512")  # sha1 is the one published by db-ip.com, sha512 the one of the jobs cache
+
+
+def download_mmdb(url: str, destination: Path, logger: Logger, *, max_retries: int = 3) -> Dict[str, str]:
+    """Download a gzipped mmdb file to destination and return its hashes (see HASH_ALGORITHMS).
+
+    The response is decompressed and hashed while it is written to a temporary file next to destination,
+    which replaces destination once the database is valid, so memory stays bounded whatever the size of the file.
+    """
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    retry_count = 0
+    while True:
+        tmp_path = None
+        try:
+            hashes = {algorithm: new_hash(algorithm) for algorithm in HASH_ALGORITHMS}
+            decompressor = decompressobj(16 + MAX_WBITS)  # gzip container
+            with get(url, stream=True, timeout=5) as resp, NamedTemporaryFile(dir=destination.parent, prefix=f".{destination.name}.", delete=False) as tmp:
+                tmp_path = Path(tmp.name)
+                resp.raise_for_status()
+
+                def write(data: bytes) -> None:
+                    if data:
+                        tmp.write(data)
+                        for _hash in hashes.values():
+                            _hash.update(data)
+
+                for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                    while chunk:
+                        # Bound the output of every step, a small gzip chunk can expand a lot
+                        write(decompressor.decompress(chunk, CHUNK_SIZE))
+                        chunk = decompressor.unconsumed_tail
+                write(decompressor.flush())
+                if not decompressor.eof:
+                    raise EOFError("the mmdb archive is truncated")
+
+            logger.info("Checking if mmdb file is valid ...")
+            with open_database(tmp_path.as_posix()):
+                pass
+
+            replace(tmp_path, destination)
+            return {algorithm: _hash.hexdigest() for algorithm, _hash in hashes.items()}
+        except ConnectionError:
+            retry_count += 1
+            if retry_count >= max_retries:
+                raise
+            logger.warning(f"Connection refused, retrying in 3 seconds... ({retry_count}/{max_retries})")
+            sleep(3)
+        finally:
+            if tmp_path:
+                tmp_path.unlink(missing_ok=True)
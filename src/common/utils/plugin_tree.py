@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+from contextlib import suppress
+from hashlib import sha256
+from json import JSONDecodeError, dumps, loads
+from os import R_OK, access, getpid, readlink, sep
+from pathlib import Path
+from stat import S_IMODE, S_ISDIR, S_ISLNK, S_ISREG
+from threading import Lock
+from typing import Dict, List, NamedTuple, Optional, Union
+from zlib import ZLIB_RUNTIME_VERSION
+
+from common_utils import PLUGIN_TAR_COMPRESS_LEVEL, bytes_hash, create_plugin_tar_gz, plugin_tar_exclude  # type: ignore
+
+PLUGIN_HASH_MEMO_FILE = Path(sep, "var", "tmp", "bunkerweb", "plugin_hashes.json")
+# The archive checksums remembered for a tree are only valid for the same archive format and compressor
+MEMO_FORMAT = f"1:{PLUGIN_TAR_COMPRESS_LEVEL}:{ZLIB_RUNTIME_VERSION}"
+
+
+class PluginTree(NamedTuple):
+    """Merkle tree of a plugin directory: the digest of every entry by path relative to the directory ("" is the directory itself)."""
+
+    root: str
+    nodes: Dict[str, str]
+
+    def changed(self, other: "PluginTree") -> List[str]:
+        """Return the deepest paths that differ between the two trees (the added, removed or modified entries)."""
+        if self.root == other.root:
+            return []
+
+        paths = sorted(self.nodes.keys() | other.nodes.keys(), key=lambda path: path.split("/"))
+        differing = [path for path in paths if path and self.nodes.get(path) != other.nodes.get(path)]
+        # A directory differs because of its entries, unless its own mode changed
+        return [path for index, path in enumerate(differing) if index + 1 == len(differing) or not differing[index + 1].startswith(f"{path}/")] or [""]
+
+
+class PluginHashMemo:
+    """File digests keyed by (device, inode, mtime, ctime, size) and archive checksums keyed by tree root, shared by the processes through a JSON file.
+
+    The memo is only a cache: it is ignored when it can't be read and silently not saved when it can't be written.
+    """
+
+    def __init__(self, file_path: Path = PLUGIN_HASH_MEMO_FILE):
+        self.file_path = file_path
+        self.files: Dict[str, list] = {}
+        self.checksums: Dict[str, list] = {}
+        self.trees: Dict[str, Dict[str, str]] = {}
+        self.__dirty = False
+        self.__lock = Lock()
+        with suppress(OSError, JSONDecodeError, TypeError):
+            data = loads(file_path.read_text(encoding="utf-8"))
+            if isinstance(data, dict) and data.get("format") == MEMO_FORMAT:
+                self.files = data.get("files") or {}
+                self.checksums = data.get("checksums") or {}
+                self.trees = data.get("trees") or {}
+
+    def file_digest(self, path: Path, stat_result) -> str:
+        key = [stat_result.st_dev, stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_ctime_ns, stat_result.st_size]
+        with self.__lock:
+            memo = self.files.get(path.as_posix())
+        if memo and memo[:-1] == key:
+            return memo[-1]
+
+        digest = _file_digest(path)
+        with self.__lock:
+            self.files[path.as_posix()] = [*key, digest]
+            self.__dirty = True
+        return digest
+
+    def get_checksum(self, dir_path: Path, arc_root: str, tree: PluginTree) -> Optional[str]:
+        with self.__lock:
+            memo = self.checksums.get(dir_path.as_posix())
+        if memo and memo[:2] == [arc_root, tree.root]:
+            return memo[2]
+        return None
+
+    def set_checksum(self, dir_path: Path, arc_root: str, tree: PluginTree, checksum: str):
+        with self.__lock:
+            self.checksums[dir_path.as_posix()] = [arc_root, tree.root, checksum]
+            self.trees[dir_path.as_posix()] = tree.nodes
+            self.__dirty = True
+
+    def get_tree(self, dir_path: Path) -> Optional[PluginTree]:
+        """Return the tree of the directory as of its last archive checksum, to tell which subtrees changed since."""
+        with self.__lock:
+            nodes = self.trees.get(dir_path.as_posix())
+        if not nodes or "" not in nodes:
+            return None
+        return PluginTree(nodes[""], nodes)
+
+    def forget(self, dir_path: Path, keep: Optional[set] = None):
+        """Drop the file digests under a directory that are not in keep (the files seen by the last walk)."""
+        prefix = f"{dir_path.as_posix()}/"
+        with self.__lock:
+            for path in [path for path in self.files if path.startswith(prefix) and (keep is None or path not in keep)]:
+                del self.files[path]
+                self.__dirty = True
+
+    def save(self):
+        with self.__lock:
+            if not self.__dirty:
+                return
+            data = dumps({"format": MEMO_FORMAT, "files": self.files, "checksums": self.checksums, "trees": self.trees})
+            self.__dirty = False
+
+        tmp_file = self.file_path.with_name(f".{self.file_path.name}.{getpid()}")
+        with suppress(OSError):
+            self.file_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file.write_text(data, encoding="utf-8")
+            tmp_file.replace(self.file_path)
+        tmp_file.unlink(missing_ok=True)
+
+
+def _digest(*parts: str) -> str:
+    return sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def _file_digest(path: Path) -> str:
+    digest = sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(64 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_plugin_tree(dir_path: Union[str, Path], arc_root: Optional[str] = None, *, memo: Optional[PluginHashMemo] = None) -> PluginTree:
+    """Hash a plugin directory into a Merkle tree covering everything create_plugin_tar_gz() puts in the archive.
+
+    Entries are walked and excluded like add_dir_to_tar_safely() does. A file leaf is the hash of its type, mode and
+    content (content digests are reused from the memo when the file's stat didn't change), a symlink leaf covers its
+    target and a directory node covers its mode and the names and digests of its children.
+    """
+    d = Path(dir_path)
+    if arc_root is None:
+        arc_root = d.name
+
+    nodes: Dict[str, str] = {}
+    children: Dict[str, List[str]] = {"": []}
+    hardlinks: Dict[tuple, str] = {}
+    seen_files = set()
+
+    for p in sorted(d.rglob("*")):
+        if plugin_tar_exclude(p):
+            continue
+        relative = p.relative_to(d).as_posix()
+        try:
+            stat_result = p.lstat()
+            if S_ISLNK(stat_result.st_mode):
+                if not p.is_dir() and not (p.is_file() and access(p.as_posix(), R_OK)):
+                    continue
+                nodes[relative] = _digest("l", str(S_IMODE(stat_result.st_mode)), readlink(p))
+            elif S_ISDIR(stat_result.st_mode):
+                nodes[relative] = ""  # computed once its children are known
+                children.setdefault(relative, [])
+            elif S_ISREG(stat_result.st_mode) and access(p.as_posix(), R_OK):
+                inode = (stat_result.st_dev, stat_result.st_ino)
+                if stat_result.st_nlink > 1 and inode in hardlinks:
+                    # tarfile stores the next paths of a hard link as links to the first one
+                    nodes[relative] = _digest("h", hardlinks[inode])
+                else:
+                    hardlinks.setdefault(inode, relative)
+                    content = memo.file_digest(p, stat_result) if memo else _file_digest(p)
+                    nodes[relative] = _digest("f", str(S_IMODE(stat_result.st_mode)), content)
+                    seen_files.add(p.as_posix())
+            else:
+                continue
+        except OSError:
+            # The archive silently skips the entries it can't add
+            nodes.pop(relative, None)
+            continue
+        children.setdefault(relative.rpartition("/")[0], []).append(relative)
+
+    # Directories from the deepest to the root, so that the children digests are known
+    for directory in sorted(children, key=lambda path: path.count("/") + bool(path), reverse=True):
+        if directory and directory not in nodes:
+            continue
+        try:
+            mode = str(S_IMODE((d.joinpath(directory) if directory else d).lstat().st_mode))
+        except OSError:
+            mode = ""
+        entries = [f"{child.rpartition('/')[2]}:{nodes[child]}" for child in children[directory] if child in nodes]
+        nodes[directory] = _digest("d", arc_root if not directory else "", mode, *entries)
+
+    if memo:
+        memo.forget(d, seen_files)
+    return PluginTree(nodes[""], nodes)
+
+
+def plugin_checksum(dir_path: Union[str, Path], arc_root: Optional[str] = None, *, memo: Optional[PluginHashMemo] = None) -> str:
+    """Return the sha256 of create_plugin_tar_gz(dir_path, arc_root), without building the archive when the tree didn't change since it was last built."""
+    d = Path(dir_path)
+    if arc_root is None:
+        arc_root = d.name
+    if not d.is_dir() or plugin_tar_exclude(d):
+        return bytes_hash(create_plugin_tar_gz(d, arc_root=arc_root), algorithm="sha256")
+
+    save = memo is None
+    memo = memo or PluginHashMemo()
+    tree = hash_plugin_tree(d, arc_root, memo=memo)
+    checksum = memo.get_checksum(d, arc_root, tree)
+    if checksum is None:
+        checksum = bytes_hash(create_plugin_tar_gz(d, arc_root=arc_root), algorithm="sha256")
+        memo.set_checksum(d, arc_root, tree, checksum)
+    if save:
+        memo.save()
+    return checksum
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+from functools import lru_cache
+from re import DOTALL, Pattern, compile as re_compile, error as RegexError
+from typing import Any, Collection, Dict, Iterable, Mapping, NamedTuple, Optional, Tuple
+
+SUFFIX_RX = re_compile(r"^(?P<setting>.+)_(?P<suffix>\d+)$")
+
+
+@lru_cache(maxsize=4096)
+def compile_setting_regex(pattern: str, file: bool = False) -> Optional[Pattern]:
+    """Compile the regex of a setting once per process (DOTALL for file settings), None if the regex is invalid."""
+    try:
+        return re_compile(pattern, DOTALL if file else 0)
+    except RegexError:
+        return None
+
+
+class SettingKey(NamedTuple):
+    """A configuration key split into its service ("" for a global key), its setting id and its multiple suffix."""
+
+    service: str
+    setting: str
+    suffix: Optional[int]
+
+
+class SettingRule(NamedTuple):
+    context: str
+    regex: str
+    pattern: Optional[Pattern]
+    multiple: bool
+
+
+class SettingValidator:
+    """Validates configuration keys and values against the settings, with every regex compiled once.
+
+    Keys can be suffixed (``SETTING_1``) when the setting is multiple and prefixed by a service (``www.example.com_SETTING``).
+    """
+
+    def __init__(self, settings: Mapping[str, Mapping[str, Any]], *, ignore_regex_check: bool = False):
+        self.ignore_regex_check = ignore_regex_check
+        self.rules: Dict[str, SettingRule] = {}
+        # Settings whose regex doesn't compile, their values are not checked
+        self.invalid_regexes: Dict[str, str] = {}
+
+        for setting, data in settings.items():
+            regex = data.get("regex") or ""
+            pattern = compile_setting_regex(regex, data.get("type") == "file")
+            if pattern is None:
+                self.invalid_regexes[setting] = regex
+            self.rules[setting] = SettingRule(data.get("context", "global"), regex, pattern, bool(data.get("multiple")))
+
+    @classmethod
+    def from_plugins(cls, *settings: Mapping[str, Mapping[str, Any]], plugins: Iterable[Mapping[str, Any]] = (), **kwargs) -> "SettingValidator":
+        """Build the validator from settings dicts (settings.json) and plugins (plugin.json), the first definition of a setting wins."""
+        merged: Dict[str, Mapping[str, Any]] = {}
+        for data in settings:
+            for setting, setting_data in data.items():
+                merged.setdefault(setting, setting_data)
+        for plugin in plugins:
+            for setting, setting_data in plugin.get("settings", {}).items():
+                merged.setdefault(setting, setting_data)
+        return cls(merged, **kwargs)
+
+    def resolve(self, key: str) -> Optional[Tuple[str, Optional[int]]]:
+        """Return the setting id and the suffix of an unprefixed key, None if it isn't a known setting."""
+        if key in self.rules:
+            return key, None
+        match = SUFFIX_RX.match(key)
+        if match:
+            rule = self.rules.get(match.group("setting"))
+            if rule is not None and rule.multiple:
+                return match.group("setting"), int(match.group("suffix"))
+        return None
+
+    def parse_key(self, key: str, services: Collection[str] = ()) -> Optional[SettingKey]:
+        """Split a key into its service, setting and suffix, services should be a set as it is probed for every underscore of the key."""
+        if services:
+            start = key.find("_")
+            while start != -1:
+                if key[:start] in services:
+                    resolved = self.resolve(key[start + 1 :])  # noqa: E203
+                    if resolved:
+                        return SettingKey(key[:start], *resolved)
+                start = key.find("_", start + 1)
+
+        resolved = self.resolve(key)
+        if resolved:
+            return SettingKey("", *resolved)
+        return None
+
+    def match(self, setting: str, value: str) -> bool:
+        """Whether the value matches the regex of the setting (always True when the regex is invalid or not checked)."""
+        rule = self.rules[setting]
+        return self.ignore_regex_check or rule.pattern is None or rule.pattern.search(value) is not None
+
+    def check(self, key: str, value: str, services: Collection[str] = ()) -> Tuple[bool, str]:
+        """Check a key and its value, services being the services whose prefixed keys are accepted."""
+        parsed = self.parse_key(key, services)
+        if parsed is None:
+            return False, f"variable name {key} doesn't exist"
+
+        rule = self.rules[parsed.setting]
+        if parsed.service and rule.context != "multisite":
+            return False, f"context of {key} isn't multisite"
+        if not self.match(parsed.setting, value):
+            return False, f"value {value} doesn't match regex {rule.regex}"
+        return True, "ok"
+
+    def validate(self, config: Mapping[str, str], services: Collection[str] = ()) -> Dict[str, str]:
+        """Check every key and value of a config, return the errors by key."""
+        if services and not isinstance(services, (set, frozenset)):
+            services = frozenset(services)
+
+        errors = {}
+        for key, value in config.items():
+            ok, err = self.check(key, value, services)
+            if not ok:
+                errors[key] = err
+        return errors
@@ -28,6 +28,7 @@ from common_utils import effective_cpu_count  # type: ignore
 from Database import Database, DEFAULT_POOL_MAX_OVERFLOW, DEFAULT_POOL_SIZE  # type: ignore
 from logger import getLogger  # type: ignore
 from ApiCaller import ApiCaller  # type: ignore
+from jobs import jobs_run  # type: ignore
 
 
 class JobScheduler(ApiCaller):
@@ -369,12 +370,13 @@ class JobScheduler(ApiCaller):
         self.__job_reload = False
 
         try:
-            # Use ThreadPoolExecutor to run jobs
-            futures = [self.__executor.submit(job.run) for job in pending_jobs]
+            with jobs_run(self.db):
+                # Use ThreadPoolExecutor to run jobs
+                futures = [self.__executor.submit(job.run) for job in pending_jobs]
 
-            # Wait for all jobs to complete
-            for future in futures:
-                future.result()
+                # Wait for all jobs to complete
+                for future in futures:
+                    future.result()
 
             success = self.__job_success
             self.__job_success = True
@@ -436,32 +438,33 @@ class JobScheduler(ApiCaller):
         plugins = plugins or []
 
         try:
-            futures = []
-            for plugin, jobs in self.__jobs.items():
-                jobs_to_run = []
-                if (plugins and plugin not in plugins) or (ignore_plugins and plugin in ignore_plugins):
-                    continue
-                for job in jobs:
-                    if job.get("async", False):
-                        futures.append(self.__executor.submit(self.__job_wrapper, job["path"], plugin, job["name"], job["file"]))
+            with jobs_run(self.db):
+                futures = []
+                for plugin, jobs in self.__jobs.items():
+                    jobs_to_run = []
+                    if (plugins and plugin not in plugins) or (ignore_plugins and plugin in ignore_plugins):
                         continue
-
-                    jobs_to_run.append(
-                        partial(
-                            self.__job_wrapper,
-                            job["path"],
-                            plugin,
-                            job["name"],
-                            job["file"],
+                    for job in jobs:
+                        if job.get("async", False):
+                            futures.append(self.__executor.submit(self.__job_wrapper, job["path"], plugin, job["name"], job["file"]))
+                            continue
+
+                        jobs_to_run.append(
+                            partial(
+                                self.__job_wrapper,
+                                job["path"],
+                                plugin,
+                                job["name"],
+                                job["file"],
+                            )
                         )
-                    )
 
-                if jobs_to_run:
-                    futures.append(self.__executor.submit(self.__run_jobs, jobs_to_run))
+                    if jobs_to_run:
+                        futures.append(self.__executor.submit(self.__run_jobs, jobs_to_run))
 
-            # Wait for all jobs to complete
-            for future in futures:
-                future.result()
+                # Wait for all jobs to complete
+                for future in futures:
+                    future.result()
 
             return self.__job_success
         finally:
@@ -502,12 +505,13 @@ class JobScheduler(ApiCaller):
                 return False
 
             try:
-                self.__job_wrapper(
-                    job_to_run["path"],
-                    job_plugin,
-                    job_to_run["name"],
-                    job_to_run["file"],
-                )
+                with jobs_run(self.db):
+                    self.__job_wrapper(
+                        job_to_run["path"],
+                        job_plugin,
+                        job_to_run["name"],
+                        job_to_run["file"],
+                    )
             finally:
                 with self.__module_paths_lock:
                     for module_path in self.__module_paths.copy():
@@ -19,7 +19,7 @@ from subprocess import run as subprocess_run, DEVNULL, STDOUT
 from sys import path as sys_path
 from tarfile import TarFile, open as tar_open
 from threading import Event, Lock
-from time import sleep
+from time import monotonic, sleep
 from traceback import format_exc
 from typing import Any, Dict, List, Literal, Optional, Set, Union, cast
 
@@ -36,6 +36,7 @@ from logger import getLogger  # type: ignore
 from Database import Database  # type: ignore
 from JobScheduler import JobScheduler
 from jobs import Job, _write_atomic  # type: ignore
+from plugin_tree import PluginHashMemo, plugin_checksum  # type: ignore
 from API import API  # type: ignore
 
 from ApiCaller import ApiCaller  # type: ignore
@@ -124,6 +125,17 @@ IGNORE_REGEX_CHECK = getenv("IGNORE_REGEX_CHECK", "no").lower() == "yes"
 if IGNORE_REGEX_CHECK:
     LOGGER.warning("Ignoring regex check for settings (we hope you know what you're doing) ...")
 
+CHANGES_POLL_INTERVAL = getenv("CHANGES_POLL_INTERVAL", "30")
+
+if not CHANGES_POLL_INTERVAL.isdigit() or int(CHANGES_POLL_INTERVAL) < 1:
+    LOGGER.error("CHANGES_POLL_INTERVAL must be a positive integer, defaulting to 30")
+    CHANGES_POLL_INTERVAL = 30
+
+CHANGES_POLL_INTERVAL = int(CHANGES_POLL_INTERVAL)
+
+INCREMENTAL_CONFIG_GENERATION = getenv("INCREMENTAL_CONFIG_GENERATION", "no").lower() == "yes"
+CONFIG_CHANGES_PATH = TMP_PATH.joinpath("config.changes")
+
 
 def _instance_endpoint(db_instance: Dict[str, Any]) -> str:
     """Return full scheme://host:port for an instance based on HTTPS settings."""
@@ -331,29 +343,35 @@ def generate_external_plugins(original_path: Union[Path, str] = EXTERNAL_PLUGINS
     LOGGER.info(f"Removing old/changed {'pro ' if pro else ''}external plugins files ...")
     ignored_plugins = set()
     if original_path.is_dir():
+        memo = PluginHashMemo()
         for file in original_path.glob("*"):
             with suppress(StopIteration, IndexError, FileNotFoundError):
                 index = next(i for i, plugin in enumerate(plugins) if plugin["id"] == file.name)
 
+                previous_tree = None
                 if file.is_dir():
-                    plugin_content = create_plugin_tar_gz(file, arc_root=file.name)
+                    previous_tree = memo.get_tree(file)
+                    checksum = plugin_checksum(file, arc_root=file.name, memo=memo)
                 elif file.is_file():
                     if plugin_tar_exclude(file.as_posix()) or not access(file.as_posix(), R_OK):
                         LOGGER.debug(f"Excluding file from tar: {file}")
                         continue
-                    plugin_content = create_plugin_tar_gz(file, arc_root=file.name)
+                    checksum = bytes_hash(create_plugin_tar_gz(file, arc_root=file.name), algorithm="sha256")
                 else:
                     continue
-                if bytes_hash(plugin_content, algorithm="sha256") == plugins[index]["checksum"]:
+                if checksum == plugins[index]["checksum"]:
                     ignored_plugins.add(file.name)
                     continue
-                LOGGER.debug(f"Checksum of {file} has changed, removing it ...")
+                tree = memo.get_tree(file)
+                changed = previous_tree.changed(tree) if previous_tree and tree else []
+                LOGGER.debug(f"Checksum of {file} has changed{' (' + ', '.join(changed) + ')' if changed else ''}, removing it ...")
 
             if file.is_symlink() or file.is_file():
                 with suppress(OSError):
                     file.unlink()
             elif file.is_dir():
                 rmtree(file, ignore_errors=True)
+        memo.save()
 
     if plugins:
         LOGGER.info(f"Generating new {'pro ' if pro else ''}external plugins ...")
@@ -529,6 +547,9 @@ def generate_configs(logger: Logger = LOGGER) -> bool:
             BUNKERWEB_PATH.joinpath("confs").as_posix(),
             "--output",
             CONFIG_PATH.as_posix(),
+            "--changes",
+            CONFIG_CHANGES_PATH.as_posix(),
+            *(["--incremental"] if INCREMENTAL_CONFIG_GENERATION else []),
         ],
         stdin=DEVNULL,
         stderr=STDOUT,
@@ -540,6 +561,9 @@ def generate_configs(logger: Logger = LOGGER) -> bool:
         logger.error("Config generator failed, configuration will not work as expected...")
         return False
 
+    if INCREMENTAL_CONFIG_GENERATION and CONFIG_CHANGES_PATH.is_file():
+        logger.info(f"Config generator changed {len(CONFIG_CHANGES_PATH.read_text().splitlines())} file(s)")
+
     copy(NGINX_VARIABLES_PATH.as_posix(), NGINX_TMP_VARIABLES_PATH.as_posix())
     return True
 
@@ -926,16 +950,16 @@ if __name__ == "__main__":
             db_plugins = SCHEDULER.db.get_plugins(_type=_type)
             external_plugins = []
             tmp_external_plugins = []
+            memo = PluginHashMemo()
             for file in plugin_path.glob("*/plugin.json"):
-                plugin_content = create_plugin_tar_gz(file.parent, arc_root=file.parent.name)
-
                 with file.open("r", encoding="utf-8") as f:
                     plugin_data = json_load(f)
 
                 if plugin_data["id"] == "letsencrypt_dns":
                     continue
 
-                checksum = bytes_hash(plugin_content, algorithm="sha256")
+                # The archive is only built for the plugins that have to be saved
+                checksum = plugin_checksum(file.parent, arc_root=file.parent.name, memo=memo)
                 common_data = plugin_data | {
                     "type": _type,
                     "page": file.parent.joinpath("ui").is_dir(),
@@ -949,6 +973,8 @@ if __name__ == "__main__":
                     if checksum == db_plugins[index]["checksum"] or db_plugins[index]["method"] != "manual":
                         continue
 
+                plugin_content = create_plugin_tar_gz(file.parent, arc_root=file.parent.name)
+                common_data["checksum"] = bytes_hash(plugin_content, algorithm="sha256")
                 tmp_external_plugins.append(common_data.copy())
 
                 external_plugins.append(
@@ -959,6 +985,7 @@ if __name__ == "__main__":
                     }
                     | ({"jobs": jobs} if jobs else {})
                 )
+            memo.save()
 
             changes = False
             if tmp_external_plugins:
@@ -1049,6 +1076,7 @@ if __name__ == "__main__":
         changed_plugins = []
         old_changes = {}
         healthcheck_job_run = False
+        changes_pushed = None
 
         while True:
             task_futures.clear()
@@ -1284,13 +1312,19 @@ if __name__ == "__main__":
                 schedule_every(HEALTHCHECK_INTERVAL).seconds.do(healthcheck_job)
                 healthcheck_job_run = True
 
+            if changes_pushed is None:
+                changes_pushed = SCHEDULER.db.listen_for_changes()
+                if changes_pushed:
+                    LOGGER.info(f"Listening for database changes, polling every {CHANGES_POLL_INTERVAL} seconds as a fallback")
+
             # infinite schedule for the jobs
             LOGGER.info("Executing job scheduler ...")
             errors = 0
             _gc_counter = 0
+            last_changes_poll = 0.0
             while RUN and not NEED_RELOAD:
                 try:
-                    sleep(3 if SCHEDULER.db.readonly else 1)
+                    notified_changes = SCHEDULER.db.wait_for_changes(3 if SCHEDULER.db.readonly else 1)
                     run_pending()
                     SCHEDULER.run_pending()
                     _gc_counter += 1
@@ -1305,6 +1339,12 @@ if __name__ == "__main__":
 
                     DB_LOCK_FILE.unlink(missing_ok=True)
 
+                    if changes_pushed and not SCHEDULER.db.readonly and not notified_changes and monotonic() - last_changes_poll < CHANGES_POLL_INTERVAL:
+                        continue
+
+                    if notified_changes:
+                        LOGGER.debug(f"Notified of database changes: {', '.join(sorted(notified_changes))}")
+                    last_changes_poll = monotonic()
                     db_metadata = SCHEDULER.db.get_metadata()
 
                     if isinstance(db_metadata, str):
@@ -9,7 +9,8 @@ from stat import S_IRGRP, S_IRUSR, S_IWUSR, S_IXGRP, S_IXUSR
 from tarfile import open as tar_open
 from traceback import format_exc
 
-from common_utils import bytes_hash, create_plugin_tar_gz, safe_tar_extractall  # type: ignore
+from common_utils import safe_tar_extractall  # type: ignore
+from plugin_tree import PluginHashMemo, plugin_checksum  # type: ignore
 
 from app.models.config import Config
 from app.models.instance import InstancesUtils
@@ -17,7 +18,7 @@ from app.models.ui_data import UIData
 from app.models.ui_database import UIDatabase
 
 DB = UIDatabase(getLogger("UI"), log=False)
-DATA = UIData(Path(sep, "var", "tmp", "bunkerweb").joinpath("ui_data.json"))
+DATA = UIData(Path(sep, "var", "tmp", "bunkerweb").joinpath("ui_data.sqlite3"))
 
 BW_CONFIG = Config(DB, data=DATA)
 BW_INSTANCES_UTILS = InstancesUtils(DB)
@@ -43,6 +44,7 @@ def reload_plugins():
     known_plugin_ids = {plugin["id"] for plugin in plugins}
 
     ignored_plugins = set()
+    memo = PluginHashMemo()
     for plugin in plugins:
         # Determine the correct extraction path based on the plugin type.
         if plugin["type"] in ("external", "ui"):
@@ -57,8 +59,7 @@ def reload_plugins():
         # If the target exists, compare its checksum.
         if target.exists():
             with suppress(StopIteration, IndexError, FileNotFoundError):
-                plugin_content = create_plugin_tar_gz(target, arc_root=target.name)
-                if bytes_hash(plugin_content, algorithm="sha256") == plugin["checksum"]:
+                if plugin_checksum(target, arc_root=target.name, memo=memo) == plugin["checksum"]:
                     ignored_plugins.add(target.name)
                     continue
                 DB.logger.debug(f"Checksum of {target} has changed, removing it ...")
@@ -93,6 +94,8 @@ def reload_plugins():
             DB.logger.debug(format_exc())
             DB.logger.error(f"Error while generating {plugin['type']} plugins \"{plugin['name']}\": {e}")
 
+    memo.save()
+
     ret = DB.checked_changes(["ui_plugins"])
     if ret:
         DB.logger.error(f"An error occurred when setting the changes to checked in the database : {ret}")
@@ -115,3 +118,5 @@ def safe_reload_plugins(force: bool = False):
     if force or DATA.get("FORCE_RELOAD_PLUGIN", False) or not DATA.get("IS_RELOADING_PLUGINS", False):
         DATA["IS_RELOADING_PLUGINS"] = True
         reload_plugins()
+        # Let every worker refresh the plugins of its page context
+        DATA["CONTEXT_GENERATION"] = DATA.get("CONTEXT_GENERATION", 0) + 1
@@ -14,7 +14,9 @@ from urllib.parse import quote
 
 from API import API  # type: ignore
 from ApiCaller import ApiCaller  # type: ignore
+from common_utils import batch_results  # type: ignore
 
+from app.models.request_rollups import get_rollup_home_aggregates, get_rollup_pane_counts, rollups_available, update_request_rollups
 from app.utils import LOGGER, RESERVED_SERVICE_NAMES
 
 # Short-lived process-local cache for home page aggregates. /home recomputes a
@@ -368,6 +370,16 @@ class InstancesUtils:
 
         return pane_counts if has_values else None
 
+    def _get_redis_pane_counts_from_rollups(self, redis_client, pane_fields: List[str]) -> Optional[dict[str, dict[str, dict[str, int]]]]:
+        """Read the pane counts from the hourly rollups (top-K sketches), after catching up with the new requests."""
+        try:
+            update_request_rollups(redis_client)
+            if rollups_available(redis_client):
+                return get_rollup_pane_counts(redis_client, pane_fields, max(0, self._REPORT_PANE_MAX_VALUES))
+        except Exception as e:
+            LOGGER.warning(f"Failed to read pane counts from the requests rollups: {e}")
+        return None
+
     def _get_redis_pane_counts_streaming_fallback(
         self,
         redis_client,
@@ -481,19 +493,51 @@ class InstancesUtils:
             instance.name for instance in instances or self.get_instances() if instance.status == "down" or instance.reload().startswith("Can't reload")
         ] or "Successfully reloaded instances"
 
+    def __send_batch(self, url: str, items: List[dict], instances: Optional[List[Instance]]) -> List[dict[str, Any]]:
+        """POST the items to the instances with a single request per instance and return one result per item (see batch_results),
+        the instances that failed being listed by name."""
+        instances = instances or self.get_instances(status="up")
+        names = {api.endpoint: instance.name for instance in instances for api in instance.apiCaller.apis}
+        try:
+            _, responses = ApiCaller([api for instance in instances for api in instance.apiCaller.apis]).send_batch_to_apis(url, items, response=True)
+        except BaseException as e:
+            LOGGER.error(f"Can't send the batch to {url}: {e}")
+            responses = {endpoint: {"status": "error", "msg": str(e), "data": []} for endpoint in names}
+        results = batch_results(items, responses)
+        for result in results:
+            result["failed"] = {names.get(endpoint, endpoint): msg for endpoint, msg in result["failed"].items()}
+        return results
+
+    def ban_many(self, bans: List[dict[str, Any]], *, instances: Optional[List[Instance]] = None) -> List[dict[str, Any]]:
+        """Apply a list of bans (ip, exp, reason, service and ban_scope) on the instances, in one request per instance."""
+        payloads = []
+        for ban in bans:
+            ban_scope = ban.get("ban_scope", "global")
+            # Ensure ban_scope is either 'global' or 'service' and that service bans have a valid service
+            if ban_scope not in ("global", "service") or (ban_scope == "service" and (not ban.get("service") or ban["service"] in RESERVED_SERVICE_NAMES)):
+                ban_scope = "global"
+            payloads.append({"ip": ban["ip"], "exp": ban.get("exp", 0), "reason": ban.get("reason"), "service": ban.get("service"), "ban_scope": ban_scope})
+        return self.__send_batch("/ban", payloads, instances)
+
+    def unban_many(self, unbans: List[dict[str, Any]], *, instances: Optional[List[Instance]] = None) -> List[dict[str, Any]]:
+        """Remove a list of bans (ip, service and ban_scope) from the instances, in one request per instance."""
+        payloads = []
+        for unban in unbans:
+            data = {"ip": unban["ip"], "ban_scope": unban.get("ban_scope", "global")}
+            if unban.get("service") and unban["service"] not in RESERVED_SERVICE_NAMES:
+                data["service"] = unban["service"]
+            payloads.append(data)
+        return self.__send_batch("/unban", payloads, instances)
+
     def ban(
         self, ip: str, exp: float, reason: str, service: str, ban_scope: str = "global", *, instances: Optional[List[Instance]] = None
     ) -> Union[list[str], str]:
-        return [
-            instance.name
-            for instance in instances or self.get_instances(status="up")
-            if instance.ban(ip, exp, reason, service, ban_scope).startswith("Can't ban")
-        ] or ""
+        result = self.ban_many([{"ip": ip, "exp": exp, "reason": reason, "service": service, "ban_scope": ban_scope}], instances=instances)[0]
+        return list(result["failed"]) or ""
 
     def unban(self, ip: str, service: Optional[str] = None, ban_scope: str = "global", *, instances: Optional[List[Instance]] = None) -> Union[list[str], str]:
-        return [
-            instance.name for instance in instances or self.get_instances(status="up") if instance.unban(ip, service, ban_scope).startswith("Can't unban")
-        ] or ""
+        result = self.unban_many([{"ip": ip, "service": service, "ban_scope": ban_scope}], instances=instances)[0]
+        return list(result["failed"]) or ""
 
     def get_bans(self, hostname: Optional[str] = None, *, instances: Optional[List[Instance]] = None) -> List[dict[str, Any]]:
         """Get unique bans from all instances or a specific instance and sort them by expiration date"""
@@ -647,6 +691,10 @@ class InstancesUtils:
                 if facet_counts is not None:
                     return facet_counts
 
+                rollup_counts = self._get_redis_pane_counts_from_rollups(redis_client, pane_fields)
+                if rollup_counts is not None:
+                    return rollup_counts
+
                 return self._get_redis_pane_counts_streaming_fallback(
                     redis_client,
                     max_requests=max_redis_requests,
@@ -722,7 +770,11 @@ class InstancesUtils:
                 max_pane_values = max(0, self._REPORT_PANE_MAX_VALUES)
                 pane_counts_enabled = include_pane_counts
                 can_use_precomputed_pane_counts = pane_counts_enabled and search == "" and not pane_filters
-                precomputed_pane_counts = self._get_redis_pane_counts_from_facets(redis_client, pane_fields) if can_use_precomputed_pane_counts else None
+                precomputed_pane_counts = None
+                if can_use_precomputed_pane_counts:
+                    precomputed_pane_counts = self._get_redis_pane_counts_from_facets(redis_client, pane_fields)
+                    if precomputed_pane_counts is None:
+                        precomputed_pane_counts = self._get_redis_pane_counts_from_rollups(redis_client, pane_fields)
                 use_precomputed_pane_counts = precomputed_pane_counts is not None
                 pane_counts = precomputed_pane_counts if use_precomputed_pane_counts else ({field: {} for field in pane_fields} if pane_counts_enabled else {})
 
@@ -1009,9 +1061,10 @@ class InstancesUtils:
     def get_home_aggregates(self, hours: int = 24 * 7, top_ips_limit: int = 10, *, redis_client: Any = _REDIS_UNSET) -> dict[str, Any]:
         """
         Compute home page aggregates (country counts, IP counts, time buckets)
-        using streaming/chunked processing to minimize memory usage.
+        from the hourly Redis rollups, or using streaming/chunked processing to
+        minimize memory usage when the rollups are unavailable.
 
-        This method processes requests in chunks and computes aggregates incrementally,
+        The fallback processes requests in chunks and computes aggregates incrementally,
         only keeping the aggregated counts in memory instead of all request data.
 
         Args:
@@ -1029,6 +1082,21 @@ class InstancesUtils:
             - time_buckets: Dict of ISO timestamp -> blocked count
             - request_statuses: Dict of status code -> count
         """
+        if redis_client is _REDIS_UNSET:
+            from app.routes.utils import get_redis_client
+
+            redis_client = get_redis_client()
+
+        # Hourly rollups maintained in Redis and shared by every worker: catch up
+        # with the requests pushed since the last run, then read O(hours) buckets.
+        if redis_client:
+            try:
+                update_request_rollups(redis_client)
+                if rollups_available(redis_client):
+                    return get_rollup_home_aggregates(redis_client, hours, top_ips_limit)
+            except Exception as e:
+                LOGGER.warning(f"Failed to read home aggregates from the requests rollups, falling back to a full aggregation: {e}")
+
         cache_key = (hours, top_ips_limit)
 
         def _fresh():
@@ -1043,11 +1111,6 @@ class InstancesUtils:
         if hit is not None:
             return _copy_home_aggregates(hit)
 
-        if redis_client is _REDIS_UNSET:
-            from app.routes.utils import get_redis_client
-
-            redis_client = get_redis_client()
-
         # Redis-down fallback is uncached, so the single-flight lock only serializes every
         # /home request per worker during an outage with no benefit. Skip it.
         if not redis_client:
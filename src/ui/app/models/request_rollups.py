@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+from collections import defaultdict
+from contextlib import suppress
+from datetime import datetime, timedelta
+from json import loads
+from time import time
+from traceback import format_exc
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from redis.exceptions import WatchError
+
+from app.utils import LOGGER
+
+# Hourly rollups of the Redis "requests" list, shared by every gunicorn worker:
+# - requests:rollup:<hour>:counts   hash: total, blocked, status:<code>, country:<country> (blocked requests)
+# - requests:rollup:<hour>:top:<f>  sorted set: value -> count, trimmed to the ROLLUP_TOP_K biggest values (top-K sketch)
+# - requests:rollup:<hour>:ips      HyperLogLog of the blocked IPs
+# where <hour> is the number of hours since the epoch. Every bucket expires ROLLUP_RETENTION_HOURS after its end.
+ROLLUP_PREFIX = "requests:rollup"
+ROLLUP_CURSOR_KEY = f"{ROLLUP_PREFIX}:cursor"  # hash: entry (last consumed raw entry) and index (its position back then)
+ROLLUP_LOCK_KEY = f"{ROLLUP_PREFIX}:lock"
+ROLLUP_LOCK_TTL_MS = 30000
+ROLLUP_RETENTION_HOURS = 24 * 8
+ROLLUP_TOP_K = 500
+ROLLUP_BATCH_SIZE = 5000
+ROLLUP_MAX_BATCHES = 20  # per run, the next run resumes from the cursor
+ROLLUP_FIELDS = ("ip", "country", "method", "url", "status", "reason", "server_name", "security_mode")
+BLOCKED_STATUSES = (403, 429, 444)
+
+# Return the position of the first entry after the cursor entry and up to ARGV[3] entries from there.
+# Entries are only appended at the tail and trimmed at the head, so the cursor entry can only have moved
+# towards the head since its last known position: look for it from there, and if it was trimmed every
+# remaining entry is new.
+_NEXT_ENTRIES_SCRIPT = """
+local length = redis.call("LLEN", KEYS[1])
+local start = 0
+if ARGV[1] ~= "" then
+    local idx = math.min(tonumber(ARGV[2]) or length - 1, length - 1)
+    while idx >= 0 do
+        local low = math.max(0, idx - 999)
+        local chunk = redis.call("LRANGE", KEYS[1], low, idx)
+        local found = false
+        for i = #chunk, 1, -1 do
+            if chunk[i] == ARGV[1] then
+                start = low + i
+                found = true
+                break
+            end
+        end
+        if found then
+            break
+        end
+        idx = low - 1
+    end
+end
+return { start, redis.call("LRANGE", KEYS[1], start, start + tonumber(ARGV[3]) - 1) }
+"""
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+def _bucket_key(hour: int, kind: str) -> str:
+    return f"{ROLLUP_PREFIX}:{hour}:{kind}"
+
+
+def _decode(value: Any) -> str:
+    return value.decode("utf-8", errors="replace") if isinstance(value, bytes) else str(value)
+
+
+def _consume_batch(redis_client) -> Optional[int]:
+    """Roll up the next batch of entries, returns how many were consumed or None if another worker moved the cursor meanwhile."""
+    with redis_client.pipeline() as pipe:
+        try:
+            pipe.watch(ROLLUP_CURSOR_KEY)
+            cursor = pipe.hgetall(ROLLUP_CURSOR_KEY)
+            start, entries = pipe.eval(_NEXT_ENTRIES_SCRIPT, 1, "requests", cursor.get(b"entry", b""), int(cursor.get(b"index", -1)), ROLLUP_BATCH_SIZE)
+            if not entries:
+                if not cursor:
+                    # Mark the rollups as initialized even when there is nothing to roll up yet
+                    pipe.multi()
+                    pipe.hset(ROLLUP_CURSOR_KEY, mapping={"entry": "", "index": -1})
+                    pipe.execute()
+                return 0
+
+            min_hour = int(time() // 3600) - ROLLUP_RETENTION_HOURS
+            counts: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+            tops: Dict[tuple, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+            ips: Dict[int, set] = defaultdict(set)
+
+            for raw_entry in entries:
+                try:
+                    request = loads(raw_entry)
+                    hour = int(float(request.get("date", 0)) // 3600)
+                except Exception:
+                    continue
+                if hour < min_hour:
+                    continue
+
+                status = request.get("status", 0)
+                if not isinstance(status, int):
+                    with suppress(ValueError, TypeError):
+                        status = int(status)
+                if not isinstance(status, int):
+                    status = 0
+
+                counts[hour]["total"] += 1
+                counts[hour][f"status:{status}"] += 1
+                if status in BLOCKED_STATUSES:
+                    ip = str(request.get("ip") or "unknown")
+                    counts[hour]["blocked"] += 1
+                    counts[hour][f"country:{request.get('country', 'unknown')}"] += 1
+                    tops[(hour, "blocked_ip")][ip] += 1
+                    ips[hour].add(ip)
+
+                for field in ROLLUP_FIELDS:
+                    tops[(hour, field)][str(request.get(field, "N/A"))] += 1
+
+            pipe.multi()
+            expirations = {}
+            for hour, fields in counts.items():
+                key = _bucket_key(hour, "counts")
+                for field, count in fields.items():
+                    pipe.hincrby(key, field, count)
+                expirations[key] = hour
+            for (hour, field), values in tops.items():
+                key = _bucket_key(hour, f"top:{field}")
+                for value, count in values.items():
+                    pipe.zincrby(key, count, value)
+                pipe.zremrangebyrank(key, 0, -(ROLLUP_TOP_K + 1))
+                expirations[key] = hour
+            for hour, hour_ips in ips.items():
+                key = _bucket_key(hour, "ips")
+                pipe.pfadd(key, *hour_ips)
+                expirations[key] = hour
+            for key, hour in expirations.items():
+                pipe.expireat(key, (hour + 1 + ROLLUP_RETENTION_HOURS) * 3600)
+            pipe.hset(ROLLUP_CURSOR_KEY, mapping={"entry": entries[-1], "index": int(start) + len(entries) - 1})
+            pipe.execute()
+        except WatchError:
+            return None
+    return len(entries)
+
+
+def update_request_rollups(redis_client, *, max_batches: int = ROLLUP_MAX_BATCHES) -> int:
+    """Roll up the entries pushed to the Redis "requests" list since the last run.
+
+    Only one worker rolls up at a time (the others return right away) and the
+    cursor is updated in the same transaction as the rollups, so entries are
+    never counted twice. Returns how many entries were consumed.
+    """
+    token = uuid4().hex
+    try:
+        if not redis_client.set(ROLLUP_LOCK_KEY, token, nx=True, px=ROLLUP_LOCK_TTL_MS):
+            return 0
+    except Exception as e:
+        LOGGER.debug(f"Couldn't acquire the requests rollup lock: {e}")
+        return 0
+
+    consumed = 0
+    try:
+        for _ in range(max_batches):
+            batch = _consume_batch(redis_client)
+            if batch is None:
+                break
+            consumed += batch
+            if batch < ROLLUP_BATCH_SIZE:
+                break
+    except Exception as e:
+        LOGGER.debug(format_exc())
+        LOGGER.warning(f"Couldn't update the requests rollups: {e}")
+    finally:
+        with suppress(Exception):
+            redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, ROLLUP_LOCK_KEY, token)
+    return consumed
+
+
+def rollups_available(redis_client) -> bool:
+    try:
+        return bool(redis_client.exists(ROLLUP_CURSOR_KEY))
+    except Exception:
+        return False
+
+
+def _merge_top(redis_client, keys: List[str], limit: int) -> List[tuple]:
+    """Merge hourly top-K sorted sets and return the ``limit`` biggest ``(value, count)`` pairs."""
+    if limit <= 0 or not keys:
+        return []
+    tmp_key = f"{ROLLUP_PREFIX}:tmp:{uuid4().hex}"
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.zunionstore(tmp_key, keys)
+    pipe.zrevrange(tmp_key, 0, limit - 1, withscores=True)
+    pipe.delete(tmp_key)
+    _, top, _ = pipe.execute()
+    return [(_decode(value), int(count)) for value, count in top]
+
+
+def get_rollup_home_aggregates(redis_client, hours: int, top_ips_limit: int) -> dict[str, Any]:
+    """Build the home page aggregates from the hourly rollups (reads O(hours) keys)."""
+    now_hour = int(time() // 3600)
+    bucket_hours = range(now_hour - hours + 1, now_hour + 1)
+
+    pipe = redis_client.pipeline(transaction=False)
+    for hour in bucket_hours:
+        pipe.hgetall(_bucket_key(hour, "counts"))
+    pipe.pfcount(*[_bucket_key(hour, "ips") for hour in bucket_hours])
+    *hourly_counts, blocked_unique_ips = pipe.execute()
+
+    # Same local-time hourly buckets as the streaming aggregation
+    current_date = datetime.now().astimezone()
+    time_buckets: dict[datetime, int] = {(current_date - timedelta(hours=i)).replace(minute=0, second=0, microsecond=0): 0 for i in range(hours)}
+
+    request_countries: dict[str, dict[str, int]] = {}
+    request_statuses: dict[int, int] = {}
+    for hour, counts in zip(bucket_hours, hourly_counts):
+        if not counts:
+            continue
+        for raw_field, raw_count in counts.items():
+            field = _decode(raw_field)
+            count = int(raw_count)
+            if field == "blocked":
+                bucket = datetime.fromtimestamp(hour * 3600).astimezone().replace(minute=0, second=0, microsecond=0)
+                if bucket in time_buckets:
+                    time_buckets[bucket] += count
+            elif field.startswith("status:"):
+                with suppress(ValueError):
+                    status = int(field[7:])
+                    request_statuses[status] = request_statuses.get(status, 0) + count
+            elif field.startswith("country:"):
+                country = field[8:]
+                request_countries.setdefault(country, {"blocked": 0})["blocked"] += count
+
+    top_ips = _merge_top(redis_client, [_bucket_key(hour, "top:blocked_ip") for hour in bucket_hours], top_ips_limit)
+
+    return {
+        "request_countries": request_countries,
+        "top_blocked_ips": {ip: {"blocked": count} for ip, count in top_ips},
+        "blocked_unique_ips": int(blocked_unique_ips or 0),
+        "time_buckets": {key.isoformat(): value for key, value in time_buckets.items()},
+        "request_statuses": request_statuses,
+    }
+
+
+def get_rollup_pane_counts(redis_client, pane_fields: List[str], max_values: int) -> Optional[dict[str, dict[str, dict[str, int]]]]:
+    """Build the reports SearchPanes counts from the top-K sketches of the retained hours, or None when there is no data."""
+    now_hour = int(time() // 3600)
+    bucket_hours = range(now_hour - ROLLUP_RETENTION_HOURS, now_hour + 1)
+    pane_counts: dict[str, dict[str, dict[str, int]]] = {}
+    has_values = False
+    for field in pane_fields:
+        if field not in ROLLUP_FIELDS:
+            pane_counts[field] = {}
+            continue
+        top = _merge_top(redis_client, [_bucket_key(hour, f"top:{field}") for hour in bucket_hours], max_values)
+        has_values = has_values or bool(top)
+        pane_counts[field] = {value: {"total": count, "count": count} for value, count in top}
+    return pane_counts if has_values else None
@@ -1,26 +1,123 @@
 from json import dumps, loads
-from multiprocessing import Lock
+from os import getpid
 from pathlib import Path
+from sqlite3 import Connection, connect
+from threading import Lock
+from typing import Dict, Optional
 
 
 class UIData(dict):
+    """Dict shared between the UI workers, backed by a SQLite database in WAL mode.
+
+    Every key is stored in its own row with the version (a global, increasing counter) of its last write, deleted keys
+    are kept as tombstones. Writes only touch the keys whose value changed and ``load_from_file()`` only reads the keys
+    written since the last load, after a ``PRAGMA data_version`` tells that another worker committed something.
+    The database is opened lazily, by each worker, as a SQLite connection must not be shared across a fork.
+    """
+
     def __init__(self, file_path: Path):
         super().__init__()
         self.file_path = file_path
         self.__lock = Lock()
-        self.load_from_file()
+        self.__connection: Optional[Connection] = None
+        self.__pid = None
+        self.__data_version = None
+        self.__version = 0
+        # Serialized value of each key as of the last load or write, to detect the changed keys (nested values included)
+        self.__persisted: Dict[str, str] = {}
+
+    @property
+    def generation(self) -> int:
+        """The version of the last write loaded by this worker, it increases whenever another worker changes a key."""
+        return self.__version
+
+    def __connect(self) -> Connection:
+        if self.__connection is None or self.__pid != getpid():
+            self.file_path.parent.mkdir(parents=True, exist_ok=True)
+            self.__connection = connect(self.file_path.as_posix(), timeout=30, isolation_level=None, check_same_thread=False)
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+            self.__connection.execute("PRAGMA synchronous=NORMAL")
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS ui_data (key TEXT PRIMARY KEY, value TEXT, version INTEGER NOT NULL)")
+            self.__connection.execute("CREATE INDEX IF NOT EXISTS ui_data_version ON ui_data (version)")
+            self.__pid = getpid()
+            self.__data_version = None
+            self.__version = 0
+        return self.__connection
 
     def write_to_file(self):
+        """Persist the keys whose value changed since they were last loaded or written."""
         with self.__lock:
-            self.file_path.write_text(dumps(self))
+            serialized = {key: dumps(value) for key, value in self.items()}
+            changed = [(key, value) for key, value in serialized.items() if self.__persisted.get(key) != value]
+            changed.extend((key, None) for key in self.__persisted.keys() - serialized.keys())
+            if not changed:
+                return
+
+            connection = self.__connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                version = connection.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM ui_data").fetchone()[0]
+                connection.executemany(
+                    "INSERT INTO ui_data (key, value, version) VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value, version = excluded.version",
+                    [(key, value, version) for key, value in changed],
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+            for key, value in changed:
+                if value is None:
+                    self.__persisted.pop(key, None)
+                else:
+                    self.__persisted[key] = value
 
     def load_from_file(self):
-        if self.file_path.is_file():
-            with self.__lock:
-                data = self.file_path.read_text()
-                if data:
-                    for key, value in loads(data).items():
-                        super().__setitem__(key, value)
+        """Apply the writes made by the other workers since the last load."""
+        with self.__lock:
+            if self.__connection is None and not self.file_path.is_file():
+                return
+
+            connection = self.__connect()
+            # data_version only changes when another connection committed
+            data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self.__data_version:
+                return
+
+            for key, value, version in connection.execute("SELECT key, value, version FROM ui_data WHERE version > ? ORDER BY version", (self.__version,)):
+                if value is None:
+                    super().pop(key, None)
+                    self.__persisted.pop(key, None)
+                else:
+                    super().__setitem__(key, loads(value))
+                    self.__persisted[key] = value
+                self.__version = max(self.__version, version)
+            self.__data_version = data_version
+
+    def reset(self, data: dict):
+        """Replace all the keys with the given data (used when the UI starts)."""
+        with self.__lock:
+            connection = self.__connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute("DELETE FROM ui_data")
+                connection.executemany("INSERT INTO ui_data (key, value, version) VALUES (?, ?, 1)", [(key, dumps(value)) for key, value in data.items()])
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+            super().clear()
+            super().update(data)
+            self.__persisted = {key: dumps(value) for key, value in data.items()}
+            self.__version = 1
+            self.__data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        with self.__lock:
+            if self.__connection is not None and self.__pid == getpid():
+                self.__connection.close()
+            self.__connection = None
 
     def __setitem__(self, key, value):
         super().__setitem__(key, value)
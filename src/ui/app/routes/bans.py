@@ -14,6 +14,8 @@ from flask_login import login_required
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill
 
+from ban_index import BANS_INDEX, BANS_INDEX_DATE, count_bans, ensure_ban_index, get_ban_counts, get_ban_keys, get_bans, iter_bans  # type: ignore
+
 from app.dependencies import BW_CONFIG, BW_INSTANCES_UTILS, DB
 from app.utils import LOGGER, RESERVED_SERVICE_NAMES, csv_safe, csv_writer, flash
 
@@ -28,6 +30,9 @@ from app.routes.utils import (
 
 bans = Blueprint("bans", __name__)
 
+# Failures of a bulk action flashed one by one, the others are summarized
+MAX_FAILED_FLASHES = 10
+
 
 # Column order shared between the table and exports — must stay in sync with bans.js
 _BAN_COLUMNS = (
@@ -43,76 +48,45 @@ _BAN_COLUMNS = (
 )
 
 
+def _enrich_ban(ban, timestamp_now):
+    """Add the `remain`/`start_date`/`end_date` display fields to a ban."""
+    exp = ban.pop("exp", 0)
+    if exp == 0 or ban.get("permanent", False):
+        ban["remain"] = "permanent"
+        ban["permanent"] = True
+        ban["end_date"] = "permanent"
+    else:
+        remain = ("unknown", "unknown") if exp <= 0 else get_remain(exp)
+        ban["remain"] = remain[0]
+        ban["start_date"] = datetime.fromtimestamp(floor(ban["date"])).astimezone().isoformat()
+        ban["end_date"] = datetime.fromtimestamp(floor(timestamp_now + exp)).astimezone().isoformat()
+    # Preserve `exp` for end_date pane filters that still need it
+    ban["exp"] = exp
+    return ban
+
+
+def _ban_id(ban):
+    """Use IP+scope+service as unique ID for bans."""
+    service = ban.get("service")
+    # Normalize service to "_" for global bans or when service is None
+    if ban.get("ban_scope") == "global" or service is None:
+        service = "_"
+    return f"{ban.get('ip','')}|{ban.get('ban_scope','')}|{service}"  # noqa: E231
+
+
 def _collect_all_bans():
-    """Pull every ban from Redis (global + service-scoped) and from each
-    BunkerWeb instance, deduplicate them, and enrich with `remain`/`start_date`/
-    `end_date` for display. Returns the raw (unfiltered) list."""
+    """Pull every ban from the Redis ban index (global + service-scoped) and
+    from each BunkerWeb instance, deduplicate them, and enrich with `remain`/
+    `start_date`/`end_date` for display. Returns the raw (unfiltered) list."""
     redis_client = get_redis_client()
 
     bans_list = []
     if redis_client:
         try:
-            # Collect keys first, then pipeline GET+TTL for all of them. This
-            # turns 2 round-trips per ban (get + ttl) into ~2 round-trips total.
-            # Results come back flat: [data0, ttl0, data1, ttl1, ...].
-            global_keys = list(redis_client.scan_iter("bans_ip_*"))
-            if global_keys:
-                pipe = redis_client.pipeline(transaction=False)
-                for key in global_keys:
-                    pipe.get(key)
-                    pipe.ttl(key)
-                results = pipe.execute()
-                for idx, key in enumerate(global_keys):
-                    data = results[2 * idx]
-                    exp = results[2 * idx + 1]
-                    if not data:
-                        continue
-                    key_str = key.decode("utf-8", "replace")
-                    ip = key_str.replace("bans_ip_", "")
-                    raw_value = data.decode("utf-8", "replace")
-                    try:
-                        ban_data = loads(raw_value)
-                    except (JSONDecodeError, ValueError) as e:
-                        LOGGER.warning(f"Failed to decode ban data for {ip}, using raw value as reason: {e}")
-                        ban_data = {"reason": raw_value, "service": "unknown", "date": 0, "country": "unknown", "ban_scope": "global", "permanent": False}
-
-                    ban_data["ban_scope"] = "global"
-                    ban_data["permanent"] = ban_data.get("permanent", False) or exp == 0
-
-                    if ban_data.get("permanent", False):
-                        exp = 0
-
-                    bans_list.append({"ip": ip, "exp": exp, "permanent": ban_data.get("permanent", False)} | ban_data)
-
-            service_keys = list(redis_client.scan_iter("bans_service_*_ip_*"))
-            if service_keys:
-                pipe = redis_client.pipeline(transaction=False)
-                for key in service_keys:
-                    pipe.get(key)
-                    pipe.ttl(key)
-                results = pipe.execute()
-                for idx, key in enumerate(service_keys):
-                    data = results[2 * idx]
-                    exp = results[2 * idx + 1]
-                    if not data:
-                        continue
-                    key_str = key.decode("utf-8", "replace")
-                    service, ip = key_str.replace("bans_service_", "").rsplit("_ip_", 1)
-                    raw_value = data.decode("utf-8", "replace")
-                    try:
-                        ban_data = loads(raw_value)
-                    except (JSONDecodeError, ValueError) as e:
-                        LOGGER.warning(f"Failed to decode ban data for {ip} on service {service}, using raw value as reason: {e}")
-                        ban_data = {"reason": raw_value, "service": service, "date": 0, "country": "unknown", "ban_scope": "service", "permanent": False}
-
-                    ban_data["ban_scope"] = "service"
-                    ban_data["service"] = service
-                    ban_data["permanent"] = ban_data.get("permanent", False) or exp == 0
-
-                    if ban_data.get("permanent", False):
-                        exp = 0
-
-                    bans_list.append({"ip": ip, "exp": exp, "permanent": ban_data.get("permanent", False)} | ban_data)
+            # Ranged reads of the ban index, each batch is a single pipelined
+            # GET+TTL round-trip instead of a SCAN of the whole keyspace.
+            ensure_ban_index(redis_client)
+            bans_list = list(iter_bans(redis_client, logger=LOGGER))
         except BaseException as e:
             LOGGER.debug(format_exc())
             LOGGER.error(f"Couldn't get bans from redis: {e}")
@@ -122,25 +96,16 @@ def _collect_all_bans():
 
     timestamp_now = time()
 
+    known_ids = {_ban_id(ban) for ban in bans_list}
     for ban in instance_bans:
         if "ban_scope" not in ban:
             ban["ban_scope"] = "global" if ban.get("service", "_") == "_" else "service"
-        if not any(b["ip"] == ban["ip"] and b["ban_scope"] == ban["ban_scope"] and (b.get("service", "_") == ban.get("service", "_")) for b in bans_list):
+        if _ban_id(ban) not in known_ids:
+            known_ids.add(_ban_id(ban))
             bans_list.append(ban)
 
     for ban in bans_list:
-        exp = ban.pop("exp", 0)
-        if exp == 0 or ban.get("permanent", False):
-            ban["remain"] = "permanent"
-            ban["permanent"] = True
-            ban["end_date"] = "permanent"
-        else:
-            remain = ("unknown", "unknown") if exp <= 0 else get_remain(exp)
-            ban["remain"] = remain[0]
-            ban["start_date"] = datetime.fromtimestamp(floor(ban["date"])).astimezone().isoformat()
-            ban["end_date"] = datetime.fromtimestamp(floor(timestamp_now + exp)).astimezone().isoformat()
-        # Preserve `exp` for end_date pane filters that still need it
-        ban["exp"] = exp
+        _enrich_ban(ban, timestamp_now)
 
     return bans_list
 
@@ -257,114 +222,118 @@ def bans_page():
     return render_template("bans.html", services=services)
 
 
-@bans.route("/bans/fetch", methods=["POST"])
-@login_required
-@cors_required
-def bans_fetch():
-    try:
-        bans = _collect_all_bans()
-    except BaseException as e:
-        LOGGER.debug(format_exc())
-        LOGGER.error(f"Couldn't get bans from redis: {e}")
-        flash("Failed to fetch bans from Redis, see logs for more information.", "error")
-        bans = []
-
-    # DataTables parameters
-    draw = int(request.form.get("draw", 1))
-    start = max(0, int(request.form.get("start", 0)))
-    length = max(1, min(int(request.form.get("length", 10)), 1000))
-    search_value = request.form.get("search[value]", "").lower()
-    # DataTables includes two leading non-data columns (details-control and select)
-    # Adjust incoming index to align with backend data columns
-    try:
-        order_column_index_dt = int(request.form.get("order[0][column]", 0))
-    except Exception:
-        order_column_index_dt = 0
-    order_column_index = max(order_column_index_dt - 2, 0)
-    order_direction = request.form.get("order[0][dir]", "desc")
-    search_panes = parse_search_panes_dict(request.form)
-
-    # Local alias kept for the formatter / pane-counts code below
-    columns = list(_BAN_COLUMNS)
-
-    # Helper: format a ban for DataTable row
-    def format_ban(ban):
-        # Defensive: some bans may lack some fields
-        return {
-            "date": datetime.fromtimestamp(floor(ban.get("date", 0))).isoformat() if ban.get("date") else "N/A",
-            "ip": escape(str(ban.get("ip", "N/A"))),
-            "country": escape(str(ban.get("country", "N/A"))),
-            "reason": escape(str(ban.get("reason", "N/A"))),
-            "scope": escape(str(ban.get("ban_scope", "global"))),
-            "service": escape(str(ban.get("service") or "_")),
-            "end_date": "permanent" if ban.get("permanent", False) else escape(str(ban.get("end_date", "N/A"))),
-            "time_left": "permanent" if ban.get("permanent", False) else escape(str(ban.get("remain", "N/A"))),
-            "permanent": bool(ban.get("permanent", False)),
-            "actions": "",  # Actions column for buttons
-        }
-
-    filtered_bans = _filter_and_sort_bans(bans, search_value, search_panes, order_column_index, order_direction)
+# Orderings that the Redis ban index can serve directly and the sorted set backing each of them
+_INDEXED_ORDER_COLUMNS = {"date": "date", "end_date": "expiration", "time_left": "expiration"}
 
-    paginated_bans = filtered_bans if length == -1 else filtered_bans[start : start + length]  # noqa: E203
+_DATE_PANES = (
+    ("last_24h", "Last 24 hours"),
+    ("last_7d", "Last 7 days"),
+    ("last_30d", "Last 30 days"),
+    ("older_30d", "More than 30 days"),
+)
+_END_DATE_PANES = (
+    ("permanent", "Permanent"),
+    ("next_24h", "Next 24 hours"),
+    ("next_7d", "Next 7 days"),
+    ("next_30d", "Next 30 days"),
+    ("future_30d", "More than 30 days"),
+)
 
-    # Format for DataTable
-    formatted_bans = [format_ban(ban) for ban in paginated_bans]
 
-    # Calculate pane counts (for SearchPanes)
-    pane_counts = defaultdict(lambda: defaultdict(lambda: {"total": 0, "count": 0}))
+def _new_pane_counts():
+    return defaultdict(lambda: defaultdict(lambda: {"total": 0, "count": 0}))
+
+
+def _date_panes(ban, now):
+    age = now - ban.get("date", 0)
+    if age < 86400:
+        yield "last_24h"
+    if age < 604800:
+        yield "last_7d"
+    if age < 2592000:
+        yield "last_30d"
+    if age >= 2592000:
+        yield "older_30d"
+
+
+def _end_date_panes(ban):
+    if ban.get("permanent", False) or ban.get("exp", 0) == 0:
+        yield "permanent"
+    if not ban.get("permanent", False):
+        exp = ban.get("exp", 0)
+        if exp < 86400:
+            yield "next_24h"
+        if exp < 604800:
+            yield "next_7d"
+        if exp < 2592000:
+            yield "next_30d"
+        if exp >= 2592000:
+            yield "future_30d"
+
+
+def _indexed_pane_counts(redis_client):
+    """Read the SearchPanes counts of the whole (unfiltered) ban list from the
+    ban index counters and sorted sets, without loading any ban."""
+    pane_counts = _new_pane_counts()
+    for name, total in get_ban_counts(redis_client).items():
+        field, _, value = name.partition("_")
+        if field in ("country", "reason", "scope", "service"):
+            pane_counts[field][value] = {"total": total, "count": total}
+
+    now = int(time())
+    ranges = (
+        ("date", "last_24h", BANS_INDEX_DATE, f"({now - 86400}", "+inf"),
+        ("date", "last_7d", BANS_INDEX_DATE, f"({now - 604800}", "+inf"),
+        ("date", "last_30d", BANS_INDEX_DATE, f"({now - 2592000}", "+inf"),
+        ("date", "older_30d", BANS_INDEX_DATE, "-inf", now - 2592000),
+        ("end_date", "permanent", BANS_INDEX, "+inf", "+inf"),
+        ("end_date", "next_24h", BANS_INDEX, "-inf", f"({now + 86400}"),
+        ("end_date", "next_7d", BANS_INDEX, "-inf", f"({now + 604800}"),
+        ("end_date", "next_30d", BANS_INDEX, "-inf", f"({now + 2592000}"),
+        ("end_date", "future_30d", BANS_INDEX, now + 2592000, "(+inf"),
+    )
+    pipe = redis_client.pipeline(transaction=False)
+    for _, _, key, min_score, max_score in ranges:
+        pipe.zcount(key, min_score, max_score)
+    for (field, value, *_), total in zip(ranges, pipe.execute()):
+        pane_counts[field][value] = {"total": total, "count": total}
+    return pane_counts
+
+
+def _fetch_indexed_bans(redis_client, start, length, order_column, order_direction):
+    """Read a single page of bans from the Redis ban index, ordered by ban date
+    or expiration. Returns the page and the total number of bans."""
+    by = _INDEXED_ORDER_COLUMNS[order_column]
+    desc = order_direction == "desc"
+    stop = start + length - 1
+
+    if by == "expiration" and desc:
+        # Permanent bans (+inf) are listed last whatever the direction, like the in-memory sort
+        total = count_bans(redis_client)
+        expiring = count_bans(redis_client, "-inf", "(+inf")
+        keys = []
+        if start < expiring:
+            page, _ = get_ban_keys(redis_client, expiring - 1 - min(stop, expiring - 1), expiring - 1 - start)
+            keys.extend(reversed(page))
+        if stop >= expiring:
+            page, _ = get_ban_keys(redis_client, max(start, expiring), stop)
+            keys.extend(page)
+    else:
+        keys, total = get_ban_keys(redis_client, start, stop, by=by, desc=desc)
 
-    # Use IP+scope+service as unique ID for bans
-    def ban_id(ban):
-        service = ban.get("service")
-        # Normalize service to "_" for global bans or when service is None
-        if ban.get("ban_scope") == "global" or service is None:
-            service = "_"
-        return f"{ban.get('ip','')}|{ban.get('ban_scope','')}|{service}"  # noqa: E231
+    timestamp_now = time()
+    return [_enrich_ban(ban, timestamp_now) for ban in get_bans(redis_client, keys, LOGGER)], total
 
-    filtered_ids = {ban_id(ban) for ban in filtered_bans}
-    for ban in bans:
-        for field in columns[1:]:  # skip date
-            value = ban.get(field, "N/A")
-            # Special handling for service field to normalize global bans
-            if field == "service":
-                if ban.get("ban_scope") == "global" or value in (None, ""):
-                    value = "_"
-            if isinstance(value, (dict, list)):
-                value = str(value)
-            pane_counts[field][value]["total"] += 1
-            if ban_id(ban) in filtered_ids:
-                pane_counts[field][value]["count"] += 1
 
-    # Prepare SearchPanes options (special formatting for date, country, scope, service, and end_date)
+def _search_panes_options(pane_counts):
+    """Build the SearchPanes options from `pane_counts[field][value]` totals and
+    counts, where the date, scope and end_date values are the pane buckets."""
     base_flags_url = url_for("static", filename="img/flags")
     search_panes_options = {}
 
     # Special handling for date searchpane options
     search_panes_options["date"] = [
-        {
-            "label": '<span data-i18n="searchpane.last_24h">Last 24 hours</span>',
-            "value": "last_24h",
-            "total": sum(1 for ban in bans if time() - ban.get("date", 0) < 86400),
-            "count": sum(1 for ban in filtered_bans if time() - ban.get("date", 0) < 86400),
-        },
-        {
-            "label": '<span data-i18n="searchpane.last_7d">Last 7 days</span>',
-            "value": "last_7d",
-            "total": sum(1 for ban in bans if time() - ban.get("date", 0) < 604800),
-            "count": sum(1 for ban in filtered_bans if time() - ban.get("date", 0) < 604800),
-        },
-        {
-            "label": '<span data-i18n="searchpane.last_30d">Last 30 days</span>',
-            "value": "last_30d",
-            "total": sum(1 for ban in bans if time() - ban.get("date", 0) < 2592000),
-            "count": sum(1 for ban in filtered_bans if time() - ban.get("date", 0) < 2592000),
-        },
-        {
-            "label": '<span data-i18n="searchpane.older_30d">More than 30 days</span>',
-            "value": "older_30d",
-            "total": sum(1 for ban in bans if time() - ban.get("date", 0) >= 2592000),
-            "count": sum(1 for ban in filtered_bans if time() - ban.get("date", 0) >= 2592000),
-        },
+        {"label": f'<span data-i18n="searchpane.{value}">{label}</span>', "value": value} | pane_counts["date"][value] for value, label in _DATE_PANES
     ]
 
     # Special handling for country searchpane options
@@ -392,15 +361,13 @@ def bans_fetch():
         {
             "label": '<i class="bx bx-xs bx-globe"></i> <span data-i18n="scope.global">Global</span>',
             "value": "global",
-            "total": sum(1 for ban in bans if ban.get("ban_scope") == "global"),
-            "count": sum(1 for ban in filtered_bans if ban.get("ban_scope") == "global"),
-        },
+        }
+        | pane_counts["scope"]["global"],
         {
             "label": '<i class="bx bx-xs bx-server"></i> <span data-i18n="scope.service_specific">Service</span>',
             "value": "service",
-            "total": sum(1 for ban in bans if ban.get("ban_scope") == "service"),
-            "count": sum(1 for ban in filtered_bans if ban.get("ban_scope") == "service"),
-        },
+        }
+        | pane_counts["scope"]["service"],
     ]
 
     # Special handling for service searchpane options
@@ -418,36 +385,7 @@ def bans_fetch():
 
     # Special handling for end_date searchpane options
     search_panes_options["end_date"] = [
-        {
-            "label": '<span data-i18n="searchpane.permanent">Permanent</span>',
-            "value": "permanent",
-            "total": sum(1 for ban in bans if ban.get("permanent", False) or ban.get("exp", 0) == 0),
-            "count": sum(1 for ban in filtered_bans if ban.get("permanent", False) or ban.get("exp", 0) == 0),
-        },
-        {
-            "label": '<span data-i18n="searchpane.next_24h">Next 24 hours</span>',
-            "value": "next_24h",
-            "total": sum(1 for ban in bans if not ban.get("permanent", False) and ban.get("exp", 0) < 86400),
-            "count": sum(1 for ban in filtered_bans if not ban.get("permanent", False) and ban.get("exp", 0) < 86400),
-        },
-        {
-            "label": '<span data-i18n="searchpane.next_7d">Next 7 days</span>',
-            "value": "next_7d",
-            "total": sum(1 for ban in bans if not ban.get("permanent", False) and ban.get("exp", 0) < 604800),
-            "count": sum(1 for ban in filtered_bans if not ban.get("permanent", False) and ban.get("exp", 0) < 604800),
-        },
-        {
-            "label": '<span data-i18n="searchpane.next_30d">Next 30 days</span>',
-            "value": "next_30d",
-            "total": sum(1 for ban in bans if not ban.get("permanent", False) and ban.get("exp", 0) < 2592000),
-            "count": sum(1 for ban in filtered_bans if not ban.get("permanent", False) and ban.get("exp", 0) < 2592000),
-        },
-        {
-            "label": '<span data-i18n="searchpane.future_30d">More than 30 days</span>',
-            "value": "future_30d",
-            "total": sum(1 for ban in bans if not ban.get("permanent", False) and ban.get("exp", 0) >= 2592000),
-            "count": sum(1 for ban in filtered_bans if not ban.get("permanent", False) and ban.get("exp", 0) >= 2592000),
-        },
+        {"label": f'<span data-i18n="searchpane.{value}">{label}</span>', "value": value} | pane_counts["end_date"][value] for value, label in _END_DATE_PANES
     ]
 
     # Add any remaining fields from pane_counts
@@ -463,6 +401,113 @@ def bans_fetch():
                 for value, counts in values.items()
             ]
 
+    return search_panes_options
+
+
+@bans.route("/bans/fetch", methods=["POST"])
+@login_required
+@cors_required
+def bans_fetch():
+    # DataTables parameters
+    draw = int(request.form.get("draw", 1))
+    start = max(0, int(request.form.get("start", 0)))
+    length = max(1, min(int(request.form.get("length", 10)), 1000))
+    search_value = request.form.get("search[value]", "").lower()
+    # DataTables includes two leading non-data columns (details-control and select)
+    # Adjust incoming index to align with backend data columns
+    try:
+        order_column_index_dt = int(request.form.get("order[0][column]", 0))
+    except Exception:
+        order_column_index_dt = 0
+    order_column_index = max(order_column_index_dt - 2, 0)
+    order_direction = request.form.get("order[0][dir]", "desc")
+    search_panes = parse_search_panes_dict(request.form)
+
+    # Local alias kept for the formatter / pane-counts code below
+    columns = list(_BAN_COLUMNS)
+
+    # Helper: format a ban for DataTable row
+    def format_ban(ban):
+        # Defensive: some bans may lack some fields
+        return {
+            "date": datetime.fromtimestamp(floor(ban.get("date", 0))).isoformat() if ban.get("date") else "N/A",
+            "ip": escape(str(ban.get("ip", "N/A"))),
+            "country": escape(str(ban.get("country", "N/A"))),
+            "reason": escape(str(ban.get("reason", "N/A"))),
+            "scope": escape(str(ban.get("ban_scope", "global"))),
+            "service": escape(str(ban.get("service") or "_")),
+            "end_date": "permanent" if ban.get("permanent", False) else escape(str(ban.get("end_date", "N/A"))),
+            "time_left": "permanent" if ban.get("permanent", False) else escape(str(ban.get("remain", "N/A"))),
+            "permanent": bool(ban.get("permanent", False)),
+            "actions": "",  # Actions column for buttons
+        }
+
+    # Unfiltered pages ordered by date or expiration are served straight from the
+    # Redis ban index (Redis is the source of truth for bans when it is enabled)
+    order_column = columns[order_column_index] if order_column_index < len(columns) else None
+    if not search_value and not any(search_panes.values()) and order_column in _INDEXED_ORDER_COLUMNS:
+        redis_client = get_redis_client()
+        if redis_client:
+            try:
+                ensure_ban_index(redis_client)
+                paginated_bans, total = _fetch_indexed_bans(redis_client, start, length, order_column, order_direction)
+                return jsonify(
+                    {
+                        "draw": draw,
+                        "recordsTotal": total,
+                        "recordsFiltered": total,
+                        "data": [format_ban(ban) for ban in paginated_bans],
+                        "searchPanes": {"options": _search_panes_options(_indexed_pane_counts(redis_client))},
+                    }
+                )
+            except BaseException as e:
+                LOGGER.debug(format_exc())
+                LOGGER.warning(f"Couldn't read bans from the redis ban index, falling back to the full listing: {e}")
+
+    try:
+        bans = _collect_all_bans()
+    except BaseException as e:
+        LOGGER.debug(format_exc())
+        LOGGER.error(f"Couldn't get bans from redis: {e}")
+        flash("Failed to fetch bans from Redis, see logs for more information.", "error")
+        bans = []
+
+    filtered_bans = _filter_and_sort_bans(bans, search_value, search_panes, order_column_index, order_direction)
+
+    paginated_bans = filtered_bans if length == -1 else filtered_bans[start : start + length]  # noqa: E203
+
+    # Format for DataTable
+    formatted_bans = [format_ban(ban) for ban in paginated_bans]
+
+    # Calculate pane counts (for SearchPanes)
+    pane_counts = _new_pane_counts()
+
+    now = time()
+    filtered_ids = {_ban_id(ban) for ban in filtered_bans}
+    for ban in bans:
+        in_filtered = _ban_id(ban) in filtered_ids
+        for field in columns[1:]:  # skip date
+            if field in ("scope", "end_date"):  # bucketed below
+                continue
+            value = ban.get(field, "N/A")
+            # Special handling for service field to normalize global bans
+            if field == "service":
+                if ban.get("ban_scope") == "global" or value in (None, ""):
+                    value = "_"
+            if isinstance(value, (dict, list)):
+                value = str(value)
+            pane_counts[field][value]["total"] += 1
+            if in_filtered:
+                pane_counts[field][value]["count"] += 1
+
+        buckets = [("scope", ban.get("ban_scope"))]
+        buckets.extend(("date", value) for value in _date_panes(ban, now))
+        buckets.extend(("end_date", value) for value in _end_date_panes(ban))
+        for field, value in buckets:
+            pane_counts[field][value]["total"] += 1
+            if in_filtered:
+                pane_counts[field][value]["count"] += 1
+
     # Response
     return jsonify(
         {
@@ -470,7 +515,7 @@ def bans_fetch():
             "recordsTotal": len(bans),
             "recordsFiltered": len(filtered_bans),
             "data": formatted_bans,
-            "searchPanes": {"options": search_panes_options},
+            "searchPanes": {"options": _search_panes_options(pane_counts)},
         }
     )
 
@@ -615,6 +660,26 @@ def bans_export_excel():
     )
 
 
+def flash_batch_results(results: list, action: str, done: str, what: str = "IP"):
+    """Flash the results of a bulk action (see InstancesUtils.ban_many), the successes in one message and the first failures one by one."""
+    failed = [result for result in results if result["status"] != "success"]
+    for result in failed[:MAX_FAILED_FLASHES]:
+        instances = ", ".join(result["failed"])
+        LOGGER.error(f"Failed to {action} {result['ip']} on instances: {instances}")
+        flash(f"Failed to {action} {result['ip']} on some instances: {instances}", "error")
+    if len(failed) > MAX_FAILED_FLASHES:
+        LOGGER.error(f"Failed to {action} {len(failed) - MAX_FAILED_FLASHES} more IPs on some instances")
+        flash(f"Failed to {action} {len(failed) - MAX_FAILED_FLASHES} more IPs on some instances.", "error")
+
+    succeeded = [result["ip"] for result in results if result["status"] == "success"]
+    if len(succeeded) == 1:
+        LOGGER.info(f"{done} {succeeded[0]} on all instances")
+        flash(f"{done} {succeeded[0]} successfully.", "success")
+    elif succeeded:
+        LOGGER.info(f"{done} {len(succeeded)} {what}s on all instances")
+        flash(f"{done} {len(succeeded)} {what}s successfully.", "success")
+
+
 @bans.route("/bans/ban", methods=["POST"])
 @login_required
 def bans_ban():
@@ -637,6 +702,7 @@ def bans_ban():
     except JSONDecodeError:
         return handle_error("Invalid bans parameter on /bans/ban.", "bans", True)
 
+    valid_bans = []
     for ban in bans:
         # Validate ban structure
         if not isinstance(ban, dict) or "ip" not in ban:
@@ -669,14 +735,11 @@ def bans_ban():
                 ban_scope = "global"
                 service = "unknown"
 
-        # Propagate ban to all connected BunkerWeb instances
-        resp = BW_INSTANCES_UTILS.ban(ip, ban_end, reason, service, ban_scope)
-        if resp:
-            LOGGER.error(f"Failed to ban {ip} on instances: {resp}")
-            flash(f"Failed to ban {ip} on some instances: {resp}", "error")
-        else:
-            LOGGER.info(f"Banned {ip} on all instances")
-            flash(f"Banned {ip} successfully.", "success")
+        valid_bans.append({"ip": ip, "exp": ban_end, "reason": reason, "service": service, "ban_scope": ban_scope})
+
+    # Propagate the bans to all connected BunkerWeb instances, in one request per instance
+    if valid_bans:
+        flash_batch_results(BW_INSTANCES_UTILS.ban_many(valid_bans), "ban", "Banned")
 
     return redirect(url_for("loading", next=url_for("bans.bans_page"), message=f"Banning {len(bans)} IP{'s' if len(bans) > 1 else ''}"))
 
@@ -703,6 +766,7 @@ def bans_unban():
     except JSONDecodeError:
         return handle_error("Invalid ips parameter on /bans/unban.", "bans", True)
 
+    valid_unbans = []
     for unban in unbans:
         # Validate unban structure
         if "ip" not in unban:
@@ -725,14 +789,11 @@ def bans_unban():
             ban_scope = "global"
             service = None
 
-        # Propagate unban to all connected BunkerWeb instances, now passing ban_scope
-        resp = BW_INSTANCES_UTILS.unban(ip, service, ban_scope)
-        if resp:
-            LOGGER.error(f"Failed to unban {ip} on instances: {resp}")
-            flash(f"Failed to unban {ip} on some instances: {resp}", "error")
-        else:
-            LOGGER.info(f"Unbanned {ip} on all instances")
-            flash(f"Unbanned {ip} successfully.", "success")
+        valid_unbans.append({"ip": ip, "service": service, "ban_scope": ban_scope})
+
+    # Propagate the unbans to all connected BunkerWeb instances, in one request per instance
+    if valid_unbans:
+        flash_batch_results(BW_INSTANCES_UTILS.unban_many(valid_unbans), "unban", "Unbanned")
 
     return redirect(url_for("loading", next=url_for("bans.bans_page"), message=f"Unbanning {len(unbans)} IP{'s' if len(unbans) > 1 else ''}"))
 
@@ -772,6 +833,7 @@ def bans_update_duration():
         ban_key = f"{ban.get('ip')}|{ban.get('ban_scope', 'global')}|{ban.get('service', '_') if ban['ban_scope'] == 'service' else '_'}"
         instance_bans_dict[ban_key] = ban
 
+    updated_bans = []
     for update in updates:
         # Validate update structure
         if not isinstance(update, dict) or "ip" not in update or "duration" not in update:
@@ -833,13 +895,10 @@ def bans_update_duration():
         if ban_key in instance_bans_dict:
             original_reason = instance_bans_dict[ban_key].get("reason", "ui")
 
-        # Update ban on BunkerWeb instances using original reason
-        ban_resp = BW_INSTANCES_UTILS.ban(ip, new_exp, original_reason, service, ban_scope)
-        if ban_resp:
-            LOGGER.error(f"Failed to update ban duration for {ip} on instances: {ban_resp}")
-            flash(f"Failed to update ban duration for {ip} on some instances: {ban_resp}", "error")
-        else:
-            LOGGER.info(f"Updated ban duration for {ip} on all instances")
-            flash(f"Updated ban duration for {ip} successfully.", "success")
+        updated_bans.append({"ip": ip, "exp": new_exp, "reason": original_reason, "service": service, "ban_scope": ban_scope})
+
+    # Update the bans on BunkerWeb instances using their original reason, in one request per instance
+    if updated_bans:
+        flash_batch_results(BW_INSTANCES_UTILS.ban_many(updated_bans), "update ban duration for", "Updated ban duration for", "ban")
 
     return redirect(url_for("loading", next=url_for("bans.bans_page"), message=f"Updating duration for {len(updates)} ban{'s' if len(updates) > 1 else ''}"))
@@ -1,13 +1,14 @@
 from contextlib import suppress
+from hashlib import sha1
 from itertools import islice
-from os import cpu_count, getenv, listdir
+from os import cpu_count, getenv, getpid, listdir, replace
 from os.path import isabs, sep
 from pathlib import Path
 import json
 import threading
 import time
 
-from flask import Blueprint, Response, render_template, request, send_file
+from flask import Blueprint, Response, render_template, request, send_file, stream_with_context
 from flask_login import login_required
 from werkzeug.utils import secure_filename
 
@@ -16,6 +17,16 @@ logs = Blueprint("logs", __name__)
 LOGS_PATH = Path(sep, "var", "log", "bunkerweb")
 PAGE_SIZE = 10000
 
+# --- Line-offset index ---
+# Byte offset of every CHECKPOINT_LINES-th line, persisted per file so a page deep in a
+# multi-GB log is read with one seek instead of a rescan of everything before it.
+LOGS_INDEX_PATH = Path(sep, "var", "tmp", "bunkerweb", "ui_logs_index")
+CHECKPOINT_LINES = 1000  # divides PAGE_SIZE, so every page starts on a checkpoint
+INDEX_READ_SIZE = 1024 * 1024
+INDEX_HEAD_BYTES = 1024  # fingerprint of the file start, catches copytruncate rotations that regrew past the old size
+INDEX_VERSION = 1
+_index_lock = threading.Lock()
+
 # --- SSE (live-follow) tuning ---
 REFRESH_TAIL_BYTES = 2 * 1024 * 1024  # cap the initial/rotated SSE payload to the last 2 MiB
 STREAM_MAX_SECONDS = 900  # bound a follow session; the client auto-reconnects and resumes via Last-Event-ID
@@ -61,6 +72,84 @@ def _list_log_files():
     return files
 
 
+def _index_file(file_path):
+    return LOGS_INDEX_PATH / f"{sha1(file_path.as_posix().encode('utf-8')).hexdigest()}.json"
+
+
+def _head_fingerprint(f, size):
+    f.seek(0)
+    return sha1(f.read(size)).hexdigest()
+
+
+def _load_line_index(file_path):
+    """Return the line index of a log file, extended to its current end.
+
+    The index holds the byte offset of every CHECKPOINT_LINES-th line, the number of
+    complete lines and the offset right after the last one. It is reused as is when the
+    inode, size and mtime are unchanged, extended from where it stopped when the file only
+    grew, and rebuilt when the file was rotated or truncated.
+    """
+    stat = file_path.stat()
+    index_file = _index_file(file_path)
+    index = None
+    with suppress(OSError, ValueError):
+        index = json.loads(index_file.read_text())
+
+    with _index_lock, file_path.open("rb") as f:
+        reusable = isinstance(index, dict) and index.get("version") == INDEX_VERSION and index.get("inode") == stat.st_ino
+        if reusable and index["size"] == stat.st_size and index["mtime"] == stat.st_mtime:
+            return index
+        if not reusable or index["size"] > stat.st_size or _head_fingerprint(f, index["head_size"]) != index["head"]:
+            index = {"version": INDEX_VERSION, "inode": stat.st_ino, "checkpoints": [0], "lines": 0, "indexed": 0}
+
+        checkpoints = index["checkpoints"]
+        lines = index["lines"]
+        offset = index["indexed"]
+        f.seek(offset)
+        while chunk := f.read(INDEX_READ_SIZE):
+            position = chunk.find(b"\n")
+            while position != -1:
+                lines += 1
+                if lines % CHECKPOINT_LINES == 0:
+                    checkpoints.append(offset + position + 1)
+                position = chunk.find(b"\n", position + 1)
+            last_newline = chunk.rfind(b"\n")
+            if last_newline != -1:
+                index["indexed"] = offset + last_newline + 1
+            offset += len(chunk)
+
+        index["lines"] = lines
+        # A trailing line still being written is counted but only indexed once it is complete
+        index["total_lines"] = lines + (1 if offset > index["indexed"] else 0)
+        index["size"] = offset
+        index["mtime"] = stat.st_mtime
+        index["head_size"] = min(offset, INDEX_HEAD_BYTES)
+        index["head"] = _head_fingerprint(f, index["head_size"])
+
+    with suppress(OSError):
+        LOGS_INDEX_PATH.mkdir(parents=True, exist_ok=True)
+        tmp_file = index_file.with_suffix(f".{getpid()}.{threading.get_ident()}.tmp")
+        tmp_file.write_text(json.dumps(index, separators=(",", ":")))
+        replace(tmp_file, index_file)
+    return index
+
+
+def _line_offset(f, index, line):
+    """Byte offset of a 0-based line: seek to the closest checkpoint and skip the remaining lines."""
+    checkpoint = min(line // CHECKPOINT_LINES, len(index["checkpoints"]) - 1)
+    f.seek(index["checkpoints"][checkpoint])
+    for _ in range(line - checkpoint * CHECKPOINT_LINES):
+        if not f.readline():
+            break
+    return f.tell()
+
+
+def _read_lines(file_path, index, start, count):
+    with file_path.open("rb") as f:
+        _line_offset(f, index, start)
+        return b"".join(islice(iter(f.readline, b""), count)).decode("utf-8", errors="replace")
+
+
 def _resolve_log_path(current_file, files):
     """Validate `current_file` against the listing and return its Path, or None.
 
@@ -106,12 +195,9 @@ def logs_page():
         if file_path is None or not file_path.is_file():
             return Response("No such file", 404)
 
-        # Count lines without holding the whole file in memory (avoids OOM on
-        # very large logs — only one line is resident at a time).
-        total_lines = 0
-        with file_path.open(encoding="utf-8", errors="replace") as f:
-            for _ in f:
-                total_lines += 1
+        # The persisted line index only reads what was appended since the last visit
+        index = _load_line_index(file_path)
+        total_lines = index["total_lines"]
         # Ceil division so an exact multiple of PAGE_SIZE doesn't add a spurious
         # trailing empty page (which would be the default "latest" view).
         page_num = max(1, -(-total_lines // PAGE_SIZE))
@@ -123,13 +209,10 @@ def logs_page():
             page = page_num
         page = max(1, min(page, page_num))
 
-        # Read only the requested page's slice (O(page) memory, not O(file)).
-        start = (page - 1) * PAGE_SIZE
-        with file_path.open(encoding="utf-8", errors="replace") as f:
-            raw_logs = "".join(islice(f, start, start + PAGE_SIZE)).rstrip("\n")
+        # Seek straight to the requested page (O(page) reads and memory, not O(file)).
+        raw_logs = _read_lines(file_path, index, (page - 1) * PAGE_SIZE, PAGE_SIZE).rstrip("\n")
 
-        stat = file_path.stat()
-        file_meta = {"size": stat.st_size, "lines": total_lines, "mtime": stat.st_mtime}
+        file_meta = {"size": index["size"], "lines": total_lines, "mtime": index["mtime"]}
 
     return render_template(
         "logs.html",
@@ -152,6 +235,35 @@ def download_log():
     if file_path is None or not file_path.is_file():
         return Response("No such file", 404)
 
+    # Download a single page of the file (same numbering as the logs page)
+    page = request.args.get("page", "")
+    if page:
+        if not page.isdigit() or int(page) < 1:
+            return Response("Invalid page", 400)
+        index = _load_line_index(file_path)
+        start_line = (int(page) - 1) * PAGE_SIZE
+        if start_line >= index["total_lines"]:
+            return Response("No such page", 404)
+
+        with file_path.open("rb") as f:
+            start = _line_offset(f, index, start_line)
+            end = _line_offset(f, index, start_line + PAGE_SIZE) if start_line + PAGE_SIZE < index["lines"] else index["size"]
+
+        def generate():
+            with file_path.open("rb") as f:
+                f.seek(start)
+                remaining = end - start
+                while remaining > 0 and (chunk := f.read(min(INDEX_READ_SIZE, remaining))):
+                    remaining -= len(chunk)
+                    yield chunk
+
+        name = current_file.removeprefix("letsencrypt_")
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/plain",
+            headers={"Content-Disposition": f"attachment; filename={name}.page{page}", "Content-Length": str(end - start), "Cache-Control": "no-cache"},
+        )
+
     return send_file(
         file_path,
         mimetype="text/plain",
@@ -31,8 +31,10 @@ from jinja2 import ChoiceLoader, FileSystemLoader
 from werkzeug.routing.exceptions import BuildError
 
 from common_utils import get_redis_client as get_common_redis_client, is_newer_version_available  # type: ignore
+from logger import get_log_queue_stats  # type: ignore
 
 from app.models.biscuit import BiscuitMiddleware
+from app.models.request_rollups import update_request_rollups
 from app.models.reverse_proxied import ReverseProxied
 
 from app.dependencies import BW_CONFIG, DATA, DB, CORE_PLUGINS_PATH, EXTERNAL_PLUGINS_PATH, PRO_PLUGINS_PATH, safe_reload_plugins
@@ -80,6 +82,7 @@ from app.routes.setup import setup
 from app.routes.totp import totp
 from app.routes.support import support
 from app.routes.templates import templates as templates_bp
+from app.routes.utils import get_redis_client
 
 BLUEPRINTS = (
     about,
@@ -164,11 +167,19 @@ _cookie_config_detected = False
 _SESSION_CLEANUP_INTERVAL_SECONDS = 3600.0
 _session_cleanup_last_run = 0.0
 
+_REQUESTS_ROLLUP_INTERVAL_SECONDS = 30.0
+_requests_rollup_last_run = 0.0
+
 _restart_workers_lock = Lock()
 _restart_workers_future = None
 _restart_workers_next_allowed = 0.0
 RESTART_WORKERS_MIN_INTERVAL_SECONDS = 10.0
 
+# Per-worker cache of the database reads of the page context, refreshed when its generation key changes (or at least every TTL)
+_PAGE_CONTEXT_TTL_SECONDS = 60.0
+_page_context_lock = Lock()
+_page_context_cache = {"key": None, "expires": 0.0, "value": {}}
+
 
 def _shutdown_executors():
     """Shutdown all thread pool executors on application exit."""
@@ -902,6 +913,13 @@ def update_latest_stable_release():
         DATA["LATEST_VERSION"] = latest_release
 
 
+def roll_up_requests():
+    # Runs outside of the request context: the Redis client isn't cached on flask.g and nothing is flashed
+    redis_client = get_redis_client()
+    if redis_client:
+        update_request_rollups(redis_client)
+
+
 def check_database_state(request_method: str, request_path: str):
     DATA.load_from_file()
     if (
@@ -1118,6 +1136,33 @@ def _host_allowed(host: str, allowed: list) -> bool:
     return False
 
 
+def _get_page_context(metadata: dict, with_services_count: bool) -> dict:
+    """Return the plugins, the global config and the services count of the page context, cached against a generation key.
+
+    The key is made of the database config generation, bumped by every save of the settings and services, of the plugins
+    markers already read with the metadata and of the CONTEXT_GENERATION shared between workers. Without a config generation
+    (database not migrated yet), nothing is cached.
+    """
+    config_generation = DB.get_config_generation()
+    key = (
+        config_generation,
+        DATA.get("CONTEXT_GENERATION", 0),
+        metadata["is_pro"],
+        metadata["last_external_plugins_change"],
+        metadata["last_pro_plugins_change"],
+        tuple(sorted(metadata["plugins_config_changed"].items())),
+    )
+    with _page_context_lock:
+        context = _page_context_cache["value"]
+        if config_generation is None or _page_context_cache["key"] != key or _page_context_cache["expires"] <= time():
+            context = {"plugins": BW_CONFIG.get_plugins(), "config": DB.get_config(global_only=True, methods=True)}
+            _page_context_cache.update(key=key, expires=time() + _PAGE_CONTEXT_TTL_SECONDS, value=context)
+
+        if with_services_count and "services_count" not in context:
+            context["services_count"] = len(DB.get_services())
+        return context
+
+
 @app.before_request
 def before_request():
     # Skip the per-request lifecycle (UIData lock, CSP nonce, get_metadata) for static assets;
@@ -1188,6 +1233,12 @@ def before_request():
                 _session_cleanup_last_run = now_ts
                 _periodic_tasks_executor.submit(app.config["SESSION_CACHELIB"]._remove_expired, now_ts)
 
+        # Periodic background rollup of the new Redis requests (the Redis lock lets a single worker do it at a time)
+        global _requests_rollup_last_run
+        if time() - _requests_rollup_last_run > _REQUESTS_ROLLUP_INTERVAL_SECONDS:
+            _requests_rollup_last_run = time()
+            _periodic_tasks_executor.submit(roll_up_requests)
+
         schedule_database_state_check(request.method, request.path)
 
         DB.readonly = DATA.get("READONLY_MODE", DB.readonly) or not DB.database_uri
@@ -1295,11 +1346,12 @@ def before_request():
                     continue
                 seen.add(content)
                 flash(content, f["type"], save=f.get("save", True))
-            DATA["TO_FLASH"] = []
+            if DATA.get("TO_FLASH"):
+                DATA["TO_FLASH"] = []
 
             # Live, every-request overlap check — the metadata flag is only refreshed daily by the scheduler.
             if metadata["is_pro"] and metadata["pro_services"]:
-                pro_overlapped = len(DB.get_services()) > metadata["pro_services"]
+                pro_overlapped = _get_page_context(metadata, with_services_count=True)["services_count"] > metadata["pro_services"]
                 if pro_overlapped and current_endpoint != "pro":
                     flash(
                         "You have more services than allowed by your pro license. "
@@ -1309,6 +1361,7 @@ def before_request():
                         save=False,  # transient toast; keep it out of the notification history
                     )
 
+        page_context = _get_page_context(metadata, with_services_count=False)
         data = dict(
             current_endpoint=current_endpoint,
             script_nonce=g.script_nonce,
@@ -1320,7 +1373,7 @@ def before_request():
             pro_services=metadata["pro_services"],
             pro_expire=metadata["pro_expire"].strftime("%Y/%m/%d") if isinstance(metadata["pro_expire"], datetime) else "Unknown",
             pro_overlapped=pro_overlapped,
-            plugins=BW_CONFIG.get_plugins(),
+            plugins=page_context["plugins"],
             flash_messages=session.get("flash_messages", []),
             is_readonly=DATA.get("READONLY_MODE", False) or ("write" not in current_user.list_permissions and not request.path.startswith("/profile")),
             db_readonly=DATA.get("READONLY_MODE", False),
@@ -1333,7 +1386,7 @@ def before_request():
             extra_pages=app.config["EXTRA_PAGES"],
             extra_scripts=DATA.get("EXTRA_SCRIPTS", []),
             extra_styles=DATA.get("EXTRA_STYLES", []),
-            config=DB.get_config(global_only=True, methods=True),
+            config=page_context["config"],
         )
 
         if current_endpoint in COLUMNS_PREFERENCES_DEFAULTS:
@@ -1473,6 +1526,10 @@ if getenv("ENABLE_HEALTHCHECK", "no").lower() == "yes":
             "service": "bunkerweb-ui",
         }
 
+        log_queue = get_log_queue_stats()
+        if log_queue["enabled"]:
+            health_data["log_queue"] = log_queue
+
         return Response(status=200, response=dumps(health_data), content_type="application/json")
 
 
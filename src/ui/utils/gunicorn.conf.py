@@ -22,7 +22,7 @@ from common_utils import effective_cpu_count, getenv_bool, handle_docker_secrets
 from logger import getLogger, log_types  # type: ignore
 
 from app.models.ui_database import UIDatabase
-from app.dependencies import reload_plugins
+from app.dependencies import DATA, reload_plugins
 from app.utils import (
     BISCUIT_PRIVATE_KEY_FILE,
     BISCUIT_PUBLIC_KEY_FILE,
@@ -43,7 +43,7 @@ TMP_UI_DIR = TMP_DIR.joinpath("ui")
 RUN_DIR = Path(sep, "var", "run", "bunkerweb")
 LIB_DIR = Path(sep, "var", "lib", "bunkerweb")
 
-UI_DATA_FILE = TMP_DIR.joinpath("ui_data.json")
+UI_DATA_FILE = TMP_DIR.joinpath("ui_data.sqlite3")
 HEALTH_FILE = TMP_DIR.joinpath("ui.healthy")
 ERROR_FILE = TMP_DIR.joinpath("ui.error")
 
@@ -609,17 +609,16 @@ def on_starting(server):
     except BaseException as e:
         LOGGER.error(f"Exception while fetching latest release information: {e}")
 
-    UI_DATA_FILE.write_text(
-        dumps(
-            {
-                "LATEST_VERSION": latest_version,
-                "LATEST_VERSION_LAST_CHECK": datetime.now().astimezone().isoformat(),
-                "TO_FLASH": [],
-                "READONLY_MODE": DB.readonly,
-            }
-        ),
-        encoding="utf-8",
+    DATA.reset(
+        {
+            "LATEST_VERSION": latest_version,
+            "LATEST_VERSION_LAST_CHECK": datetime.now().astimezone().isoformat(),
+            "TO_FLASH": [],
+            "READONLY_MODE": DB.readonly,
+        }
     )
+    # Each worker opens its own connection
+    DATA.close()
     set_secure_permissions(UI_DATA_FILE)
 
     # Check if Redis is enabled via environment variable or database before closing DB
@@ -684,4 +683,5 @@ def post_fork(server, worker):
 
 def on_exit(server):
     HEALTH_FILE.unlink(missing_ok=True)
-    UI_DATA_FILE.unlink(missing_ok=True)
+    for file_path in (UI_DATA_FILE, UI_DATA_FILE.with_name(f"{UI_DATA_FILE.name}-wal"), UI_DATA_FILE.with_name(f"{UI_DATA_FILE.name}-shm")):
+        file_path.unlink(missing_ok=True)